@@ -6,6 +6,7 @@ from flask_socketio import SocketIO
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from config import config
+import click
 import json
 import os
 import subprocess
@@ -36,6 +37,12 @@ def create_app(config_name='default'):
     app.config.from_object(config[config_name])
     
     db.init_app(app)
+    # Registriert die Session-Listener für die SystemSettings-Cache-Invalidierung
+    from app.utils import settings_store  # noqa: F401
+    # Registriert die Session-Listener, die neue Dateiinhalte für die Vorschau einreihen
+    from app.utils import file_previews  # noqa: F401
+    # Registriert die Session-Listener für die Verweiszähler der Datei-Blobs
+    from app.utils import file_storage  # noqa: F401
     login_manager.init_app(app)
     mail.init_app(app)
     
@@ -337,26 +344,26 @@ def create_app(config_name='default'):
         portal_logo_filename = None
         
         try:
-            from app.models.settings import SystemSettings
+            from app.utils.settings_store import get_all_settings
             
-            portal_name_setting = SystemSettings.query.filter_by(key='portal_name').first()
-            if portal_name_setting and portal_name_setting.value and portal_name_setting.value.strip():
-                app_name = portal_name_setting.value
+            # Alle Einstellungen kommen aus dem Prozess-Cache (eine Abfrage statt vier)
+            settings_values = get_all_settings()
+            
+            portal_name = settings_values.get('portal_name')
+            org_name = settings_values.get('organization_name')
+            if portal_name and portal_name.strip():
+                app_name = portal_name
+            elif org_name and org_name.strip():
+                app_name = org_name
             else:
-                org_name_setting = SystemSettings.query.filter_by(key='organization_name').first()
-                if org_name_setting and org_name_setting.value and org_name_setting.value.strip():
-                    app_name = org_name_setting.value
-                else:
-                    app_name = app.config.get('APP_NAME', 'Prismateams')
+                app_name = app.config.get('APP_NAME', 'Prismateams')
             
-            portal_logo_setting = SystemSettings.query.filter_by(key='portal_logo').first()
-            if portal_logo_setting and portal_logo_setting.value:
-                portal_logo_filename = portal_logo_setting.value
+            if settings_values.get('portal_logo'):
+                portal_logo_filename = settings_values['portal_logo']
                 app_logo = None
             
-            gradient_setting = SystemSettings.query.filter_by(key='color_gradient').first()
-            if gradient_setting and gradient_setting.value:
-                color_gradient = gradient_setting.value
+            if settings_values.get('color_gradient'):
+                color_gradient = settings_values['color_gradient']
         except:
             pass
         
@@ -756,7 +763,7 @@ def create_app(config_name='default'):
     from app.blueprints.chat import chat_bp
     from app.blueprints.files import files_bp
     from app.blueprints.calendar import calendar_bp
-    from app.blueprints.email import email_bp, start_email_sync
+    from app.blueprints.email import email_bp
     from app.blueprints.contacts import contacts_bp
     from app.blueprints.credentials import credentials_bp
     from app.blueprints.manuals import manuals_bp
@@ -805,18 +812,17 @@ def create_app(config_name='default'):
     def manifest():
         import json
         from flask import url_for
-        from app.models.settings import SystemSettings
+        from app.utils.settings_store import get_setting
         
-        portal_name_setting = SystemSettings.query.filter_by(key='portal_name').first()
-        portal_name = portal_name_setting.value if portal_name_setting and portal_name_setting.value else app.config.get('APP_NAME', 'Prismateams')
+        portal_name = get_setting('portal_name') or app.config.get('APP_NAME', 'Prismateams')
         
         # Standard Logo-URL
         logo_url = url_for('static', filename='img/logo.png')
         
         # Portal-Logo prüfen
-        portal_logo_setting = SystemSettings.query.filter_by(key='portal_logo').first()
-        if portal_logo_setting and portal_logo_setting.value:
-            logo_url = url_for('settings.portal_logo', filename=portal_logo_setting.value)
+        portal_logo = get_setting('portal_logo')
+        if portal_logo:
+            logo_url = url_for('settings.portal_logo', filename=portal_logo)
         
         manifest_path = os.path.join(app.static_folder, 'manifest.json')
         try:
@@ -852,18 +858,17 @@ def create_app(config_name='default'):
     def portal_info():
         """API-Endpoint für Portal-Informationen (für Service Worker)."""
         from flask import url_for
-        from app.models.settings import SystemSettings
+        from app.utils.settings_store import get_setting
         
-        portal_name_setting = SystemSettings.query.filter_by(key='portal_name').first()
-        portal_name = portal_name_setting.value if portal_name_setting and portal_name_setting.value else app.config.get('APP_NAME', 'Prismateams')
+        portal_name = get_setting('portal_name') or app.config.get('APP_NAME', 'Prismateams')
         
         # Standard Logo-URL
         logo_url = url_for('static', filename='img/logo.png', _external=False)
         
         # Portal-Logo prüfen
-        portal_logo_setting = SystemSettings.query.filter_by(key='portal_logo').first()
-        if portal_logo_setting and portal_logo_setting.value:
-            logo_url = url_for('settings.portal_logo', filename=portal_logo_setting.value, _external=False)
+        portal_logo = get_setting('portal_logo')
+        if portal_logo:
+            logo_url = url_for('settings.portal_logo', filename=portal_logo, _external=False)
         
         return jsonify({
             'name': portal_name,
@@ -890,9 +895,9 @@ def create_app(config_name='default'):
                 # Dies ist notwendig, damit SQLAlchemy alle Tabellen erstellt
                 from app.models.user import User
                 from app.models.chat import Chat, ChatMessage, ChatMember
-                from app.models.file import File, FileVersion, Folder
+                from app.models.file import File, FileVersion, Folder, FilePreview, UploadSession, FileBlob
                 from app.models.calendar import CalendarEvent, EventParticipant, PublicCalendarFeed
-                from app.models.email import EmailMessage, EmailPermission, EmailAttachment, EmailFolder
+                from app.models.email import EmailMessage, EmailPermission, EmailAttachment, EmailFolder, EmailSyncRun, EmailRenderCache, EmailSearchTerm
                 from app.models.credential import Credential, CredentialFolder
                 from app.models.manual import Manual
                 from app.models.settings import SystemSettings
@@ -904,6 +909,8 @@ def create_app(config_name='default'):
                 from app.models.comment import Comment, CommentMention
                 from app.models.music import MusicProviderToken, MusicWish, MusicQueue, MusicSettings
                 from app.models.media_downloader import MediaDownloadJob
+                from app.models.background_job import BackgroundJob
+                from app.models.outbound_email import OutboundEmail
                 from app.models.shortlink import ShortLink
                 from app.models.booking import BookingRequest, BookingForm, BookingFormField, BookingFormImage, BookingRequestField, BookingRequestFile, BookingFormRole, BookingFormRoleUser, BookingRequestApproval
                 from app.models.event import Event, EventAppointment, EventAssignment, EventInventoryNeed, EventContact, EventTimelineItem
@@ -1226,6 +1233,200 @@ def create_app(config_name='default'):
                                 )
                             except Exception as mail_col_error:
                                 print(f"[WARNUNG] Mail-Manager-Spalten konnten nicht hinzugefügt werden: {mail_col_error}")
+
+                    # Inkrementeller IMAP-Sync: Ordnerzustand (UIDVALIDITY/UIDNEXT/HIGHESTMODSEQ)
+                    if 'email_folders' in inspector.get_table_names():
+                        folder_columns = {col['name'] for col in inspector.get_columns('email_folders')}
+                        sync_state_columns = [
+                            (col_name, col_def)
+                            for col_name, col_def in (
+                                ("uid_validity", "BIGINT NULL"),
+                                ("uid_next", "BIGINT NULL"),
+                                ("highest_modseq", "BIGINT NULL"),
+                                ("message_count", "INTEGER NULL"),
+                            )
+                            if col_name not in folder_columns
+                        ]
+                        if sync_state_columns:
+                            print("[INFO] Ergänze email_folders Sync-Zustand ...")
+                            try:
+                                with db.engine.begin() as connection:
+                                    for col_name, col_def in sync_state_columns:
+                                        connection.execute(text(
+                                            f"ALTER TABLE email_folders ADD COLUMN {col_name} {col_def}"
+                                        ))
+                                print(
+                                    "[OK] email_folders Sync-Spalten hinzugefügt: "
+                                    + ", ".join(c[0] for c in sync_state_columns)
+                                )
+                            except Exception as folder_col_error:
+                                print(f"[WARNUNG] Sync-Spalten für email_folders konnten nicht hinzugefügt werden: {folder_col_error}")
+
+                        # Vorberechnete Ordnerzähler (gesamt/ungelesen), einmalig befüllen
+                        counter_columns = [
+                            col_name for col_name in ('total_count', 'unread_count')
+                            if col_name not in folder_columns
+                        ]
+                        if counter_columns:
+                            print("[INFO] Ergänze email_folders Zähler ...")
+                            try:
+                                with db.engine.begin() as connection:
+                                    for col_name in counter_columns:
+                                        connection.execute(text(
+                                            f"ALTER TABLE email_folders ADD COLUMN {col_name} INTEGER NOT NULL DEFAULT 0"
+                                        ))
+                                from app.utils.email_folder_counts import recount_folder_counts
+                                recount_folder_counts()
+                                db.session.commit()
+                                print("[OK] email_folders Zähler hinzugefügt und befüllt")
+                            except Exception as folder_count_error:
+                                db.session.rollback()
+                                print(f"[WARNUNG] Zähler für email_folders konnten nicht hinzugefügt werden: {folder_count_error}")
+
+                    # Duplikaterkennung beim Sync: UIDs gelten nur zusammen mit der UIDVALIDITY
+                    # (der eindeutige Index wird unten mit den übrigen Indizes angelegt)
+                    if 'email_messages' in inspector.get_table_names():
+                        email_columns = {col['name'] for col in inspector.get_columns('email_messages')}
+                        if 'imap_uid_validity' not in email_columns:
+                            print("[INFO] Ergänze email_messages.imap_uid_validity ...")
+                            try:
+                                with db.engine.begin() as connection:
+                                    connection.execute(text(
+                                        "ALTER TABLE email_messages ADD COLUMN imap_uid_validity BIGINT NULL"
+                                    ))
+                                    connection.execute(text(
+                                        "UPDATE email_messages SET imap_uid_validity = ("
+                                        "SELECT uid_validity FROM email_folders "
+                                        "WHERE email_folders.name = email_messages.folder"
+                                        ") WHERE imap_uid IS NOT NULL"
+                                    ))
+                                    # Doppelte UIDs im Altbestand: nur die neueste Zeile behält ihre UID,
+                                    # die übrigen werden beim nächsten Sync über die Message-ID zugeordnet
+                                    connection.execute(text(
+                                        "UPDATE email_messages SET imap_uid = NULL, imap_uid_validity = NULL "
+                                        "WHERE id IN (SELECT id FROM ("
+                                        "SELECT older.id FROM email_messages older "
+                                        "JOIN email_messages newer ON newer.folder = older.folder "
+                                        "AND newer.imap_uid = older.imap_uid AND newer.id > older.id"
+                                        ") duplicates)"
+                                    ))
+                                print("[OK] email_messages.imap_uid_validity hinzugefügt")
+                            except Exception as uid_validity_error:
+                                print(f"[WARNUNG] email_messages.imap_uid_validity konnte nicht hinzugefügt werden: {uid_validity_error}")
+
+                    # Paginierte Ordneransicht: Vorschauspalte, Indizes, received_at immer gesetzt
+                    if 'email_messages' in inspector.get_table_names():
+                        from app.models.email import EmailMessage
+                        email_columns = {col['name'] for col in inspector.get_columns('email_messages')}
+                        try:
+                            if 'preview_text' not in email_columns:
+                                print("[INFO] Ergänze email_messages.preview_text ...")
+                                with db.engine.begin() as connection:
+                                    connection.execute(text(
+                                        "ALTER TABLE email_messages ADD COLUMN preview_text VARCHAR(255) NULL"
+                                    ))
+                                    connection.execute(text(
+                                        "UPDATE email_messages SET preview_text = SUBSTR(body_text, 1, :length) "
+                                        "WHERE body_text IS NOT NULL AND body_text <> ''"
+                                    ), {'length': EmailMessage.PREVIEW_LENGTH})
+                                    # Anhang-Kennzeichen wurde bisher beim Öffnen der Liste gesetzt
+                                    connection.execute(text(
+                                        "UPDATE email_messages SET has_attachments = 1 "
+                                        "WHERE id IN (SELECT DISTINCT email_id FROM email_attachments)"
+                                    ))
+                                print("[OK] email_messages.preview_text hinzugefügt und befüllt")
+                            existing_indexes = {index['name'] for index in inspector.get_indexes('email_messages')}
+                            for index in EmailMessage.__table__.indexes:
+                                if index.name not in existing_indexes:
+                                    print(f"[INFO] Erstelle Index {index.name} ...")
+                                    index.create(bind=db.engine)
+                            with db.engine.begin() as connection:
+                                connection.execute(text(
+                                    "UPDATE email_messages SET received_at = COALESCE(sent_at, created_at) "
+                                    "WHERE received_at IS NULL"
+                                ))
+                        except Exception as email_list_error:
+                            print(f"[WARNUNG] Migration für die E-Mail-Ordneransicht fehlgeschlagen: {email_list_error}")
+
+                        # Suchindex: Bestand wird vom Hintergrund-Job email_search_index indexiert
+                        if 'search_index_version' not in email_columns:
+                            print("[INFO] Ergänze email_messages.search_index_version ...")
+                            try:
+                                with db.engine.begin() as connection:
+                                    connection.execute(text(
+                                        "ALTER TABLE email_messages ADD COLUMN search_index_version SMALLINT NULL"
+                                    ))
+                                print("[OK] email_messages.search_index_version hinzugefügt")
+                            except Exception as search_col_error:
+                                print(f"[WARNUNG] email_messages.search_index_version konnte nicht hinzugefügt werden: {search_col_error}")
+
+                    # Blob-Speicher für E-Mail-Anhänge (Inhalte werden per Hintergrund-Job übertragen)
+                    if 'email_attachments' in inspector.get_table_names():
+                        attachment_columns = {col['name'] for col in inspector.get_columns('email_attachments')}
+                        if 'content_hash' not in attachment_columns:
+                            print("[INFO] Ergänze email_attachments.content_hash ...")
+                            try:
+                                with db.engine.begin() as connection:
+                                    connection.execute(text(
+                                        "ALTER TABLE email_attachments ADD COLUMN content_hash VARCHAR(64) NULL"
+                                    ))
+                                    connection.execute(text(
+                                        "CREATE INDEX ix_email_attachments_content_hash ON email_attachments (content_hash)"
+                                    ))
+                                print("[OK] email_attachments.content_hash hinzugefügt")
+                            except Exception as blob_col_error:
+                                print(f"[WARNUNG] email_attachments.content_hash konnte nicht hinzugefügt werden: {blob_col_error}")
+                        # Große Anhänge werden erst beim ersten Öffnen vom IMAP-Server geladen
+                        if 'imap_section' not in attachment_columns:
+                            print("[INFO] Ergänze email_attachments.imap_section/imap_encoding ...")
+                            try:
+                                with db.engine.begin() as connection:
+                                    connection.execute(text(
+                                        "ALTER TABLE email_attachments ADD COLUMN imap_section VARCHAR(64) NULL"
+                                    ))
+                                    connection.execute(text(
+                                        "ALTER TABLE email_attachments ADD COLUMN imap_encoding VARCHAR(32) NULL"
+                                    ))
+                                print("[OK] email_attachments.imap_section/imap_encoding hinzugefügt")
+                            except Exception as lazy_col_error:
+                                print(f"[WARNUNG] email_attachments.imap_section konnte nicht hinzugefügt werden: {lazy_col_error}")
+
+                    # Inhalts-Hash für gespeicherte Dateivorschauen (file_previews)
+                    if 'files' in inspector.get_table_names():
+                        file_columns = {col['name'] for col in inspector.get_columns('files')}
+                        if 'content_hash' not in file_columns:
+                            print("[INFO] Ergänze files.content_hash ...")
+                            try:
+                                with db.engine.begin() as connection:
+                                    connection.execute(text(
+                                        "ALTER TABLE files ADD COLUMN content_hash VARCHAR(64) NULL"
+                                    ))
+                                    connection.execute(text(
+                                        "CREATE INDEX ix_files_content_hash ON files (content_hash)"
+                                    ))
+                                print("[OK] files.content_hash hinzugefügt")
+                            except Exception as file_hash_error:
+                                print(f"[WARNUNG] files.content_hash konnte nicht hinzugefügt werden: {file_hash_error}")
+
+                    # Inhaltsadressierter Speicher für Dateiversionen (file_storage)
+                    if 'file_versions' in inspector.get_table_names():
+                        version_columns = {col['name'] for col in inspector.get_columns('file_versions')}
+                        if 'content_hash' not in version_columns:
+                            print("[INFO] Ergänze file_versions.content_hash ...")
+                            try:
+                                with db.engine.begin() as connection:
+                                    connection.execute(text(
+                                        "ALTER TABLE file_versions ADD COLUMN content_hash VARCHAR(64) NULL"
+                                    ))
+                                    connection.execute(text(
+                                        "CREATE INDEX ix_file_versions_content_hash ON file_versions (content_hash)"
+                                    ))
+                                    # Bisherige Hashes stammen nur aus der Vorschau; die Inhalte liegen noch
+                                    # nicht im Blob-Speicher und werden vom Job file_blob_migration übertragen
+                                    connection.execute(text("UPDATE files SET content_hash = NULL"))
+                                print("[OK] file_versions.content_hash hinzugefügt")
+                            except Exception as version_hash_error:
+                                print(f"[WARNUNG] file_versions.content_hash konnte nicht hinzugefügt werden: {version_hash_error}")
                 except Exception as migration_error:
                     print(f"[WARNUNG] Migration konnte nicht automatisch ausgeführt werden: {migration_error}")
                     print("[INFO] Bitte führen Sie manuell aus: python migrations/migrate_to_2_4_1.py --security-only")
@@ -1517,15 +1718,20 @@ def create_app(config_name='default'):
             except Exception as e:
                 print(f"[WARNUNG] Warnung beim Erstellen der Datenbank-Tabellen: {e}")
     
-    # Background-Jobs nur im Hauptprozess starten
-    if is_main_process and not os.getenv('PRISMATEAMS_SKIP_BACKGROUND_JOBS'):
-        start_email_sync(app)
-        
-        from app.tasks.notification_scheduler import start_notification_scheduler
-        start_notification_scheduler(app)
+    @app.cli.command('run-scheduler')
+    @click.option('--with-workers', is_flag=True, help='Jobs zusätzlich in diesem Prozess abarbeiten.')
+    def run_scheduler_command(with_workers):
+        """Periodische Jobs in einem eigenen Prozess einreihen (mit Leader-Wahl)."""
+        from app.tasks.job_queue import run_scheduler
+        run_scheduler(app, with_workers=with_workers)
 
-        from app.tasks.media_downloader_cleanup import start_media_downloader_cleanup
-        start_media_downloader_cleanup(app)
+    # Background-Jobs nur im Hauptprozess starten
+    # (E-Mail-Sync, Benachrichtigungen, Downloads und Bereinigungen laufen über die Job-Queue;
+    # periodische Jobs reiht nur der gewählte Scheduler-Leader ein)
+    running_scheduler_command = 'run-scheduler' in sys.argv[1:]
+    if is_main_process and not running_scheduler_command and not os.getenv('PRISMATEAMS_SKIP_BACKGROUND_JOBS'):
+        from app.tasks.job_queue import start_job_queue
+        start_job_queue(app)
     
     return app
 
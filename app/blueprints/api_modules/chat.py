@@ -12,10 +12,10 @@ from app.models.chat import Chat, ChatMember, ChatMessage
 from app.models.file import Folder
 from app.models.user import User
 from app.utils.access_control import has_module_access, get_guest_accessible_items
-from app.utils.dashboard_events import emit_dashboard_update
 from app.utils.i18n import translate
 from app.utils.notifications import enqueue_chat_notification
 from app.utils.chat_visibility import visible_chat_user_filters
+from app.services.chat_unread_service import ChatUnreadService
 
 
 ALLOWED_MEDIA_EXTENSIONS = {
@@ -190,15 +190,11 @@ def register_chat_routes(api_bp, require_api_auth):
             return access_error
 
         memberships = ChatMember.query.filter_by(user_id=current_user.id).all()
+        unread_by_chat = ChatUnreadService.per_chat_for_user(current_user.id)
         chats = []
         for membership in memberships:
             chat = membership.chat
-            unread_count = ChatMessage.query.filter(
-                ChatMessage.chat_id == chat.id,
-                ChatMessage.created_at > membership.last_read_at,
-                ChatMessage.sender_id != current_user.id,
-            ).count()
-            chat_data = _serialize_chat(chat, unread_count=unread_count)
+            chat_data = _serialize_chat(chat, unread_count=unread_by_chat.get(chat.id, 0))
             if chat.is_direct_message and not chat.is_main_chat:
                 members = ChatMember.query.filter_by(chat_id=chat.id).join(User).filter(
                     *visible_chat_user_filters(),
@@ -388,20 +384,7 @@ def register_chat_routes(api_bp, require_api_auth):
             pass
 
         try:
-            chat_members = ChatMember.query.filter_by(chat_id=actual_chat_id).all()
-            for member in chat_members:
-                if member.user_id == current_user.id:
-                    continue
-                user_memberships = ChatMember.query.filter_by(user_id=member.user_id).all()
-                unread_count = 0
-                for m in user_memberships:
-                    unread_count += ChatMessage.query.filter(
-                        ChatMessage.chat_id == m.chat_id,
-                        ChatMessage.sender_id != member.user_id,
-                        ChatMessage.created_at > m.last_read_at,
-                        ChatMessage.is_deleted == False,
-                    ).count()
-                emit_dashboard_update(member.user_id, "chat_update", {"count": unread_count})
+            ChatUnreadService.emit_totals_for_chat(actual_chat_id, exclude_user_id=current_user.id)
         except Exception:
             pass
 
@@ -759,17 +742,7 @@ def register_chat_routes(api_bp, require_api_auth):
         if access_error:
             return access_error
         try:
-            user_chat_members = ChatMember.query.filter_by(user_id=current_user.id).all()
-            unread_count = 0
-            for member in user_chat_members:
-                chat_unread = ChatMessage.query.filter(
-                    ChatMessage.chat_id == member.chat_id,
-                    ChatMessage.sender_id != current_user.id,
-                    ChatMessage.created_at > member.last_read_at,
-                    ChatMessage.is_deleted == False,
-                ).count()
-                unread_count += chat_unread
-            return jsonify({"count": unread_count})
+            return jsonify({"count": ChatUnreadService.total_for_user(current_user.id)})
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
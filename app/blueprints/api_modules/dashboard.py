@@ -4,8 +4,9 @@ from flask import jsonify
 from flask_login import current_user
 
 from app.models.calendar import CalendarEvent
-from app.models.chat import ChatMember, ChatMessage
+from app.services.chat_unread_service import ChatUnreadService
 from app.models.email import EmailMessage
+from app.utils.email_folder_counts import get_unread_email_count as count_unread_emails
 from app.models.file import File
 
 
@@ -15,15 +16,7 @@ def register_dashboard_routes(api_bp, require_api_auth):
     def get_dashboard_stats():
         upcoming_events = CalendarEvent.query.filter(CalendarEvent.start_time >= datetime.utcnow()).count()
 
-        user_chats = ChatMember.query.filter_by(user_id=current_user.id).all()
-        unread_count = 0
-        for membership in user_chats:
-            count = ChatMessage.query.filter(
-                ChatMessage.chat_id == membership.chat_id,
-                ChatMessage.created_at > membership.last_read_at,
-                ChatMessage.sender_id != current_user.id,
-            ).count()
-            unread_count += count
+        unread_count = ChatUnreadService.total_for_user(current_user.id)
 
         unread_emails = EmailMessage.query.filter_by(is_read=False, is_sent=False).count()
         total_files = File.query.filter_by(is_current=True).count()
@@ -39,7 +32,7 @@ def register_dashboard_routes(api_bp, require_api_auth):
     @require_api_auth
     def get_unread_email_count():
         try:
-            unread_count = EmailMessage.query.filter_by(is_read=False).count()
+            unread_count = count_unread_emails()
             return jsonify({"count": unread_count})
         except Exception as e:
             return jsonify({"error": str(e)}), 500
@@ -1,14 +1,23 @@
 import os
 import secrets
-from datetime import datetime
 
 from flask import jsonify, request, send_file, url_for
 from flask_login import current_user, login_required
 
 from app import db
 from app.models.file import File, FileVersion, Folder
-from app.models.settings import SystemSettings
+from app.utils.settings_store import get_setting
 from app.utils.access_control import has_module_access
+from app.utils.file_deletion import delete_files, delete_folder_tree
+from app.utils.file_storage import add_file_version, restore_file_version, store_content
+from app.utils.chunked_upload import (
+    ChunkedUploadError,
+    append_chunk,
+    create_upload,
+    discard_upload,
+    get_upload,
+    upload_status,
+)
 from werkzeug.security import generate_password_hash
 
 
@@ -60,8 +69,7 @@ def _is_folder_descendant(candidate_folder, ancestor_folder_id):
 
 
 def _is_sharing_enabled():
-    setting = SystemSettings.query.filter_by(key="files_sharing_enabled").first()
-    return bool(setting and str(setting.value).lower() == "true")
+    return str(get_setting("files_sharing_enabled")).lower() == "true"
 
 
 from app.utils.public_share import (
@@ -80,25 +88,6 @@ def _generate_unique_dropbox_token():
     return token
 
 
-def _remove_file_from_storage(file_obj):
-    file_path = _resolve_path(file_obj.file_path)
-    if os.path.exists(file_path):
-        os.remove(file_path)
-    for version in file_obj.versions:
-        version_path = _resolve_path(version.file_path)
-        if os.path.exists(version_path):
-            os.remove(version_path)
-
-
-def _delete_folder_recursive(folder):
-    for file_obj in list(folder.files):
-        _remove_file_from_storage(file_obj)
-        db.session.delete(file_obj)
-    for subfolder in list(folder.subfolders):
-        _delete_folder_recursive(subfolder)
-    db.session.delete(folder)
-
-
 def register_files_routes(api_bp, require_api_auth):
     @api_bp.route("/files", methods=["GET"])
     @login_required
@@ -242,28 +231,9 @@ def register_files_routes(api_bp, require_api_auth):
         if content is None:
             return jsonify({"success": False, "error": "content ist erforderlich"}), 400
 
-        # version snapshot
-        db.session.add(FileVersion(
-            file_id=file_obj.id,
-            version_number=file_obj.version_number,
-            file_path=file_obj.file_path,
-            file_size=file_obj.file_size,
-            uploaded_by=file_obj.uploaded_by,
-        ))
-
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{file_obj.original_name}"
-        relative_path = os.path.join("uploads", "files", filename)
-        absolute_path = os.path.abspath(relative_path)
-        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
-        with open(absolute_path, "w", encoding="utf-8") as f:
-            f.write(content)
-
-        file_obj.file_path = absolute_path
-        file_obj.file_size = os.path.getsize(absolute_path)
-        file_obj.version_number += 1
-        file_obj.uploaded_by = current_user.id
-        file_obj.updated_at = datetime.utcnow()
+        # Bisherigen Stand als Version sichern (gleicher Blob, keine Kopie)
+        content_hash, size = store_content(content)
+        add_file_version(file_obj, content_hash, size, current_user.id)
         db.session.commit()
 
         return jsonify({
@@ -275,6 +245,135 @@ def register_files_routes(api_bp, require_api_auth):
             },
         }), 200
 
+    @api_bp.route("/files/versions/<int:version_id>/restore", methods=["POST"])
+    @require_api_auth
+    def api_restore_file_version(version_id):
+        if not _check_files_access():
+            return _files_access_denied_response()
+        guest_error = _ensure_not_guest_for_write()
+        if guest_error:
+            return guest_error
+
+        version = FileVersion.query.get_or_404(version_id)
+        file_obj = File.query.get_or_404(version.file_id)
+        restored_number = version.version_number
+        if restore_file_version(file_obj, version, current_user.id) is None:
+            db.session.rollback()
+            return jsonify({"success": False, "error": "Datei-Version nicht gefunden"}), 404
+        db.session.commit()
+
+        return jsonify({
+            "success": True,
+            "restored_version": restored_number,
+            "file": {
+                "id": file_obj.id,
+                "version": file_obj.version_number,
+                "updated_at": file_obj.updated_at.isoformat(),
+            },
+        }), 200
+
+    # Uploads in Teilstücken (fortsetzbar), siehe app/utils/chunked_upload.py
+    @api_bp.route("/files/uploads", methods=["POST"])
+    @require_api_auth
+    def api_chunked_upload_init():
+        if not _check_files_access():
+            return _files_access_denied_response()
+        guest_error = _ensure_not_guest_for_write()
+        if guest_error:
+            return guest_error
+
+        data = request.get_json(silent=True) or {}
+        raw_folder_id = data.get("folder_id")
+        try:
+            folder_id = int(raw_folder_id) if raw_folder_id not in (None, "", "null") else None
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "error": "Ungültiger Ordner"}), 400
+
+        try:
+            upload = create_upload(
+                current_user.id,
+                folder_id,
+                data.get("filename"),
+                data.get("size"),
+                relative_path=data.get("relative_path"),
+                sha256=data.get("sha256"),
+                mime_type=data.get("mime_type"),
+            )
+        except ChunkedUploadError as error:
+            return jsonify(error.to_dict()), error.status_code
+        return jsonify({"success": True, **upload_status(upload)}), 201
+
+    @api_bp.route("/files/uploads/<upload_id>", methods=["GET"])
+    @require_api_auth
+    def api_chunked_upload_status(upload_id):
+        if not _check_files_access():
+            return _files_access_denied_response()
+        try:
+            upload = get_upload(upload_id, current_user.id)
+        except ChunkedUploadError as error:
+            return jsonify(error.to_dict()), error.status_code
+        return jsonify({"success": True, **upload_status(upload)})
+
+    @api_bp.route("/files/uploads/<upload_id>", methods=["PUT"])
+    @require_api_auth
+    def api_chunked_upload_append(upload_id):
+        if not _check_files_access():
+            return _files_access_denied_response()
+        try:
+            upload = get_upload(upload_id, current_user.id)
+            received_size = append_chunk(
+                upload,
+                request.args.get("offset"),
+                request.stream,
+                request.content_length,
+                sha256=request.headers.get("X-Chunk-SHA256"),
+            )
+        except ChunkedUploadError as error:
+            return jsonify(error.to_dict()), error.status_code
+        return jsonify({"success": True, "received_size": received_size})
+
+    @api_bp.route("/files/uploads/<upload_id>/commit", methods=["POST"])
+    @require_api_auth
+    def api_chunked_upload_commit(upload_id):
+        if not _check_files_access():
+            return _files_access_denied_response()
+        from app.blueprints.files import store_chunked_upload
+
+        data = request.get_json(silent=True) or {}
+        conflict_strategy = str(data.get("conflict_strategy") or "").strip().lower()
+        try:
+            upload = get_upload(upload_id, current_user.id)
+            file_obj, outcome = store_chunked_upload(
+                upload, current_user.id, conflict_strategy, sha256=data.get("sha256")
+            )
+        except ChunkedUploadError as error:
+            return jsonify(error.to_dict()), error.status_code
+
+        return jsonify({
+            "success": True,
+            "outcome": outcome,
+            "file": {
+                "id": file_obj.id,
+                "name": file_obj.name,
+                "folder_id": file_obj.folder_id,
+                "version": file_obj.version_number,
+                "size": file_obj.file_size,
+                "mime_type": file_obj.mime_type,
+            },
+        }), 201 if outcome != "version" else 200
+
+    @api_bp.route("/files/uploads/<upload_id>", methods=["DELETE"])
+    @require_api_auth
+    def api_chunked_upload_abort(upload_id):
+        if not _check_files_access():
+            return _files_access_denied_response()
+        try:
+            upload = get_upload(upload_id, current_user.id)
+        except ChunkedUploadError as error:
+            return jsonify(error.to_dict()), error.status_code
+        discard_upload(upload)
+        return jsonify({"success": True})
+
     @api_bp.route("/files/<int:file_id>/rename", methods=["POST"])
     @require_api_auth
     def api_rename_file(file_id):
@@ -380,8 +479,7 @@ def register_files_routes(api_bp, require_api_auth):
             return guest_error
 
         file_obj = File.query.get_or_404(file_id)
-        _remove_file_from_storage(file_obj)
-        db.session.delete(file_obj)
+        delete_files([file_obj.id])
         db.session.commit()
         return jsonify({"success": True}), 200
 
@@ -395,7 +493,7 @@ def register_files_routes(api_bp, require_api_auth):
             return guest_error
 
         folder = Folder.query.get_or_404(folder_id)
-        _delete_folder_recursive(folder)
+        delete_folder_tree(folder.id)
         db.session.commit()
         return jsonify({"success": True}), 200
 
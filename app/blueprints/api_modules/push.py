@@ -130,11 +130,9 @@ def register_push_routes(api_bp, require_api_auth):
 
             portal_name = current_app.config.get("APP_NAME", "Rpismateams")
             try:
-                from app.models.settings import SystemSettings
+                from app.utils.settings_store import get_setting_stripped
 
-                portal_name_setting = SystemSettings.query.filter_by(key="portal_name").first()
-                if portal_name_setting and portal_name_setting.value and portal_name_setting.value.strip():
-                    portal_name = portal_name_setting.value.strip()
+                portal_name = get_setting_stripped("portal_name", portal_name)
             except Exception:
                 pass
 
@@ -5,7 +5,7 @@ from app.models.user import User
 from app.models.email import EmailPermission
 from app.models.chat import Chat, ChatMember
 from app.models.whitelist import WhitelistEntry
-from app.models.settings import SystemSettings
+from app.utils.settings_store import get_setting
 from app.utils.i18n import translate
 from app.utils.session_manager import create_session, revoke_session_by_id
 from app.utils.totp import verify_totp
@@ -26,8 +26,7 @@ def _auth_template_kwargs(**extra):
 
 def get_color_gradient():
     """Holt den Farbverlauf aus den System-Einstellungen."""
-    gradient_setting = SystemSettings.query.filter_by(key='color_gradient').first()
-    return gradient_setting.value if gradient_setting else None
+    return get_setting('color_gradient')
 
 
 def _clear_pending_2fa_login():
@@ -153,9 +152,7 @@ def register():
         is_whitelisted = WhitelistEntry.is_email_whitelisted(email)
         
         # Get default accent color from system settings
-        from app.models.settings import SystemSettings
-        default_accent_color_setting = SystemSettings.query.filter_by(key='default_accent_color').first()
-        default_accent_color = default_accent_color_setting.value if default_accent_color_setting else '#0d6efd'
+        default_accent_color = get_setting('default_accent_color', '#0d6efd')
         
         # Create new user (active if whitelisted, inactive otherwise)
         new_user = User(
@@ -186,16 +183,15 @@ def register():
         email_sent = send_confirmation_email(new_user)
         
         # Zuweise Standardrollen
-        from app.models.settings import SystemSettings
         from app.models.role import UserModuleRole
         from app.utils.access_control import has_module_access
         from app.utils.common import is_module_enabled
         import json
         
-        default_roles_setting = SystemSettings.query.filter_by(key='default_module_roles').first()
-        if default_roles_setting:
+        default_roles_value = get_setting('default_module_roles')
+        if default_roles_value:
             try:
-                default_roles = json.loads(default_roles_setting.value)
+                default_roles = json.loads(default_roles_value)
                 
                 if default_roles.get('full_access', False):
                     new_user.has_full_access = True
@@ -505,7 +501,7 @@ def test_email():
     from flask import current_app
     from flask_mail import Message
     from app import mail
-    from app.utils.email_sender import send_email_with_lock
+    from app.utils.email_sender import send_email_now
     
     try:
         # Prüfe E-Mail-Konfiguration
@@ -533,7 +529,8 @@ def test_email():
         )
         msg.body = 'Dies ist eine Test-E-Mail von Prismateams.'
         
-        send_email_with_lock(msg)
+        # Sofort senden (nicht über die Warteschlange), damit Fehler hier angezeigt werden
+        send_email_now(msg)
         
         flash(translate('auth.flash.test_email_sent'), 'success')
         return render_template('auth/email_test_result.html', 
@@ -11,6 +11,7 @@ from app.models.file import Folder
 from app.models.user import User
 from app.utils.email_sender import send_booking_confirmation_email, send_booking_accepted_email, send_booking_rejected_email
 from app.utils.access_control import check_module_access
+from app.utils.file_storage import set_file_content, store_content
 from app.utils.i18n import translate
 from app.tasks.booking_archiver import archive_old_booking_requests
 from datetime import datetime, timedelta, date, time
@@ -215,9 +216,8 @@ def public_form(form_id):
     fields = sorted(form.fields, key=lambda f: f.field_order)
     
     # Lade Portalslogo
-    from app.models.settings import SystemSettings
-    portal_logo_setting = SystemSettings.query.filter_by(key='portal_logo').first()
-    portal_logo_filename = portal_logo_setting.value if portal_logo_setting and portal_logo_setting.value else None
+    from app.utils.settings_store import get_setting
+    portal_logo_filename = get_setting('portal_logo') or None
     
     return render_template('booking/public_form.html', form=form, fields=fields, portal_logo_filename=portal_logo_filename)
 
@@ -234,9 +234,8 @@ def public_view(token):
         field_values[field_value.field_id] = field_value
     
     # Lade Portalslogo
-    from app.models.settings import SystemSettings
-    portal_logo_setting = SystemSettings.query.filter_by(key='portal_logo').first()
-    portal_logo_filename = portal_logo_setting.value if portal_logo_setting and portal_logo_setting.value else None
+    from app.utils.settings_store import get_setting
+    portal_logo_filename = get_setting('portal_logo') or None
     
     return render_template('booking/public_view.html', 
                          request=booking_request, 
@@ -285,21 +284,9 @@ def mailbox_upload(token):
                 flash(translate('booking.flash.file_too_large', filename=file.filename), 'danger')
                 continue
             
-            # Datei speichern
+            # Datei im Blob-Speicher ablegen (gleiche Inhalte nur einmal)
             original_name = secure_filename(file.filename)
-            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-            filename = f"{timestamp}_{original_name}"
-            
-            # Speichere im Veranstaltungen-Ordner
-            upload_dir = os.path.join(
-                current_app.config['UPLOAD_FOLDER'],
-                'veranstaltungen',
-                secure_filename(booking_request.event_name)
-            )
-            os.makedirs(upload_dir, exist_ok=True)
-            
-            file_path = os.path.join(upload_dir, filename)
-            file.save(file_path)
+            content_hash, file_size = store_content(file)
             
             # Erstelle File-Eintrag in der Datenbank
             from app.models.file import File
@@ -309,11 +296,10 @@ def mailbox_upload(token):
                 name=original_name,
                 original_name=original_name,
                 folder_id=folder.id,
-                file_path=file_path,
                 uploaded_by=uploader_id,
-                file_size=file_size,
                 is_current=True
             )
+            set_file_content(new_file, content_hash, file_size)
             db.session.add(new_file)
             uploaded_count += 1
         
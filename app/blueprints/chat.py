@@ -10,9 +10,9 @@ from app.utils.access_control import check_module_access, get_guest_accessible_i
 from app.utils.dashboard_events import emit_dashboard_update_multiple
 from app.utils.i18n import translate
 from app.utils.chat_visibility import visible_chat_user_filters, selectable_chat_user_filters
+from app.services.chat_unread_service import ChatUnreadService
 from datetime import datetime
 from werkzeug.utils import secure_filename
-from sqlalchemy import and_
 import os
 import json
 
@@ -339,28 +339,8 @@ def send_message(chat_id):
     
     # Sende Dashboard-Updates an alle Chat-Mitglieder (außer dem Sender)
     try:
-        chat_members = ChatMember.query.filter_by(chat_id=actual_chat_id).all()
-        member_ids = [cm.user_id for cm in chat_members if cm.user_id != current_user.id]
-        
-        if member_ids:
-            # Berechne unread_count für jeden Benutzer
-            for user_id in member_ids:
-                user_memberships = ChatMember.query.filter_by(user_id=user_id).all()
-                unread_count = 0
-                for member in user_memberships:
-                    chat_unread = ChatMessage.query.filter(
-                        and_(
-                            ChatMessage.chat_id == member.chat_id,
-                            ChatMessage.sender_id != user_id,
-                            ChatMessage.created_at > member.last_read_at,
-                            ChatMessage.is_deleted == False
-                        )
-                    ).count()
-                    unread_count += chat_unread
-                
-                # Emittiere Dashboard-Update für jeden Benutzer
-                from app.utils.dashboard_events import emit_dashboard_update
-                emit_dashboard_update(user_id, 'chat_update', {'count': unread_count})
+        # Ein gruppierter COUNT für alle Mitglieder statt einer Abfrage pro Mitglied und Chat
+        ChatUnreadService.emit_totals_for_chat(actual_chat_id, exclude_user_id=current_user.id)
     except Exception as e:
         current_app.logger.error(f"Fehler beim Senden der Dashboard-Updates für Chat: {e}")
     
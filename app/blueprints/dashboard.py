@@ -1,8 +1,10 @@
 from flask import Blueprint, render_template, redirect, url_for, session, request, flash, jsonify, current_app
 from flask_login import login_required, current_user
 from app.models.calendar import CalendarEvent, EventParticipant
-from app.models.chat import ChatMessage, ChatMember
+from app.models.chat import ChatMember
+from app.services.chat_unread_service import ChatUnreadService
 from app.models.email import EmailMessage, EmailPermission
+from app.utils.email_folder_counts import get_unread_email_count
 from app.models.file import File
 from app.models.credential import Credential
 from app.models.wiki import WikiPage, WikiFavorite
@@ -12,7 +14,6 @@ from app import db
 from app.utils.common import is_module_enabled, check_for_updates
 from app.utils.i18n import translate
 from datetime import datetime, date
-from sqlalchemy import and_
 import logging
 
 logger = logging.getLogger(__name__)
@@ -72,23 +73,12 @@ def index():
     unread_messages = []
     if 'nachrichten' in enabled_widgets and is_module_enabled('module_chat'):
         try:
-            user_chats = ChatMember.query.filter_by(user_id=current_user.id).all()
-            for membership in user_chats:
-                messages = ChatMessage.query.filter(
-                    and_(
-                        ChatMessage.chat_id == membership.chat_id,
-                        ChatMessage.created_at > membership.last_read_at,
-                        ChatMessage.sender_id != current_user.id,
-                        ChatMessage.is_deleted == False
-                    )
-                ).order_by(ChatMessage.created_at.desc()).limit(5).all()
-                unread_messages.extend(messages)
-            # Sort by newest first and limit to 5
-            unread_messages = sorted(unread_messages, key=lambda x: x.created_at, reverse=True)[:5]
+            unread_messages = ChatUnreadService.latest_unread_messages(current_user.id, limit=5)
         except Exception as e:
             logger.warning(f"Fehler beim Laden der Nachrichten: {e}")
     
     recent_emails = []
+    email_unread_count = 0
     # Gast-Accounts haben keinen Zugriff auf E-Mails
     if 'emails' in enabled_widgets and is_module_enabled('module_email') and not (hasattr(current_user, 'is_guest') and current_user.is_guest):
         try:
@@ -98,6 +88,7 @@ def index():
                     is_sent=False,
                     folder='INBOX'
                 ).order_by(EmailMessage.received_at.desc()).limit(5).all()
+                email_unread_count = get_unread_email_count()
         except Exception as e:
             logger.warning(f"Fehler beim Laden der E-Mails: {e}")
     
@@ -234,6 +225,7 @@ def index():
         upcoming_events=upcoming_events,
         unread_messages=unread_messages,
         recent_emails=recent_emails,
+        email_unread_count=email_unread_count,
         recent_files=recent_files,
         favorite_credentials=favorite_credentials,
         recent_wiki_pages=recent_wiki_pages,
@@ -1,10 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, send_file, Response
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, send_file, abort
 from flask_login import login_required, current_user
 from uuid import uuid4
 from app import db, mail
 from app.blueprints.sse import emit_email_sync_status
-from app.models.email import EmailMessage, EmailPermission, EmailAttachment, EmailFolder
-from app.models.settings import SystemSettings
+from app.models.email import EmailMessage, EmailPermission, EmailAttachment, EmailFolder, EmailRenderCache, EmailSearchTerm
+from app.utils.settings_store import get_setting
 from app.utils.notifications import send_email_notification
 from app.utils.access_control import check_module_access
 from app.utils.i18n import translate
@@ -17,28 +17,67 @@ import email as email_module
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import smtplib
-import threading
-import time
 import logging
 import io
+import os
 import hashlib
 from markupsafe import Markup
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.dialects.mysql import insert as mysql_insert
-from sqlalchemy import func, cast, Integer
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import func, cast, Integer, or_, and_, insert
+from sqlalchemy.orm import load_only
+from sqlalchemy.orm.attributes import flag_modified
 import re
 
-from app.utils.email_sender import get_logo_base64, get_logo_data, send_email_with_lock
+from app.utils.email_sender import get_logo_base64, get_logo_data, send_email_now
 from app.utils.lock_manager import acquire_email_sync_lock
+from app.utils import imap_sync
+from app.utils.imap_pool import get_imap_pool
+from app.utils.blob_store import store_bytes
+from app.utils.email_lazy_fetch import ensure_attachment_content
+from app.utils.email_search import index_emails, search_emails
+from app.utils.email_folder_counts import count_inserted_emails, discount_emails, get_unread_email_count
 from app.utils.common import format_datetime, now_in_portal_timezone
 
 email_bp = Blueprint('email', __name__)
 
+# Maximale Anzahl Werte pro IN (...)-Abfrage beim IMAP-Abgleich
+IMAP_SYNC_IN_CHUNK = 500
+
+# Version der HTML-Aufbereitung für die Ansicht. Bei Änderungen an der Aufbereitung
+# (Bereinigung, CID-Ersetzung, Scoping) erhöhen: gespeicherte Ergebnisse werden dann neu erzeugt.
+EMAIL_RENDERER_VERSION = 1
+
+# Platzhalter für Inline-Bilder, deren Anhang (noch) nicht vorliegt
+CID_PLACEHOLDER_IMAGE = (
+    "data:image/svg+xml;base64,"
+    "PHN2ZyB3aWR0aD0iMTAwIiBoZWlnaHQ9IjEwMCIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj48"
+    "cmVjdCB3aWR0aD0iMTAwIiBoZWlnaHQ9IjEwMCIgZmlsbD0iI2Y4ZjlmYSIvPjx0ZXh0IHg9IjUwIiB5PSI1MCIg"
+    "Zm9udC1mYW1pbHk9IkFyaWFsIiBmb250LXNpemU9IjE0IiBmaWxsPSIjNmM3NTdkIiB0ZXh0LWFuY2hvcj0ibWlk"
+    "ZGxlIiBkeT0iLjNlbSI+SW1hZ2U8L3RleHQ+PC9zdmc+"
+)
+
+# Ordneransicht: E-Mails pro Seite und geladene Spalten (ohne Bodies)
+EMAIL_LIST_PAGE_SIZE = 50
+EMAIL_LIST_COLUMNS = (
+    EmailMessage.id,
+    EmailMessage.subject,
+    EmailMessage.sender,
+    EmailMessage.folder,
+    EmailMessage.preview_text,
+    EmailMessage.is_read,
+    EmailMessage.has_attachments,
+    EmailMessage.color_dot,
+    EmailMessage.is_flagged,
+    EmailMessage.received_at,
+)
+
 
 def get_portal_display_name():
-    portal_name_setting = SystemSettings.query.filter_by(key='portal_name').first()
-    if portal_name_setting and portal_name_setting.value and portal_name_setting.value.strip():
-        return portal_name_setting.value
+    portal_name = get_setting('portal_name')
+    if portal_name and portal_name.strip():
+        return portal_name
     return current_app.config.get('APP_NAME', 'Prismateams')
 
 
@@ -53,14 +92,14 @@ def html_to_plain_text(html_content: str) -> str:
 
 
 def build_footer_html():
-    footer_template = SystemSettings.query.filter_by(key='email_footer_template').first()
+    footer_template = get_setting('email_footer_template')
     portal_name = get_portal_display_name()
 
-    if footer_template and footer_template.value:
+    if footer_template:
         now = now_in_portal_timezone()
         date_part = now.strftime('%d.%m.%Y')
         time_part = now.strftime('%H:%M')
-        footer_html = footer_template.value
+        footer_html = footer_template
         replacements = {
             '<user>': current_user.full_name or '',
             '<email>': current_user.email or '',
@@ -81,11 +120,11 @@ def build_footer_html():
         footer_html = ''.join(formatted_paragraphs) if formatted_paragraphs else footer_html
         return footer_html
 
-    footer_text_setting = SystemSettings.query.filter_by(key='email_footer_text').first()
+    footer_text = get_setting('email_footer_text')
 
     lines = []
-    if footer_text_setting and footer_text_setting.value:
-        lines.append(footer_text_setting.value)
+    if footer_text:
+        lines.append(footer_text)
     lines.append(f"Gesendet von {current_user.full_name}")
 
     return ''.join(f'<p>{line}</p>' for line in lines if line and line.strip())
@@ -200,12 +239,10 @@ def backfill_inline_attachments_from_imap(email_msg) -> bool:
                     filename=filename,
                     content_type=content_type,
                     size=len(payload),
-                    content=payload,
-                    file_path=None,
                     is_inline=True,
                     content_id=cid_hdr or None,
-                    is_large_file=False,
                 )
+                attachment.set_content(payload)
                 db.session.add(attachment)
                 created_any = True
 
@@ -230,19 +267,16 @@ def backfill_inline_attachments_from_imap(email_msg) -> bool:
         return False
 
 
-def replace_cid_images_in_email_html(html: str, email_msg) -> str:
-    """Replace cid: image sources with data URLs from stored attachments."""
+def replace_cid_images_in_email_html(html: str, email_msg, embed: bool = False) -> str:
+    """Replace cid: image sources with URLs of the stored inline attachments.
+
+    Die Ansicht verweist auf ``email.inline_image`` (per ETag cachebar).
+    Mit ``embed=True`` (Antworten/Weiterleiten) werden Data-URLs eingebettet,
+    da die Empfänger keinen Zugriff auf das Portal haben.
+    """
     if not html or not email_msg or not getattr(email_msg, 'attachments', None):
         return html
 
-    placeholder_data_url = (
-        "data:image/svg+xml;base64,"
-        "PHN2ZyB3aWR0aD0iMTAwIiBoZWlnaHQ9IjEwMCIgeG1sbnM9Imh0dHA6Ly93d3cudzMub3JnLzIwMDAvc3ZnIj48"
-        "cmVjdCB3aWR0aD0iMTAwIiBoZWlnaHQ9IjEwMCIgZmlsbD0iI2Y4ZjlmYSIvPjx0ZXh0IHg9IjUwIiB5PSI1MCIg"
-        "Zm9udC1mYW1pbHk9IkFyaWFsIiBmb250LXNpemU9IjE0IiBmaWxsPSIjNmM3NTdkIiB0ZXh0LWFuY2hvcj0ibWlk"
-        "ZGxlIiBkeT0iLjNlbSI+SW1hZ2U8L3RleHQ+PC9zdmc+"
-    )
-
     def normalize_cid_ref(value: str) -> str:
         if not value:
             return ""
@@ -258,13 +292,17 @@ def replace_cid_images_in_email_html(html: str, email_msg) -> str:
     for attachment in email_msg.attachments:
         if not attachment.is_inline or not attachment.content_type.startswith('image/'):
             continue
-        data_url = attachment.get_data_url()
-        if not data_url:
+        if embed:
+            ensure_attachment_content(attachment)
+            image_url = attachment.get_data_url()
+        else:
+            image_url = url_for('email.inline_image', attachment_id=attachment.id)
+        if not image_url:
             continue
         for raw_ref in (attachment.content_id, attachment.filename):
             key = normalize_cid_ref(raw_ref)
             if key:
-                cid_map[key] = data_url
+                cid_map[key] = image_url
 
     def replace_src(match):
         prefix = match.group("prefix")
@@ -272,7 +310,7 @@ def replace_cid_images_in_email_html(html: str, email_msg) -> str:
         cid_value = match.group("value") or ""
         key = normalize_cid_ref(cid_value)
         resolved = cid_map.get(key)
-        src_value = resolved if resolved else placeholder_data_url
+        src_value = resolved if resolved else CID_PLACEHOLDER_IMAGE
         return f"{prefix}{quote}{src_value}{quote}"
 
     return re.sub(
@@ -357,6 +395,14 @@ def build_rich_email_iframe_document(
     last-in-head stylesheet matches the portal theme (sans-serif + body colours)
     so unstyled/plain regions are readable; sender rules can still override.
     """
+    html = build_rich_email_iframe_base(raw_html, email_msg)
+    if not html:
+        return ''
+    return inject_iframe_portal_viewer_theme(html, viewer_dark, viewer_oled)
+
+
+def build_rich_email_iframe_base(raw_html: str, email_msg) -> str:
+    """iframe-Dokument ohne Theme-CSS (unabhängig vom Betrachter, daher speicherbar)."""
     if not raw_html:
         return ''
     try:
@@ -393,8 +439,6 @@ def build_rich_email_iframe_document(
                 html = '<!DOCTYPE html>\n' + html
             html = inject_iframe_head_meta_and_base(html)
 
-        html = inject_iframe_portal_viewer_theme(html, viewer_dark, viewer_oled)
-
         return html
     except Exception as e:
         logging.error(f"build_rich_email_iframe_document: {e}")
@@ -847,7 +891,8 @@ def connect_imap(folder='INBOX'):
         folder: IMAP folder to select (default: 'INBOX')
     
     Returns:
-        IMAP connection object or None if connection failed
+        Gepoolte IMAP-Verbindung oder None if connection failed.
+        ``logout()`` gibt die Verbindung an den Pool zurück.
     """
     try:
         imap_server = current_app.config.get('IMAP_SERVER')
@@ -872,29 +917,11 @@ def connect_imap(folder='INBOX'):
             )
             return None
         
-        logging.debug(f"Connecting to IMAP server: {imap_server}:{imap_port} (SSL: {imap_use_ssl})")
-        
-        if imap_use_ssl:
-            mail = imaplib.IMAP4_SSL(imap_server, imap_port, timeout=30)
-        else:
-            mail = imaplib.IMAP4(imap_server, imap_port, timeout=30)
-        
-        logging.debug(f"Logging in as {username}")
-        mail.login(username, password)
-        
-        logging.debug(f"Selecting folder: {folder}")
-        status, messages = mail.select(folder)
-        if status != 'OK':
-            # Versuche mit Anführungszeichen
-            try:
-                status, messages = mail.select(f'"{folder}"')
-            except:
-                pass
-            if status != 'OK':
-                logging.warning(f"Could not select folder '{folder}', status: {status}")
-                # Weiter mit INBOX als Fallback
-                mail.select('INBOX')
-        
+        # Verbindung aus dem Pool dieses Workers; der Ordner wird erst beim ersten
+        # Befehl ausgewählt (mit Fallback auf INBOX), logout() gibt sie zurück
+        mail = get_imap_pool(current_app.config).acquire(
+            imap_server, imap_port, imap_use_ssl, username, password, folder=folder
+        )
         logging.debug("IMAP connection established successfully")
         return mail
     except imaplib.IMAP4.error as e:
@@ -980,8 +1007,6 @@ def save_email_to_imap_sent(msg):
     """
     try:
         imap_server = current_app.config.get('IMAP_SERVER')
-        imap_port = current_app.config.get('IMAP_PORT', 993)
-        imap_use_ssl = current_app.config.get('IMAP_USE_SSL', True)
         username = current_app.config.get('MAIL_USERNAME')
         password = current_app.config.get('MAIL_PASSWORD')
         
@@ -989,16 +1014,10 @@ def save_email_to_imap_sent(msg):
             logging.warning("IMAP configuration missing, cannot save to Sent folder")
             return False, None
         
-        # Verbindung herstellen
-        try:
-            if imap_use_ssl:
-                mail_conn = imaplib.IMAP4_SSL(imap_server, imap_port, timeout=30)
-            else:
-                mail_conn = imaplib.IMAP4(imap_server, imap_port, timeout=30)
-            
-            mail_conn.login(username, password)
-        except Exception as conn_error:
-            logging.error(f"Fehler beim Verbinden mit IMAP zum Speichern der gesendeten E-Mail: {conn_error}")
+        # Verbindung aus dem IMAP-Pool
+        mail_conn = connect_imap()
+        if not mail_conn:
+            logging.error("Fehler beim Verbinden mit IMAP zum Speichern der gesendeten E-Mail")
             return False, None
         
         # Sent-Ordner finden
@@ -1240,8 +1259,609 @@ def sync_imap_folders():
         return False, f"Ordner-Sync-Fehler: {str(e)}"
 
 
-def sync_emails_from_folder(folder_name):
-    """Sync emails from a specific IMAP folder with bidirectional support."""
+def _index_for_search(email_msgs):
+    """Indexiert neue bzw. geänderte E-Mails für die Suche (Fehler holt der Index-Job nach)."""
+    if not isinstance(email_msgs, (list, tuple)):
+        email_msgs = [email_msgs]
+    try:
+        index_emails(email_msgs)
+    except Exception as e:
+        logging.warning(f"Suchindex für E-Mails {[email_msg.id for email_msg in email_msgs]} nicht aktualisiert: {e}")
+
+
+def _parse_imap_message(folder_name, imap_uid_str, raw_email, flags):
+    """
+    Zerlegt eine vom IMAP-Server geladene Nachricht (ohne Datenbankzugriff).
+
+    ``raw_email`` ist die vollständige Nachricht als Bytes oder eine ohne große
+    Anhänge zusammengesetzte Nachricht (``imap_sync.fetch_partial_message``).
+
+    Returns:
+        dict mit den Spalten der neuen ``EmailMessage`` (``values``) und den
+        Anhängen (``attachments``) oder None, falls die Nachricht nicht lesbar ist
+    """
+    subject = "Unknown"
+    sender = "Unknown"
+    try:
+        if isinstance(raw_email, (bytes, bytearray)):
+            email_msg = email_module.message_from_bytes(raw_email)
+        else:
+            email_msg = raw_email
+        
+        sender_raw = email_msg.get('From', '')
+        sender = decode_header_field(sender_raw)
+        if not sender:
+            sender = "Unknown Sender"
+        
+        subject_raw = email_msg.get('Subject', '')
+        subject = decode_header_field(subject_raw)
+        if not subject:
+            subject = "(No Subject)"
+        
+        date_str = email_msg.get('Date', '')
+        message_id = email_msg.get('Message-ID', '')
+        
+        recipients_raw = email_msg.get('To', '')
+        recipients = decode_header_field(recipients_raw)
+        
+        cc_raw = email_msg.get('Cc', '')
+        cc = decode_header_field(cc_raw)
+        
+        bcc_raw = email_msg.get('Bcc', '')
+        bcc = decode_header_field(bcc_raw)
+        
+        if not message_id:
+            # Wichtig für Move-Sync: Fallback-ID muss über Ordner hinweg stabil sein.
+            # Sonst wird dieselbe Mail nach Verschieben als neue Mail erkannt.
+            try:
+                stable_fingerprint = '|'.join([
+                    (sender or '').strip().lower(),
+                    (recipients or '').strip().lower(),
+                    (subject or '').strip().lower(),
+                    (date_str or '').strip().lower(),
+                ])
+                digest = hashlib.sha1(stable_fingerprint.encode('utf-8', errors='ignore')).hexdigest()
+                message_id = f"<generated-{digest}@local>"
+            except Exception:
+                message_id = f"<generated-{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}@local>"
+            logging.debug(f"Generated stable message_id for email without Message-ID: {message_id}")
+        
+        received_at = datetime.utcnow()
+        try:
+            from email.utils import parsedate_to_datetime
+            received_at = parsedate_to_datetime(date_str)
+        except:
+            pass
+
+        body_text = ""
+        body_html = ""
+        has_attachments = False
+        attachments_data = []
+        
+        if email_msg.is_multipart():
+            for part in email_msg.walk():
+                content_type = part.get_content_type()
+                content_disposition = part.get('Content-Disposition', '')
+                content_id_header = (part.get('Content-ID', '') or '').strip()
+
+                # Inline-Bilder aus multipart/related haben oft KEIN Content-Disposition,
+                # nur einen Content-ID-Header. Diese Parts müssen trotzdem als Attachment
+                # gespeichert werden, sonst können cid:-Referenzen im HTML nie aufgelöst werden.
+                is_related_inline = (
+                    bool(content_id_header)
+                    and not content_type.startswith('text/')
+                    and not content_type.startswith('multipart/')
+                    and 'attachment' not in content_disposition
+                    and 'inline' not in content_disposition
+                )
+
+                if (
+                    ('attachment' in content_disposition or 'inline' in content_disposition)
+                    and not content_type.startswith('text/')
+                ) or is_related_inline:
+                    has_attachments = True
+                    if is_related_inline:
+                        content_disposition = (content_disposition or '') + '; inline'
+                    
+                    try:
+                        filename = part.get_filename()
+                        if not filename:
+                            extension = content_type.split('/')[-1] if '/' in content_type else 'bin'
+                            filename = f"attachment_{len(attachments_data)}.{extension}"
+                        
+                        if filename:
+                            try:
+                                from email.header import decode_header
+                                decoded_filename = decode_header(filename)
+                                if decoded_filename and decoded_filename[0][0]:
+                                    filename = decoded_filename[0][0]
+                            except:
+                                pass
+                            
+                            # Kürze Dateinamen auf maximal 500 Zeichen (Datenbanklimit)
+                            filename = truncate_filename(filename, max_length=500)
+                        
+                        lazy_section = part.get(imap_sync.LAZY_SECTION_HEADER)
+                        if lazy_section:
+                            # Großer Anhang: wird erst beim ersten Zugriff vom Server geladen
+                            encoding = (part.get(imap_sync.LAZY_ENCODING_HEADER) or '').lower()
+                            encoded_size = int(part.get(imap_sync.LAZY_SIZE_HEADER) or 0)
+                            attachments_data.append({
+                                'filename': filename,
+                                'content_type': content_type,
+                                'content': None,
+                                'content_hash': None,
+                                # Geschätzt (base64: 57 Bytes je Zeile aus 76 Zeichen + CRLF), exakt nach dem Laden
+                                'size': encoded_size * 57 // 78 if encoding == 'base64' else encoded_size,
+                                'is_inline': 'inline' in content_disposition,
+                                'content_id': part.get('Content-ID', '').strip('<>'),
+                                'imap_section': lazy_section,
+                                'imap_encoding': encoding or None,
+                            })
+                            continue
+
+                        try:
+                            payload = None
+                            try:
+                                payload = part.get_payload(decode=True)
+                            except Exception as decode_error:
+                                logging.error(f"Failed to decode attachment '{filename}': {decode_error}")
+                                has_attachments = True
+                                continue
+                            
+                            if payload:
+                                attachment_size = len(payload)
+                                attachment_entry = {
+                                    'filename': filename,
+                                    'content_type': content_type,
+                                    'content': None,
+                                    'content_hash': None,
+                                    'size': attachment_size,
+                                    'is_inline': 'inline' in content_disposition,
+                                    'content_id': part.get('Content-ID', '').strip('<>'),
+                                }
+                                # Inhalt im Blob-Speicher ablegen (gleiche Inhalte nur einmal)
+                                try:
+                                    attachment_entry['content_hash'] = store_bytes(payload, EmailAttachment.BLOB_NAMESPACE)
+                                except Exception as file_error:
+                                    logging.error(f"Error saving attachment to blob store: {file_error}")
+                                    attachment_entry['content'] = payload
+                                attachments_data.append(attachment_entry)
+                                
+                                logging.debug(f"Added attachment: '{filename}' ({attachment_size / (1024*1024):.2f} MB) - {'blob store' if attachment_entry['content_hash'] else 'database'}")
+                        except MemoryError as mem_error:
+                            logging.error(f"Memory error processing attachment '{filename}': {mem_error}. Email will be saved without this attachment.")
+                            has_attachments = True
+                            continue
+                        except Exception as payload_error:
+                            logging.error(f"Error getting payload for attachment '{filename}': {payload_error}. Email will be saved without this attachment.")
+                            has_attachments = True
+                            continue
+                    except Exception as e:
+                        logging.error(f"Error processing attachment '{filename if 'filename' in locals() else 'unknown'}': {e}. Email will be saved without this attachment.")
+                        has_attachments = True
+                        continue
+                
+                if content_type == "text/plain":
+                    try:
+                        payload = part.get_payload(decode=True)
+                        if payload:
+                            import chardet
+                            detected = chardet.detect(payload)
+                            encoding = detected.get('encoding', 'utf-8')
+                            decoded_text = payload.decode(encoding, errors='ignore')
+                            if decoded_text.strip():
+                                body_text = decoded_text
+                    except:
+                        pass
+                elif content_type == "text/html":
+                    try:
+                        payload = part.get_payload(decode=True)
+                        if payload:
+                            import chardet
+                            detected = chardet.detect(payload)
+                            encoding = detected.get('encoding', 'utf-8')
+                            decoded_html = payload.decode(encoding, errors='ignore')
+                            if decoded_html.strip():
+                                if body_html:
+                                    body_html += "\n" + decoded_html
+                                else:
+                                    body_html = decoded_html
+                    except Exception as e:
+                        logging.error(f"Error processing HTML part: {e}")
+                        pass
+        else:
+            content_type = email_msg.get_content_type()
+            try:
+                payload = email_msg.get_payload(decode=True)
+                if payload:
+                    import chardet
+                    detected = chardet.detect(payload)
+                    encoding = detected.get('encoding', 'utf-8')
+                    decoded_content = payload.decode(encoding, errors='ignore')
+                    
+                    if content_type == "text/html":
+                        if decoded_content.strip():
+                            body_html = decoded_content
+                    else:
+                        if decoded_content.strip():
+                            body_text = decoded_content
+            except Exception as e:
+                logging.error(f"Error processing single part email: {e}")
+                pass
+        
+        
+        html_max_length = current_app.config.get('EMAIL_HTML_MAX_LENGTH', 0)
+        text_max_length = current_app.config.get('EMAIL_TEXT_MAX_LENGTH', 10000)
+        
+        if html_max_length > 0 and body_html and len(body_html) > html_max_length:
+            body_html = body_html[:html_max_length]
+        
+        if text_max_length > 0 and body_text and len(body_text) > text_max_length:
+            body_text = body_text[:text_max_length]
+
+        # E-Mails im "Sent"-Ordner sind immer als gelesen markiert, sonst gilt das IMAP-Flag \Seen
+        is_sent_folder_flag = is_sent_folder(folder_name)
+        color_dot, color_keyword = _color_from_imap_flags(flags)
+        return {
+            'values': {
+                'message_id': message_id,
+                'sender': sender,
+                'subject': subject,
+                'recipients': recipients or 'Unknown',
+                'cc': cc,
+                'bcc': bcc,
+                'body_text': body_text if body_text else '',
+                'body_html': body_html if body_html else '',
+                'preview_text': EmailMessage.build_preview(body_text),
+                'has_attachments': has_attachments,
+                'folder': folder_name,
+                'imap_uid': imap_uid_str,
+                'received_at': received_at,
+                'is_read': True if is_sent_folder_flag else '\\Seen' in flags,
+                'is_sent': is_sent_folder_flag,
+                'is_flagged': '\\Flagged' in flags,
+                'color_dot': color_dot,
+                'imap_color_keyword': color_keyword,
+            },
+            'attachments': attachments_data,
+        }
+    except MemoryError as mem_error:
+        logging.error(f"Memory error reading email {imap_uid_str} from folder '{folder_name}': {mem_error}")
+    except Exception as e:
+        logging.error(f"Error reading email '{subject}': {e}")
+        import traceback
+        logging.error(f"Traceback: {traceback.format_exc()}")
+    return None
+
+
+def _insert_ignoring_duplicates(table):
+    """Sammel-INSERT, der Zeilen mit bereits vorhandenem eindeutigem Schlüssel überspringt."""
+    dialect_name = db.engine.dialect.name
+    if dialect_name in ('mysql', 'mariadb'):
+        return mysql_insert(table).on_duplicate_key_update(id=table.c.id)
+    if dialect_name == 'sqlite':
+        return sqlite_insert(table).on_conflict_do_nothing()
+    return insert(table)
+
+
+def _store_imap_messages(folder_name, uid_validity, records, stats, split_on_error=True):
+    """
+    Speichert einen Stapel geladener Nachrichten mit einer festen Anzahl Abfragen.
+
+    Vorhandene Nachrichten werden mit je einer ``IN``-Abfrage über
+    ``(folder, imap_uid)`` und über die Message-ID erkannt (aktualisiert bzw.
+    als verschoben übernommen). Neue Nachrichten und ihre Anhänge werden per
+    Sammel-INSERT geschrieben; doppelte Schlüssel (z.B. durch einen parallelen
+    Sync) werden dabei übersprungen statt einen Fehler auszulösen.
+
+    Schlägt der Stapel fehl, wird jede Nachricht einzeln erneut versucht.
+
+    Returns:
+        Liste der UIDs, die nicht gespeichert werden konnten
+    """
+    if not records:
+        return []
+    now = datetime.utcnow()
+    stats_before = dict(stats)
+    try:
+        uid_strings = [record['values']['imap_uid'] for record in records]
+        sync_columns = (
+            EmailMessage.id, EmailMessage.message_id, EmailMessage.folder, EmailMessage.imap_uid,
+            EmailMessage.imap_uid_validity, EmailMessage.is_read, EmailMessage.is_sent,
+            EmailMessage.is_deleted_imap, EmailMessage.last_imap_sync,
+        )
+        by_uid = {
+            email_msg.imap_uid: email_msg
+            for email_msg in EmailMessage.query.options(load_only(*sync_columns)).filter(
+                EmailMessage.folder == folder_name,
+                EmailMessage.imap_uid.in_(uid_strings),
+            )
+        }
+        message_ids = list({
+            record['values']['message_id'] for record in records
+            if record['values']['imap_uid'] not in by_uid
+        })
+        by_message_id = {
+            email_msg.message_id: email_msg
+            for email_msg in EmailMessage.query.options(load_only(*sync_columns)).filter(
+                EmailMessage.message_id.in_(message_ids)
+            )
+        } if message_ids else {}
+
+        new_records = []
+        batch_message_ids = set()
+        for record in records:
+            values = record['values']
+            existing = by_uid.get(values['imap_uid']) or by_message_id.get(values['message_id'])
+            if existing is None:
+                if values['message_id'] in batch_message_ids:
+                    stats['skipped_emails'] += 1
+                    continue
+                batch_message_ids.add(values['message_id'])
+                new_records.append(record)
+                continue
+            moved = existing.folder != folder_name
+            if existing.folder == folder_name:
+                stats['updated_emails'] += 1
+            else:
+                stats['moved_emails'] += 1
+                existing.folder = folder_name
+            existing.imap_uid = values['imap_uid']
+            existing.imap_uid_validity = uid_validity
+            existing.last_imap_sync = now
+            existing.is_deleted_imap = False
+            if moved:
+                # Immer schreiben: der Thread des Quellordners kann die Zeile parallel als gelöscht markiert haben
+                flag_modified(existing, 'is_deleted_imap')
+            existing.is_read = values['is_read']  # Synchronisiere Gelesen-Status von IMAP
+            existing.is_sent = values['is_sent']
+
+        if new_records:
+            db.session.flush()
+            rows = [
+                dict(record['values'], imap_uid_validity=uid_validity, last_imap_sync=now, is_deleted_imap=False)
+                for record in new_records
+            ]
+            db.session.execute(_insert_ignoring_duplicates(EmailMessage.__table__), rows)
+            inserted = {
+                email_msg.imap_uid: email_msg
+                for email_msg in EmailMessage.query.filter(
+                    EmailMessage.folder == folder_name,
+                    EmailMessage.imap_uid.in_([record['values']['imap_uid'] for record in new_records]),
+                )
+            }
+
+            attachment_rows = []
+            unread = 0
+            for record in new_records:
+                email_entry = inserted.get(record['values']['imap_uid'])
+                if email_entry is None:
+                    logging.debug(f"Email with message_id '{record['values']['message_id']}' already exists, skipping duplicate")
+                    stats['skipped_emails'] += 1
+                    continue
+                stats['new_emails'] += 1
+                unread += 0 if email_entry.is_read else 1
+                for attachment_data in record['attachments']:
+                    attachment_rows.append({
+                        'email_id': email_entry.id,
+                        'filename': truncate_filename(attachment_data['filename'], max_length=500),
+                        'content_type': attachment_data['content_type'],
+                        'size': attachment_data['size'],
+                        'content': attachment_data.get('content'),
+                        'content_hash': attachment_data.get('content_hash'),
+                        'is_inline': attachment_data['is_inline'],
+                        'content_id': attachment_data['content_id'] or None,
+                        'is_large_file': bool(attachment_data.get('content_hash')),
+                        'imap_section': attachment_data.get('imap_section'),
+                        'imap_encoding': attachment_data.get('imap_encoding'),
+                    })
+            if attachment_rows:
+                db.session.execute(insert(EmailAttachment.__table__), attachment_rows)
+            # Sammel-INSERT läuft an den Session-Events vorbei
+            count_inserted_emails(folder_name, len(inserted), unread)
+            _index_for_search(list(inserted.values()))
+
+        db.session.commit()
+        return []
+    except Exception as e:
+        db.session.rollback()
+        stats.update(stats_before)
+        if split_on_error and len(records) > 1:
+            logging.warning(f"Stapel aus Ordner '{folder_name}' konnte nicht gespeichert werden, speichere einzeln: {e}")
+            failed = []
+            for record in records:
+                failed.extend(_store_imap_messages(folder_name, uid_validity, [record], stats, split_on_error=False))
+            return failed
+        stats['errors'] += len(records)
+        logging.error(f"Error saving emails from folder '{folder_name}': {e}")
+        import traceback
+        logging.error(f"Traceback: {traceback.format_exc()}")
+        return [int(record['values']['imap_uid']) for record in records]
+
+
+def _color_from_imap_flags(flags):
+    """Ermittelt (Farbpunkt, Keyword) aus den IMAP-Flags einer Nachricht."""
+    keyword_to_color = {keyword: color for color, keyword in COLOR_DOT_CHOICES.items() if keyword}
+    for flag in flags:
+        if flag in keyword_to_color:
+            return keyword_to_color[flag], flag
+    return None, None
+
+
+def _apply_imap_flag_changes(folder_name, changes, stats):
+    """Überträgt geänderte Flags (CONDSTORE) auf bereits synchronisierte E-Mails."""
+    if not changes:
+        return
+    is_sent_folder_flag = is_sent_folder(folder_name)
+    now = datetime.utcnow()
+    uid_strings = [str(uid) for uid in changes]
+    for chunk_start in range(0, len(uid_strings), IMAP_SYNC_IN_CHUNK):
+        chunk = uid_strings[chunk_start:chunk_start + IMAP_SYNC_IN_CHUNK]
+        for email_obj in EmailMessage.query.filter(
+            EmailMessage.folder == folder_name,
+            EmailMessage.imap_uid.in_(chunk),
+        ).all():
+            flags = changes[int(email_obj.imap_uid)].flags
+            email_obj.is_read = True if is_sent_folder_flag else '\\Seen' in flags
+            email_obj.is_flagged = '\\Flagged' in flags
+            color, keyword = _color_from_imap_flags(flags)
+            if keyword:
+                email_obj.color_dot = color
+                email_obj.imap_color_keyword = keyword
+            elif email_obj.imap_color_keyword:
+                email_obj.color_dot = None
+                email_obj.imap_color_keyword = None
+            email_obj.last_flag_sync_at = now
+            email_obj.last_imap_sync = now
+            stats['updated_emails'] += 1
+    db.session.commit()
+
+
+def _mark_vanished_emails(folder_name, server_uids, stats):
+    """Markiert E-Mails, deren UID nicht mehr auf dem Server liegt, als gelöscht bzw. verschoben."""
+    vanished = []
+    for email_id, imap_uid, message_id in db.session.query(
+        EmailMessage.id, EmailMessage.imap_uid, EmailMessage.message_id
+    ).filter(
+        EmailMessage.folder == folder_name,
+        EmailMessage.imap_uid.isnot(None),
+        EmailMessage.is_deleted_imap == False,
+    ).all():
+        try:
+            if int(imap_uid) in server_uids:
+                continue
+        except (TypeError, ValueError):
+            continue
+        vanished.append((email_id, message_id))
+
+    if not vanished:
+        return
+
+    # E-Mails, die bereits in einem anderen Ordner liegen, wurden verschoben.
+    # Die verschwundenen Zeilen selbst zählen nicht: ein paralleler Ordner-Thread
+    # kann genau diese Zeile inzwischen in den Zielordner übernommen haben.
+    vanished_ids = {email_id for email_id, _ in vanished}
+    moved_message_ids = set()
+    message_ids = [message_id for _, message_id in vanished if message_id]
+    for chunk_start in range(0, len(message_ids), IMAP_SYNC_IN_CHUNK):
+        chunk = message_ids[chunk_start:chunk_start + IMAP_SYNC_IN_CHUNK]
+        moved_message_ids.update(
+            message_id for email_id, message_id in db.session.query(EmailMessage.id, EmailMessage.message_id).filter(
+                EmailMessage.message_id.in_(chunk),
+                EmailMessage.folder != folder_name,
+            ).all()
+            if email_id not in vanished_ids
+        )
+
+    moved_ids = [email_id for email_id, message_id in vanished if message_id in moved_message_ids]
+    deleted_ids = [email_id for email_id, message_id in vanished if message_id not in moved_message_ids]
+
+    # Löschen und Markieren nur, solange die Zeile noch in diesem Ordner liegt
+    # (sperrendes Lesen, damit eine inzwischen committete Verschiebung sichtbar ist)
+    for chunk_start in range(0, len(moved_ids), IMAP_SYNC_IN_CHUNK):
+        chunk = moved_ids[chunk_start:chunk_start + IMAP_SYNC_IN_CHUNK]
+        for email_obj in EmailMessage.query.filter(
+            EmailMessage.id.in_(chunk),
+            EmailMessage.folder == folder_name,
+        ).with_for_update().all():
+            db.session.delete(email_obj)
+            stats['moved_emails'] += 1
+
+    # Gelöschte E-Mails nur markieren (nicht aus der DB löschen), damit Benutzer sie noch sehen können
+    now = datetime.utcnow()
+    for chunk_start in range(0, len(deleted_ids), IMAP_SYNC_IN_CHUNK):
+        chunk = deleted_ids[chunk_start:chunk_start + IMAP_SYNC_IN_CHUNK]
+        stats['deleted_emails'] += EmailMessage.query.filter(
+            EmailMessage.id.in_(chunk),
+            EmailMessage.folder == folder_name,
+        ).update(
+            {'is_deleted_imap': True, 'last_imap_sync': now},
+            synchronize_session=False,
+        )
+    db.session.commit()
+
+
+def _close_imap(mail_conn):
+    if not mail_conn:
+        return
+    try:
+        mail_conn.close()
+    except Exception as close_error:
+        logging.debug(f"Fehler beim Schließen der IMAP-Verbindung: {close_error}")
+    try:
+        mail_conn.logout()
+    except Exception as logout_error:
+        logging.debug(f"Fehler beim Logout von IMAP: {logout_error}")
+
+
+def new_folder_sync_stats():
+    """Leere Kennzahlen eines Ordner-Abgleichs (siehe ``sync_emails_from_folder``)."""
+    return {
+        'new_emails': 0,
+        'updated_emails': 0,
+        'moved_emails': 0,
+        'deleted_emails': 0,
+        'skipped_emails': 0,
+        'errors': 0,
+        'bytes': 0,
+        'duration': 0.0,
+    }
+
+
+def _fetch_partial_messages(mail_conn, folder_name, uids, min_part_size):
+    """
+    Lädt große Nachrichten ohne ihre großen Anhänge (BODYSTRUCTURE, Header, kleine Teile).
+
+    Returns:
+        dict UID -> (Nachricht, geladene Bytes); fehlende UIDs werden vollständig geladen
+    """
+    partial = {}
+    try:
+        structures = imap_sync.fetch_structures(mail_conn, uids)
+    except Exception as structure_error:
+        logging.warning(f"BODYSTRUCTURE für Ordner '{folder_name}' nicht abrufbar, lade vollständig: {structure_error}")
+        return partial
+    for uid, (header, structure) in structures.items():
+        try:
+            result = imap_sync.fetch_partial_message(mail_conn, uid, header, structure, min_part_size)
+        except Exception as partial_error:
+            logging.warning(f"Nachricht {uid} in Ordner '{folder_name}' wird vollständig geladen: {partial_error}")
+            continue
+        if result:
+            partial[uid] = result
+    return partial
+
+
+def sync_emails_from_folder(folder_name, stats=None):
+    """Sync emails from a specific IMAP folder (inkrementell über UIDVALIDITY/UIDNEXT/HIGHESTMODSEQ).
+
+    Der Ordnerzustand wird in ``EmailFolder`` gespeichert. Neue Nachrichten
+    werden über ``UID n:*`` ermittelt und in Stapeln geladen, Flag-Änderungen
+    über CONDSTORE (``CHANGEDSINCE``) übernommen. Gelöschte Nachrichten werden
+    nur gesucht, wenn die Nachrichtenanzahl (EXISTS) auf ein EXPUNGE hinweist.
+
+    Args:
+        stats: optionales Dict, das mit den Kennzahlen des Abgleichs gefüllt
+            wird (neu, aktualisiert, verschoben, gelöscht, Fehler, geladene
+            Bytes, Dauer in Sekunden)
+
+    Returns:
+        (Erfolg, Meldung)
+    """
+    import time
+
+    if stats is None:
+        stats = {}
+    stats.update(new_folder_sync_stats())
+    started = time.monotonic()
+    try:
+        return _sync_emails_from_folder(folder_name, stats)
+    finally:
+        stats['duration'] = round(time.monotonic() - started, 3)
+
+
+def _sync_emails_from_folder(folder_name, stats):
     mail_conn = None
     try:
         mail_conn = connect_imap(folder_name)
@@ -1251,83 +1871,52 @@ def sync_emails_from_folder(folder_name):
     except Exception as conn_error:
         logging.error(f"Fehler beim Verbinden mit IMAP für Ordner '{folder_name}': {conn_error}")
         return False, f"IMAP-Verbindungsfehler: {str(conn_error)}"
-    
-    stats = {
-        'new_emails': 0,
-        'updated_emails': 0,
-        'moved_emails': 0,
-        'deleted_emails': 0,
-        'skipped_emails': 0,
-        'errors': 0
-    }
-    
+
     try:
-        # Haupt-Synchronisations-Logik
-        # Versuche Ordner zu öffnen
-        status, messages = mail_conn.select(folder_name)
-        if status != 'OK':
-            # Versuche mit Anführungszeichen (für Ordner mit Leerzeichen)
-            try:
-                status, messages = mail_conn.select(f'"{folder_name}"')
-            except Exception as quote_error:
-                logging.debug(f"Could not select folder '{folder_name}' with quotes: {quote_error}")
-            
-            if status != 'OK':
-                # Ordner existiert nicht auf dem Server - überspringen, aber in DB behalten
-                error_msg = ''
-                try:
-                    if messages and len(messages) > 0:
-                        if isinstance(messages[0], bytes):
-                            error_msg = messages[0].decode('utf-8', errors='ignore')
-                        else:
-                            error_msg = str(messages[0])
-                except:
-                    error_msg = 'Unbekannter Fehler'
-                
-                # Prüfe ob es sich um einen Archiv-Ordner handelt (Archive oder Archives)
-                is_archive_folder = folder_name in ['Archive', 'Archives']
-                if "doesn't exist" in error_msg or "Mailbox doesn't exist" in error_msg or "NONEXISTENT" in error_msg:
-                    if is_archive_folder:
-                        logging.debug(f"IMAP folder '{folder_name}' does not exist on server, skipping sync (normal for empty archive folders): {error_msg}")
-                    else:
-                        logging.info(f"IMAP folder '{folder_name}' does not exist on server, skipping sync: {error_msg}")
-                    try:
-                        mail_conn.close()
-                    except:
-                        pass
-                    try:
-                        mail_conn.logout()
-                    except:
-                        pass
-                    return True, f"Ordner '{folder_name}' existiert nicht auf dem Server, übersprungen"
+        condstore = imap_sync.enable_condstore(mail_conn)
+        selected, folder_status = imap_sync.select_folder(mail_conn, folder_name)
+        if not selected:
+            # Ordner existiert nicht auf dem Server - überspringen, aber in DB behalten
+            error_msg = folder_status
+            # Prüfe ob es sich um einen Archiv-Ordner handelt (Archive oder Archives)
+            is_archive_folder = folder_name in ['Archive', 'Archives']
+            _close_imap(mail_conn)
+            if "doesn't exist" in error_msg or "Mailbox doesn't exist" in error_msg or "NONEXISTENT" in error_msg:
+                if is_archive_folder:
+                    logging.debug(f"IMAP folder '{folder_name}' does not exist on server, skipping sync (normal for empty archive folders): {error_msg}")
                 else:
-                    logging.warning(f"IMAP folder selection failed for '{folder_name}': {error_msg}")
-                    try:
-                        mail_conn.close()
-                    except:
-                        pass
-                    try:
-                        mail_conn.logout()
-                    except:
-                        pass
-                    return True, f"Ordner '{folder_name}' konnte nicht geöffnet werden, übersprungen: {error_msg}"
+                    logging.info(f"IMAP folder '{folder_name}' does not exist on server, skipping sync: {error_msg}")
+                return True, f"Ordner '{folder_name}' existiert nicht auf dem Server, übersprungen"
+            logging.warning(f"IMAP folder selection failed for '{folder_name}': {error_msg}")
+            return True, f"Ordner '{folder_name}' konnte nicht geöffnet werden, übersprungen: {error_msg}"
     except Exception as e:
         logging.error(f"Exception while selecting folder '{folder_name}': {e}")
         import traceback
         logging.error(f"Traceback: {traceback.format_exc()}")
-        try:
-            mail_conn.close()
-        except:
-            pass
-        try:
-            mail_conn.logout()
-        except:
-            pass
+        _close_imap(mail_conn)
         return True, f"Ordner '{folder_name}' konnte nicht geöffnet werden, übersprungen: {str(e)}"
     
     # Haupt-Synchronisations-Logik
     try:
-        # Ermittle die höchste bereits synchronisierte UID für diesen Ordner
+        folder_row = EmailFolder.query.filter_by(name=folder_name).first()
+        stored_validity = folder_row.uid_validity if folder_row else None
+        stored_uid_next = folder_row.uid_next if folder_row else None
+        stored_modseq = folder_row.highest_modseq if folder_row else None
+        stored_exists = folder_row.message_count if folder_row else None
+
+        # UIDVALIDITY geändert: alle gespeicherten UIDs des Ordners sind ungültig.
+        # Die Nachrichten werden beim Neuabgleich über die Message-ID wieder zugeordnet.
+        if stored_validity and folder_status.uid_validity and stored_validity != folder_status.uid_validity:
+            logging.warning(
+                f"UIDVALIDITY für Ordner '{folder_name}' geändert ({stored_validity} -> {folder_status.uid_validity}), "
+                f"Ordner wird neu abgeglichen"
+            )
+            EmailMessage.query.filter_by(folder=folder_name).update(
+                {'imap_uid': None, 'imap_uid_validity': None}, synchronize_session=False
+            )
+            db.session.commit()
+            stored_uid_next = stored_modseq = stored_exists = None
+
         highest_uid = None
         try:
             highest_uid_result = db.session.query(
@@ -1335,777 +1924,129 @@ def sync_emails_from_folder(folder_name):
             ).filter_by(folder=folder_name).scalar()
             if highest_uid_result:
                 highest_uid = int(highest_uid_result)
-                logging.debug(f"Highest UID for folder '{folder_name}': {highest_uid}")
         except Exception as e:
             logging.debug(f"Could not determine highest UID for folder '{folder_name}': {e}")
-        
-        # Initialisiere Variablen
-        all_seq_numbers = []
-        seq_to_uid = {}
-        
-        # Verwende search() für Sequenznummern (zuverlässiger als uid_search)
-        status, messages = mail_conn.search(None, 'ALL')
-        if status != 'OK':
-            logging.error(f"IMAP search failed for folder '{folder_name}': {messages}")
-            return False, f"E-Mail-Suche in Ordner '{folder_name}' fehlgeschlagen: {messages[0].decode() if messages else 'Unbekannter Fehler'}"
-        
-        all_seq_numbers = messages[0].split() if messages[0] else []
-        logging.info(f"Found {len(all_seq_numbers)} total emails in folder '{folder_name}'")
-        
-        if len(all_seq_numbers) == 0:
-            logging.info(f"No emails found in folder '{folder_name}' on server")
-            try:
-                mail_conn.close()
-            except:
-                pass
-            try:
-                mail_conn.logout()
-            except:
-                pass
-            return True, f"Ordner '{folder_name}': Keine E-Mails vorhanden"
-        
-        # Hole UIDs für alle E-Mails
-        # Verwende FETCH mit UID für alle Sequenznummern auf einmal
-        if len(all_seq_numbers) > 0:
-            try:
-                first_seq = all_seq_numbers[0].decode() if isinstance(all_seq_numbers[0], bytes) else str(all_seq_numbers[0])
-                last_seq = all_seq_numbers[-1].decode() if isinstance(all_seq_numbers[-1], bytes) else str(all_seq_numbers[-1])
-                seq_range = f"{first_seq}:{last_seq}" if len(all_seq_numbers) > 1 else first_seq
-                status, uid_data = mail_conn.fetch(seq_range, '(UID)')
-                
-                # Erstelle Mapping von Sequenznummer zu UID
-                if status == 'OK' and uid_data:
-                    import re
-                    for item in uid_data:
-                        uid_info = None
-                        # Handle both tuple and bytes formats
-                        if isinstance(item, tuple) and len(item) > 0:
-                            # Format: (b'1 (UID 123)', b'...')
-                            uid_info = item[0].decode('utf-8', errors='ignore') if isinstance(item[0], bytes) else str(item[0])
-                        elif isinstance(item, bytes):
-                            # Format: b'1 (UID 123)' - direct bytes object
-                            uid_info = item.decode('utf-8', errors='ignore')
-                        elif isinstance(item, str):
-                            # Format: '1 (UID 123)' - direct string
-                            uid_info = item
-                        
-                        if uid_info:
-                            # Parse: "1 (UID 123)" -> seq=1, uid=123
-                            match = re.search(r'(\d+)\s+\(UID\s+(\d+)\)', uid_info)
-                            if match:
-                                seq_num = match.group(1)
-                                uid_num = match.group(2)
-                                seq_to_uid[seq_num] = uid_num
-                
-                # Falls Batch-Abfrage nicht alle UIDs zurückgegeben hat, hole sie einzeln
-                if len(seq_to_uid) < len(all_seq_numbers):
-                    logging.debug(f"Batch UID fetch returned {len(seq_to_uid)} UIDs, but {len(all_seq_numbers)} emails exist. Fetching remaining UIDs individually...")
-                    for seq_bytes in all_seq_numbers:
-                        seq_str = seq_bytes.decode() if isinstance(seq_bytes, bytes) else str(seq_bytes)
-                        if seq_str not in seq_to_uid:
-                            try:
-                                status_single, uid_data_single = mail_conn.fetch(seq_str, '(UID)')
-                                if status_single == 'OK' and uid_data_single:
-                                    import re
-                                    for item in uid_data_single:
-                                        uid_info = None
-                                        # Handle both tuple and bytes formats
-                                        if isinstance(item, tuple) and len(item) > 0:
-                                            uid_info = item[0].decode('utf-8', errors='ignore') if isinstance(item[0], bytes) else str(item[0])
-                                        elif isinstance(item, bytes):
-                                            uid_info = item.decode('utf-8', errors='ignore')
-                                        elif isinstance(item, str):
-                                            uid_info = item
-                                        
-                                        if uid_info:
-                                            match = re.search(r'\(UID\s+(\d+)\)', uid_info)
-                                            if match:
-                                                seq_to_uid[seq_str] = match.group(1)
-                                                break
-                            except Exception as single_fetch_error:
-                                logging.debug(f"Failed to fetch UID for sequence {seq_str}: {single_fetch_error}")
-                                # Fallback: Verwende Sequenznummer als UID
-                                seq_to_uid[seq_str] = seq_str
-                
-                logging.debug(f"Created UID mapping for {len(seq_to_uid)} emails in folder '{folder_name}'")
-            except Exception as uid_fetch_error:
-                logging.warning(f"Failed to fetch UIDs for folder '{folder_name}': {uid_fetch_error}")
-                # Falls UID-Abfrage komplett fehlschlägt, verwende Sequenznummern als Fallback
-                for seq_bytes in all_seq_numbers:
-                    seq_str = seq_bytes.decode() if isinstance(seq_bytes, bytes) else str(seq_bytes)
-                    seq_to_uid[seq_str] = seq_str
-                logging.debug(f"Using sequence numbers as UID fallback for {len(seq_to_uid)} emails")
-        
-        # Filtere nach neuen E-Mails (UID > highest_uid)
-        logging.info(f"Filtering emails for folder '{folder_name}': highest_uid={highest_uid}, seq_to_uid mapping has {len(seq_to_uid)} entries")
-        
-        if highest_uid:
-            email_seqs = []
-            emails_without_uid = []
-            
-            for seq_bytes in all_seq_numbers:
-                seq_str = seq_bytes.decode() if isinstance(seq_bytes, bytes) else str(seq_bytes)
-                uid_str = seq_to_uid.get(seq_str)
-                if uid_str:
-                    try:
-                        email_uid = int(uid_str)
-                        if email_uid > highest_uid:
-                            email_seqs.append(seq_bytes)
-                    except (ValueError, AttributeError):
-                        # Falls UID nicht als Integer geparst werden kann, prüfe ob E-Mail existiert
-                        emails_without_uid.append(seq_bytes)
-                else:
-                    # Falls keine UID im Mapping, prüfe ob E-Mail bereits in DB existiert
-                    emails_without_uid.append(seq_bytes)
-            
-            # Für E-Mails ohne UID: Prüfe ob sie bereits in DB existieren
-            if emails_without_uid:
-                logging.info(f"Checking {len(emails_without_uid)} emails without UID mapping in folder '{folder_name}'")
-                for seq_bytes in emails_without_uid:
-                    seq_str = seq_bytes.decode() if isinstance(seq_bytes, bytes) else str(seq_bytes)
-                    try:
-                        status_test, msg_data_test = mail_conn.fetch(seq_str, '(RFC822)')
-                        if status_test == 'OK' and msg_data_test:
-                            raw_email_test = msg_data_test[0][1]
-                            email_msg_test = email_module.message_from_bytes(raw_email_test)
-                            message_id_test = email_msg_test.get('Message-ID', '')
-                            if message_id_test:
-                                existing = EmailMessage.query.filter_by(message_id=message_id_test).first()
-                                if not existing:
-                                    email_seqs.append(seq_bytes)
-                                    logging.info(f"Email with sequence {seq_str} (Message-ID: {message_id_test[:50]}) not in database, adding to sync list")
-                            else:
-                                # Keine Message-ID - füge zur Sicherheit hinzu
-                                email_seqs.append(seq_bytes)
-                                logging.info(f"Email with sequence {seq_str} has no Message-ID, adding to sync list")
-                    except Exception as e:
-                        logging.debug(f"Error checking email with sequence {seq_str}: {e}")
-                        # Bei Fehler, füge zur Sicherheit hinzu (besser zu viel als zu wenig)
-                        email_seqs.append(seq_bytes)
-            
-            logging.info(f"Found {len(email_seqs)} new emails in folder '{folder_name}' with UID > {highest_uid} (or without UID mapping)")
-            email_ids = email_seqs
-        else:
-            # Erste Synchronisation: Verwende alle Sequenznummern
-            email_ids = all_seq_numbers
-            logging.info(f"First sync for folder '{folder_name}', processing all {len(email_ids)} emails")
-        
-        # Für die Prüfung gelöschter E-Mails: Hole alle UIDs vom Server (nur wenn nicht erste Sync)
-        # WICHTIG: Nur prüfen, wenn seq_to_uid vollständig ist (alle E-Mails haben UIDs)
-        if highest_uid and len(seq_to_uid) > 0 and len(seq_to_uid) == len(all_seq_numbers):
-            # Nur wenn wir schon E-Mails haben UND das UID-Mapping vollständig ist, prüfen wir auf gelöschte
-            current_imap_uids = set(seq_to_uid.values())
-            
-            # Optimierte Prüfung: Nur UIDs abfragen statt alle E-Mails
-            existing_uids = db.session.query(EmailMessage.imap_uid).filter_by(
-                folder=folder_name
-            ).filter(EmailMessage.imap_uid.isnot(None)).all()
-            existing_uid_set = {str(uid[0]) for uid in existing_uids if uid[0]}
-            
-            for existing_uid in existing_uid_set:
-                if existing_uid not in current_imap_uids:
-                    # E-Mail existiert nicht mehr auf Server
-                    email_obj = EmailMessage.query.filter_by(
-                        imap_uid=existing_uid,
-                        folder=folder_name
-                    ).first()
-                    if email_obj:
-                        # Prüfe ob E-Mail in einen anderen Ordner verschoben wurde
-                        other_folder_email = EmailMessage.query.filter_by(
-                            message_id=email_obj.message_id
-                        ).filter(EmailMessage.folder != folder_name).first()
-                        
-                        if other_folder_email:
-                            # E-Mail wurde in einen anderen Ordner verschoben
-                            db.session.delete(email_obj)
-                            stats['moved_emails'] += 1
-                        else:
-                            # E-Mail wurde auf Server gelöscht - markiere als gelöscht (aber lösche NICHT aus DB)
-                            # Nur markieren, nicht löschen, damit Benutzer sie noch sehen können
-                            email_obj.is_deleted_imap = True
-                            email_obj.last_imap_sync = datetime.utcnow()
-                            stats['deleted_emails'] += 1
+
+        # Neue Nachrichten ermitteln
+        server_uids = None
+        if stored_uid_next:
+            start_uid = stored_uid_next
+        elif highest_uid:
+            start_uid = highest_uid + 1
         else:
-            # UID-Mapping ist nicht vollständig - keine Prüfung auf gelöschte E-Mails
-            # (verhindert, dass E-Mails fälschlicherweise gelöscht werden)
-            if highest_uid:
-                logging.debug(f"Skipping deleted email check for folder '{folder_name}' - UID mapping incomplete ({len(seq_to_uid)}/{len(all_seq_numbers)})")
-
-        if len(email_ids) == 0:
-            logging.info(f"No new emails to sync in folder '{folder_name}' (all {len(all_seq_numbers)} emails already in database or filtered out)")
-            emails_to_process = []
+            start_uid = None
+
+        if start_uid is None:
+            # Erste Synchronisation: Nur die letzten N E-Mails verarbeiten
+            server_uids = imap_sync.uid_search(mail_conn, 'ALL')
+            is_special_folder = folder_name in ['INBOX', 'Drafts', 'Trash', 'Spam', 'Archive', 'Archives'] or is_sent_folder(folder_name)
+            max_emails = 100 if not is_special_folder else 30
+            arrived_uids = server_uids
+            new_uids = server_uids[-max_emails:]
+            logging.info(f"First sync for folder '{folder_name}': processing {len(new_uids)} of {len(server_uids)} emails")
+        elif folder_status.uid_next and start_uid >= folder_status.uid_next:
+            arrived_uids = new_uids = []
         else:
-            # Bei erster Synchronisation: Nur die letzten N E-Mails verarbeiten
-            if not highest_uid:
-                is_special_folder = folder_name in ['INBOX', 'Drafts', 'Trash', 'Spam', 'Archive', 'Archives'] or is_sent_folder(folder_name)
-                max_emails = 100 if not is_special_folder else 30
-                emails_to_process = email_ids[-max_emails:] if len(email_ids) > max_emails else email_ids
-                logging.debug(f"First sync: Processing {len(emails_to_process)} emails from folder '{folder_name}' (max: {max_emails})")
-            else:
-                emails_to_process = email_ids
-                logging.debug(f"Processing {len(emails_to_process)} new emails from folder '{folder_name}'")
-        
-        for idx, email_id in enumerate(emails_to_process, 1):
-            # Initialisiere Variablen für Exception-Handler
-            subject = "Unknown"
-            sender = "Unknown"
-            imap_uid_str = None
-            
-            try:
-                # Konvertiere email_id zu String (Sequenznummer)
-                email_id_str = email_id.decode() if isinstance(email_id, bytes) else str(email_id)
-                
-                # Hole UID aus dem Mapping
-                imap_uid_str = seq_to_uid.get(email_id_str)
-                if not imap_uid_str:
-                    # Falls UID nicht im Mapping, versuche sie direkt abzurufen
-                    try:
-                        status_uid, uid_data = mail_conn.fetch(email_id_str, '(UID)')
-                        if status_uid == 'OK' and uid_data:
-                            for item in uid_data:
-                                uid_info = None
-                                # Handle both tuple and bytes formats
-                                if isinstance(item, tuple) and len(item) > 0:
-                                    uid_info = item[0].decode('utf-8', errors='ignore') if isinstance(item[0], bytes) else str(item[0])
-                                elif isinstance(item, bytes):
-                                    uid_info = item.decode('utf-8', errors='ignore')
-                                elif isinstance(item, str):
-                                    uid_info = item
-                                
-                                if uid_info:
-                                    import re
-                                    match = re.search(r'\(UID\s+(\d+)\)', uid_info)
-                                    if match:
-                                        imap_uid_str = match.group(1)
-                                        break
-                    except:
-                        pass
-                
-                if not imap_uid_str:
-                    logging.debug(f"Could not determine UID for sequence {email_id_str}, skipping")
-                    stats['errors'] += 1
-                    continue
-                
-                # FLAGS abrufen um Gelesen-Status zu bestimmen
-                is_read_imap = False
-                try:
-                    flags_status, flags_result = mail_conn.fetch(email_id_str, '(FLAGS)')
-                    
-                    if flags_status == 'OK' and flags_result and len(flags_result) > 0:
-                        flags_entry = flags_result[0]
-                        # FLAGS können als Tuple oder Bytes kommen
-                        if isinstance(flags_entry, tuple) and len(flags_entry) > 1:
-                            # Format: (b'1 (FLAGS (\\Seen))', b'...')
-                            flags_str = flags_entry[0].decode('utf-8', errors='ignore') if isinstance(flags_entry[0], bytes) else str(flags_entry[0])
-                        elif isinstance(flags_entry, tuple):
-                            flags_str = flags_entry[0].decode('utf-8', errors='ignore') if isinstance(flags_entry[0], bytes) else str(flags_entry[0])
-                        else:
-                            flags_str = flags_entry.decode('utf-8', errors='ignore') if isinstance(flags_entry, bytes) else str(flags_entry)
-                        
-                        # Prüfe ob \Seen Flag vorhanden ist
-                        is_read_imap = '\\Seen' in flags_str or '\\SEEN' in flags_str
-                except Exception as flags_error:
-                    logging.debug(f"Failed to fetch FLAGS for email {imap_uid_str} from folder '{folder_name}': {flags_error}")
-                    # Weiter mit is_read_imap = False
-                
-                # RFC822 (E-Mail-Inhalt) abrufen
-                status, msg_data = mail_conn.fetch(email_id_str, '(RFC822)')
-                
-                if status != 'OK' or not msg_data:
-                    logging.debug(f"Failed to fetch email {imap_uid_str} from folder '{folder_name}': {msg_data}")
-                    stats['errors'] += 1
-                    continue
-                
-                raw_email = msg_data[0][1]
-                email_msg = email_module.message_from_bytes(raw_email)
-                
-                sender_raw = email_msg.get('From', '')
-                sender = decode_header_field(sender_raw)
-                if not sender:
-                    sender = "Unknown Sender"
-                
-                subject_raw = email_msg.get('Subject', '')
-                subject = decode_header_field(subject_raw)
-                if not subject:
-                    subject = "(No Subject)"
-                
-                date_str = email_msg.get('Date', '')
-                message_id = email_msg.get('Message-ID', '')
-                
-                recipients_raw = email_msg.get('To', '')
-                recipients = decode_header_field(recipients_raw)
-                
-                cc_raw = email_msg.get('Cc', '')
-                cc = decode_header_field(cc_raw)
-                
-                bcc_raw = email_msg.get('Bcc', '')
-                bcc = decode_header_field(bcc_raw)
-                
-                # imap_uid_str wurde bereits oben bestimmt
-                
-                if not message_id:
-                    # Wichtig für Move-Sync: Fallback-ID muss über Ordner hinweg stabil sein.
-                    # Sonst wird dieselbe Mail nach Verschieben als neue Mail erkannt.
-                    try:
-                        stable_fingerprint = '|'.join([
-                            (sender or '').strip().lower(),
-                            (recipients or '').strip().lower(),
-                            (subject or '').strip().lower(),
-                            (date_str or '').strip().lower(),
-                        ])
-                        digest = hashlib.sha1(stable_fingerprint.encode('utf-8', errors='ignore')).hexdigest()
-                        message_id = f"<generated-{digest}@local>"
-                    except Exception:
-                        message_id = f"<generated-{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}@local>"
-                    logging.debug(f"Generated stable message_id for email without Message-ID: {message_id}")
-                
-                received_at = datetime.utcnow()
-                try:
-                    from email.utils import parsedate_to_datetime
-                    received_at = parsedate_to_datetime(date_str)
-                except:
-                    pass
-                
-                # Bestimme is_read Status für Updates:
-                # 1. E-Mails im "Sent"-Ordner sind immer als gelesen markiert
-                # 2. Andere Ordner: basierend auf IMAP FLAGS (\Seen)
-                is_sent_folder_flag = is_sent_folder(folder_name)
-                if is_sent_folder_flag:
-                    is_read_status = True
-                else:
-                    is_read_status = is_read_imap
-                
-                existing_in_folder = EmailMessage.query.filter_by(
-                    imap_uid=imap_uid_str,
-                    folder=folder_name
-                ).first()
-                
-                if existing_in_folder:
-                    try:
-                        existing_in_folder.last_imap_sync = datetime.utcnow()
-                        # Stelle sicher, dass E-Mail nicht als gelöscht markiert ist (wiederherstellen falls nötig)
-                        if existing_in_folder.is_deleted_imap:
-                            existing_in_folder.is_deleted_imap = False
-                            logging.debug(f"Restoring email {imap_uid_str} in folder '{folder_name}' - was marked as deleted but found on server")
-                        existing_in_folder.last_imap_sync = datetime.utcnow()
-                        existing_in_folder.is_read = is_read_status  # Synchronisiere Gelesen-Status von IMAP
-                        existing_in_folder.is_sent = is_sent_folder_flag  # Aktualisiere is_sent Status
-                        stats['updated_emails'] += 1
-                        db.session.commit()
-                        continue
-                    except Exception as update_error:
-                        if "MySQL server has gone away" in str(update_error) or "ConnectionResetError" in str(update_error):
-                            logging.debug("Database connection lost during update, attempting to reconnect...")
-                            db.session.rollback()
-                            db.session.close()
-                            db.session = db.create_scoped_session()
-                            existing_in_folder = EmailMessage.query.filter_by(
-                                imap_uid=imap_uid_str,
-                                folder=folder_name
-                            ).first()
-                            if existing_in_folder:
-                                existing_in_folder.last_imap_sync = datetime.utcnow()
-                                existing_in_folder.is_deleted_imap = False
-                                existing_in_folder.is_read = is_read_status  # Synchronisiere Gelesen-Status von IMAP
-                                existing_in_folder.is_sent = is_sent_folder_flag  # Aktualisiere is_sent Status
-                                stats['updated_emails'] += 1
-                                db.session.commit()
-                                logging.debug("Database reconnection successful for update")
-                            continue
-                        else:
-                            raise update_error
-                
-                existing_by_message_id = EmailMessage.query.filter_by(message_id=message_id).first()
-                if existing_by_message_id:
-                    if existing_by_message_id.folder == folder_name:
-                        try:
-                            existing_by_message_id.last_imap_sync = datetime.utcnow()
-                            existing_by_message_id.is_deleted_imap = False
-                            existing_by_message_id.imap_uid = imap_uid_str
-                            existing_by_message_id.is_read = is_read_status  # Synchronisiere Gelesen-Status von IMAP
-                            existing_by_message_id.is_sent = is_sent_folder_flag  # Aktualisiere is_sent Status
-                            stats['updated_emails'] += 1
-                            db.session.commit()
-                            continue
-                        except Exception as update_error:
-                            if "MySQL server has gone away" in str(update_error) or "ConnectionResetError" in str(update_error):
-                                logging.debug("Database connection lost during update, attempting to reconnect...")
-                                db.session.rollback()
-                                db.session.close()
-                                db.session = db.create_scoped_session()
-                                existing_by_message_id = EmailMessage.query.filter_by(message_id=message_id).first()
-                                if existing_by_message_id and existing_by_message_id.folder == folder_name:
-                                    existing_by_message_id.last_imap_sync = datetime.utcnow()
-                                    existing_by_message_id.is_deleted_imap = False
-                                    existing_by_message_id.imap_uid = imap_uid_str
-                                    existing_by_message_id.is_read = is_read_status  # Synchronisiere Gelesen-Status von IMAP
-                                    existing_by_message_id.is_sent = is_sent_folder_flag  # Aktualisiere is_sent Status
-                                    stats['updated_emails'] += 1
-                                    db.session.commit()
-                                    logging.debug("Database reconnection successful for update")
-                                continue
-                            else:
-                                raise update_error
-                    else:
-                        try:
-                            existing_by_message_id.folder = folder_name
-                            existing_by_message_id.imap_uid = imap_uid_str
-                            existing_by_message_id.last_imap_sync = datetime.utcnow()
-                            existing_by_message_id.is_deleted_imap = False
-                            existing_by_message_id.is_read = is_read_status  # Synchronisiere Gelesen-Status von IMAP beim Ordnerwechsel
-                            existing_by_message_id.is_sent = is_sent_folder_flag  # Aktualisiere is_sent Status
-                            stats['moved_emails'] += 1
-                            db.session.commit()
-                            continue
-                        except Exception as move_error:
-                            if "MySQL server has gone away" in str(move_error) or "ConnectionResetError" in str(move_error):
-                                logging.debug("Database connection lost during move, attempting to reconnect...")
-                                db.session.rollback()
-                                db.session.close()
-                                db.session = db.create_scoped_session()
-                                existing_by_message_id = EmailMessage.query.filter_by(message_id=message_id).first()
-                                if existing_by_message_id:
-                                    existing_by_message_id.folder = folder_name
-                                    existing_by_message_id.imap_uid = imap_uid_str
-                                    existing_by_message_id.last_imap_sync = datetime.utcnow()
-                                    existing_by_message_id.is_deleted_imap = False
-                                    existing_by_message_id.is_read = is_read_status  # Synchronisiere Gelesen-Status von IMAP beim Ordnerwechsel
-                                    existing_by_message_id.is_sent = is_sent_folder_flag  # Aktualisiere is_sent Status
-                                    stats['moved_emails'] += 1
-                                    db.session.commit()
-                                    logging.debug("Database reconnection successful for move")
-                                continue
-                            else:
-                                raise move_error
-                
-                body_text = ""
-                body_html = ""
-                has_attachments = False
-                attachments_data = []
-                
-                if email_msg.is_multipart():
-                    for part in email_msg.walk():
-                        content_type = part.get_content_type()
-                        content_disposition = part.get('Content-Disposition', '')
-                        content_id_header = (part.get('Content-ID', '') or '').strip()
-
-                        # Inline-Bilder aus multipart/related haben oft KEIN Content-Disposition,
-                        # nur einen Content-ID-Header. Diese Parts müssen trotzdem als Attachment
-                        # gespeichert werden, sonst können cid:-Referenzen im HTML nie aufgelöst werden.
-                        is_related_inline = (
-                            bool(content_id_header)
-                            and not content_type.startswith('text/')
-                            and not content_type.startswith('multipart/')
-                            and 'attachment' not in content_disposition
-                            and 'inline' not in content_disposition
-                        )
-
-                        if (
-                            ('attachment' in content_disposition or 'inline' in content_disposition)
-                            and not content_type.startswith('text/')
-                        ) or is_related_inline:
-                            has_attachments = True
-                            if is_related_inline:
-                                content_disposition = (content_disposition or '') + '; inline'
-                            
-                            try:
-                                filename = part.get_filename()
-                                if not filename:
-                                    extension = content_type.split('/')[-1] if '/' in content_type else 'bin'
-                                    filename = f"attachment_{len(attachments_data)}.{extension}"
-                                
-                                if filename:
-                                    try:
-                                        from email.header import decode_header
-                                        decoded_filename = decode_header(filename)
-                                        if decoded_filename and decoded_filename[0][0]:
-                                            filename = decoded_filename[0][0]
-                                    except:
-                                        pass
-                                    
-                                    # Kürze Dateinamen auf maximal 500 Zeichen (Datenbanklimit)
-                                    filename = truncate_filename(filename, max_length=500)
-                                
-                                try:
-                                    payload = None
-                                    try:
-                                        payload = part.get_payload(decode=True)
-                                    except Exception as decode_error:
-                                        logging.error(f"Failed to decode attachment '{filename}': {decode_error}")
-                                        has_attachments = True
-                                        continue
-                                    
-                                    if payload:
-                                        attachment_size = len(payload)
-                                        
-                                        max_db_size = 1 * 1024 * 1024
-                                        
-                                        if attachment_size > max_db_size:
-                                            import os
-                                            
-                                            attachments_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'attachments')
-                                            os.makedirs(attachments_dir, exist_ok=True)
-                                            
-                                            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-                                            safe_filename = "".join(c for c in filename if c.isalnum() or c in '._- ')
-                                            file_path = os.path.join(attachments_dir, f"{timestamp}_{safe_filename}")
-                                            
-                                            try:
-                                                with open(file_path, 'wb') as f:
-                                                    f.write(payload)
-                                                logging.debug(f"Large attachment saved to disk: {file_path}")
-                                                
-                                                attachments_data.append({
-                                                    'filename': filename,
-                                                    'content_type': content_type,
-                                                    'content': None,
-                                                    'file_path': file_path,
-                                                    'size': attachment_size,
-                                                    'is_inline': 'inline' in content_disposition,
-                                                    'content_id': part.get('Content-ID', '').strip('<>'),
-                                                    'is_large_file': True
-                                                })
-                                            except Exception as file_error:
-                                                logging.error(f"Error saving large file to disk: {file_error}")
-                                                attachments_data.append({
-                                                    'filename': filename,
-                                                    'content_type': content_type,
-                                                    'content': payload,
-                                                    'file_path': None,
-                                                    'size': attachment_size,
-                                                    'is_inline': 'inline' in content_disposition,
-                                                    'content_id': part.get('Content-ID', '').strip('<>'),
-                                                    'is_large_file': False
-                                                })
-                                        else:
-                                            attachments_data.append({
-                                                'filename': filename,
-                                                'content_type': content_type,
-                                                'content': payload,
-                                                'file_path': None,
-                                                'size': attachment_size,
-                                                'is_inline': 'inline' in content_disposition,
-                                                'content_id': part.get('Content-ID', '').strip('<>'),
-                                                'is_large_file': False
-                                            })
-                                        
-                                        logging.debug(f"Added attachment: '{filename}' ({attachment_size / (1024*1024):.2f} MB) - {'disk' if attachment_size > max_db_size else 'database'}")
-                                except MemoryError as mem_error:
-                                    logging.error(f"Memory error processing attachment '{filename}': {mem_error}. Email will be saved without this attachment.")
-                                    has_attachments = True
-                                    continue
-                                except Exception as payload_error:
-                                    logging.error(f"Error getting payload for attachment '{filename}': {payload_error}. Email will be saved without this attachment.")
-                                    has_attachments = True
-                                    continue
-                            except Exception as e:
-                                logging.error(f"Error processing attachment '{filename if 'filename' in locals() else 'unknown'}': {e}. Email will be saved without this attachment.")
-                                has_attachments = True
-                                continue
-                        
-                        if content_type == "text/plain":
-                            try:
-                                payload = part.get_payload(decode=True)
-                                if payload:
-                                    import chardet
-                                    detected = chardet.detect(payload)
-                                    encoding = detected.get('encoding', 'utf-8')
-                                    decoded_text = payload.decode(encoding, errors='ignore')
-                                    if decoded_text.strip():
-                                        body_text = decoded_text
-                            except:
-                                pass
-                        elif content_type == "text/html":
-                            try:
-                                payload = part.get_payload(decode=True)
-                                if payload:
-                                    import chardet
-                                    detected = chardet.detect(payload)
-                                    encoding = detected.get('encoding', 'utf-8')
-                                    decoded_html = payload.decode(encoding, errors='ignore')
-                                    if decoded_html.strip():
-                                        if body_html:
-                                            body_html += "\n" + decoded_html
-                                        else:
-                                            body_html = decoded_html
-                            except Exception as e:
-                                logging.error(f"Error processing HTML part: {e}")
-                                pass
-                else:
-                    content_type = email_msg.get_content_type()
-                    try:
-                        payload = email_msg.get_payload(decode=True)
-                        if payload:
-                            import chardet
-                            detected = chardet.detect(payload)
-                            encoding = detected.get('encoding', 'utf-8')
-                            decoded_content = payload.decode(encoding, errors='ignore')
-                            
-                            if content_type == "text/html":
-                                if decoded_content.strip():
-                                    body_html = decoded_content
-                            else:
-                                if decoded_content.strip():
-                                    body_text = decoded_content
-                    except Exception as e:
-                        logging.error(f"Error processing single part email: {e}")
-                        pass
-                
-                
-                html_max_length = current_app.config.get('EMAIL_HTML_MAX_LENGTH', 0)
-                text_max_length = current_app.config.get('EMAIL_TEXT_MAX_LENGTH', 10000)
-                
-                if html_max_length > 0 and body_html and len(body_html) > html_max_length:
-                    body_html = body_html[:html_max_length]
-                
-                if text_max_length > 0 and body_text and len(body_text) > text_max_length:
-                    body_text = body_text[:text_max_length]
-                
-                # Bestimme is_read Status:
-                # 1. E-Mails im "Sent"-Ordner sind immer als gelesen markiert (man hat sie selbst versendet)
-                # 2. Andere Ordner: basierend auf IMAP FLAGS (\Seen)
-                is_sent_folder_flag = is_sent_folder(folder_name)
-                if is_sent_folder_flag:
-                    is_read_status = True
-                else:
-                    is_read_status = is_read_imap
-                
-                email_entry = EmailMessage(
-                    message_id=message_id,
-                    sender=sender,
-                    subject=subject,
-                    recipients=recipients or 'Unknown',
-                    cc=cc,
-                    bcc=bcc,
-                    body_text=body_text if body_text else '',
-                    body_html=body_html if body_html else '',
-                    has_attachments=has_attachments,
-                    folder=folder_name,
-                    imap_uid=imap_uid_str,
-                    last_imap_sync=datetime.utcnow(),
-                    is_deleted_imap=False,
-                    received_at=received_at,
-                    is_read=is_read_status,
-                    is_sent=is_sent_folder_flag
+            arrived_uids = new_uids = [
+                uid for uid in imap_sync.uid_search(mail_conn, 'UID', f'{start_uid}:*')
+                if uid >= start_uid
+            ]
+        logging.info(f"Found {len(new_uids)} new emails in folder '{folder_name}' (UID >= {start_uid or 1})")
+
+        # Bereits gespeicherte UIDs (z.B. nach abgebrochenem Lauf) nicht erneut laden
+        if new_uids:
+            known_uids = set()
+            uid_strings = [str(uid) for uid in new_uids]
+            for chunk_start in range(0, len(uid_strings), IMAP_SYNC_IN_CHUNK):
+                chunk = uid_strings[chunk_start:chunk_start + IMAP_SYNC_IN_CHUNK]
+                known_uids.update(
+                    int(uid) for (uid,) in db.session.query(EmailMessage.imap_uid).filter(
+                        EmailMessage.folder == folder_name,
+                        EmailMessage.imap_uid.in_(chunk),
+                    ).all()
                 )
-                
+            new_uids = [uid for uid in new_uids if uid not in known_uids]
+
+        failed_uids = []
+        if new_uids:
+            metadata = imap_sync.fetch_metadata(mail_conn, new_uids)
+            sizes = {uid: message.size for uid, message in metadata.items()}
+            batch_size = current_app.config.get('EMAIL_SYNC_FETCH_BATCH_SIZE', 25)
+            batch_bytes = current_app.config.get('EMAIL_SYNC_FETCH_BATCH_BYTES', 20 * 1024 * 1024)
+            lazy_min_size = current_app.config.get('EMAIL_LAZY_FETCH_MIN_SIZE', 0)
+            for batch in imap_sync.batch_uids(new_uids, sizes, max_count=batch_size, max_bytes=batch_bytes):
+                # Große Nachrichten ohne ihre großen Anhänge laden (diese folgen beim ersten Zugriff)
+                large_uids = [uid for uid in batch if lazy_min_size and (sizes.get(uid) or 0) >= lazy_min_size]
+                partial = _fetch_partial_messages(mail_conn, folder_name, large_uids, lazy_min_size) if large_uids else {}
+                records = []
                 try:
-                    db.session.add(email_entry)
-                    db.session.flush()
-                except IntegrityError as integrity_error:
-                    if "Duplicate entry" in str(integrity_error) or "1062" in str(integrity_error):
-                        logging.debug(f"Email with message_id '{message_id}' already exists in another folder, skipping")
-                        stats['skipped_emails'] += 1
-                        db.session.rollback()
-                        continue
+                    bodies = imap_sync.fetch_bodies(mail_conn, [uid for uid in batch if uid not in partial])
+                except Exception as fetch_error:
+                    logging.error(f"Failed to fetch emails {batch[0]}-{batch[-1]} from folder '{folder_name}': {fetch_error}")
+                    bodies = {}
+                for uid in batch:
+                    if uid in partial:
+                        raw_email, fetched_bytes = partial[uid]
                     else:
-                        raise
-                
-                for attachment_data in attachments_data:
-                    try:
-                        attachment_size = attachment_data['size']
-                        filename = truncate_filename(attachment_data['filename'], max_length=500)
-                        
-                        if attachment_size > 1 * 1024 * 1024:
-                            logging.info(f"Processing large attachment: '{filename}' ({attachment_size / (1024*1024):.2f} MB) - from disk")
-                        
-                        attachment = EmailAttachment(
-                            email_id=email_entry.id,
-                            filename=filename,
-                            content_type=attachment_data['content_type'],
-                            size=attachment_size,
-                            content=attachment_data.get('content'),
-                            file_path=attachment_data.get('file_path'),
-                            is_inline=attachment_data['is_inline'],
-                            content_id=attachment_data['content_id'] if attachment_data['content_id'] else None,
-                            is_large_file=attachment_data.get('is_large_file', False)
-                        )
-                        
-                        db.session.add(attachment)
-                        
-                        if attachment_size > 1 * 1024 * 1024:
-                            try:
-                                db.session.flush()
-                                logging.debug(f"Successfully flushed attachment '{filename}' ({attachment_size / (1024*1024):.2f} MB) to database")
-                            except Exception as flush_error:
-                                logging.debug(f"Flush failed for '{filename}', will commit with email: {flush_error}")
-                    except Exception as e:
-                        logging.error(f"Error saving attachment '{attachment_data['filename']}' ({attachment_data['size'] / (1024*1024):.2f} MB): {e}")
-                        import traceback
-                        logging.error(f"Traceback: {traceback.format_exc()}")
+                        raw_email = bodies.get(uid)
+                        if raw_email is None:
+                            stats['errors'] += 1
+                            failed_uids.append(uid)
+                            continue
+                        fetched_bytes = len(raw_email)
+                    stats['bytes'] += fetched_bytes
+                    flags = metadata[uid].flags if uid in metadata else ()
+                    record = _parse_imap_message(folder_name, str(uid), raw_email, flags)
+                    if record is None:
+                        stats['errors'] += 1
                         continue
-                
+                    records.append(record)
+                failed_uids.extend(_store_imap_messages(folder_name, folder_status.uid_validity, records, stats))
+
+        # Flag-Änderungen bereits bekannter Nachrichten (nur mit CONDSTORE)
+        modseq_synced = False
+        if condstore and folder_status.highest_modseq:
+            if stored_modseq and stored_uid_next and stored_uid_next > 1 and folder_status.highest_modseq > stored_modseq:
                 try:
-                    db.session.commit()
-                    stats['new_emails'] += 1
-                except Exception as commit_error:
-                    if "Duplicate entry" in str(commit_error) or "1062" in str(commit_error):
-                        logging.debug(f"Email with message_id '{message_id}' already exists, skipping duplicate")
-                        stats['skipped_emails'] += 1
-                        db.session.rollback()
-                        continue
-                    if "MySQL server has gone away" in str(commit_error) or "ConnectionResetError" in str(commit_error):
-                        logging.debug("Database connection lost, attempting to reconnect...")
-                        db.session.rollback()
-                        db.session.close()
-                        db.session = db.create_scoped_session()
-                        db.session.add(email_entry)
-                        db.session.flush()
-                        for attachment_data in attachments_data:
-                            try:
-                                attachment = EmailAttachment(
-                                    email_id=email_entry.id,
-                                    filename=attachment_data['filename'],
-                                    content_type=attachment_data['content_type'],
-                                    size=attachment_data['size'],
-                                    content=attachment_data.get('content'),
-                                    file_path=attachment_data.get('file_path'),
-                                    is_inline=attachment_data['is_inline'],
-                                    content_id=attachment_data['content_id'] if attachment_data['content_id'] else None,
-                                    is_large_file=attachment_data.get('is_large_file', False)
-                                )
-                                db.session.add(attachment)
-                            except Exception as e:
-                                logging.error(f"Error saving attachment {attachment_data['filename']}: {e}")
-                                continue
-                        db.session.commit()
-                        stats['new_emails'] += 1
-                        logging.debug("Database reconnection successful")
-                    else:
-                        raise commit_error
-            except Exception as e:
-                stats['errors'] += 1
-                subject_display = subject if 'subject' in locals() and subject else "Unknown"
-                logging.error(f"Error saving email '{subject_display}': {e}")
-                import traceback
-                logging.error(f"Traceback: {traceback.format_exc()}")
-                db.session.rollback()
-                continue
-                
-            except MemoryError as mem_error:
-                stats['errors'] += 1
-                logging.error(f"Memory error syncing email from folder '{folder_name}': {mem_error}")
-                db.session.rollback()
-                continue
-            except Exception as e:
-                stats['errors'] += 1
-                logging.error(f"Error syncing email from folder '{folder_name}': {e}")
-                import traceback
-                logging.error(f"Traceback: {traceback.format_exc()}")
-                db.session.rollback()
-                continue
-        
+                    changes = imap_sync.fetch_metadata(mail_conn, f'1:{stored_uid_next - 1}', changed_since=stored_modseq)
+                    _apply_imap_flag_changes(folder_name, changes, stats)
+                    modseq_synced = True
+                except Exception as flag_error:
+                    db.session.rollback()
+                    logging.warning(f"Flag-Abgleich (CHANGEDSINCE) für Ordner '{folder_name}' fehlgeschlagen: {flag_error}")
+            else:
+                modseq_synced = True
+
+        # Gelöschte Nachrichten: nur prüfen, wenn EXISTS auf ein EXPUNGE hinweist
+        # (bisherige Anzahl + neu eingetroffene > aktuelle Anzahl) oder kein Zustand gespeichert ist
+        if stored_exists is None:
+            check_vanished = bool(highest_uid)
+        else:
+            check_vanished = folder_status.exists is None or (
+                stored_exists + len(arrived_uids) > folder_status.exists
+            )
+        if check_vanished:
+            if server_uids is None:
+                server_uids = imap_sync.uid_search(mail_conn, 'ALL')
+            _mark_vanished_emails(folder_name, set(server_uids), stats)
+
+        # Ordnerzustand speichern
+        if folder_row:
+            folder_row.uid_validity = folder_status.uid_validity
+            if failed_uids:
+                # Fehlgeschlagene Nachrichten beim nächsten Lauf erneut versuchen
+                folder_row.uid_next = min(failed_uids)
+                folder_row.message_count = None
+            else:
+                seen_uids = arrived_uids or []
+                folder_row.uid_next = folder_status.uid_next or (max(seen_uids) + 1 if seen_uids else stored_uid_next)
+                folder_row.message_count = folder_status.exists
+            if modseq_synced:
+                folder_row.highest_modseq = folder_status.highest_modseq
+            folder_row.last_synced = datetime.utcnow()
         db.session.commit()
         
-        # Schließe IMAP-Verbindung sicher
-        try:
-            mail_conn.close()
-        except Exception as close_error:
-            logging.debug(f"Fehler beim Schließen der IMAP-Verbindung: {close_error}")
-        try:
-            mail_conn.logout()
-        except Exception as logout_error:
-            logging.debug(f"Fehler beim Logout von IMAP: {logout_error}")
+        _close_imap(mail_conn)
         
         # Sende Dashboard-Updates an alle Benutzer mit E-Mail-Berechtigungen (nur wenn neue E-Mails)
         if stats['new_emails'] > 0:
@@ -2118,13 +2059,9 @@ def sync_emails_from_folder(folder_name):
                     EmailPermission, User.id == EmailPermission.user_id
                 ).filter(EmailPermission.can_read == True).all()
                 
+                # Ungelesene E-Mails aus den Ordnerzählern (für alle Benutzer gleich)
+                unread_count = get_unread_email_count()
                 for (user_id,) in users_with_email_access:
-                    # Berechne unread_count für diesen Benutzer
-                    unread_count = EmailMessage.query.filter_by(
-                        is_read=False
-                    ).count()
-                    
-                    # Emittiere Dashboard-Update
                     emit_dashboard_update(user_id, 'email_update', {'count': unread_count})
             except Exception as e:
                 logging.error(f"Fehler beim Senden der Dashboard-Updates für E-Mails: {e}")
@@ -2159,70 +2096,161 @@ def sync_emails_from_folder(folder_name):
         logging.error(f"Traceback: {traceback.format_exc()}")
         
         # Stelle sicher, dass IMAP-Verbindung geschlossen wird
-        if mail_conn:
-            try:
-                mail_conn.close()
-            except:
-                pass
-            try:
-                mail_conn.logout()
-            except:
-                pass
+        _close_imap(mail_conn)
         
         return False, f"E-Mail-Sync-Fehler für Ordner '{folder_name}': {str(e)}"
 
 
-def cleanup_old_emails():
-    """Lösche alte E-Mails basierend auf der konfigurierten Speicherdauer."""
+def get_email_storage_days():
+    """Speicherdauer für E-Mails in Tagen aus den Einstellungen (0 = unbegrenzt)."""
+    storage_value = get_setting('email_storage_days')
     try:
-        # Hole Speicherdauer aus Einstellungen
-        storage_setting = SystemSettings.query.filter_by(key='email_storage_days').first()
-        storage_days = 0
-        if storage_setting and storage_setting.value:
-            try:
-                storage_days = int(storage_setting.value)
-            except ValueError:
-                storage_days = 0
-        
-        # Wenn Speicherdauer 0 ist, keine Bereinigung
-        if storage_days <= 0:
-            logging.debug("E-Mail-Bereinigung deaktiviert (Speicherdauer = 0)")
-            return 0
-        
-        # Berechne das Datum, ab dem E-Mails gelöscht werden sollen
-        cutoff_date = datetime.utcnow() - timedelta(days=storage_days)
-        
-        # Finde E-Mails, die älter als die Speicherdauer sind
-        old_emails = EmailMessage.query.filter(
-            EmailMessage.created_at < cutoff_date
-        ).all()
-        
-        deleted_count = 0
-        for email in old_emails:
-            try:
-                # Lösche auch alle Anhänge (wird durch cascade automatisch gemacht)
-                db.session.delete(email)
-                deleted_count += 1
-            except Exception as e:
-                logging.error(f"Fehler beim Löschen der E-Mail {email.id}: {e}")
-                continue
-        
-        if deleted_count > 0:
+        return max(0, int(storage_value)) if storage_value else 0
+    except ValueError:
+        return 0
+
+
+def cleanup_old_emails(batch_size=None, time_budget=None):
+    """Lösche alte E-Mails basierend auf der konfigurierten Speicherdauer.
+
+    Gelöscht wird in Stapeln von ``batch_size`` IDs: zuerst die Anhänge per
+    ``email_id IN (...)``, dann die E-Mails, mit einem Commit pro Stapel.
+    Sperren bleiben damit kurz und die Synchronisation läuft weiter. Endet
+    der Lauf wegen ``time_budget`` (Sekunden) vorzeitig, setzt der nächste
+    Aufruf einfach mit den verbleibenden E-Mails fort.
+
+    Returns:
+        (Anzahl gelöschter E-Mails, True wenn keine alten E-Mails mehr übrig sind)
+    """
+    import time
+
+    storage_days = get_email_storage_days()
+    # Wenn Speicherdauer 0 ist, keine Bereinigung
+    if storage_days <= 0:
+        logging.debug("E-Mail-Bereinigung deaktiviert (Speicherdauer = 0)")
+        return 0, True
+
+    batch_size = batch_size or current_app.config.get('EMAIL_CLEANUP_BATCH_SIZE', 500)
+    cutoff_date = datetime.utcnow() - timedelta(days=storage_days)
+    started = time.monotonic()
+    deleted_count = 0
+    last_id = 0
+    finished = False
+    total = None
+
+    try:
+        while True:
+            email_ids = [email_id for (email_id,) in db.session.query(EmailMessage.id).filter(
+                EmailMessage.id > last_id,
+                EmailMessage.created_at < cutoff_date,
+            ).order_by(EmailMessage.id).limit(batch_size).all()]
+            if not email_ids:
+                finished = True
+                break
+            if total is None:
+                total = db.session.query(func.count(EmailMessage.id)).filter(
+                    EmailMessage.created_at < cutoff_date
+                ).scalar() or 0
+
+            EmailAttachment.query.filter(
+                EmailAttachment.email_id.in_(email_ids)
+            ).delete(synchronize_session=False)
+            EmailRenderCache.query.filter(
+                EmailRenderCache.email_id.in_(email_ids)
+            ).delete(synchronize_session=False)
+            EmailSearchTerm.query.filter(
+                EmailSearchTerm.email_id.in_(email_ids)
+            ).delete(synchronize_session=False)
+            discount_emails(email_ids)
+            deleted_count += EmailMessage.query.filter(
+                EmailMessage.id.in_(email_ids)
+            ).delete(synchronize_session=False)
             db.session.commit()
-            logging.info(f"E-Mail-Bereinigung: {deleted_count} E-Mails gelöscht (älter als {storage_days} Tage)")
-        else:
-            logging.debug(f"E-Mail-Bereinigung: Keine E-Mails zum Löschen gefunden (älter als {storage_days} Tage)")
-        
-        return deleted_count
-        
+            last_id = email_ids[-1]
+
+            logging.info(
+                f"E-Mail-Bereinigung: {deleted_count}/{total} E-Mails gelöscht "
+                f"(älter als {storage_days} Tage, bis ID {last_id})"
+            )
+            if time_budget is not None and time.monotonic() - started >= time_budget:
+                break
+    except Exception as e:
+        logging.error(f"Fehler bei der E-Mail-Bereinigung: {e}", exc_info=True)
+        db.session.rollback()
+        return deleted_count, False
+    finally:
+        # Per Bulk-Delete entfernte Zeilen nicht weiter in der Session halten
+        db.session.expire_all()
+
+    if deleted_count == 0:
+        logging.debug(f"E-Mail-Bereinigung: Keine E-Mails zum Löschen gefunden (älter als {storage_days} Tage)")
+    return deleted_count, finished
+
+
+def _sync_folder_in_context(app, folder_name):
+    """Gleicht einen Ordner in einem eigenen App-Kontext (eigene DB-Session, eigene IMAP-Verbindung) ab."""
+    with app.app_context():
+        stats = new_folder_sync_stats()
+        try:
+            success, message = sync_emails_from_folder(folder_name, stats)
+        except Exception as folder_error:
+            logging.error(f"Fehler beim Synchronisieren des Ordners '{folder_name}': {folder_error}")
+            import traceback
+            logging.error(f"Traceback: {traceback.format_exc()}")
+            success, message = False, str(folder_error)
+            db.session.rollback()
+        finally:
+            db.session.remove()
+        return success, message, stats
+
+
+def _record_email_sync_run(trigger, started_at, parallelism, folder_results):
+    """Speichert die zusammengefassten Kennzahlen eines Abgleichs und kürzt die Historie."""
+    import json
+    from app.models.email import EmailSyncRun
+
+    try:
+        run = EmailSyncRun(
+            trigger=trigger,
+            started_at=started_at,
+            finished_at=datetime.utcnow(),
+            parallelism=parallelism,
+            folders_total=len(folder_results),
+            folders_failed=sum(1 for result in folder_results if not result['success']),
+        )
+        for key in ('new_emails', 'updated_emails', 'moved_emails', 'deleted_emails', 'errors'):
+            setattr(run, key, sum(result[key] for result in folder_results))
+        run.bytes_fetched = sum(result['bytes'] for result in folder_results)
+        run.duration_seconds = round((run.finished_at - started_at).total_seconds(), 3)
+        run.folder_stats = json.dumps(folder_results)
+        db.session.add(run)
+        db.session.flush()
+
+        keep = max(1, int(current_app.config.get('EMAIL_SYNC_RUN_HISTORY', 500)))
+        cutoff_id = db.session.query(EmailSyncRun.id).order_by(EmailSyncRun.id.desc()).offset(keep).limit(1).scalar()
+        if cutoff_id:
+            EmailSyncRun.query.filter(EmailSyncRun.id <= cutoff_id).delete(synchronize_session=False)
+        db.session.commit()
+        return run
     except Exception as e:
-        logging.error(f"Fehler bei der E-Mail-Bereinigung: {e}", exc_info=True)
         db.session.rollback()
-        return 0
+        logging.error(f"Sync-Kennzahlen konnten nicht gespeichert werden: {e}")
+        return None
+
+
+def sync_emails_from_server(trigger='scheduled'):
+    """Sync emails from IMAP server to database with folder support.
 
+    Die Ordner werden parallel abgeglichen (höchstens
+    ``EMAIL_SYNC_PARALLEL_FOLDERS`` gleichzeitig, jeweils mit eigener
+    Pool-Verbindung). Die Kennzahlen aller Ordner werden zusammengefasst und
+    als ``EmailSyncRun`` gespeichert.
+
+    Args:
+        trigger: 'scheduled' (Job) oder 'manual' (vom Benutzer gestartet)
+    """
+    from concurrent.futures import ThreadPoolExecutor
 
-def sync_emails_from_server():
-    """Sync emails from IMAP server to database with folder support."""
     print("E-Mail-Synchronisation wird gestartet")
     logging.info("E-Mail-Synchronisation wird gestartet")
     
@@ -2238,6 +2266,8 @@ def sync_emails_from_server():
             print(message)
             return False, message
 
+        started_at = datetime.utcnow()
+
         # Synchronisiere zuerst die Ordner-Liste
         folder_success, folder_message = sync_imap_folders()
         if not folder_success:
@@ -2251,54 +2281,62 @@ def sync_emails_from_server():
             # Fallback: Verwende Standard-Ordner
             folder_rows = [('INBOX', 'Posteingang')]
             logging.info("Keine Ordner in Datenbank gefunden, verwende Standard-Ordner")
-        
-        logging.info(f"Syncing emails from {len(folder_rows)} folders: {[name for (name, _) in folder_rows]}")
-        
-        total_synced = 0
-        total_new = 0
+        # Ordner-Sync ist abgeschlossen; die Ordner-Threads arbeiten mit eigenen Sessions
+        db.session.commit()
+
+        # Nicht mehr Threads als der IMAP-Pool Verbindungen erlaubt
+        parallelism = max(1, min(
+            int(current_app.config.get('EMAIL_SYNC_PARALLEL_FOLDERS', 4) or 1),
+            int(current_app.config.get('IMAP_POOL_SIZE', 4) or 1),
+            len(folder_rows),
+        ))
+        logging.info(
+            f"Syncing emails from {len(folder_rows)} folders (parallel: {parallelism}): "
+            f"{[name for (name, _) in folder_rows]}"
+        )
+
+        app = current_app._get_current_object()
+        if parallelism > 1:
+            with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='email-sync') as executor:
+                futures = [
+                    executor.submit(_sync_folder_in_context, app, folder_name)
+                    for (folder_name, _) in folder_rows
+                ]
+                outcomes = [future.result() for future in futures]
+        else:
+            outcomes = [_sync_folder_in_context(app, folder_name) for (folder_name, _) in folder_rows]
+
         folder_results = []
-        successful_folders = 0
-        failed_folders = 0
-        
-        for (folder_name, display_name) in folder_rows:
-            try:
-                logging.info(f"Syncing folder: '{folder_name}' ({display_name})")
-                success, message = sync_emails_from_folder(folder_name)
-                if success:
-                    successful_folders += 1
-                    import re
-                    # Suche nach verschiedenen Mustern für Anzahl
-                    match = re.search(r'(\d+)\s+(neu|new)', message, re.IGNORECASE)
-                    if match:
-                        count = int(match.group(1))
-                        total_new += count
-                    # Auch nach "E-Mails" suchen
-                    match = re.search(r'(\d+)\s+E-Mails', message, re.IGNORECASE)
-                    if match:
-                        count = int(match.group(1))
-                        total_synced += count
-                    folder_results.append(f"{display_name}: {message}")
-                    logging.info(f"✓ Ordner '{folder_name}' erfolgreich synchronisiert: {message}")
-                else:
-                    failed_folders += 1
-                    logging.warning(f"✗ Ordner '{folder_name}' konnte nicht synchronisiert werden: {message}")
-                    folder_results.append(f"{display_name}: Fehler - {message}")
-            except Exception as folder_error:
-                failed_folders += 1
-                logging.error(f"Fehler beim Synchronisieren des Ordners '{folder_name}': {folder_error}")
-                import traceback
-                logging.error(f"Traceback: {traceback.format_exc()}")
-                folder_results.append(f"{display_name}: Fehler - {str(folder_error)}")
-                continue
-        
+        for (folder_name, display_name), (success, message, stats) in zip(folder_rows, outcomes):
+            if success:
+                logging.info(f"✓ Ordner '{folder_name}' erfolgreich synchronisiert: {message}")
+            else:
+                logging.warning(f"✗ Ordner '{folder_name}' konnte nicht synchronisiert werden: {message}")
+            folder_results.append({'folder': folder_name, 'success': success, 'message': message, **stats})
+
+        successful_folders = sum(1 for result in folder_results if result['success'])
+        failed_folders = len(folder_results) - successful_folders
+        total_new = sum(result['new_emails'] for result in folder_results)
+        total_changed = sum(
+            result['updated_emails'] + result['moved_emails'] + result['deleted_emails']
+            for result in folder_results
+        )
+
+        _record_email_sync_run(trigger, started_at, parallelism, folder_results)
+
         print(f"E-Mail-Synchronisation wurde beendet: {successful_folders} erfolgreich, {failed_folders} fehlgeschlagen")
-        logging.info(f"E-Mail-Synchronisation wurde beendet: {successful_folders} Ordner erfolgreich, {failed_folders} Ordner fehlgeschlagen")
+        logging.info(
+            f"E-Mail-Synchronisation wurde beendet: {successful_folders} Ordner erfolgreich, "
+            f"{failed_folders} Ordner fehlgeschlagen, {total_new} neu, {total_changed} geändert, "
+            f"{sum(result['bytes'] for result in folder_results)} Bytes in "
+            f"{(datetime.utcnow() - started_at).total_seconds():.1f}s"
+        )
         
         # Erstelle Ergebnis-Meldung
         if total_new > 0:
             result_msg = f"{total_new} neue E-Mails aus {successful_folders} Ordnern synchronisiert"
-        elif total_synced > 0:
-            result_msg = f"{total_synced} E-Mails aus {successful_folders} Ordnern synchronisiert"
+        elif total_changed > 0:
+            result_msg = f"{total_changed} E-Mails aus {successful_folders} Ordnern synchronisiert"
         elif successful_folders > 0:
             result_msg = f"{successful_folders} Ordner synchronisiert (keine neuen E-Mails)"
         else:
@@ -2476,6 +2514,50 @@ def _folder_tree_context():
     return flat, ordered
 
 
+def _encode_email_cursor(email_obj):
+    return f"{email_obj.received_at.strftime('%Y%m%d%H%M%S%f')}-{email_obj.id}"
+
+
+def _decode_email_cursor(cursor):
+    try:
+        timestamp, email_id = cursor.split('-', 1)
+        return datetime.strptime(timestamp, '%Y%m%d%H%M%S%f'), int(email_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _load_email_list_page(folder_name):
+    """Eine Seite der Ordnerliste, neueste zuerst (Keyset-Paginierung über ``?before=``).
+
+    Nutzt den Index (folder, received_at, id) und lädt nur die Spalten der
+    Listenansicht, keine Bodies oder Anhänge. Die Laufzeit hängt damit nicht
+    von der Größe des Ordners ab.
+
+    Returns:
+        (E-Mails der Seite, Cursor für die nächste Seite oder None)
+    """
+    query = EmailMessage.query.options(load_only(*EMAIL_LIST_COLUMNS)).filter(
+        EmailMessage.folder == folder_name
+    )
+    cursor = _decode_email_cursor(request.args.get('before'))
+    if cursor:
+        received_at, email_id = cursor
+        query = query.filter(or_(
+            EmailMessage.received_at < received_at,
+            and_(EmailMessage.received_at == received_at, EmailMessage.id < email_id),
+        ))
+    emails = query.order_by(
+        EmailMessage.received_at.desc(), EmailMessage.id.desc()
+    ).limit(EMAIL_LIST_PAGE_SIZE + 1).all()
+
+    next_cursor = None
+    if len(emails) > EMAIL_LIST_PAGE_SIZE:
+        emails = emails[:EMAIL_LIST_PAGE_SIZE]
+        if emails[-1].received_at:
+            next_cursor = _encode_email_cursor(emails[-1])
+    return emails, next_cursor
+
+
 @email_bp.route('/')
 @login_required
 @check_module_access('module_email')
@@ -2486,32 +2568,12 @@ def index():
         return redirect(url_for('dashboard.index'))
     
     current_folder = request.args.get('folder', 'INBOX')
-    # Zeige alle E-Mails (auch die als gelöscht markierten, um zu prüfen was los ist)
-    emails = EmailMessage.query.filter_by(
-        folder=current_folder
-    ).order_by(EmailMessage.received_at.desc()).all()
-    
-    # Stelle alle fälschlicherweise als gelöscht markierten E-Mails wieder her
-    restored_count = 0
-    for email in emails:
-        if email.is_deleted_imap:
-            email.is_deleted_imap = False
-            restored_count += 1
-    if restored_count > 0:
-        db.session.commit()
-        logging.info(f"Wiederhergestellt {restored_count} fälschlicherweise als gelöscht markierte E-Mails im Ordner '{current_folder}'")
+    emails, next_cursor = _load_email_list_page(current_folder)
     folder_obj = EmailFolder.query.filter_by(name=current_folder).first()
     folder_display_name = folder_obj.display_name if folder_obj else current_folder
 
     folders, folder_tree = _folder_tree_context()
 
-    for email_obj in emails:
-        if email_obj.attachments:
-            email_obj.has_attachments = True
-        else:
-            email_obj.has_attachments = False
-    db.session.commit()
-
     return render_template(
         'email/index.html',
         emails=emails,
@@ -2519,6 +2581,8 @@ def index():
         folder_tree=folder_tree,
         current_folder=current_folder,
         folder_display_name=folder_display_name,
+        next_cursor=next_cursor,
+        is_first_page=not request.args.get('before'),
         color_dot_choices=[c for c in COLOR_DOT_CHOICES.keys() if c not in ('', 'none')],
     )
 
@@ -2550,22 +2614,7 @@ def folder_view(folder_name):
         flash(f'Ordner "{folder_name}" nicht gefunden.', 'warning')
         return redirect(url_for('email.index'))
     
-    # Zeige alle E-Mails (auch die als gelöscht markierten, um zu prüfen was los ist)
-    emails = EmailMessage.query.filter_by(
-        folder=folder_name
-    ).order_by(EmailMessage.received_at.desc()).all()
-    
-    # Stelle alle fälschlicherweise als gelöscht markierten E-Mails wieder her
-    restored_count = 0
-    for email in emails:
-        if email.is_deleted_imap:
-            email.is_deleted_imap = False
-            restored_count += 1
-    if restored_count > 0:
-        db.session.commit()
-        logging.info(f"Wiederhergestellt {restored_count} fälschlicherweise als gelöscht markierte E-Mails im Ordner '{folder_name}'")
-    
-    logging.info(f"Viewing folder '{folder_name}' with {len(emails)} emails")
+    emails, next_cursor = _load_email_list_page(folder_name)
 
     folders, folder_tree = _folder_tree_context()
     folder_display_name = folder_obj.display_name if folder_obj else folder_name
@@ -2577,10 +2626,167 @@ def folder_view(folder_name):
         folder_tree=folder_tree,
         current_folder=folder_name,
         folder_display_name=folder_display_name,
+        next_cursor=next_cursor,
+        is_first_page=not request.args.get('before'),
+        color_dot_choices=[c for c in COLOR_DOT_CHOICES.keys() if c not in ('', 'none')],
+    )
+
+
+def _run_email_search():
+    """Suche aus den Request-Parametern ``q``, ``folder``, ``page`` und ``per_page`` (siehe app/utils/email_search.py)."""
+    query = (request.args.get('q') or '').strip()[:200]
+    folder = (request.args.get('folder') or '').strip() or None
+    page = request.args.get('page', 1, type=int) or 1
+    per_page = request.args.get('per_page', EMAIL_LIST_PAGE_SIZE, type=int) or EMAIL_LIST_PAGE_SIZE
+    result = search_emails(
+        query,
+        folder=folder,
+        page=page,
+        per_page=min(max(per_page, 1), 100),
+        columns=EMAIL_LIST_COLUMNS,
+    )
+    return query, folder, result
+
+
+@email_bp.route('/search')
+@login_required
+@check_module_access('module_email')
+def search():
+    """Suchergebnisse in der Ordneransicht, nach Relevanz sortiert."""
+    if not check_email_permission('read'):
+        flash(translate('email.flash.no_read_permission'), 'danger')
+        return redirect(url_for('dashboard.index'))
+
+    query, folder, result = _run_email_search()
+    if not query:
+        return redirect(url_for('email.index', folder=folder) if folder else url_for('email.index'))
+
+    folders, folder_tree = _folder_tree_context()
+    folder_obj = EmailFolder.query.filter_by(name=folder).first() if folder else None
+
+    return render_template(
+        'email/index.html',
+        emails=[email_msg for email_msg, _ in result['emails']],
+        folders=folders,
+        folder_tree=folder_tree,
+        current_folder=folder or '',
+        folder_display_name=folder_obj.display_name if folder_obj else (folder or ''),
+        next_cursor=None,
+        is_first_page=result['page'] == 1,
+        search_query=query,
+        search_folder=folder,
+        search_total=result['total'],
+        search_page=result['page'],
+        search_has_more=result['page'] * result['per_page'] < result['total'],
         color_dot_choices=[c for c in COLOR_DOT_CHOICES.keys() if c not in ('', 'none')],
     )
 
 
+@email_bp.route('/api/search')
+@login_required
+@check_module_access('module_email')
+def api_search():
+    """Suche als JSON: ``?q=...&folder=...&page=...``."""
+    if not check_email_permission('read'):
+        return jsonify({'error': translate('email.flash.no_read_permission')}), 403
+
+    query, folder, result = _run_email_search()
+    return jsonify({
+        'query': query,
+        'folder': folder,
+        'terms': result['terms'],
+        'total': result['total'],
+        'page': result['page'],
+        'per_page': result['per_page'],
+        'has_more': result['page'] * result['per_page'] < result['total'],
+        'results': [
+            {
+                'id': email_msg.id,
+                'subject': email_msg.subject,
+                'sender': email_msg.sender,
+                'folder': email_msg.folder,
+                'preview': email_msg.preview_text or '',
+                'received_at': email_msg.received_at.isoformat() if email_msg.received_at else None,
+                'is_read': bool(email_msg.is_read),
+                'has_attachments': bool(email_msg.has_attachments),
+                'score': int(score or 0),
+                'url': url_for('email.view_email', email_id=email_msg.id),
+            }
+            for email_msg, score in result['emails']
+        ],
+    })
+
+def render_email_body_html(email_msg):
+    """
+    Liefert das aufbereitete HTML einer E-Mail für die Ansicht.
+
+    Das Ergebnis wird in ``EmailRenderCache`` gespeichert und wiederverwendet,
+    solange ``EMAIL_RENDERER_VERSION`` unverändert ist. Ergebnisse mit
+    Platzhaltern für fehlende Inline-Bilder werden nicht gespeichert, damit
+    diese beim nächsten Öffnen erneut nachgeladen werden.
+
+    Returns:
+        (is_simple_html, iframe_html ohne Theme-CSS, inline_html)
+    """
+    cache = email_msg.render_cache
+    if cache is not None and cache.renderer_version == EMAIL_RENDERER_VERSION:
+        return cache.is_simple_html, cache.iframe_html, cache.inline_html
+
+    raw_html = None
+    if email_msg.body_html:
+        try:
+            if isinstance(email_msg.body_html, bytes):
+                raw_html = email_msg.body_html.decode('utf-8', errors='replace')
+            else:
+                raw_html = str(email_msg.body_html)
+        except Exception as e:
+            logging.error(f"HTML decode error: {e}")
+            raw_html = None
+    if not raw_html:
+        return True, None, None
+
+    # Inline-Bilder (cid:) nachladen, falls sie bei einem früheren Sync nicht erfasst wurden
+    if re.search(r'src\s*=\s*["\']?cid:', raw_html, flags=re.IGNORECASE):
+        try:
+            backfill_inline_attachments_from_imap(email_msg)
+        except Exception as backfill_err:
+            logging.debug(f"Inline backfill skipped: {backfill_err}")
+
+    is_simple_html = is_simple_html_email(raw_html)
+    iframe_html = None
+    inline_html = None
+    if not is_simple_html:
+        iframe_html = build_rich_email_iframe_base(raw_html, email_msg) or None
+    if is_simple_html or not iframe_html:
+        try:
+            inline_html = process_email_body_html_for_inline_view(raw_html, email_msg)
+        except Exception as e:
+            logging.error(f"HTML processing error: {e}")
+            inline_html = None
+
+    unresolved = any(
+        CID_PLACEHOLDER_IMAGE in html or re.search(r'src\s*=\s*["\']?cid:', html, flags=re.IGNORECASE)
+        for html in (iframe_html, inline_html) if html
+    )
+    if not unresolved:
+        try:
+            if cache is None:
+                cache = EmailRenderCache(email_id=email_msg.id)
+                db.session.add(cache)
+            cache.renderer_version = EMAIL_RENDERER_VERSION
+            cache.is_simple_html = is_simple_html
+            cache.iframe_html = iframe_html
+            cache.inline_html = inline_html
+            cache.created_at = datetime.utcnow()
+            db.session.commit()
+        except Exception as e:
+            # z.B. gleichzeitiges Öffnen derselben E-Mail: das andere Ergebnis bleibt gespeichert
+            db.session.rollback()
+            logging.debug(f"Aufbereitetes HTML für E-Mail {email_msg.id} nicht gespeichert: {e}")
+
+    return is_simple_html, iframe_html, inline_html
+
+
 @email_bp.route('/view/<int:email_id>')
 @login_required
 @check_module_access('module_email')
@@ -2604,55 +2810,19 @@ def view_email(email_id):
     if not email_msg.is_read:
         email_msg.is_read = True
         db.session.commit()
-    
-    
-    raw_html = None
-    if email_msg.body_html:
-        try:
-            if isinstance(email_msg.body_html, bytes):
-                raw_html = email_msg.body_html.decode('utf-8', errors='replace')
-            else:
-                raw_html = str(email_msg.body_html)
-        except Exception as e:
-            logging.error(f"HTML decode error: {e}")
-            raw_html = None
-
-    # Inline-Bilder (cid:) nachladen, falls sie bei einem früheren Sync nicht erfasst wurden
-    if raw_html and re.search(r'src\s*=\s*["\']?cid:', raw_html, flags=re.IGNORECASE):
-        try:
-            backfill_inline_attachments_from_imap(email_msg)
-        except Exception as backfill_err:
-            logging.debug(f"Inline backfill skipped: {backfill_err}")
 
-    is_simple_html = is_simple_html_email(raw_html) if raw_html else True
+    is_simple_html, iframe_html, html_content = render_email_body_html(email_msg)
 
     html_iframe_html = None
-    html_content = None
-
-    if raw_html:
-        if not is_simple_html:
-            # Rich HTML: full document in sandboxed iframe so sender CSS/layout stay intact
-            viewer_dark = bool(
-                current_user.is_authenticated and getattr(current_user, 'dark_mode', False)
-            )
-            viewer_oled = bool(
-                current_user.is_authenticated and getattr(current_user, 'oled_mode', False)
-            )
-            html_iframe_html = build_rich_email_iframe_document(
-                raw_html, email_msg, viewer_dark=viewer_dark, viewer_oled=viewer_oled
-            )
-            if not html_iframe_html:
-                try:
-                    html_content = process_email_body_html_for_inline_view(raw_html, email_msg)
-                except Exception as e:
-                    logging.error(f"HTML inline fallback error: {e}")
-                    html_content = None
-        else:
-            try:
-                html_content = process_email_body_html_for_inline_view(raw_html, email_msg)
-            except Exception as e:
-                logging.error(f"HTML processing error: {e}")
-                html_content = None
+    if iframe_html:
+        # Rich HTML: full document in sandboxed iframe so sender CSS/layout stay intact
+        viewer_dark = bool(
+            current_user.is_authenticated and getattr(current_user, 'dark_mode', False)
+        )
+        viewer_oled = bool(
+            current_user.is_authenticated and getattr(current_user, 'oled_mode', False)
+        )
+        html_iframe_html = inject_iframe_portal_viewer_theme(iframe_html, viewer_dark, viewer_oled)
 
     return render_template(
         'email/view.html',
@@ -2888,7 +3058,7 @@ def build_reply_context(email_msg: EmailMessage, mode: str):
             if not html_content.strip().startswith('<div class="email-original-content-inner">'):
                 html_content = f'<div class="email-original-content-inner">{html_content}</div>'
             
-            html_content = replace_cid_images_in_email_html(html_content, email_msg)
+            html_content = replace_cid_images_in_email_html(html_content, email_msg, embed=True)
             
             original_html = html_content
         except Exception as e:
@@ -2988,6 +3158,49 @@ def forward(email_id: int):
     return render_template('email/compose.html', **ctx)
 
 
+@email_bp.route('/attachment/<int:attachment_id>/inline')
+@login_required
+@check_module_access('module_email')
+def inline_image(attachment_id):
+    """Inline-Bild (cid:) für die E-Mail-Ansicht; per ETag vom Browser cachebar."""
+    if not check_email_permission('read'):
+        abort(403)
+
+    attachment = EmailAttachment.query.get_or_404(attachment_id)
+    content_type = (attachment.content_type or '').lower()
+    if not attachment.is_inline or not content_type.startswith('image/'):
+        abort(404)
+    if not ensure_attachment_content(attachment):
+        abort(404)
+
+    file_path = attachment.get_file_path()
+    if file_path and os.path.exists(file_path):
+        response = send_file(
+            file_path,
+            mimetype=content_type,
+            conditional=True,
+            etag=attachment.content_hash or True,
+        )
+    else:
+        content = attachment.get_content()
+        if not content:
+            abort(404)
+        response = send_file(
+            io.BytesIO(content),
+            mimetype=content_type,
+            conditional=True,
+            etag=hashlib.sha256(content).hexdigest(),
+        )
+
+    response.cache_control.no_cache = None
+    response.cache_control.private = True
+    response.cache_control.max_age = 7 * 24 * 60 * 60
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    # SVG-Bilder direkt aufgerufen: keine Skripte im Portal-Kontext ausführen
+    response.headers['Content-Security-Policy'] = "default-src 'none'; style-src 'unsafe-inline'; sandbox"
+    return response
+
+
 @email_bp.route('/attachment/<int:attachment_id>')
 @login_required
 @check_module_access('module_email')
@@ -3003,54 +3216,44 @@ def download_attachment(attachment_id):
         flash(translate('email.flash.attachment_not_found'), 'danger')
         return redirect(url_for('email.index'))
     
+    if not ensure_attachment_content(attachment):
+        flash(translate('email.flash.attachment_fetch_failed'), 'danger')
+        return redirect(url_for('email.view_email', email_id=email_msg.id))
+
     try:
-        if attachment.size > 1 * 1024 * 1024:
-            logging.info(f"Downloading large attachment: '{attachment.filename}' ({attachment.size / (1024*1024):.2f} MB)")
-        
-        if attachment.is_large_file and attachment.file_path:
+        file_path = attachment.get_file_path()
+        if file_path:
             import os
-            if os.path.exists(attachment.file_path):
-                def generate():
-                    with open(attachment.file_path, 'rb') as f:
-                        while True:
-                            data = f.read(8192)
-                            if not data:
-                                break
-                            yield data
-                
-                response = Response(generate(), mimetype=attachment.content_type)
-                import urllib.parse
-                encoded_filename = urllib.parse.quote(attachment.filename.encode('utf-8'))
-                response.headers['Content-Disposition'] = f'attachment; filename*=UTF-8\'\'{encoded_filename}'
-                response.headers['Content-Length'] = str(attachment.size)
-                response.headers['Accept-Ranges'] = 'bytes'
-                return response
-            else:
+            if not os.path.exists(file_path):
                 flash(translate('email.flash.attachment_file_not_found'), 'danger')
                 return redirect(url_for('email.view_email', email_id=email_msg.id))
+            # Streaming direkt von der Festplatte; Blob-Inhalte ändern sich nie (Hash als ETag)
+            response = send_file(
+                file_path,
+                as_attachment=True,
+                download_name=attachment.filename,
+                mimetype=attachment.content_type,
+                conditional=True,
+                etag=attachment.content_hash or True,
+            )
         else:
             content = attachment.get_content()
             if not content:
                 flash(translate('email.flash.attachment_corrupted'), 'danger')
                 return redirect(url_for('email.index'))
             
-            file_obj = io.BytesIO(content)
-            
             response = send_file(
-                file_obj,
+                io.BytesIO(content),
                 as_attachment=True,
                 download_name=attachment.filename,
                 mimetype=attachment.content_type
             )
-            
-            import urllib.parse
-            encoded_filename = urllib.parse.quote(attachment.filename.encode('utf-8'))
-            response.headers['Content-Disposition'] = f'attachment; filename*=UTF-8\'\'{encoded_filename}'
-            
-            response.headers['Content-Length'] = str(attachment.size)
-            response.headers['Accept-Ranges'] = 'bytes'
-            
-            return response
+            response.headers['Content-Length'] = str(len(content))
+        
+        import urllib.parse
+        encoded_filename = urllib.parse.quote(attachment.filename.encode('utf-8'))
+        response.headers['Content-Disposition'] = f'attachment; filename*=UTF-8\'\'{encoded_filename}'
+        return response
         
     except Exception as e:
         logging.error(f"Error downloading attachment {attachment_id} ({attachment.filename}): {e}")
@@ -3190,7 +3393,7 @@ def compose():
                     attachment_filename = 'logo.png'
                 
                 # KRITISCH: Verwende msg.attach() - dies stellt sicher, dass das Logo in der Struktur bleibt
-                # Die Manipulation mit CID und inline erfolgt später in send_email_with_lock()
+                # Die Manipulation mit CID und inline erfolgt später in prepare_mime_message()
                 msg.attach(attachment_filename, logo_mime_type, logo_data)
                 
                 
@@ -3245,16 +3448,11 @@ def compose():
                 for aid in id_list:
                     try:
                         att = EmailAttachment.query.get(int(aid))
-                        if not att:
+                        if not att or not ensure_attachment_content(att):
                             continue
-                        if att.is_large_file and att.file_path:
-                            with open(att.file_path, 'rb') as f:
-                                data = f.read()
+                        data = att.get_content()
+                        if data:
                             msg.attach(att.filename, att.content_type or 'application/octet-stream', data)
-                        else:
-                            data = att.get_content()
-                            if data:
-                                msg.attach(att.filename, att.content_type or 'application/octet-stream', data)
                     except Exception as _:
                         continue
             
@@ -3264,21 +3462,16 @@ def compose():
                 for aid in id_list:
                     try:
                         att = EmailAttachment.query.get(int(aid))
-                        if not att:
+                        if not att or not ensure_attachment_content(att):
                             continue
-                        if att.is_large_file and att.file_path:
-                            with open(att.file_path, 'rb') as f:
-                                data = f.read()
+                        data = att.get_content()
+                        if data:
                             msg.attach(att.filename, att.content_type or 'application/octet-stream', data)
-                        else:
-                            data = att.get_content()
-                            if data:
-                                msg.attach(att.filename, att.content_type or 'application/octet-stream', data)
                     except Exception as _:
                         continue
             
             # Stelle sicher, dass Logo-Attachment nach allen anderen Anhängen mit CID markiert ist
-            # (wird auch in send_email_with_lock() nochmal geprüft, aber hier sicherstellen)
+            # (wird auch in prepare_mime_message() nochmal geprüft, aber hier sicherstellen)
             if logo_data and logo_mime_type and logo_cid:
                 # Warte, bis msg.msg erstellt wurde (nach allen anderen attach()-Aufrufen)
                 if hasattr(msg, 'msg') and msg.msg:
@@ -3323,7 +3516,8 @@ def compose():
                                     break
             
             
-            send_email_with_lock(msg)
+            # Sofort senden: der Benutzer sieht das Ergebnis, danach folgt die Ablage in "Gesendet"
+            send_email_now(msg)
             
             # Entwurf nach erfolgreichem Versand entfernen (lokal + IMAP), damit er nicht in Entwürfe bleibt
             if draft_id:
@@ -3382,14 +3576,18 @@ def compose():
                 bcc=bcc or None,
                 body_text=full_body_plain,
                 body_html=full_body_html,
+                preview_text=EmailMessage.build_preview(full_body_plain),
                 folder=sent_folder_name,
                 is_sent=True,
                 is_read=True,  # E-Mails im "Sent"-Ordner sind immer als gelesen markiert
                 sent_by_user_id=current_user.id,
                 sent_at=datetime.utcnow(),
+                received_at=datetime.utcnow(),
                 has_attachments=bool(request.files.getlist('attachments')) or bool(forward_attachment_ids) or bool(original_attachment_ids)
             )
             db.session.add(email_record)
+            db.session.flush()
+            _index_for_search(email_record)
             db.session.commit()
             
             success_msg = 'E-Mail wurde erfolgreich gesendet.'
@@ -3588,6 +3786,7 @@ def save_draft():
             email_record.bcc = bcc or None
             email_record.body_text = body_text
             email_record.body_html = body_html
+            email_record.preview_text = EmailMessage.build_preview(body_text)
             email_record.received_at = datetime.utcnow()
         else:
             email_record = EmailMessage(
@@ -3598,6 +3797,7 @@ def save_draft():
                 bcc=bcc or None,
                 body_text=body_text,
                 body_html=body_html,
+                preview_text=EmailMessage.build_preview(body_text),
                 folder='Drafts',
                 is_sent=False,
                 is_read=False,
@@ -3615,61 +3815,26 @@ def save_draft():
                     content = attachment.read()
                     attachment.seek(0)
                     
-                    # Prüfe Dateigröße
-                    max_db_size = current_app.config.get('MAX_ATTACHMENT_DB_SIZE', 5 * 1024 * 1024)  # 5MB
-                    attachment_size = len(content)
-                    
-                    if attachment_size > max_db_size:
-                        # Speichere große Dateien auf der Festplatte
-                        import os
-                        attachments_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'email_attachments')
-                        os.makedirs(attachments_dir, exist_ok=True)
-                        
-                        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-                        safe_filename = "".join(c for c in attachment.filename if c.isalnum() or c in '._- ')
-                        file_path = os.path.join(attachments_dir, f"{timestamp}_{safe_filename}")
-                        
-                        try:
-                            with open(file_path, 'wb') as f:
-                                f.write(content)
-                            
-                            email_attachment = EmailAttachment(
-                                email=email_record,
-                                filename=attachment.filename,
-                                content_type=attachment.content_type or 'application/octet-stream',
-                                size=attachment_size,
-                                content=None,
-                                file_path=file_path,
-                                is_large_file=True
-                            )
-                        except Exception as file_error:
-                            logging.error(f"Fehler beim Speichern großer Datei: {file_error}")
-                            # Fallback: versuche trotzdem in DB zu speichern
-                            email_attachment = EmailAttachment(
-                                email=email_record,
-                                filename=attachment.filename,
-                                content_type=attachment.content_type or 'application/octet-stream',
-                                size=attachment_size,
-                                content=content,
-                                file_path=None,
-                                is_large_file=False
-                            )
-                    else:
-                        email_attachment = EmailAttachment(
-                            email=email_record,
-                            filename=attachment.filename,
-                            content_type=attachment.content_type or 'application/octet-stream',
-                            size=attachment_size,
-                            content=content,
-                            file_path=None,
-                            is_large_file=False
-                        )
+                    email_attachment = EmailAttachment(
+                        email=email_record,
+                        filename=attachment.filename,
+                        content_type=attachment.content_type or 'application/octet-stream',
+                        size=len(content),
+                    )
+                    try:
+                        email_attachment.set_content(content)
+                    except Exception as file_error:
+                        logging.error(f"Fehler beim Speichern des Anhangs im Blob-Speicher: {file_error}")
+                        # Fallback: in der Datenbank speichern
+                        email_attachment.content = content
                     
                     db.session.add(email_attachment)
                     email_record.has_attachments = True
         
         db.session.add(email_record)
         email_record.has_attachments = bool(email_record.attachments)
+        db.session.flush()
+        _index_for_search(email_record)
         db.session.commit()
         
         return jsonify({
@@ -3764,7 +3929,7 @@ def sync_emails():
                     if current_folder:
                         success, message = sync_emails_from_folder(current_folder)
                     else:
-                        success, message = sync_emails_from_server()
+                        success, message = sync_emails_from_server(trigger='manual')
                     
                     if success:
                         flash(f'✅ {message}', 'success')
@@ -3782,15 +3947,42 @@ def sync_emails():
     
     user_id = current_user.id
     job_id = f"{user_id}-{uuid4().hex}"
-    app_instance = current_app._get_current_object()
+
+    from app.tasks.job_queue import enqueue_job, PRIORITY_HIGH
+    enqueue_job(
+        'email_manual_sync',
+        {
+            'user_id': user_id,
+            'job_id': job_id,
+            'folder': current_folder,
+            'folder_label': folder_label,
+        },
+        priority=PRIORITY_HIGH,
+        max_attempts=1,
+    )
+    
+    response_message = 'Synchronisation gestartet.'
+    if folder_label:
+        response_message = f"Synchronisation für '{folder_label}' gestartet."
     
+    return jsonify({
+        'success': True,
+        'jobId': job_id,
+        'message': response_message,
+        'folder': current_folder,
+        'folderLabel': folder_label
+    }), 202
+
+
+def run_manual_email_sync(user_id, job_id, folder=None, folder_label=None):
+    """Job-Handler für eine vom Benutzer angestoßene Synchronisation (mit SSE-Statusmeldungen)."""
     def emit_status(status: str, message: str, level: str = 'info', **extras):
         payload = {
             'jobId': job_id,
             'status': status,
             'message': message,
             'level': level,
-            'folder': current_folder,
+            'folder': folder,
             'folderLabel': folder_label,
         }
         if extras:
@@ -3798,52 +3990,34 @@ def sync_emails():
         # SSE-Update senden (funktioniert mit mehreren Gunicorn-Workern)
         emit_email_sync_status(user_id, 'sync_status', payload)
     
-    def sync_in_background():
-        with app_instance.app_context():
-            start_msg = 'Synchronisation gestartet.'
-            if folder_label:
-                start_msg = f"Synchronisation für '{folder_label}' gestartet."
-            emit_status('started', start_msg, 'info', shouldRefresh=False)
-            
-            try:
-                # Verwende Lock, um sicherzustellen, dass nur ein Worker synchronisiert
-                with acquire_email_sync_lock(timeout=60) as acquired:
-                    if acquired:
-                        if current_folder:
-                            print(f"E-Mail-Synchronisation wird gestartet (Ordner: {folder_label or current_folder})")
-                            success, message = sync_emails_from_folder(current_folder)
-                            print(f"E-Mail-Synchronisation wurde beendet (Ordner: {folder_label or current_folder})")
-                        else:
-                            # sync_emails_from_server() gibt bereits die Meldungen aus
-                            success, message = sync_emails_from_server()
-                        
-                        if success:
-                            emit_status('success', message, 'success', shouldRefresh=True)
-                        else:
-                            emit_status('error', message, 'danger', shouldRefresh=False)
-                    else:
-                        print("E-Mail-Synchronisation: Bereits in einem anderen Worker aktiv")
-                        emit_status('warning', 'Synchronisation läuft bereits in einem anderen Worker. Bitte warten Sie einen Moment.', 'warning', shouldRefresh=False)
-            except Exception as exc:
-                print(f"E-Mail-Synchronisation Fehler: {exc}")
-                app_instance.logger.error(f"E-Mail-Synchronisation Fehler: {exc}", exc_info=True)
-                emit_status('error', str(exc), 'danger', shouldRefresh=False)
-    
-    thread = threading.Thread(target=sync_in_background, name=f"email-sync-{job_id}")
-    thread.daemon = True
-    thread.start()
-    
-    response_message = 'Synchronisation gestartet.'
+    start_msg = 'Synchronisation gestartet.'
     if folder_label:
-        response_message = f"Synchronisation für '{folder_label}' gestartet."
+        start_msg = f"Synchronisation für '{folder_label}' gestartet."
+    emit_status('started', start_msg, 'info', shouldRefresh=False)
     
-    return jsonify({
-        'success': True,
-        'jobId': job_id,
-        'message': response_message,
-        'folder': current_folder,
-        'folderLabel': folder_label
-    }), 202
+    try:
+        # Verwende Lock, um sicherzustellen, dass nur ein Worker synchronisiert
+        with acquire_email_sync_lock(timeout=60) as acquired:
+            if acquired:
+                if folder:
+                    print(f"E-Mail-Synchronisation wird gestartet (Ordner: {folder_label or folder})")
+                    success, message = sync_emails_from_folder(folder)
+                    print(f"E-Mail-Synchronisation wurde beendet (Ordner: {folder_label or folder})")
+                else:
+                    # sync_emails_from_server() gibt bereits die Meldungen aus
+                    success, message = sync_emails_from_server(trigger='manual')
+                
+                if success:
+                    emit_status('success', message, 'success', shouldRefresh=True)
+                else:
+                    emit_status('error', message, 'danger', shouldRefresh=False)
+            else:
+                print("E-Mail-Synchronisation: Bereits in einem anderen Worker aktiv")
+                emit_status('warning', 'Synchronisation läuft bereits in einem anderen Worker. Bitte warten Sie einen Moment.', 'warning', shouldRefresh=False)
+    except Exception as exc:
+        print(f"E-Mail-Synchronisation Fehler: {exc}")
+        current_app.logger.error(f"E-Mail-Synchronisation Fehler: {exc}", exc_info=True)
+        emit_status('error', str(exc), 'danger', shouldRefresh=False)
 
 
 def _wants_json_response():
@@ -3858,6 +4032,14 @@ def _wants_json_response():
     return False
 
 
+def _folder_counts_payload(*folder_names):
+    """Aktuelle Ordnerzähler für JSON-Antworten (Badges im Ordnerbaum aktualisieren)."""
+    return {
+        folder.name: {'total': folder.total_count, 'unread': folder.unread_count}
+        for folder in EmailFolder.query.filter(EmailFolder.name.in_([name for name in folder_names if name])).all()
+    }
+
+
 @email_bp.route('/delete/<int:email_id>', methods=['POST'])
 @login_required
 @check_module_access('module_email')
@@ -3886,6 +4068,7 @@ def delete_email(email_id):
             'message': translate('email.flash.deleted'),
             'folder': original_folder,
             'email_id': email_id,
+            'folder_counts': _folder_counts_payload(original_folder),
         }
         if imap_warning:
             payload['imap_warning'] = imap_warning
@@ -3958,6 +4141,7 @@ def move_email(email_id):
             'previous_folder': old_folder,
             'email_id': email.id,
             'imap_warning': imap_warning,
+            'folder_counts': _folder_counts_payload(old_folder, new_folder),
         })
 
     if imap_warning:
@@ -3996,6 +4180,7 @@ def set_email_read_state(email_id):
         'email_id': email.id,
         'is_read': email.is_read,
         'imap_warning': imap_warning,
+        'folder_counts': _folder_counts_payload(email.folder),
     })
 
 
@@ -4166,6 +4351,12 @@ def delete_folder():
     if contained_children:
         EmailFolder.query.filter_by(parent_folder=folder_name).delete(synchronize_session=False)
     if contained_emails:
+        EmailRenderCache.query.filter(EmailRenderCache.email_id.in_(
+            db.session.query(EmailMessage.id).filter_by(folder=folder_name)
+        )).delete(synchronize_session=False)
+        EmailSearchTerm.query.filter(EmailSearchTerm.email_id.in_(
+            db.session.query(EmailMessage.id).filter_by(folder=folder_name)
+        )).delete(synchronize_session=False)
         EmailMessage.query.filter_by(folder=folder_name).delete(synchronize_session=False)
     db.session.delete(folder_obj)
     db.session.commit()
@@ -4561,98 +4752,3 @@ def imap_set_keyword(uid, folder, keyword, enabled=True):
 
 # SSE-basierte Live-Updates (siehe app/blueprints/sse.py)
 # Socket.IO wurde durch Server-Sent Events ersetzt für bessere Multi-Worker-Kompatibilität
-
-
-def email_sync_scheduler(app):
-    """Background thread for automatic email synchronization every 15 minutes."""
-    print("E-Mail-Sync-Scheduler Thread gestartet, warte 30 Sekunden vor erster Synchronisation...")
-    # Warte 30 Sekunden nach App-Start, bevor die erste Synchronisation startet
-    time.sleep(30)
-    
-    while True:
-        lock_acquired = False
-        try:
-            with app.app_context():
-                # Verwende Lock, um sicherzustellen, dass nur ein Worker synchronisiert
-                from app.utils.lock_manager import acquire_email_sync_lock
-                with acquire_email_sync_lock(timeout=10) as acquired:  # Reduziertes Timeout, damit nicht so lange gewartet wird
-                    lock_acquired = acquired
-                    if acquired:
-                        # sync_emails_from_server() gibt bereits die Start/End-Meldungen aus
-                        try:
-                            success, message = sync_emails_from_server()
-                            if success:
-                                logging.debug(f"Auto-sync: {message}")
-                            else:
-                                logging.error(f"Auto-sync failed: {message}")
-                        except Exception as sync_error:
-                            logging.error(f"Fehler während der Synchronisation: {sync_error}")
-                            import traceback
-                            logging.error(f"Traceback: {traceback.format_exc()}")
-                            print(f"E-Mail-Synchronisation Fehler: {sync_error}")
-                    else:
-                        logging.debug("E-Mail-Synchronisation wird bereits von anderem Worker durchgeführt, überspringe...")
-        except Exception as e:
-            logging.error(f"Auto-sync error: {e}")
-            import traceback
-            logging.error(f"Traceback: {traceback.format_exc()}")
-            print(f"E-Mail-Sync-Scheduler Fehler: {e}")
-        finally:
-            # Stelle sicher, dass wir nach der Synchronisation immer warten
-            if lock_acquired:
-                print("E-Mail-Synchronisation abgeschlossen, warte 15 Minuten bis zur nächsten...")
-        
-        # Nach jeder Synchronisation 15 Minuten warten
-        time.sleep(900)
-
-
-sync_thread = None
-_sync_started = False
-_sync_lock = threading.Lock()
-
-def start_email_sync(app):
-    """Start the background email synchronization thread."""
-    global sync_thread, _sync_started
-    
-    # Prüfe zuerst, ob bereits ein Thread mit diesem Namen läuft (auch nach Reload)
-    existing_threads = [t for t in threading.enumerate() if t.name == "email-sync-scheduler" and t.is_alive()]
-    if existing_threads:
-        print(f"E-Mail-Sync-Thread läuft bereits (gefunden {len(existing_threads)} Thread(s)), überspringe Neustart")
-        logging.debug(f"E-Mail-Sync-Thread läuft bereits (gefunden {len(existing_threads)} Thread(s)), überspringe Neustart")
-        return
-    
-    # Prüfe auch, ob bereits eine Lock-Datei existiert (zusätzliche Sicherheit)
-    try:
-        from pathlib import Path
-        instance_path = app.instance_path
-        lock_file_path = Path(instance_path) / 'locks' / 'email_sync.lock'
-        if lock_file_path.exists():
-            # Prüfe, ob Lock-Datei noch aktiv ist (jünger als 5 Minuten)
-            file_age = time.time() - lock_file_path.stat().st_mtime
-            if file_age < 300:  # 5 Minuten
-                print("E-Mail-Sync-Lock-Datei existiert bereits, überspringe Neustart")
-                logging.debug("E-Mail-Sync-Lock-Datei existiert bereits, überspringe Neustart")
-                return
-    except Exception as e:
-        logging.debug(f"Konnte Lock-Datei nicht prüfen: {e}")
-    
-    # Verwende Lock, um Thread-Erstellung zu synchronisieren
-    with _sync_lock:
-        # Doppelte Prüfung innerhalb des Locks
-        existing_threads = [t for t in threading.enumerate() if t.name == "email-sync-scheduler" and t.is_alive()]
-        if existing_threads:
-            print(f"E-Mail-Sync-Thread läuft bereits (zweite Prüfung, {len(existing_threads)} Thread(s)), überspringe Neustart")
-            logging.debug(f"E-Mail-Sync-Thread läuft bereits (zweite Prüfung, {len(existing_threads)} Thread(s)), überspringe Neustart")
-            return
-        
-        # Prüfe auch das Flag (für den Fall, dass Thread noch nicht vollständig gestartet ist)
-        if _sync_started:
-            print("E-Mail-Sync-Thread wird bereits gestartet, überspringe Neustart")
-            logging.debug("E-Mail-Sync-Thread wird bereits gestartet, überspringe Neustart")
-            return
-        
-        _sync_started = True
-        sync_thread = threading.Thread(target=email_sync_scheduler, args=(app,), daemon=True, name="email-sync-scheduler")
-        sync_thread.start()
-        print("E-Mail Auto-Sync Thread gestartet")
-        logging.debug("E-Mail Auto-Sync gestartet (alle 15 Minuten)")
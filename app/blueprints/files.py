@@ -1,13 +1,34 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, jsonify, current_app, session, abort
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, jsonify, current_app, session, abort, Response, stream_with_context
 from flask_login import login_required, current_user
 from app.utils.i18n import get_current_language, translate
 from app import db
 from app.models.file import File, FileVersion, Folder
 from app.models.user import User
-from app.models.settings import SystemSettings
-from app.utils.notifications import send_file_notification
+from app.utils.settings_store import get_setting
+from app.utils.notifications import enqueue_file_notification
 from app.utils.access_control import check_module_access
 from app.utils.dashboard_events import emit_dashboard_update
+from app.utils.file_storage import (
+    add_file_version,
+    replace_file_content,
+    restore_file_version,
+    set_file_content,
+    store_content,
+    store_document,
+)
+from app.utils.chunked_upload import (
+    ChunkedUploadError,
+    append_chunk,
+    create_upload,
+    discard_upload,
+    finish_upload,
+    get_max_upload_size,
+    get_upload,
+    split_relative_path,
+    upload_status,
+)
+from app.utils.file_deletion import delete_files, delete_folder_tree
+from app.utils.zip_stream import build_file_entries, build_folder_entries, stream_zip, zip_download_headers
 from app.models.public_share import PublicShare
 from app.utils.public_share import (
     generate_unique_share_token,
@@ -36,7 +57,6 @@ import zipfile
 
 files_bp = Blueprint('files', __name__)
 
-MAX_FILE_VERSIONS = 3
 MAX_FILE_PREVIEW_CHARS = 240
 
 
@@ -61,41 +81,36 @@ def _generate_unique_filename_in_folder(filename, folder_id):
 
 def _create_new_file_version(existing_file, uploaded_file, user_id):
     """Create a new version for an existing file."""
-    version_number = existing_file.version_number + 1
-
-    old_version = FileVersion(
-        file_id=existing_file.id,
-        version_number=existing_file.version_number,
-        file_path=os.path.abspath(existing_file.file_path),
-        file_size=existing_file.file_size,
-        uploaded_by=existing_file.uploaded_by
-    )
-    db.session.add(old_version)
+    content_hash, size = store_content(uploaded_file)
+    return add_file_version(existing_file, content_hash, size, user_id)
 
-    versions = FileVersion.query.filter_by(file_id=existing_file.id).order_by(
-        FileVersion.version_number.desc()
-    ).all()
 
-    if len(versions) >= MAX_FILE_VERSIONS:
-        oldest = versions[-1]
-        if os.path.exists(oldest.file_path):
-            os.remove(oldest.file_path)
-        db.session.delete(oldest)
+def _ensure_folder_path(parent_id, folder_names, user_id):
+    """Return the id of the nested folder path below parent_id, creating missing folders."""
+    current_parent_id = parent_id
+    for folder_name in folder_names:
+        if not folder_name:
+            continue
+
+        existing_folder = Folder.query.filter_by(
+            name=folder_name,
+            parent_id=current_parent_id
+        ).first()
 
-    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-    filename = f"{timestamp}_{existing_file.name}"
-    filepath = os.path.join('uploads', 'files', filename)
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    uploaded_file.save(filepath)
+        if existing_folder:
+            current_parent_id = existing_folder.id
+            continue
 
-    absolute_filepath = os.path.abspath(filepath)
-    existing_file.file_path = absolute_filepath
-    existing_file.file_size = os.path.getsize(absolute_filepath)
-    existing_file.version_number = version_number
-    existing_file.uploaded_by = user_id
-    existing_file.updated_at = datetime.utcnow()
+        new_folder = Folder(
+            name=folder_name,
+            parent_id=current_parent_id,
+            created_by=user_id
+        )
+        db.session.add(new_folder)
+        db.session.flush()  # Get the ID
+        current_parent_id = new_folder.id
 
-    return version_number
+    return current_parent_id
 
 
 def _resolve_absolute_file_path(file_path):
@@ -439,17 +454,16 @@ def browse_folder(folder_id):
         ]
 
     # Feature flags
-    dropbox_setting = SystemSettings.query.filter_by(key='files_dropbox_enabled').first()
-    sharing_setting = SystemSettings.query.filter_by(key='files_sharing_enabled').first()
-    files_dropbox_enabled = (dropbox_setting and str(dropbox_setting.value).lower() == 'true') or False
-    files_sharing_enabled = (sharing_setting and str(sharing_setting.value).lower() == 'true') or False
+    files_dropbox_enabled = str(get_setting('files_dropbox_enabled')).lower() == 'true'
+    files_sharing_enabled = str(get_setting('files_sharing_enabled')).lower() == 'true'
     
     # Check ONLYOFFICE availability
     from app.utils.onlyoffice import is_onlyoffice_enabled
     onlyoffice_available = is_onlyoffice_enabled()
 
-    file_preview_map = {file.id: build_file_preview_text(file) for file in files}
-    file_preview_html_map = {file.id: build_markdown_preview_html(file) for file in files}
+    # Gespeicherte Vorschauen (app/utils/file_previews.py) statt die Dateien bei jedem Aufruf zu lesen
+    from app.utils.file_previews import get_file_preview_maps
+    file_preview_map, file_preview_html_map = get_file_preview_maps(files)
 
     return render_template(
         'files/index.html',
@@ -747,31 +761,18 @@ def create_file():
         return redirect(request.referrer or url_for('files.index'))
     
     # Create file
-    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-    stored_filename = f"{timestamp}_{filename}"
-    filepath = os.path.join('uploads', 'files', stored_filename)
-    
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    
-    # Write content to file
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(content)
-    
-    # Store absolute path in database
-    absolute_filepath = os.path.abspath(filepath)
+    content_hash, size = store_content(content)
     
     new_file = File(
         name=filename,
         original_name=filename,
         folder_id=folder_id,
         uploaded_by=current_user.id,
-        file_path=absolute_filepath,
-        file_size=os.path.getsize(absolute_filepath),
         mime_type='text/plain' if file_type == 'txt' else 'text/markdown',
         version_number=1,
         is_current=True
     )
+    set_file_content(new_file, content_hash, size)
     db.session.add(new_file)
     db.session.commit()
     
@@ -841,28 +842,21 @@ def create_office_file():
         return redirect(request.referrer or url_for('files.index'))
     
     # Create empty Office file
-    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-    stored_filename = f"{timestamp}_{filename}"
-    filepath = os.path.join('uploads', 'files', stored_filename)
-    
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    
     try:
         if file_type == 'docx':
             from docx import Document
             doc = Document()
-            doc.save(filepath)
+            content_hash, size = store_document(doc)
             mime_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
         elif file_type == 'xlsx':
             from openpyxl import Workbook
             wb = Workbook()
-            wb.save(filepath)
+            content_hash, size = store_document(wb)
             mime_type = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         elif file_type == 'pptx':
             from pptx import Presentation
             prs = Presentation()
-            prs.save(filepath)
+            content_hash, size = store_document(prs)
             mime_type = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
     except ImportError as e:
         flash(f'Fehler: Erforderliche Bibliothek nicht installiert. Bitte installieren Sie python-docx, openpyxl und python-pptx.', 'danger')
@@ -872,20 +866,16 @@ def create_office_file():
         flash(f'Fehler beim Erstellen der Datei: {str(e)}', 'danger')
         return redirect(request.referrer or url_for('files.index'))
     
-    # Store absolute path in database
-    absolute_filepath = os.path.abspath(filepath)
-    
     new_file = File(
         name=filename,
         original_name=filename,
         folder_id=folder_id,
         uploaded_by=current_user.id,
-        file_path=absolute_filepath,
-        file_size=os.path.getsize(absolute_filepath),
         mime_type=mime_type,
         version_number=1,
         is_current=True
     )
+    set_file_content(new_file, content_hash, size)
     db.session.add(new_file)
     db.session.commit()
     
@@ -941,7 +931,7 @@ def upload_file():
     folder_id = int(folder_id) if folder_id else None
     conflict_strategy = request.form.get('conflict_strategy', '').strip().lower()
     
-    max_size = 100 * 1024 * 1024  # 100MB in bytes
+    max_size = get_max_upload_size()
     
     # Check for folder upload
     if 'folder_upload' in request.files:
@@ -970,35 +960,11 @@ def upload_file():
                 file_name = secure_filename(file_path_parts[-1])
                 
                 # Determine target folder - create subfolders if needed
-                target_folder_id = folder_id
-                if len(file_path_parts) > 1:
-                    # Create folder structure
-                    current_parent_id = folder_id
-                    for folder_name in file_path_parts[:-1]:
-                        folder_name_clean = secure_filename(folder_name)
-                        if not folder_name_clean:
-                            continue
-                        
-                        # Check if folder exists
-                        existing_folder = Folder.query.filter_by(
-                            name=folder_name_clean,
-                            parent_id=current_parent_id
-                        ).first()
-                        
-                        if not existing_folder:
-                            # Create new folder
-                            new_folder = Folder(
-                                name=folder_name_clean,
-                                parent_id=current_parent_id,
-                                created_by=current_user.id
-                            )
-                            db.session.add(new_folder)
-                            db.session.flush()  # Get the ID
-                            current_parent_id = new_folder.id
-                        else:
-                            current_parent_id = existing_folder.id
-                    
-                    target_folder_id = current_parent_id
+                target_folder_id = _ensure_folder_path(
+                    folder_id,
+                    [secure_filename(part) for part in file_path_parts[:-1]],
+                    current_user.id
+                )
                 
                 # Process file upload
                 try:
@@ -1037,7 +1003,7 @@ def upload_file():
                     ).order_by(File.created_at.desc()).limit(uploaded_count).all()
                     for f in recent_files:
                         try:
-                            send_file_notification(f.id, 'new')
+                            enqueue_file_notification(f.id, 'new')
                         except Exception as e:
                             logging.error(f"Fehler beim Senden der Datei-Benachrichtigung: {e}")
                 except Exception as e:
@@ -1119,7 +1085,7 @@ def upload_file():
                 ).order_by(File.created_at.desc()).limit(uploaded_count).all()
                 for recent_file in recent_uploads:
                     try:
-                        send_file_notification(recent_file.id, 'new')
+                        enqueue_file_notification(recent_file.id, 'new')
                     except Exception as e:
                         logging.error(f"Fehler beim Senden der Datei-Benachrichtigung: {e}")
             except Exception as e:
@@ -1153,13 +1119,13 @@ def upload_file():
     else:
         file = uploaded_files[0]
 
-        # Check file size (100MB limit)
+        # Check file size (FILE_UPLOAD_MAX_SIZE)
         file.seek(0, 2)  # Seek to end
         file_size = file.tell()
         file.seek(0)  # Reset to beginning
 
         if file_size > max_size:
-            flash(f'Datei ist zu groß. Maximale Größe: 100MB. Ihre Datei: {file_size / (1024*1024):.1f}MB', 'danger')
+            flash(f'Datei ist zu groß. Maximale Größe: {max_size / (1024*1024):.0f}MB. Ihre Datei: {file_size / (1024*1024):.1f}MB', 'danger')
             return redirect(request.referrer or url_for('files.index'))
 
         original_name = secure_filename(file.filename)
@@ -1177,7 +1143,7 @@ def upload_file():
                 db.session.commit()
 
                 try:
-                    send_file_notification(existing_file.id, 'modified')
+                    enqueue_file_notification(existing_file.id, 'modified')
                 except Exception as e:
                     logging.error(f"Fehler beim Senden der Datei-Benachrichtigung: {e}")
 
@@ -1219,7 +1185,7 @@ def upload_file():
                 db.session.commit()
 
                 try:
-                    send_file_notification(existing_file.id, 'modified')
+                    enqueue_file_notification(existing_file.id, 'modified')
                 except Exception as e:
                     logging.error(f"Fehler beim Senden der Datei-Benachrichtigung: {e}")
 
@@ -1256,7 +1222,7 @@ def upload_file():
 
             if new_file:
                 try:
-                    send_file_notification(new_file.id, 'new')
+                    enqueue_file_notification(new_file.id, 'new')
                 except Exception as e:
                     logging.error(f"Fehler beim Senden der Datei-Benachrichtigung: {e}")
 
@@ -1319,31 +1285,182 @@ def upload_conflicts():
     return jsonify({'success': True, 'conflicts': conflicts})
 
 
+def store_chunked_upload(upload, user_id, conflict_strategy='', sha256=None):
+    """
+    Create the file for a completely received chunked upload (commits).
+
+    Conflicts are handled like in upload_file: 'version' adds a new version,
+    'separate' stores the file under a unique name. Without a strategy a
+    ChunkedUploadError (409, conflict=True) is raised and the upload is kept
+    so the client can retry with a strategy.
+
+    Returns:
+        (File, 'new' | 'version' | 'separate')
+    """
+    assembled = finish_upload(upload, sha256)
+    target_folder_id = _ensure_folder_path(upload.folder_id, split_relative_path(upload.relative_path), user_id)
+    file_name = upload.filename
+
+    existing_file = File.query.filter_by(
+        name=file_name,
+        folder_id=target_folder_id,
+        is_current=True
+    ).first()
+
+    if existing_file:
+        if conflict_strategy == 'version':
+            _create_new_file_version(existing_file, assembled, user_id)
+            stored_file, outcome = existing_file, 'version'
+        elif conflict_strategy == 'separate':
+            unique_name = _generate_unique_filename_in_folder(file_name, target_folder_id)
+            stored_file, outcome = _process_file_upload(assembled, unique_name, target_folder_id, user_id), 'separate'
+        else:
+            db.session.rollback()
+            raise ChunkedUploadError(
+                f'Datei "{file_name}" existiert bereits.',
+                409,
+                conflict=True,
+                filename=file_name
+            )
+    else:
+        stored_file, outcome = _process_file_upload(assembled, file_name, target_folder_id, user_id), 'new'
+
+    db.session.delete(upload)
+    db.session.commit()
+
+    try:
+        enqueue_file_notification(stored_file.id, 'modified' if outcome == 'version' else 'new')
+    except Exception as e:
+        logging.error(f"Fehler beim Senden der Datei-Benachrichtigung: {e}")
+
+    return stored_file, outcome
+
+
+def _chunked_upload_error_response(error):
+    return jsonify(error.to_dict()), error.status_code
+
+
+def _parse_optional_folder_id(raw_folder_id):
+    if raw_folder_id in (None, '', 'null'):
+        return None
+    return int(raw_folder_id)
+
+
+@files_bp.route('/uploads', methods=['POST'])
+@login_required
+@check_module_access('module_files')
+def chunked_upload_init():
+    """Start a resumable chunked upload (see app/utils/chunked_upload.py)."""
+    payload = request.get_json(silent=True) or {}
+    try:
+        folder_id = _parse_optional_folder_id(payload.get('folder_id'))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Ungültiger Ordner.'}), 400
+
+    if _is_guest_user() and (folder_id is None or folder_id not in _get_guest_accessible_folder_ids()):
+        return jsonify({'success': False, 'error': 'Sie haben keinen Zugriff auf diesen Ordner.'}), 403
+
+    try:
+        upload = create_upload(
+            current_user.id,
+            folder_id,
+            payload.get('filename'),
+            payload.get('size'),
+            relative_path=payload.get('relative_path'),
+            sha256=payload.get('sha256'),
+            mime_type=payload.get('mime_type'),
+        )
+    except ChunkedUploadError as error:
+        return _chunked_upload_error_response(error)
+    return jsonify({'success': True, **upload_status(upload)}), 201
+
+
+@files_bp.route('/uploads/<upload_id>', methods=['GET'])
+@login_required
+@check_module_access('module_files')
+def chunked_upload_status(upload_id):
+    """Return the received size of a chunked upload (to resume after an interruption)."""
+    try:
+        upload = get_upload(upload_id, current_user.id)
+    except ChunkedUploadError as error:
+        return _chunked_upload_error_response(error)
+    return jsonify({'success': True, **upload_status(upload)})
+
+
+@files_bp.route('/uploads/<upload_id>', methods=['PUT'])
+@login_required
+@check_module_access('module_files')
+def chunked_upload_append(upload_id):
+    """Append the raw request body as chunk at ?offset=."""
+    try:
+        upload = get_upload(upload_id, current_user.id)
+        received_size = append_chunk(
+            upload,
+            request.args.get('offset'),
+            request.stream,
+            request.content_length,
+            sha256=request.headers.get('X-Chunk-SHA256'),
+        )
+    except ChunkedUploadError as error:
+        return _chunked_upload_error_response(error)
+    return jsonify({'success': True, 'received_size': received_size})
+
+
+@files_bp.route('/uploads/<upload_id>/commit', methods=['POST'])
+@login_required
+@check_module_access('module_files')
+def chunked_upload_commit(upload_id):
+    """Verify a completed chunked upload and create the file."""
+    payload = request.get_json(silent=True) or {}
+    conflict_strategy = str(payload.get('conflict_strategy') or '').strip().lower()
+    try:
+        upload = get_upload(upload_id, current_user.id)
+        stored_file, outcome = store_chunked_upload(
+            upload, current_user.id, conflict_strategy, sha256=payload.get('sha256')
+        )
+    except ChunkedUploadError as error:
+        return _chunked_upload_error_response(error)
+
+    return jsonify({
+        'success': True,
+        'outcome': outcome,
+        'file': {
+            'id': stored_file.id,
+            'name': stored_file.name,
+            'folder_id': stored_file.folder_id,
+            'version': stored_file.version_number,
+            'size': stored_file.file_size,
+        }
+    })
+
+
+@files_bp.route('/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+@check_module_access('module_files')
+def chunked_upload_abort(upload_id):
+    """Abort a chunked upload and remove its received chunks."""
+    try:
+        upload = get_upload(upload_id, current_user.id)
+    except ChunkedUploadError as error:
+        return _chunked_upload_error_response(error)
+    discard_upload(upload)
+    return jsonify({'success': True})
+
+
 def _process_file_upload(file, original_name, folder_id, user_id):
     """Helper function to process a single file upload."""
-    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-    filename = f"{timestamp}_{original_name}"
-    filepath = os.path.join('uploads', 'files', filename)
-    
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    
-    file.save(filepath)
-    
-    # Store absolute path in database
-    absolute_filepath = os.path.abspath(filepath)
+    content_hash, size = store_content(file)
     
     new_file = File(
         name=original_name,
         original_name=original_name,
         folder_id=folder_id,
         uploaded_by=user_id,
-        file_path=absolute_filepath,
-        file_size=os.path.getsize(absolute_filepath),
         mime_type=file.content_type,
         version_number=1,
         is_current=True
     )
+    set_file_content(new_file, content_hash, size)
     db.session.add(new_file)
     return new_file
 
@@ -1471,6 +1588,105 @@ def download_version(version_id):
     )
 
 
+def _parse_id_list(values):
+    """Liest IDs aus wiederholten Parametern und/oder kommagetrennten Listen."""
+    ids = []
+    for value in values:
+        for part in str(value).split(','):
+            part = part.strip()
+            if part.isdigit() and int(part) not in ids:
+                ids.append(int(part))
+    return ids
+
+
+def _zip_response(entries, filename):
+    return Response(
+        stream_with_context(stream_zip(entries)),
+        mimetype='application/zip',
+        headers=zip_download_headers(filename),
+    )
+
+
+@files_bp.route('/folder/<int:folder_id>/download-zip')
+@login_required
+@check_module_access('module_files')
+def download_folder_zip(folder_id):
+    """Lädt einen Ordner inklusive Unterordnern als ZIP herunter (wird beim Senden erzeugt)."""
+    folder = Folder.query.get_or_404(folder_id)
+    if _is_guest_user() and folder.id not in _get_guest_accessible_folder_ids():
+        flash('Sie haben keinen Zugriff auf diesen Ordner.', 'danger')
+        return redirect(url_for('files.index'))
+
+    return _zip_response(build_folder_entries(folder), folder.name)
+
+
+@files_bp.route('/download-zip', methods=['GET', 'POST'])
+@login_required
+@check_module_access('module_files')
+def download_zip():
+    """Lädt eine Auswahl (``file_ids``/``folder_ids``) als gemeinsames ZIP herunter."""
+    source = request.form if request.method == 'POST' else request.args
+    file_ids = _parse_id_list(source.getlist('file_ids'))
+    folder_ids = _parse_id_list(source.getlist('folder_ids'))
+    back_url = _get_safe_folder_url(source.get('current_folder_id', type=int))
+
+    files = File.query.filter(File.id.in_(file_ids), File.is_current == True).all() if file_ids else []
+    folders = Folder.query.filter(Folder.id.in_(folder_ids)).all() if folder_ids else []
+    if len(files) != len(file_ids) or len(folders) != len(folder_ids):
+        flash('Einige der ausgewählten Elemente wurden nicht gefunden.', 'danger')
+        return redirect(back_url)
+    if not files and not folders:
+        flash('Bitte wählen Sie mindestens eine Datei oder einen Ordner aus.', 'warning')
+        return redirect(back_url)
+
+    if _is_guest_user():
+        from app.utils.access_control import get_guest_accessible_items
+        accessible_files, accessible_folders = get_guest_accessible_items(current_user)
+        accessible_file_ids = {item.id for item in accessible_files}
+        accessible_folder_ids = {item.id for item in accessible_folders}
+        if any(file.id not in accessible_file_ids for file in files) or \
+                any(folder.id not in accessible_folder_ids for folder in folders):
+            flash('Sie haben keinen Zugriff auf alle ausgewählten Elemente.', 'danger')
+            return redirect(url_for('files.index'))
+
+    # Reihenfolge der Auswahl beibehalten
+    files.sort(key=lambda item: file_ids.index(item.id))
+    folders.sort(key=lambda item: folder_ids.index(item.id))
+    if len(folders) == 1 and not files:
+        filename = folders[0].name
+    elif len(files) == 1 and not folders:
+        filename = os.path.splitext(files[0].original_name)[0]
+    else:
+        filename = f"Dateien_{datetime.now().strftime('%Y-%m-%d')}"
+    return _zip_response(build_file_entries(files, folders), filename)
+
+
+@files_bp.route('/restore-version/<int:version_id>', methods=['POST'])
+@login_required
+@check_module_access('module_files')
+def restore_version(version_id):
+    """Restore a file version as the new current version (nur Metadaten, keine Kopie)."""
+    if _is_guest_user():
+        flash('Gast-Accounts können keine Versionen wiederherstellen.', 'danger')
+        return redirect(request.referrer or url_for('files.index'))
+    
+    version = FileVersion.query.get_or_404(version_id)
+    file = File.query.get_or_404(version.file_id)
+    restored_number = version.version_number
+    
+    new_version_number = restore_file_version(file, version, current_user.id)
+    if new_version_number is None:
+        db.session.rollback()
+        flash(f'Datei-Version "{file.original_name} v{restored_number}" wurde nicht gefunden.', 'danger')
+    else:
+        db.session.commit()
+        flash(f'Version {restored_number} von "{file.original_name}" wurde als Version {new_version_number} wiederhergestellt.', 'success')
+    
+    if file.folder_id:
+        return redirect(url_for('files.browse_folder', folder_id=file.folder_id))
+    return redirect(url_for('files.index'))
+
+
 @files_bp.route('/edit/<int:file_id>', methods=['GET', 'POST'])
 @login_required
 @check_module_access('module_files')
@@ -1498,44 +1714,9 @@ def edit_file(file_id):
     if request.method == 'POST':
         content = request.form.get('content', '')
         
-        # Save current version to history
-        version = FileVersion(
-            file_id=file.id,
-            version_number=file.version_number,
-            file_path=os.path.abspath(file.file_path),
-            file_size=file.file_size,
-            uploaded_by=file.uploaded_by
-        )
-        db.session.add(version)
-        
-        # Delete oldest version if needed
-        versions = FileVersion.query.filter_by(file_id=file.id).order_by(
-            FileVersion.version_number.desc()
-        ).all()
-        
-        if len(versions) >= MAX_FILE_VERSIONS:
-            oldest = versions[-1]
-            if os.path.exists(oldest.file_path):
-                os.remove(oldest.file_path)
-            db.session.delete(oldest)
-        
-        # Save new version
-        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_{file.original_name}"
-        filepath = os.path.join('uploads', 'files', filename)
-        
-        # Kein Newline-Transform auf Windows, sonst entstehen doppelte Leerzeilen.
-        with open(filepath, 'w', encoding='utf-8', newline='') as f:
-            f.write(content)
-        
-        # Store absolute path in database
-        absolute_filepath = os.path.abspath(filepath)
-        
-        file.file_path = absolute_filepath
-        file.file_size = os.path.getsize(absolute_filepath)
-        file.version_number += 1
-        file.uploaded_by = current_user.id
-        file.updated_at = datetime.utcnow()
+        content_hash, size = store_content(content)
+        # Bisherigen Stand als Version sichern (gleicher Blob, keine Kopie)
+        add_file_version(file, content_hash, size, current_user.id)
         
         db.session.commit()
         
@@ -1669,29 +1850,13 @@ def delete_file(file_id):
     
     file = File.query.get_or_404(file_id)
     folder_id = file.folder_id
+    file_name = file.original_name
     
-    # Delete file and all versions
-    if not os.path.isabs(file.file_path):
-        file_path = os.path.join(os.getcwd(), file.file_path)
-    else:
-        file_path = file.file_path
-        
-    if os.path.exists(file_path):
-        os.remove(file_path)
-    
-    for version in file.versions:
-        if not os.path.isabs(version.file_path):
-            version_path = os.path.join(os.getcwd(), version.file_path)
-        else:
-            version_path = version.file_path
-            
-        if os.path.exists(version_path):
-            os.remove(version_path)
-    
-    db.session.delete(file)
+    # Delete file and all versions (Speicher räumen file_blob_gc bzw. file_path_reaper auf)
+    delete_files([file.id])
     db.session.commit()
     
-    flash(f'Datei "{file.original_name}" wurde gelöscht.', 'success')
+    flash(f'Datei "{file_name}" wurde gelöscht.', 'success')
     if folder_id:
         return redirect(url_for('files.browse_folder', folder_id=folder_id))
     else:
@@ -1710,37 +1875,12 @@ def delete_folder(folder_id):
     
     folder = Folder.query.get_or_404(folder_id)
     parent_id = folder.parent_id
+    folder_name = folder.name
     
-    def delete_folder_recursive(folder):
-        # Delete all files in folder
-        for file in folder.files:
-            if not os.path.isabs(file.file_path):
-                file_path = os.path.join(os.getcwd(), file.file_path)
-            else:
-                file_path = file.file_path
-                
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                
-            for version in file.versions:
-                if not os.path.isabs(version.file_path):
-                    version_path = os.path.join(os.getcwd(), version.file_path)
-                else:
-                    version_path = version.file_path
-                    
-                if os.path.exists(version_path):
-                    os.remove(version_path)
-        
-        # Delete all subfolders
-        for subfolder in folder.subfolders:
-            delete_folder_recursive(subfolder)
-        
-        db.session.delete(folder)
-    
-    delete_folder_recursive(folder)
+    delete_folder_tree(folder.id)
     db.session.commit()
     
-    flash(f'Ordner "{folder.name}" wurde gelöscht.', 'success')
+    flash(f'Ordner "{folder_name}" wurde gelöscht.', 'success')
     if parent_id:
         return redirect(url_for('files.browse_folder', folder_id=parent_id))
     else:
@@ -1804,7 +1944,9 @@ def get_file_details(file_id):
                 'id': version.id,
                 'version_number': version.version_number,
                 'is_current': version.version_number == file.version_number,
-                'download_url': url_for('files.download_version', version_id=version.id)
+                'download_url': url_for('files.download_version', version_id=version.id),
+                'restore_url': None if _is_guest_user() or version.version_number == file.version_number
+                else url_for('files.restore_version', version_id=version.id)
             }
             for version in versions
         ],
@@ -2088,8 +2230,7 @@ def dropbox_upload_file(token):
 # =========================
 
 def _is_sharing_enabled() -> bool:
-    setting = SystemSettings.query.filter_by(key='files_sharing_enabled').first()
-    return (setting and str(setting.value).lower() == 'true') or False
+    return str(get_setting('files_sharing_enabled')).lower() == 'true'
 
 
 def _check_share_access(token):
@@ -2525,6 +2666,33 @@ def public_share_folder_file_download(token, file_id):
     return send_file(file_path, as_attachment=True, download_name=file.original_name)
 
 
+@files_bp.route('/share/<token>/download-zip', methods=['GET'])
+def public_share_download_zip(token):
+    """ZIP-Download eines freigegebenen Ordners bzw. eines seiner Unterordner (``folder_id``)."""
+    share = get_share_by_token(token) or abort(404)
+    if share.resource_type != 'folder':
+        abort(404)
+
+    item, guest_name, _access_share = _check_share_access(token)
+    if not item:
+        flash('Zugriff verweigert.', 'danger')
+        return redirect(url_for('files.public_share', token=token))
+
+    target_folder = item
+    requested_folder_id = request.args.get('folder_id', type=int)
+    if requested_folder_id and requested_folder_id != item.id:
+        requested_folder = Folder.query.get_or_404(requested_folder_id)
+        if not _is_descendant_folder(requested_folder, item):
+            flash('Der angeforderte Unterordner ist nicht Teil dieser Freigabe.', 'warning')
+            return redirect(url_for('files.public_share', token=token))
+        target_folder = requested_folder
+
+    entries = build_folder_entries(target_folder)
+    log_share_access(share, 'download_zip', request, guest_name=guest_name)
+    db.session.commit()
+    return _zip_response(entries, target_folder.name)
+
+
 @files_bp.route('/share/<token>/file/<int:file_id>/view', methods=['GET'])
 def public_share_folder_file_view(token, file_id):
     """Browser-Ansicht für Datei in freigegebenem Ordner."""
@@ -3473,51 +3641,15 @@ def onlyoffice_save(file_id):
     
     uploaded_file = request.files['file']
     
-    # Save current version to history
-    version = FileVersion(
-        file_id=file.id,
-        version_number=file.version_number,
-        file_path=os.path.abspath(file.file_path),
-        file_size=file.file_size,
-        uploaded_by=file.uploaded_by
-    )
-    db.session.add(version)
-    
-    # Delete oldest version if needed
-    versions = FileVersion.query.filter_by(file_id=file.id).order_by(
-        FileVersion.version_number.desc()
-    ).all()
-    
-    if len(versions) >= MAX_FILE_VERSIONS:
-        oldest = versions[-1]
-        if os.path.exists(oldest.file_path):
-            os.remove(oldest.file_path)
-        db.session.delete(oldest)
-    
-    # Save new version
-    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-    filename = f"{timestamp}_{file.original_name}"
-    filepath = os.path.join('uploads', 'files', filename)
-    
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    
-    uploaded_file.save(filepath)
-    
-    # Store absolute path in database
-    absolute_filepath = os.path.abspath(filepath)
-    
-    file.file_path = absolute_filepath
-    file.file_size = os.path.getsize(absolute_filepath)
-    file.version_number += 1
-    file.uploaded_by = current_user.id
-    file.updated_at = datetime.utcnow()
+    # Bisherigen Stand als Version sichern (gleicher Blob, keine Kopie)
+    content_hash, size = store_content(uploaded_file)
+    add_file_version(file, content_hash, size, current_user.id)
     
     db.session.commit()
     
     # Send notification
     try:
-        send_file_notification(file.id, 'modified')
+        enqueue_file_notification(file.id, 'modified')
     except Exception as e:
         logging.error(f"Fehler beim Senden der Datei-Benachrichtigung: {e}")
     
@@ -3565,45 +3697,9 @@ def share_onlyoffice_save(token, file_id):
         db.session.add(anonymous_user)
         db.session.flush()
     
-    # Save current version to history
-    version = FileVersion(
-        file_id=file.id,
-        version_number=file.version_number,
-        file_path=os.path.abspath(file.file_path),
-        file_size=file.file_size,
-        uploaded_by=file.uploaded_by
-    )
-    db.session.add(version)
-    
-    # Delete oldest version if needed
-    versions = FileVersion.query.filter_by(file_id=file.id).order_by(
-        FileVersion.version_number.desc()
-    ).all()
-    
-    if len(versions) >= MAX_FILE_VERSIONS:
-        oldest = versions[-1]
-        if os.path.exists(oldest.file_path):
-            os.remove(oldest.file_path)
-        db.session.delete(oldest)
-    
-    # Save new version
-    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-    filename = f"{timestamp}_{file.original_name}"
-    filepath = os.path.join('uploads', 'files', filename)
-    
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    
-    uploaded_file.save(filepath)
-    
-    # Store absolute path in database
-    absolute_filepath = os.path.abspath(filepath)
-    
-    file.file_path = absolute_filepath
-    file.file_size = os.path.getsize(absolute_filepath)
-    file.version_number += 1
-    file.uploaded_by = anonymous_user.id
-    file.updated_at = datetime.utcnow()
+    # Bisherigen Stand als Version sichern (gleicher Blob, keine Kopie)
+    content_hash, size = store_content(uploaded_file)
+    add_file_version(file, content_hash, size, anonymous_user.id)
     
     db.session.commit()
     
@@ -3694,79 +3790,36 @@ def onlyoffice_callback():
                             response = requests.get(saved_file_url)
                             
                             if response.status_code == 200:
-                                # Save new version
-                                timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-                                filename = f"{timestamp}_{file.original_name}"
-                                filepath = os.path.join('uploads', 'files', filename)
-                                
-                                os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                                
-                                with open(filepath, 'wb') as f:
-                                    f.write(response.content)
-                                
-                                absolute_filepath = os.path.abspath(filepath)
+                                # Inhalt im Blob-Speicher ablegen; identische Inhalte werden nicht erneut geschrieben
+                                content_hash, size = store_content(response.content)
                                 
                                 # IMPORTANT: For collaborative editing, we need to be careful about version increments
                                 # Status 6 (force save) always increments version and creates version history
                                 # Status 4 (auto-save) should NOT increment version to avoid "Version wurde geändert" messages
                                 
                                 if status == 6:
-                                    # Force save: Create new version with history
-                                    # Save current version to history
-                                    version = FileVersion(
-                                        file_id=file.id,
-                                        version_number=file.version_number,
-                                        file_path=os.path.abspath(file.file_path),
-                                        file_size=file.file_size,
-                                        uploaded_by=file.uploaded_by
-                                    )
-                                    db.session.add(version)
-                                    
-                                    # Delete oldest version if needed
-                                    versions = FileVersion.query.filter_by(file_id=file.id).order_by(
-                                        FileVersion.version_number.desc()
-                                    ).all()
-                                    
-                                    if len(versions) >= MAX_FILE_VERSIONS:
-                                        oldest = versions[-1]
-                                        if os.path.exists(oldest.file_path):
-                                            os.remove(oldest.file_path)
-                                        db.session.delete(oldest)
-                                    
-                                    file.file_path = absolute_filepath
-                                    file.file_size = os.path.getsize(absolute_filepath)
-                                    file.version_number += 1
-                                    file.updated_at = datetime.utcnow()
-                                    
+                                    # Force save: bisherigen Stand als Version sichern (gleicher Blob, keine Kopie)
+                                    add_file_version(file, content_hash, size, file.uploaded_by)
                                     db.session.commit()
+                                    changed = True
                                     
                                     logging.info(f"ONLYOFFICE: File {file_id} force saved (new version {file.version_number})")
                                 else:
                                     # Auto-save (status 4): Update file in place without version increment
                                     # This allows collaborative editing without "Version wurde geändert" messages
-                                    old_file_path = file.file_path
-                                    file.file_path = absolute_filepath
-                                    file.file_size = os.path.getsize(absolute_filepath)
-                                    file.updated_at = datetime.utcnow()
-                                    # Keep same version_number for auto-save
-                                    
-                                    db.session.commit()
-                                    
-                                    # Delete old file if it's different (but keep versions)
-                                    if old_file_path != absolute_filepath and os.path.exists(old_file_path):
-                                        # Only delete if it's not a version file
-                                        try:
-                                            os.remove(old_file_path)
-                                        except Exception as e:
-                                            logging.warning(f"Could not delete old file {old_file_path}: {e}")
-                                    
-                                    logging.info(f"ONLYOFFICE: File {file_id} auto-saved (version {file.version_number} updated)")
+                                    changed = replace_file_content(file, content_hash, size)
+                                    if changed:
+                                        db.session.commit()
+                                        logging.info(f"ONLYOFFICE: File {file_id} auto-saved (version {file.version_number} updated)")
+                                    else:
+                                        logging.info(f"ONLYOFFICE: File {file_id} auto-save skipped (content unchanged)")
                                 
                                 # Send notification
-                                try:
-                                    send_file_notification(file.id, 'modified')
-                                except Exception as e:
-                                    logging.error(f"Fehler beim Senden der Datei-Benachrichtigung: {e}")
+                                if changed:
+                                    try:
+                                        enqueue_file_notification(file.id, 'modified')
+                                    except Exception as e:
+                                        logging.error(f"Fehler beim Senden der Datei-Benachrichtigung: {e}")
                 except (ValueError, TypeError) as e:
                     logging.error(f"ONLYOFFICE callback: Invalid file_id: {e}")
                 except Exception as e:
@@ -3916,72 +3969,28 @@ def share_onlyoffice_callback(token):
                         db.session.add(anonymous_user)
                         db.session.flush()
                     
-                    # Save new version
-                    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-                    filename = f"{timestamp}_{file.original_name}"
-                    filepath = os.path.join('uploads', 'files', filename)
-                    
-                    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                    
-                    with open(filepath, 'wb') as f:
-                        f.write(response.content)
-                    
-                    absolute_filepath = os.path.abspath(filepath)
+                    # Inhalt im Blob-Speicher ablegen; identische Inhalte werden nicht erneut geschrieben
+                    content_hash, size = store_content(response.content)
                     
                     # IMPORTANT: For collaborative editing, we need to be careful about version increments
                     # Status 6 (force save) always increments version and creates version history
                     # Status 4 (auto-save) should NOT increment version to avoid "Version wurde geändert" messages
                     
                     if status == 6:
-                        # Force save: Create new version with history
-                        # Save current version to history
-                        version = FileVersion(
-                            file_id=file.id,
-                            version_number=file.version_number,
-                            file_path=os.path.abspath(file.file_path),
-                            file_size=file.file_size,
-                            uploaded_by=file.uploaded_by
-                        )
-                        db.session.add(version)
-                        
-                        # Delete oldest version if needed
-                        versions = FileVersion.query.filter_by(file_id=file.id).order_by(
-                            FileVersion.version_number.desc()
-                        ).all()
-                        
-                        if len(versions) >= MAX_FILE_VERSIONS:
-                            oldest = versions[-1]
-                            if os.path.exists(oldest.file_path):
-                                os.remove(oldest.file_path)
-                            db.session.delete(oldest)
-                        
-                        file.file_path = absolute_filepath
-                        file.file_size = os.path.getsize(absolute_filepath)
-                        file.version_number += 1
-                        file.uploaded_by = anonymous_user.id
-                        file.updated_at = datetime.utcnow()
-                        
+                        # Force save: bisherigen Stand als Version sichern (gleicher Blob, keine Kopie)
+                        add_file_version(file, content_hash, size, anonymous_user.id)
                         db.session.commit()
                         
                         logging.info(f"ONLYOFFICE: Shared file {file.id} force saved (new version {file.version_number}) by guest {guest_name}")
-                    else:
+                    elif replace_file_content(file, content_hash, size):
                         # Auto-save (status 4): Update file in place without version increment
-                        old_file_path = file.file_path
-                        file.file_path = absolute_filepath
-                        file.file_size = os.path.getsize(absolute_filepath)
-                        file.updated_at = datetime.utcnow()
                         # Keep same version_number and uploaded_by for auto-save
-                        
                         db.session.commit()
                         
-                        # Delete old file if it's different (but keep versions)
-                        if old_file_path != absolute_filepath and os.path.exists(old_file_path):
-                            try:
-                                os.remove(old_file_path)
-                            except Exception as e:
-                                logging.warning(f"Could not delete old file {old_file_path}: {e}")
-                        
                         logging.info(f"ONLYOFFICE: Shared file {file.id} auto-saved (version {file.version_number} updated) by guest {guest_name}")
+                    else:
+                        db.session.commit()
+                        logging.info(f"ONLYOFFICE: Shared file {file.id} auto-save skipped (content unchanged)")
         
         # Create response with CORS headers
         response = jsonify({'error': 0})  # Success response for ONLYOFFICE
@@ -6,6 +6,7 @@ from app.models.inventory import Product, BorrowTransaction, ProductFolder, Prod
 from app.models.api_token import ApiToken
 from app.models.user import User
 from app.models.settings import SystemSettings
+from app.utils.settings_store import get_setting
 from app.utils.access_control import check_module_access
 import json
 from urllib.parse import unquote
@@ -37,10 +38,10 @@ def allowed_file(filename):
 
 def get_inventory_categories():
     """Holt die verfügbaren Kategorien aus SystemSettings."""
-    categories_setting = SystemSettings.query.filter_by(key='inventory_categories').first()
-    if categories_setting and categories_setting.value:
+    categories_value = get_setting('inventory_categories')
+    if categories_value:
         try:
-            return json.loads(categories_setting.value)
+            return json.loads(categories_value)
         except:
             return []
     return []
@@ -104,13 +105,8 @@ def public_product(product_id):
     portal_logo_filename = None
     ownership_text = "Eigentum der Technik"  # Standardwert
     
-    portal_logo_setting = SystemSettings.query.filter_by(key='portal_logo').first()
-    if portal_logo_setting and portal_logo_setting.value:
-        portal_logo_filename = portal_logo_setting.value
-    
-    ownership_setting = SystemSettings.query.filter_by(key='inventory_ownership_text').first()
-    if ownership_setting and ownership_setting.value:
-        ownership_text = ownership_setting.value
+    portal_logo_filename = get_setting('portal_logo') or None
+    ownership_text = get_setting('inventory_ownership_text') or ownership_text
     
     return render_template('inventory/public_product.html',
                          product=product,
@@ -1,7 +1,6 @@
 import logging
 import os
 import threading
-from collections import defaultdict
 from datetime import datetime
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file, current_app
@@ -28,7 +27,6 @@ logger = logging.getLogger(__name__)
 media_downloader_bp = Blueprint('media_downloader', __name__, url_prefix='/media-downloader')
 
 _queue_lock = threading.Lock()
-_user_active_downloads = defaultdict(int)
 _cancelled_job_ids = set()
 
 
@@ -94,73 +92,70 @@ def _apply_job_result(job, success, error_message):
 
 
 def _dispatch_pending_jobs(app, user_id):
-    with app.app_context():
-        max_concurrent = _get_max_concurrent_for_user(app)
-        jobs_to_start = []
-
-        with _queue_lock:
-            active = _user_active_downloads[user_id]
-            slots = max(0, max_concurrent - active)
-            if slots == 0:
-                return
+    """Reiht alle wartenden Downloads des Benutzers in die Job-Queue ein."""
+    from app.tasks.job_queue import enqueue_job, wake_job_workers
 
-            pending_jobs = MediaDownloadJob.query.filter_by(
+    with app.app_context():
+        pending_ids = [
+            job_id
+            for (job_id,) in db.session.query(MediaDownloadJob.id).filter_by(
                 user_id=user_id,
                 status='pending',
-            ).order_by(MediaDownloadJob.created_at.asc()).limit(slots).all()
-
-            for job in pending_jobs:
-                _user_active_downloads[user_id] += 1
-                jobs_to_start.append(job.id)
-
-        for job_id in jobs_to_start:
-            thread = threading.Thread(
-                target=_process_download,
-                args=(app, user_id, job_id),
-                daemon=True,
-                name=f'media-download-{job_id}',
+            ).order_by(MediaDownloadJob.created_at.asc()).all()
+        ]
+        if not pending_ids:
+            return
+
+        for job_id in pending_ids:
+            enqueue_job(
+                'media_download',
+                {'job_id': job_id},
+                dedup_key=f'media_download:{job_id}',
+                max_attempts=1,
+                commit=False,
             )
-            thread.start()
+        db.session.commit()
+        wake_job_workers()
 
 
-def _process_download(app, user_id, job_id):
-    try:
-        with app.app_context():
-            job = MediaDownloadJob.query.get(job_id)
-            if not job:
-                return
-
-            if job.status != 'pending':
-                return
-
-            if _is_job_cancelled(job.id):
-                job.status = 'cancelled'
-                job.error_message = translate('media_downloader.flash.cancelled')
-                db.session.commit()
-                return
-
-            job.status = 'processing'
-            db.session.commit()
-
-            success, error_message = run_download(
-                job,
-                should_cancel=lambda: _is_job_cancelled(job.id),
-            )
-            _apply_job_result(job, success, error_message)
-            db.session.commit()
-    finally:
+def process_download_job(job_id):
+    """Job-Handler: führt einen wartenden Download aus (max. N gleichzeitig pro Benutzer)."""
+    from app.tasks.job_queue import JobDeferred
+
+    job = MediaDownloadJob.query.get(job_id)
+    if not job or job.status != 'pending':
+        _clear_job_cancelled(job_id)
+        return
+
+    if _is_job_cancelled(job.id):
+        job.status = 'cancelled'
+        job.error_message = translate('media_downloader.flash.cancelled')
+        db.session.commit()
         _clear_job_cancelled(job_id)
-        with _queue_lock:
-            _user_active_downloads[user_id] = max(0, _user_active_downloads[user_id] - 1)
-        _dispatch_pending_jobs(app, user_id)
+        return
 
+    max_concurrent = _get_max_concurrent_for_user(current_app)
+    processing = MediaDownloadJob.query.filter_by(user_id=job.user_id, status='processing').count()
+    if processing >= max_concurrent:
+        raise JobDeferred(delay=5)
 
-def _start_download_thread(app, job_id):
-    with app.app_context():
-        job = MediaDownloadJob.query.get(job_id)
-        if not job:
-            return
-        _dispatch_pending_jobs(app, job.user_id)
+    claimed = MediaDownloadJob.query.filter_by(id=job.id, status='pending').update(
+        {'status': 'processing'},
+        synchronize_session='fetch',
+    )
+    db.session.commit()
+    if not claimed:
+        return
+
+    try:
+        success, error_message = run_download(
+            job,
+            should_cancel=lambda: _is_job_cancelled(job.id),
+        )
+        _apply_job_result(job, success, error_message)
+        db.session.commit()
+    finally:
+        _clear_job_cancelled(job_id)
 
 
 def _create_and_start_job(user_id, source_url, output_format, start_parsed, end_parsed, app):
@@ -4,6 +4,7 @@ from app import db
 from app.models.user import User
 from app.models.email import EmailPermission
 from app.models.settings import SystemSettings
+from app.utils.settings_store import get_setting, get_setting_stripped
 from app.models.notification import NotificationSettings, ChatNotificationSettings, PushSubscription, NotificationLog
 from app.models.chat import Chat, ChatMember
 from app.models.whitelist import WhitelistEntry
@@ -489,10 +490,10 @@ def create_user():
             db.session.flush()  # Flush um ID zu bekommen
             
             # Wähle Standardrollen aus SystemSettings
-            default_roles_setting = SystemSettings.query.filter_by(key='default_module_roles').first()
-            if default_roles_setting:
+            default_roles_value = get_setting('default_module_roles')
+            if default_roles_value:
                 try:
-                    default_roles = json.loads(default_roles_setting.value)
+                    default_roles = json.loads(default_roles_value)
                     
                     if default_roles.get('full_access', False):
                         new_user.has_full_access = True
@@ -1334,8 +1335,7 @@ def admin_email_footer():
         return redirect(url_for('settings.admin_email_footer'))
     
     # Get current footer template
-    footer_template = SystemSettings.query.filter_by(key='email_footer_template').first()
-    current_template = footer_template.value if footer_template else ''
+    current_template = get_setting('email_footer_template', '')
     
     # Set default template if none exists
     if not current_template:
@@ -1535,17 +1535,11 @@ def admin_system():
         return redirect(url_for('settings.admin_system'))
     
     # Get current settings
-    portal_name_setting = SystemSettings.query.filter_by(key='portal_name').first()
-    portal_logo_setting = SystemSettings.query.filter_by(key='portal_logo').first()
-    accent_color_setting = SystemSettings.query.filter_by(key='default_accent_color').first()
-    gradient_setting = SystemSettings.query.filter_by(key='color_gradient').first()
-    timezone_setting = SystemSettings.query.filter_by(key='portal_timezone').first()
-    
-    portal_name = portal_name_setting.value if portal_name_setting else ''
-    portal_logo = portal_logo_setting.value if portal_logo_setting else None
-    default_accent_color = accent_color_setting.value if accent_color_setting else '#0d6efd'
-    color_gradient = gradient_setting.value if gradient_setting else ''
-    portal_timezone = timezone_setting.value if timezone_setting and timezone_setting.value else DEFAULT_TIMEZONE
+    portal_name = get_setting('portal_name', '')
+    portal_logo = get_setting('portal_logo')
+    default_accent_color = get_setting('default_accent_color', '#0d6efd')
+    color_gradient = get_setting('color_gradient', '')
+    portal_timezone = get_setting('portal_timezone') or DEFAULT_TIMEZONE
     
     return render_template('settings/admin_system.html', 
                          portal_name=portal_name, 
@@ -1638,8 +1632,7 @@ def admin_registration():
 
 
 def _get_setting_value_for_admin(key: str) -> str:
-    setting = SystemSettings.query.filter_by(key=key).first()
-    return setting.value.strip() if setting and setting.value else ''
+    return get_setting_stripped(key, '')
 
 
 @settings_bp.route('/admin/file-settings', methods=['GET', 'POST'])
@@ -1672,11 +1665,8 @@ def admin_file_settings():
         return redirect(url_for('settings.admin_file_settings'))
     
     # Get current settings
-    dropbox_setting = SystemSettings.query.filter_by(key='files_dropbox_enabled').first()
-    sharing_setting = SystemSettings.query.filter_by(key='files_sharing_enabled').first()
-    
-    files_dropbox_enabled = (dropbox_setting and str(dropbox_setting.value).lower() == 'true') or False
-    files_sharing_enabled = (sharing_setting and str(sharing_setting.value).lower() == 'true') or False
+    files_dropbox_enabled = str(get_setting('files_dropbox_enabled')).lower() == 'true'
+    files_sharing_enabled = str(get_setting('files_sharing_enabled')).lower() == 'true'
     
     return render_template('settings/admin_file_settings.html', 
                            files_dropbox_enabled=files_dropbox_enabled, 
@@ -1808,6 +1798,64 @@ def admin_push_subscriptions():
     )
 
 
+@settings_bp.route('/admin/jobs', methods=['GET', 'POST'])
+@login_required
+def admin_jobs():
+    """Hintergrund-Job-Queue überwachen (admin only)."""
+    if not current_user.is_admin:
+        flash(translate('settings.admin.flash_unauthorized'), 'danger')
+        return redirect(url_for('settings.index'))
+
+    from app.models.background_job import BackgroundJob
+    from app.tasks.job_queue import get_queue_stats, wake_job_workers
+
+    if request.method == 'POST':
+        action = request.form.get('action')
+        job_id = request.form.get('job_id', type=int)
+        job = BackgroundJob.query.get(job_id) if job_id else None
+
+        if action == 'retry' and job and job.status == BackgroundJob.STATUS_FAILED:
+            job.status = BackgroundJob.STATUS_QUEUED
+            job.attempts = 0
+            job.run_at = datetime.utcnow()
+            job.finished_at = None
+            db.session.commit()
+            wake_job_workers()
+            flash(translate('settings.admin.jobs.flash_requeued'), 'success')
+        elif action == 'delete' and job and job.status != BackgroundJob.STATUS_RUNNING:
+            db.session.delete(job)
+            db.session.commit()
+            flash(translate('settings.admin.jobs.flash_deleted'), 'success')
+
+        return redirect(url_for('settings.admin_jobs'))
+
+    from app.models.email import EmailSyncRun
+    from app.tasks.outbound_mail import get_outbound_queue_stats
+
+    stats = get_queue_stats()
+    email_sync_runs = EmailSyncRun.query.order_by(EmailSyncRun.id.desc()).limit(10).all()
+    mail_queue = get_outbound_queue_stats()
+    if request.args.get('format') == 'json':
+        from flask import jsonify
+        return jsonify({
+            'by_type': stats['by_type'],
+            'due_count': stats['due_count'],
+            'oldest_due_seconds': stats['oldest_due_seconds'],
+            'window_minutes': stats['window_minutes'],
+            'completed_in_window': stats['completed_in_window'],
+            'avg_wait_seconds': stats['avg_wait_seconds'],
+            'max_wait_seconds': stats['max_wait_seconds'],
+            'avg_runtime_seconds': stats['avg_runtime_seconds'],
+            'running': len(stats['running']),
+            'recent_failures': len(stats['recent_failures']),
+            'email_sync_last_run': email_sync_runs[0].to_dict() if email_sync_runs else None,
+            'mail_queue': mail_queue,
+        })
+
+    return render_template('settings/admin_jobs.html', stats=stats, email_sync_runs=email_sync_runs,
+                           mail_queue=mail_queue)
+
+
 @settings_bp.route('/admin/backup', methods=['GET', 'POST'])
 @login_required
 def admin_backup():
@@ -2033,8 +2081,7 @@ def admin_inventory_settings():
         return redirect(url_for('settings.admin_inventory_settings'))
     
     # Lade aktuelle Einstellungen
-    ownership_setting = SystemSettings.query.filter_by(key='inventory_ownership_text').first()
-    ownership_text = ownership_setting.value if ownership_setting and ownership_setting.value else 'Eigentum der Technik'
+    ownership_text = get_setting('inventory_ownership_text') or 'Eigentum der Technik'
     
     return render_template('settings/admin_inventory_settings.html', ownership_text=ownership_text)
 
@@ -2048,8 +2095,7 @@ def admin_email_module():
         return redirect(url_for('settings.index'))
     
     # Lade Footer-Template
-    footer_template = SystemSettings.query.filter_by(key='email_footer_template').first()
-    current_footer = footer_template.value if footer_template else ''
+    current_footer = get_setting('email_footer_template', '')
     if not current_footer:
         current_footer = """Mit freundlichen Grüßen
 Ihr Team
@@ -2059,11 +2105,11 @@ Gesendet von <user> (<email>)
 <app_name> - <date> um <time>"""
     
     # Lade E-Mail-System-Einstellungen
-    storage_setting = SystemSettings.query.filter_by(key='email_storage_days').first()
-    storage_days = int(storage_setting.value) if storage_setting and storage_setting.value else 0
+    storage_value = get_setting('email_storage_days')
+    storage_days = int(storage_value) if storage_value else 0
     
-    sync_setting = SystemSettings.query.filter_by(key='email_sync_interval_minutes').first()
-    sync_interval = int(sync_setting.value) if sync_setting and sync_setting.value else 30
+    sync_value = get_setting('email_sync_interval_minutes')
+    sync_interval = int(sync_value) if sync_value else 30
     
     now = now_in_portal_timezone()
     return render_template(
@@ -2131,11 +2177,11 @@ def admin_email_settings():
         return redirect(url_for('settings.admin_email_settings'))
     
     # Lade aktuelle Einstellungen
-    storage_setting = SystemSettings.query.filter_by(key='email_storage_days').first()
-    storage_days = int(storage_setting.value) if storage_setting and storage_setting.value else 0
+    storage_value = get_setting('email_storage_days')
+    storage_days = int(storage_value) if storage_value else 0
     
-    sync_setting = SystemSettings.query.filter_by(key='email_sync_interval_minutes').first()
-    sync_interval = int(sync_setting.value) if sync_setting and sync_setting.value else 30
+    sync_value = get_setting('email_sync_interval_minutes')
+    sync_interval = int(sync_value) if sync_value else 30
     
     return render_template('settings/admin_email_settings.html', 
                          storage_days=storage_days, 
@@ -2506,10 +2552,10 @@ def admin_roles_default():
         return redirect(url_for('settings.admin_roles_default'))
     
     # GET: Lade aktuelle Standardrollen
-    default_roles_setting = SystemSettings.query.filter_by(key='default_module_roles').first()
-    if default_roles_setting and default_roles_setting.value:
+    default_roles_value = get_setting('default_module_roles')
+    if default_roles_value:
         try:
-            default_roles = json.loads(default_roles_setting.value)
+            default_roles = json.loads(default_roles_value)
         except:
             default_roles = {}
     else:
@@ -5,6 +5,7 @@ from app.models.user import User
 from app.models.email import EmailPermission
 from app.models.chat import Chat, ChatMember
 from app.models.settings import SystemSettings
+from app.utils.settings_store import get_setting
 from app.models.whitelist import WhitelistEntry
 from app.utils.backup import import_backup, SUPPORTED_CATEGORIES
 from app.utils.i18n import translate, available_languages
@@ -23,13 +24,8 @@ def is_setup_needed():
 
 def get_color_gradient():
     """Holt den Farbverlauf aus den System-Einstellungen."""
-    try:
-        # SystemSettings ist bereits global importiert
-        gradient_setting = SystemSettings.query.filter_by(key='color_gradient').first()
-        return gradient_setting.value if gradient_setting else None
-    except Exception:
-        # Fallback auf Session-Daten bei Fehlern
-        return session.get('setup_color_gradient')
+    # Bei Fehlern (z.B. fehlende Tabelle) liefert der Cache nichts -> Fallback auf Session-Daten
+    return get_setting('color_gradient', session.get('setup_color_gradient'))
 
 
 @setup_bp.route('/setup')
@@ -39,8 +35,7 @@ def setup():
         return redirect(url_for('auth.login'))
     
     # Hole aktuellen Farbverlauf aus den System-Einstellungen oder Session
-    gradient_setting = SystemSettings.query.filter_by(key='color_gradient').first()
-    current_gradient = gradient_setting.value if gradient_setting else session.get('setup_color_gradient')
+    current_gradient = get_setting('color_gradient', session.get('setup_color_gradient'))
     
     return render_template('setup/index.html', color_gradient=current_gradient)
 
@@ -52,8 +47,7 @@ def setup_import_backup():
         return redirect(url_for('auth.login'))
     
     # Hole aktuellen Farbverlauf für Template
-    gradient_setting = SystemSettings.query.filter_by(key='color_gradient').first()
-    current_gradient = gradient_setting.value if gradient_setting else session.get('setup_color_gradient')
+    current_gradient = get_setting('color_gradient', session.get('setup_color_gradient'))
     
     if request.method == 'POST':
         action = request.form.get('action')
@@ -522,8 +516,7 @@ def setup_step1():
         return redirect(url_for('setup.setup_step2'))
     
     # Hole aktuellen Farbverlauf aus den System-Einstellungen oder Session
-    gradient_setting = SystemSettings.query.filter_by(key='color_gradient').first()
-    current_gradient = gradient_setting.value if gradient_setting else session.get('setup_color_gradient')
+    current_gradient = get_setting('color_gradient', session.get('setup_color_gradient'))
     
     # Verfügbare Sprachen und deren Namen
     language_names = {
@@ -605,8 +598,7 @@ def setup_step2():
         return redirect(url_for('setup.setup_step3'))
     
     # Hole aktuellen Farbverlauf aus den System-Einstellungen oder Session
-    gradient_setting = SystemSettings.query.filter_by(key='color_gradient').first()
-    current_gradient = gradient_setting.value if gradient_setting else session.get('setup_color_gradient')
+    current_gradient = get_setting('color_gradient', session.get('setup_color_gradient'))
     
     setup_bot = session.get('setup_bot_protection', {})
     return render_template(
@@ -648,8 +640,7 @@ def setup_step3():
         return redirect(url_for('setup.setup_step4'))
     
     # Hole aktuellen Farbverlauf aus den System-Einstellungen oder Session
-    gradient_setting = SystemSettings.query.filter_by(key='color_gradient').first()
-    current_gradient = gradient_setting.value if gradient_setting else session.get('setup_color_gradient')
+    current_gradient = get_setting('color_gradient', session.get('setup_color_gradient'))
     
     return render_template('setup/step3.html', color_gradient=current_gradient)
 
@@ -936,8 +927,7 @@ def setup_step4():
             return render_template('setup/step4.html', color_gradient=current_gradient)
     
     # Hole aktuellen Farbverlauf aus den System-Einstellungen oder Session
-    gradient_setting = SystemSettings.query.filter_by(key='color_gradient').first()
-    current_gradient = gradient_setting.value if gradient_setting else session.get('setup_color_gradient')
+    current_gradient = get_setting('color_gradient', session.get('setup_color_gradient'))
     
     return render_template('setup/step4.html', color_gradient=current_gradient)
 
@@ -38,6 +38,8 @@ from .assessment import (
     AssessmentAppSetting,
 )
 from .media_downloader import MediaDownloadJob
+from .background_job import BackgroundJob
+from .outbound_email import OutboundEmail
 
 __all__ = [
     'User', 'UserSession',
@@ -68,6 +70,8 @@ __all__ = [
     'AssessmentWarning', 'AssessmentRoomInspection',
     'AssessmentAppSetting',
     'MediaDownloadJob',
+    'BackgroundJob',
+    'OutboundEmail',
 ]
 
 
@@ -0,0 +1,46 @@
+import json
+from datetime import datetime
+
+from app import db
+
+
+class BackgroundJob(db.Model):
+    """Persistenter Eintrag der Hintergrund-Job-Queue (siehe app/tasks/job_queue.py)."""
+    __tablename__ = 'background_jobs'
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_type = db.Column(db.String(100), nullable=False, index=True)
+    payload = db.Column(db.Text, nullable=True)
+    # Höherer Wert = wird früher ausgeführt
+    priority = db.Column(db.Integer, nullable=False, default=50)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    # Eindeutiger Schlüssel für Jobs, die nicht mehrfach gleichzeitig anstehen sollen
+    dedup_key = db.Column(db.String(255), nullable=True, index=True)
+    run_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    locked_by = db.Column(db.String(100), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (
+        db.Index('idx_background_jobs_claim', 'status', 'run_at', 'priority'),
+    )
+
+    def get_payload(self):
+        if not self.payload:
+            return {}
+        try:
+            return json.loads(self.payload)
+        except (TypeError, ValueError):
+            return {}
+
+    def __repr__(self):
+        return f'<BackgroundJob {self.id} {self.job_type} {self.status}>'
@@ -2,10 +2,17 @@ from datetime import datetime
 from app import db
 import json
 from flask import current_app
+from sqlalchemy.dialects.mysql import MEDIUMTEXT
 
 
 class EmailMessage(db.Model):
     __tablename__ = 'email_messages'
+    __table_args__ = (
+        # Ordneransicht: Keyset-Paginierung nach (received_at, id) innerhalb eines Ordners
+        db.Index('idx_email_messages_folder_received', 'folder', 'received_at', 'id'),
+        # Duplikaterkennung beim Sync: eine UID gilt nur zusammen mit der UIDVALIDITY des Ordners
+        db.Index('uq_email_messages_folder_uid', 'folder', 'imap_uid', 'imap_uid_validity', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     uid = db.Column(db.String(100), nullable=True)  # IMAP UID (not unique, can be same across folders)
@@ -17,6 +24,9 @@ class EmailMessage(db.Model):
     bcc = db.Column(db.Text, nullable=True)
     body_text = db.Column(db.Text, nullable=True)  # TEXT can handle up to 65,535 characters
     body_html = db.Column(db.Text, nullable=True)  # TEXT can handle large content (up to 1GB in most databases)
+    preview_text = db.Column(db.String(255), nullable=True)  # Vorschau für die Ordnerliste (ohne Body laden)
+    # Version des Suchindex, mit der die E-Mail indexiert wurde (NULL = noch nicht indexiert)
+    search_index_version = db.Column(db.SmallInteger, nullable=True)
     
     # Metadata
     is_read = db.Column(db.Boolean, default=False)
@@ -26,6 +36,7 @@ class EmailMessage(db.Model):
     
     # IMAP synchronization tracking
     imap_uid = db.Column(db.String(100), nullable=True)  # IMAP UID for this specific folder
+    imap_uid_validity = db.Column(db.BigInteger, nullable=True)  # UIDVALIDITY des Ordners zur imap_uid
     last_imap_sync = db.Column(db.DateTime, nullable=True)  # Last time synced from IMAP
     is_deleted_imap = db.Column(db.Boolean, default=False)  # Marked as deleted in IMAP
 
@@ -47,13 +58,26 @@ class EmailMessage(db.Model):
     
     # Relationships
     attachments = db.relationship('EmailAttachment', back_populates='email', cascade='all, delete-orphan')
+    render_cache = db.relationship('EmailRenderCache', uselist=False, cascade='all, delete-orphan')
+    search_terms = db.relationship('EmailSearchTerm', cascade='all, delete-orphan', passive_deletes=True)
     
+    PREVIEW_LENGTH = 110
+
     def __repr__(self):
         return f'<EmailMessage {self.subject}>'
 
+    @staticmethod
+    def build_preview(body_text):
+        """Kurzvorschau für die Ordnerliste (Whitespace zusammengefasst)."""
+        preview = ' '.join((body_text or '').split())[:EmailMessage.PREVIEW_LENGTH]
+        return preview or None
+
 
 class EmailAttachment(db.Model):
     __tablename__ = 'email_attachments'
+
+    # Namensraum im Blob-Speicher (siehe app/utils/blob_store.py)
+    BLOB_NAMESPACE = 'email_attachments'
     
     id = db.Column(db.Integer, primary_key=True)
     email_id = db.Column(db.Integer, db.ForeignKey('email_messages.id'), nullable=False)
@@ -61,48 +85,111 @@ class EmailAttachment(db.Model):
     filename = db.Column(db.String(500), nullable=False)  # Erweitert von 255 auf 500 für längere Dateinamen
     content_type = db.Column(db.String(100), nullable=False)
     size = db.Column(db.Integer, nullable=False)  # Size in bytes
-    content = db.Column(db.LargeBinary, nullable=True)  # File content (can be None for file storage)
+    # Altbestand: Inhalt in der Datenbank bzw. als einzelne Datei; wird in den Blob-Speicher migriert
+    content = db.deferred(db.Column(db.LargeBinary, nullable=True))
     file_path = db.Column(db.String(500), nullable=True)  # Path to file on disk
+    content_hash = db.Column(db.String(64), nullable=True, index=True)  # SHA-256 im Blob-Speicher
     is_inline = db.Column(db.Boolean, default=False)  # True if inline image
     content_id = db.Column(db.String(255), nullable=True)  # Content-ID for inline images
     is_large_file = db.Column(db.Boolean, default=False)  # Flag for files stored on disk
-    
+    # Noch nicht geladener Anhang: IMAP-Abschnitt (z.B. "2.1") und Transferkodierung,
+    # der Inhalt wird beim ersten Zugriff geladen (siehe app/utils/email_lazy_fetch.py)
+    imap_section = db.Column(db.String(64), nullable=True)
+    imap_encoding = db.Column(db.String(32), nullable=True)
+
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
-    
+
     # Relationships
     email = db.relationship('EmailMessage', back_populates='attachments')
-    
+
     def __repr__(self):
         return f'<EmailAttachment {self.filename}>'
+
+    @property
+    def is_pending_download(self):
+        """True, solange der Inhalt nur auf dem IMAP-Server liegt."""
+        return bool(self.imap_section) and not self.content_hash and not self.file_path
+
+    def set_content(self, data):
+        """Legt den Inhalt im Blob-Speicher ab; die Zeile enthält danach nur Metadaten."""
+        from app.utils.blob_store import store_bytes
+        self.content_hash = store_bytes(data, self.BLOB_NAMESPACE)
+        self.size = len(data)
+        self.content = None
+        self.file_path = None
+        self.is_large_file = True
+
+    def get_file_path(self):
+        """Pfad des Inhalts auf der Festplatte oder None, falls er (noch) in der Datenbank liegt."""
+        if self.content_hash:
+            from app.utils.blob_store import blob_path
+            return blob_path(self.content_hash, self.BLOB_NAMESPACE)
+        if self.file_path:
+            import os
+            return os.path.abspath(self.file_path)
+        return None
     
     def get_data_url(self):
         """Get data URL for inline images."""
         if self.is_inline and self.content_type.startswith('image/'):
             import base64
-            if self.content:
-                return f"data:{self.content_type};base64,{base64.b64encode(self.content).decode()}"
-            elif self.file_path:
-                try:
-                    import os
-                    with open(self.file_path, 'rb') as f:
-                        content = f.read()
-                        return f"data:{self.content_type};base64,{base64.b64encode(content).decode()}"
-                except:
-                    return None
+            content = self.get_content()
+            if content:
+                return f"data:{self.content_type};base64,{base64.b64encode(content).decode()}"
         return None
     
     def get_content(self):
-        """Get attachment content from database or file system."""
-        if self.content:
-            return self.content
-        elif self.file_path:
+        """Get attachment content from blob store, database or file system."""
+        path = self.get_file_path()
+        if path:
             try:
-                import os
-                with open(self.file_path, 'rb') as f:
+                with open(path, 'rb') as f:
                     return f.read()
-            except:
+            except OSError:
                 return None
-        return None
+        return self.content or None
+
+
+class EmailRenderCache(db.Model):
+    """
+    Fertig aufbereitetes (bereinigtes) HTML einer E-Mail für die Ansicht.
+
+    Wird beim ersten Öffnen erzeugt und gilt, solange ``renderer_version`` der
+    aktuellen Version der Aufbereitung entspricht (siehe
+    ``EMAIL_RENDERER_VERSION`` in app/blueprints/email.py).
+    """
+    __tablename__ = 'email_render_cache'
+
+    email_id = db.Column(db.Integer, db.ForeignKey('email_messages.id', ondelete='CASCADE'), primary_key=True)
+    renderer_version = db.Column(db.Integer, nullable=False)
+    is_simple_html = db.Column(db.Boolean, default=True, nullable=False)
+    # Vollständiges Dokument für das iframe (ohne Theme-CSS, das hängt vom Betrachter ab)
+    iframe_html = db.deferred(db.Column(db.Text().with_variant(MEDIUMTEXT(), 'mysql'), nullable=True), group='html')
+    # Eingebettete Ansicht (einfache HTML-Mails bzw. Fallback)
+    inline_html = db.deferred(db.Column(db.Text().with_variant(MEDIUMTEXT(), 'mysql'), nullable=True), group='html')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<EmailRenderCache email={self.email_id} v{self.renderer_version}>'
+
+
+class EmailSearchTerm(db.Model):
+    """
+    Eintrag des Suchindex: ein normalisierter Begriff einer E-Mail mit Gewicht.
+
+    Der Primärschlüssel ``(term, email_id)`` dient zugleich als Index für die
+    (Präfix-)Suche nach Begriffen (siehe app/utils/email_search.py).
+    """
+    __tablename__ = 'email_search_terms'
+
+    # Binäre Sortierung unter MySQL: Begriffe sind bereits normalisiert und dürfen nicht
+    # durch eine akzent-/großschreibungsunabhängige Sortierung kollidieren
+    term = db.Column(db.String(64).with_variant(db.String(64, collation='utf8mb4_bin'), 'mysql'), primary_key=True)
+    email_id = db.Column(db.Integer, db.ForeignKey('email_messages.id', ondelete='CASCADE'), primary_key=True, index=True)
+    weight = db.Column(db.SmallInteger, nullable=False, default=1)
+
+    def __repr__(self):
+        return f'<EmailSearchTerm {self.term} email={self.email_id}>'
 
 
 class EmailFolder(db.Model):
@@ -118,6 +205,16 @@ class EmailFolder(db.Model):
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     last_synced = db.Column(db.DateTime, nullable=True)
+
+    # IMAP-Ordnerzustand für die inkrementelle Synchronisation
+    uid_validity = db.Column(db.BigInteger, nullable=True)
+    uid_next = db.Column(db.BigInteger, nullable=True)  # Nächste noch nicht synchronisierte UID
+    highest_modseq = db.Column(db.BigInteger, nullable=True)  # CONDSTORE (RFC 7162)
+    message_count = db.Column(db.Integer, nullable=True)  # EXISTS beim letzten Sync
+
+    # Zähler der lokal gespeicherten E-Mails (app/utils/email_folder_counts.py)
+    total_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    unread_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     def __repr__(self):
         return f'<EmailFolder {self.name}>'
@@ -172,3 +269,56 @@ class EmailPermission(db.Model):
 
 
 
+
+
+class EmailSyncRun(db.Model):
+    """Kennzahlen eines vollständigen IMAP-Abgleichs (alle Ordner) für die Überwachung."""
+    __tablename__ = 'email_sync_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    trigger = db.Column(db.String(20), default='scheduled', nullable=False)  # 'scheduled' oder 'manual'
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration_seconds = db.Column(db.Float, default=0.0, nullable=False)
+    parallelism = db.Column(db.Integer, default=1, nullable=False)
+
+    folders_total = db.Column(db.Integer, default=0, nullable=False)
+    folders_failed = db.Column(db.Integer, default=0, nullable=False)
+    new_emails = db.Column(db.Integer, default=0, nullable=False)
+    updated_emails = db.Column(db.Integer, default=0, nullable=False)
+    moved_emails = db.Column(db.Integer, default=0, nullable=False)
+    deleted_emails = db.Column(db.Integer, default=0, nullable=False)
+    errors = db.Column(db.Integer, default=0, nullable=False)
+    bytes_fetched = db.Column(db.BigInteger, default=0, nullable=False)
+
+    folder_stats = db.Column(db.Text, nullable=True)  # JSON: Kennzahlen pro Ordner
+
+    def get_folder_stats(self):
+        if not self.folder_stats:
+            return []
+        try:
+            return json.loads(self.folder_stats)
+        except (TypeError, ValueError):
+            return []
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'trigger': self.trigger,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_seconds': self.duration_seconds,
+            'parallelism': self.parallelism,
+            'folders_total': self.folders_total,
+            'folders_failed': self.folders_failed,
+            'new_emails': self.new_emails,
+            'updated_emails': self.updated_emails,
+            'moved_emails': self.moved_emails,
+            'deleted_emails': self.deleted_emails,
+            'errors': self.errors,
+            'bytes_fetched': self.bytes_fetched,
+            'folders': self.get_folder_stats(),
+        }
+
+    def __repr__(self):
+        return f'<EmailSyncRun {self.id} new={self.new_emails} {self.duration_seconds:.1f}s>'
@@ -51,6 +51,8 @@ class File(db.Model):
     mime_type = db.Column(db.String(100), nullable=True)
     version_number = db.Column(db.Integer, default=1, nullable=False)
     is_current = db.Column(db.Boolean, default=True, nullable=False)
+    # SHA-256 des aktuellen Inhalts im Blob-Speicher; NULL = Altbestand (siehe app/utils/file_storage.py)
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -66,6 +68,7 @@ class File(db.Model):
     folder = db.relationship('Folder', back_populates='files')
     uploader = db.relationship('User', back_populates='uploaded_files')
     versions = db.relationship('FileVersion', back_populates='file', cascade='all, delete-orphan', order_by='FileVersion.version_number.desc()')
+    preview = db.relationship('FilePreview', uselist=False, cascade='all, delete-orphan', passive_deletes=True)
     
     def __repr__(self):
         return f'<File {self.name}>'
@@ -79,6 +82,8 @@ class FileVersion(db.Model):
     version_number = db.Column(db.Integer, nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
     file_size = db.Column(db.Integer, nullable=False)
+    # SHA-256 des Inhalts im Blob-Speicher (wie File.content_hash)
+    content_hash = db.Column(db.String(64), nullable=True, index=True)
     uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     
@@ -88,4 +93,72 @@ class FileVersion(db.Model):
         return f'<FileVersion {self.file_id} v{self.version_number}>'
 
 
+class FileBlob(db.Model):
+    """
+    Inhalt im Blob-Speicher der Dateien mit Anzahl der Verweise.
 
+    ``ref_count`` zählt ``File``- und ``FileVersion``-Einträge mit diesem
+    ``content_hash`` (siehe app/utils/file_storage.py).
+    """
+    __tablename__ = 'file_blobs'
+
+    content_hash = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False, default=0)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<FileBlob {self.content_hash[:12]} x{self.ref_count}>'
+
+
+class FilePreview(db.Model):
+    """
+    Gespeicherte Vorschau einer Datei für die Ordneransicht.
+
+    Gültig, solange ``content_hash`` dem ``File.content_hash`` und
+    ``preview_version`` der aktuellen ``FILE_PREVIEW_VERSION`` entspricht.
+    """
+    __tablename__ = 'file_previews'
+
+    file_id = db.Column(db.Integer, db.ForeignKey('files.id', ondelete='CASCADE'), primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False)
+    preview_version = db.Column(db.SmallInteger, nullable=False)
+    preview_text = db.Column(db.String(255), nullable=True)
+    preview_html = db.Column(db.Text, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<FilePreview {self.file_id}>'
+
+
+class UploadSession(db.Model):
+    """
+    Laufender Upload in Teilstücken (siehe app/utils/chunked_upload.py).
+
+    Die Teilstücke werden unter ``UPLOAD_FOLDER/chunked_uploads/<id>.part``
+    zusammengesetzt; ``received_size`` ist der Offset, ab dem der Client
+    fortsetzen muss.
+    """
+    __tablename__ = 'upload_sessions'
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    folder_id = db.Column(db.Integer, db.ForeignKey('folders.id', ondelete='CASCADE'), nullable=True)
+    # Unterordner relativ zu folder_id bei Ordner-Uploads (z.B. "Bilder/2024")
+    relative_path = db.Column(db.String(1000), nullable=True)
+    filename = db.Column(db.String(255), nullable=False)
+    mime_type = db.Column(db.String(100), nullable=True)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_size = db.Column(db.BigInteger, nullable=False, default=0)
+    # Vom Client angegebener SHA-256 des gesamten Inhalts (optional)
+    sha256 = db.Column(db.String(64), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, index=True)
+
+    @property
+    def is_complete(self):
+        return self.received_size >= self.total_size
+
+    def __repr__(self):
+        return f'<UploadSession {self.id} {self.filename}>'
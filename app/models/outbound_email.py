@@ -0,0 +1,50 @@
+import json
+from datetime import datetime
+
+from sqlalchemy.dialects.mysql import LONGBLOB
+
+from app import db
+
+
+class OutboundEmail(db.Model):
+    """Ausgehende E-Mail in der Versand-Warteschlange (siehe app/tasks/outbound_mail.py)."""
+    __tablename__ = 'outbound_emails'
+
+    STATUS_QUEUED = 'queued'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    sender = db.Column(db.String(500), nullable=False)
+    # JSON-Liste der Envelope-Empfänger (To, Cc und Bcc)
+    recipients = db.Column(db.Text, nullable=False)
+    subject = db.Column(db.String(500), nullable=True)
+    # Fertig aufgebaute Nachricht (RFC 5322); wird nach dem Versand geleert
+    message = db.deferred(db.Column(db.LargeBinary().with_variant(LONGBLOB(), 'mysql'), nullable=True))
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Kennung des Versandlaufs, der die Nachricht gerade zustellt
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    __table_args__ = (
+        db.Index('idx_outbound_emails_claim', 'status', 'next_attempt_at'),
+    )
+
+    def get_recipients(self):
+        try:
+            return json.loads(self.recipients or '[]')
+        except (TypeError, ValueError):
+            return []
+
+    def set_recipients(self, recipients):
+        self.recipients = json.dumps(list(recipients))
+
+    def __repr__(self):
+        return f'<OutboundEmail {self.id} {self.status}>'
@@ -0,0 +1,99 @@
+from sqlalchemy import and_, func
+
+from app import db
+from app.models.chat import ChatMember, ChatMessage
+
+
+class ChatUnreadService:
+    """Aggregierte Ungelesen-Zähler für Chats (eine gruppierte Abfrage statt COUNT pro Chat)."""
+
+    @staticmethod
+    def _unread_join_condition():
+        # Mitglieder ohne last_read_at gelten ab ihrem Beitritt als "gelesen".
+        return and_(
+            ChatMessage.chat_id == ChatMember.chat_id,
+            ChatMessage.sender_id != ChatMember.user_id,
+            ChatMessage.created_at > func.coalesce(ChatMember.last_read_at, ChatMember.joined_at),
+            ChatMessage.is_deleted == False,  # noqa: E712
+        )
+
+    @staticmethod
+    def totals_for_users(user_ids):
+        """Liefert {user_id: ungelesene Nachrichten über alle Chats} für mehrere Benutzer."""
+        user_ids = {int(user_id) for user_id in user_ids if user_id}
+        if not user_ids:
+            return {}
+
+        rows = (
+            db.session.query(ChatMember.user_id, func.count(ChatMessage.id))
+            .join(ChatMessage, ChatUnreadService._unread_join_condition())
+            .filter(ChatMember.user_id.in_(user_ids))
+            .group_by(ChatMember.user_id)
+            .all()
+        )
+        totals = {user_id: 0 for user_id in user_ids}
+        totals.update({user_id: int(count) for user_id, count in rows})
+        return totals
+
+    @staticmethod
+    def total_for_user(user_id):
+        """Ungelesene Nachrichten eines Benutzers über alle Chats."""
+        return ChatUnreadService.totals_for_users([user_id]).get(user_id, 0)
+
+    @staticmethod
+    def per_chat_for_user(user_id):
+        """Liefert {chat_id: ungelesene Nachrichten} für alle Chats eines Benutzers."""
+        rows = (
+            db.session.query(ChatMember.chat_id, func.count(ChatMessage.id))
+            .join(ChatMessage, ChatUnreadService._unread_join_condition())
+            .filter(ChatMember.user_id == user_id)
+            .group_by(ChatMember.chat_id)
+            .all()
+        )
+        return {chat_id: int(count) for chat_id, count in rows}
+
+    @staticmethod
+    def latest_unread_messages(user_id, limit=5):
+        """Die neuesten ungelesenen Nachrichten eines Benutzers über alle Chats (eine Abfrage)."""
+        return (
+            ChatMessage.query
+            .join(ChatMember, ChatUnreadService._unread_join_condition())
+            .filter(ChatMember.user_id == user_id)
+            .order_by(ChatMessage.created_at.desc())
+            .limit(limit)
+            .all()
+        )
+
+    @staticmethod
+    def counts_in_chat(chat_id, user_ids=None):
+        """Liefert {user_id: ungelesene Nachrichten} in einem Chat für dessen Mitglieder."""
+        query = (
+            db.session.query(ChatMember.user_id, func.count(ChatMessage.id))
+            .join(ChatMessage, ChatUnreadService._unread_join_condition())
+            .filter(ChatMember.chat_id == chat_id)
+        )
+        if user_ids is not None:
+            user_ids = {int(user_id) for user_id in user_ids if user_id}
+            if not user_ids:
+                return {}
+            query = query.filter(ChatMember.user_id.in_(user_ids))
+        rows = query.group_by(ChatMember.user_id).all()
+        return {user_id: int(count) for user_id, count in rows}
+
+    @staticmethod
+    def emit_totals_for_chat(chat_id, exclude_user_id=None):
+        """Sendet nach einer neuen Nachricht die Gesamtzähler an alle anderen Chat-Mitglieder."""
+        from app.utils.dashboard_events import emit_dashboard_update
+
+        member_ids = [
+            user_id
+            for (user_id,) in db.session.query(ChatMember.user_id).filter(ChatMember.chat_id == chat_id).all()
+            if user_id != exclude_user_id
+        ]
+        if not member_ids:
+            return {}
+
+        totals = ChatUnreadService.totals_for_users(member_ids)
+        for user_id in member_ids:
+            emit_dashboard_update(user_id, 'chat_update', {'count': totals.get(user_id, 0)})
+        return totals
@@ -0,0 +1,113 @@
+"""
+Hintergrundaufgaben für den Blob-Speicher der E-Mail-Anhänge.
+
+- ``migrate_attachments_to_blob_store``: verschiebt Altbestand (Inhalt in der
+  Datenbank oder als einzelne Datei) in den inhaltsadressierten Speicher
+- ``collect_attachment_blob_garbage``: entfernt Blobs, auf die kein Anhang
+  mehr verweist (z.B. nach der E-Mail-Bereinigung)
+
+Beide laufen als periodische Jobs (siehe app/tasks/job_handlers.py).
+"""
+
+import logging
+import os
+import time
+
+from sqlalchemy import or_
+from sqlalchemy.orm import undefer
+
+from app import db
+from app.models.email import EmailAttachment
+from app.utils.blob_store import collect_garbage, store_file
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_BATCH_SIZE = 20
+# Laufzeit pro Job; danach wird ein Folgejob eingereiht, damit andere Jobs nicht warten
+MIGRATION_TIME_BUDGET_SECONDS = 120
+
+
+def _migrate_attachment(attachment, moved_files):
+    if attachment.content:
+        attachment.set_content(attachment.content)
+        return True
+    if attachment.file_path:
+        source_path = os.path.abspath(attachment.file_path)
+        if not os.path.isfile(source_path):
+            logger.warning(f"Anhang {attachment.id}: Datei {source_path} fehlt, überspringe")
+            return False
+        content_hash, _ = store_file(source_path, EmailAttachment.BLOB_NAMESPACE)
+        attachment.content_hash = content_hash
+        attachment.file_path = None
+        attachment.is_large_file = True
+        moved_files.append(source_path)
+        return True
+    return False
+
+
+def migrate_attachments_to_blob_store(after_id=0):
+    """
+    Überträgt bestehende Anhänge in Stapeln in den Blob-Speicher (commit pro Stapel).
+
+    Ist das Zeitbudget erschöpft, wird ein Folgejob ab der zuletzt
+    bearbeiteten ID eingereiht.
+    """
+    from app.tasks.job_queue import PRIORITY_LOW, enqueue_job
+
+    started = time.monotonic()
+    migrated = 0
+    last_id = int(after_id or 0)
+    while True:
+        ids = [attachment_id for (attachment_id,) in db.session.query(EmailAttachment.id).filter(
+            EmailAttachment.id > last_id,
+            EmailAttachment.content_hash.is_(None),
+            or_(EmailAttachment.content.isnot(None), EmailAttachment.file_path.isnot(None)),
+        ).order_by(EmailAttachment.id).limit(MIGRATION_BATCH_SIZE).all()]
+        if not ids:
+            break
+
+        moved_files = []
+        for attachment in EmailAttachment.query.options(undefer(EmailAttachment.content)).filter(
+            EmailAttachment.id.in_(ids)
+        ).all():
+            try:
+                if _migrate_attachment(attachment, moved_files):
+                    migrated += 1
+            except OSError as exc:
+                logger.error(f"Anhang {attachment.id} konnte nicht übertragen werden: {exc}")
+        db.session.commit()
+        db.session.expunge_all()
+        # Alte Einzeldateien erst nach dem Commit entfernen
+        for path in moved_files:
+            try:
+                os.unlink(path)
+            except OSError as exc:
+                logger.debug(f"Alte Anhangsdatei {path} konnte nicht entfernt werden: {exc}")
+        last_id = ids[-1]
+
+        if time.monotonic() - started >= MIGRATION_TIME_BUDGET_SECONDS:
+            enqueue_job(
+                'email_attachment_blob_migration',
+                payload={'after_id': last_id},
+                priority=PRIORITY_LOW,
+                dedup_key=f'email_attachment_blob_migration:{last_id}',
+            )
+            break
+
+    if migrated:
+        logger.info(f"Blob-Speicher: {migrated} E-Mail-Anhänge übertragen (bis ID {last_id})")
+    return migrated
+
+
+def collect_attachment_blob_garbage():
+    """Entfernt nicht mehr referenzierte Anhang-Blobs."""
+
+    def referenced(hashes):
+        return [content_hash for (content_hash,) in db.session.query(EmailAttachment.content_hash).filter(
+            EmailAttachment.content_hash.in_(hashes)
+        ).distinct().all()]
+
+    removed = collect_garbage(EmailAttachment.BLOB_NAMESPACE, referenced)
+    if removed:
+        logger.info(f"Blob-Speicher: {removed} nicht mehr verwendete Anhänge entfernt")
+    return removed
@@ -0,0 +1,74 @@
+"""
+Hintergrundaufgabe für den Suchindex der E-Mails (app/utils/email_search.py).
+
+``index_pending_emails`` indexiert E-Mails ohne aktuellen Index nach: den
+Bestand nach der Einführung, E-Mails aus anderen Quellen (z.B. Backup-Import)
+und nach einer Erhöhung von ``SEARCH_INDEX_VERSION`` alle E-Mails. Läuft als
+periodischer Job (siehe app/tasks/job_handlers.py).
+"""
+
+import logging
+import time
+
+from sqlalchemy import or_
+from sqlalchemy.orm import load_only
+
+from app import db
+from app.models.email import EmailMessage
+from app.utils.email_search import SEARCH_INDEX_VERSION, index_email
+
+logger = logging.getLogger(__name__)
+
+INDEX_BATCH_SIZE = 200
+# Laufzeit pro Job; danach wird ein Folgejob eingereiht, damit andere Jobs nicht warten
+INDEX_TIME_BUDGET_SECONDS = 120
+
+
+def index_pending_emails(after_id=0):
+    """
+    Indexiert E-Mails ohne aktuellen Suchindex in Stapeln (commit pro Stapel).
+
+    Ist das Zeitbudget erschöpft, wird ein Folgejob ab der zuletzt
+    bearbeiteten ID eingereiht.
+    """
+    from app.tasks.job_queue import PRIORITY_LOW, enqueue_job
+
+    started = time.monotonic()
+    indexed = 0
+    last_id = int(after_id or 0)
+    while True:
+        emails = EmailMessage.query.options(load_only(
+            EmailMessage.id, EmailMessage.subject, EmailMessage.sender,
+            EmailMessage.body_text, EmailMessage.body_html, EmailMessage.search_index_version,
+        )).filter(
+            EmailMessage.id > last_id,
+            or_(
+                EmailMessage.search_index_version.is_(None),
+                EmailMessage.search_index_version != SEARCH_INDEX_VERSION,
+            ),
+        ).order_by(EmailMessage.id).limit(INDEX_BATCH_SIZE).all()
+        if not emails:
+            break
+
+        for email_msg in emails:
+            try:
+                index_email(email_msg)
+                indexed += 1
+            except Exception as exc:
+                logger.error(f"E-Mail {email_msg.id} konnte nicht indexiert werden: {exc}")
+        last_id = emails[-1].id
+        db.session.commit()
+        db.session.expunge_all()
+
+        if time.monotonic() - started >= INDEX_TIME_BUDGET_SECONDS:
+            enqueue_job(
+                'email_search_index',
+                payload={'after_id': last_id},
+                priority=PRIORITY_LOW,
+                dedup_key=f'email_search_index:{last_id}',
+            )
+            break
+
+    if indexed:
+        logger.info(f"E-Mail-Suche: {indexed} E-Mails indexiert (bis ID {last_id})")
+    return indexed
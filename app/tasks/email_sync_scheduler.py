@@ -1,125 +1,105 @@
 """
 Background Task für E-Mail-Synchronisation
 Führt regelmäßig die Synchronisation von E-Mails vom IMAP-Server durch.
+
+Die Ausführung erfolgt als periodischer Job der Job-Queue (siehe
+app/tasks/job_handlers.py); das Intervall kommt aus den Systemeinstellungen.
 """
 
-import threading
-import time
 import logging
-from datetime import datetime
-from app import create_app
-from app.models.settings import SystemSettings
+from app.utils.settings_store import get_setting
 
 logger = logging.getLogger(__name__)
 
 
-class EmailSyncScheduler:
-    """Scheduler für regelmäßige E-Mail-Synchronisation."""
-    
-    def __init__(self, app=None):
-        self.app = app
-        self.running = False
-        self.thread = None
-        
-        if app:
-            self.init_app(app)
-    
-    def init_app(self, app):
-        """Initialisiere den Scheduler mit der Flask-App."""
-        self.app = app
-        
-        # Starte Scheduler automatisch
-        self.start()
-    
-    def start(self):
-        """Starte den E-Mail-Synchronisations-Scheduler."""
-        if self.running:
+def get_sync_interval():
+    """Hole das Synchronisationsintervall aus den Einstellungen (in Sekunden).
+    Muss innerhalb eines Application Contexts aufgerufen werden.
+
+    Beobachtet dieser Prozess die INBOX per IMAP IDLE, genügt ein seltenerer
+    Abgleich (IMAP_IDLE_POLL_INTERVAL_MINUTES) für die übrigen Ordner."""
+    from flask import current_app
+    from app.tasks.imap_idle_listener import get_poll_interval, is_idle_active
+
+    if is_idle_active():
+        return get_poll_interval(current_app.config)
+
+    try:
+        sync_value = get_setting('email_sync_interval_minutes')
+        if sync_value:
+            interval_minutes = int(sync_value)
+            # Mindestens 15 Minuten, maximal 60 Minuten
+            interval_minutes = max(15, min(60, interval_minutes))
+            return interval_minutes * 60  # Konvertiere zu Sekunden
+    except Exception as e:
+        logger.warning(f"Fehler beim Lesen des Synchronisationsintervalls: {e}")
+
+    # Standard: 30 Minuten
+    return 30 * 60
+
+
+def run_scheduled_email_sync():
+    """Automatische E-Mail-Synchronisation (die Bereinigung läuft als eigener Job)."""
+    # Importiere hier, um zirkuläre Imports zu vermeiden
+    from app.blueprints.email import sync_emails_from_server
+    from app.utils.lock_manager import acquire_email_sync_lock
+
+    # Lock verhindert Überschneidung mit einer manuell gestarteten Synchronisation
+    with acquire_email_sync_lock(timeout=300) as acquired:
+        if not acquired:
+            logger.debug("E-Mail-Synchronisation läuft bereits, überspringe...")
             return
-        
-        self.running = True
-        self.thread = threading.Thread(target=self._run_scheduler, daemon=True)
-        self.thread.start()
-        logger.info("E-Mail-Synchronisations-Scheduler gestartet")
-    
-    def stop(self):
-        """Stoppe den E-Mail-Synchronisations-Scheduler."""
-        self.running = False
-        if self.thread:
-            self.thread.join(timeout=5)
-        logger.info("E-Mail-Synchronisations-Scheduler gestoppt")
-    
-    def _get_sync_interval(self):
-        """Hole das Synchronisationsintervall aus den Einstellungen (in Sekunden).
-        Muss innerhalb eines Application Contexts aufgerufen werden."""
-        try:
-            sync_setting = SystemSettings.query.filter_by(key='email_sync_interval_minutes').first()
-            if sync_setting and sync_setting.value:
-                interval_minutes = int(sync_setting.value)
-                # Mindestens 15 Minuten, maximal 60 Minuten
-                interval_minutes = max(15, min(60, interval_minutes))
-                return interval_minutes * 60  # Konvertiere zu Sekunden
-        except Exception as e:
-            logger.warning(f"Fehler beim Lesen des Synchronisationsintervalls: {e}")
-        
-        # Standard: 30 Minuten
-        return 30 * 60
-    
-    def _run_scheduler(self):
-        """Hauptschleife des Schedulers."""
-        while self.running:
-            try:
-                with self.app.app_context():
-                    # Importiere hier, um zirkuläre Imports zu vermeiden
-                    from app.blueprints.email import sync_emails_from_server, cleanup_old_emails
-                    from app.utils.lock_manager import acquire_email_sync_lock
-                    
-                    # Verwende Lock, um sicherzustellen, dass nur ein Worker synchronisiert
-                    with acquire_email_sync_lock(timeout=300) as acquired:
-                        if acquired:
-                            logger.info("Starte automatische E-Mail-Synchronisation...")
-                            success, message = sync_emails_from_server()
-                            
-                            if success:
-                                logger.info(f"E-Mail-Synchronisation erfolgreich: {message}")
-                            else:
-                                logger.warning(f"E-Mail-Synchronisation fehlgeschlagen: {message}")
-                            
-                            # Führe E-Mail-Bereinigung durch
-                            deleted_count = cleanup_old_emails()
-                            if deleted_count > 0:
-                                logger.info(f"E-Mail-Bereinigung: {deleted_count} E-Mails gelöscht")
-                        else:
-                            logger.debug("E-Mail-Synchronisation wird bereits von anderem Worker durchgeführt, überspringe...")
-                    
-                    # Hole das Intervall innerhalb des Application Contexts
-                    interval_seconds = self._get_sync_interval()
-                    logger.debug(f"Warte {interval_seconds // 60} Minuten bis zur nächsten Synchronisation...")
-                
-                # Warte in kleinen Schritten, um auf Stop-Anfragen reagieren zu können
-                waited = 0
-                while self.running and waited < interval_seconds:
-                    time.sleep(min(60, interval_seconds - waited))  # Warte max. 1 Minute pro Iteration
-                    waited += 60
-                
-            except Exception as e:
-                logger.error(f"Fehler im E-Mail-Synchronisations-Scheduler: {e}", exc_info=True)
-                # Warte 5 Minuten bei Fehlern
-                time.sleep(300)
-
-
-# Globale Scheduler-Instanz
-scheduler = EmailSyncScheduler()
-
-
-def start_email_sync_scheduler(app):
-    """Starte den E-Mail-Synchronisations-Scheduler für die gegebene App."""
-    global scheduler
-    scheduler.init_app(app)
-    return scheduler
-
-
-def stop_email_sync_scheduler():
-    """Stoppe den E-Mail-Synchronisations-Scheduler."""
-    global scheduler
-    scheduler.stop()
 
+        logger.info("Starte automatische E-Mail-Synchronisation...")
+        success, message = sync_emails_from_server()
+
+        if success:
+            logger.info(f"E-Mail-Synchronisation erfolgreich: {message}")
+        else:
+            logger.warning(f"E-Mail-Synchronisation fehlgeschlagen: {message}")
+
+
+def is_cleanup_window(hours_value, hour):
+    """
+    Prüft, ob ``hour`` im Zeitfenster ``EMAIL_CLEANUP_HOURS`` liegt.
+
+    Format ``start-ende`` in Stunden (Portal-Zeitzone, Ende exklusiv), z.B.
+    ``1-5`` oder über Mitternacht ``22-4``. Leer bedeutet: jederzeit.
+    """
+    if not hours_value:
+        return True
+    try:
+        start, end = (int(part) % 24 for part in str(hours_value).split('-', 1))
+    except ValueError:
+        logger.warning(f"Ungültiges EMAIL_CLEANUP_HOURS '{hours_value}', Bereinigung läuft jederzeit")
+        return True
+    if start == end:
+        return True
+    if start < end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def run_email_cleanup():
+    """
+    Löscht E-Mails außerhalb der Speicherdauer in Stapeln (periodischer Job).
+
+    Läuft nur im Zeitfenster ``EMAIL_CLEANUP_HOURS`` und höchstens
+    ``EMAIL_CLEANUP_TIME_BUDGET`` Sekunden am Stück; danach wird der Job
+    zurückgestellt und setzt mit den verbleibenden E-Mails fort.
+    """
+    from flask import current_app
+    from app.blueprints.email import cleanup_old_emails
+    from app.tasks.job_queue import JobDeferred
+    from app.utils.common import now_in_portal_timezone
+
+    config = current_app.config
+    if not is_cleanup_window(config.get('EMAIL_CLEANUP_HOURS'), now_in_portal_timezone().hour):
+        logger.debug("E-Mail-Bereinigung: außerhalb des Zeitfensters, überspringe")
+        return
+
+    deleted_count, finished = cleanup_old_emails(time_budget=config.get('EMAIL_CLEANUP_TIME_BUDGET', 300))
+    if deleted_count > 0:
+        logger.info(f"E-Mail-Bereinigung: {deleted_count} E-Mails gelöscht")
+    if not finished and deleted_count > 0:
+        raise JobDeferred(delay=config.get('EMAIL_CLEANUP_PAUSE', 30))
@@ -0,0 +1,177 @@
+"""
+Hintergrundaufgaben für den Blob-Speicher der Dateien (app/utils/file_storage.py).
+
+- ``migrate_files_to_blob_store``: überträgt Altbestand (eigene Datei je Datei
+  und Version unter ``uploads/files``) in den inhaltsadressierten Speicher
+- ``collect_file_blob_garbage``: gleicht ``file_blobs.ref_count`` mit den
+  Tabellen ab und entfernt Blobs ohne Verweise
+- ``reap_file_paths``: entfernt Altbestand-Dateien gelöschter Dateien und
+  Versionen (eingereiht von app/utils/file_deletion.py)
+
+Die ersten beiden laufen als periodische Jobs (siehe app/tasks/job_handlers.py).
+"""
+
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import exists, func, select, update
+
+from app import db
+from app.models.file import File, FileBlob, FileVersion
+from app.utils.blob_store import GC_MIN_AGE_SECONDS, collect_garbage
+from app.utils.file_storage import FILE_BLOB_NAMESPACE, insert_ignoring_duplicates, adopt_legacy_content, is_blob_path
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_BATCH_SIZE = 20
+# Laufzeit pro Job; danach wird ein Folgejob eingereiht, damit andere Jobs nicht warten
+MIGRATION_TIME_BUDGET_SECONDS = 120
+_MIGRATION_STAGES = (('files', File), ('versions', FileVersion))
+
+
+def migrate_files_to_blob_store(stage='files', after_id=0):
+    """
+    Überträgt Dateien und danach Dateiversionen ohne Inhalts-Hash in Stapeln (commit pro Stapel).
+
+    Ist das Zeitbudget erschöpft, wird ein Folgejob ab der zuletzt
+    bearbeiteten ID eingereiht.
+    """
+    from app.tasks.job_queue import PRIORITY_LOW, enqueue_job
+
+    started = time.monotonic()
+    migrated = 0
+    stage_names = [name for name, _ in _MIGRATION_STAGES]
+    stages = _MIGRATION_STAGES[stage_names.index(stage) if stage in stage_names else 0:]
+    last_id = int(after_id or 0)
+    for stage_name, model in stages:
+        while True:
+            rows = model.query.filter(
+                model.id > last_id,
+                model.content_hash.is_(None),
+            ).order_by(model.id).limit(MIGRATION_BATCH_SIZE).all()
+            if not rows:
+                break
+
+            for row in rows:
+                try:
+                    if adopt_legacy_content(row):
+                        migrated += 1
+                    else:
+                        logger.warning(f"{model.__name__} {row.id}: Datei {row.file_path} fehlt, überspringe")
+                except OSError as exc:
+                    logger.error(f"{model.__name__} {row.id} konnte nicht übertragen werden: {exc}")
+            last_id = rows[-1].id
+            # Alte Dateien entfernt file_storage nach dem Commit
+            db.session.commit()
+            db.session.expunge_all()
+
+            if time.monotonic() - started >= MIGRATION_TIME_BUDGET_SECONDS:
+                enqueue_job(
+                    'file_blob_migration',
+                    payload={'stage': stage_name, 'after_id': last_id},
+                    priority=PRIORITY_LOW,
+                    dedup_key=f'file_blob_migration:{stage_name}:{last_id}',
+                )
+                if migrated:
+                    logger.info(f"Blob-Speicher: {migrated} Dateien übertragen (bis {stage_name} {last_id})")
+                return migrated
+        last_id = 0
+
+    if migrated:
+        logger.info(f"Blob-Speicher: {migrated} Dateien und Versionen übertragen")
+    return migrated
+
+
+def reconcile_file_blob_refs():
+    """
+    Zählt die Verweise aller Datei-Blobs neu (z.B. nach Änderungen direkt per SQL).
+
+    Returns:
+        Anzahl korrigierter Einträge
+    """
+    table = FileBlob.__table__
+    connection = db.session.connection()
+    now = datetime.utcnow()
+
+    # Fehlende Einträge anlegen, der Zähler folgt im UPDATE darunter
+    for model in (File, FileVersion):
+        missing = db.session.query(model.content_hash, func.max(model.file_size)).filter(
+            model.content_hash.isnot(None),
+            ~exists().where(table.c.content_hash == model.content_hash),
+        ).group_by(model.content_hash).all()
+        for content_hash, size in missing:
+            connection.execute(insert_ignoring_duplicates(connection, table).values(
+                content_hash=content_hash, size=size or 0, ref_count=0, created_at=now, updated_at=now,
+            ))
+
+    file_refs = select(func.count()).where(File.content_hash == table.c.content_hash).scalar_subquery()
+    version_refs = select(func.count()).where(FileVersion.content_hash == table.c.content_hash).scalar_subquery()
+    result = connection.execute(
+        update(table)
+        .where(table.c.ref_count != file_refs + version_refs)
+        .values(ref_count=file_refs + version_refs, updated_at=now)
+    )
+    db.session.commit()
+    return result.rowcount or 0
+
+
+def collect_file_blob_garbage():
+    """Gleicht die Verweiszähler ab und entfernt Datei-Blobs ohne Verweise."""
+    corrected = reconcile_file_blob_refs()
+    if corrected:
+        logger.warning(f"Blob-Speicher: {corrected} Verweiszähler von Dateien korrigiert")
+
+    def referenced(hashes):
+        return [content_hash for (content_hash,) in db.session.query(FileBlob.content_hash).filter(
+            FileBlob.content_hash.in_(hashes),
+            FileBlob.ref_count > 0,
+        ).all()]
+
+    removed = collect_garbage(FILE_BLOB_NAMESPACE, referenced)
+
+    cutoff = datetime.utcnow() - timedelta(seconds=GC_MIN_AGE_SECONDS)
+    FileBlob.query.filter(FileBlob.ref_count <= 0, FileBlob.updated_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+
+    if removed:
+        logger.info(f"Blob-Speicher: {removed} nicht mehr verwendete Dateiinhalte entfernt")
+    return removed
+
+
+def reap_file_paths(paths=()):
+    """
+    Job ``file_path_reaper``: löscht die Dateien gelöschter Altbestand-Einträge.
+
+    Pfade, auf die noch eine Datei oder Version verweist, bleiben erhalten.
+    Schlägt das Löschen fehl, wird der Job von der Queue mit Backoff
+    wiederholt; bereits entfernte Pfade werden dabei übersprungen.
+    """
+    paths = [path for path in paths if path and not is_blob_path(path)]
+    if not paths:
+        return 0
+    referenced = {path for (path,) in db.session.query(File.file_path).filter(File.file_path.in_(paths)).all()}
+    referenced.update(
+        path for (path,) in db.session.query(FileVersion.file_path).filter(FileVersion.file_path.in_(paths)).all()
+    )
+
+    removed = 0
+    failed = []
+    for path in paths:
+        if path in referenced:
+            continue
+        absolute_path = path if os.path.isabs(path) else os.path.join(os.getcwd(), path)
+        try:
+            os.remove(absolute_path)
+            removed += 1
+        except FileNotFoundError:
+            continue
+        except OSError as exc:
+            failed.append(f"{path} ({exc})")
+
+    if removed:
+        logger.info(f"Dateien: {removed} gelöschte Altbestand-Dateien entfernt")
+    if failed:
+        raise OSError(f"{len(failed)} Dateien konnten nicht entfernt werden: {'; '.join(failed[:5])}")
+    return removed
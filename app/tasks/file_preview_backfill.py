@@ -0,0 +1,74 @@
+"""
+Hintergrundaufgabe für die gespeicherten Dateivorschauen (app/utils/file_previews.py).
+
+``generate_missing_previews`` erzeugt Vorschauen für Dateien ohne aktuelle
+Vorschau nach: den Bestand nach der Einführung, Dateien aus anderen Quellen
+(z.B. Backup-Wiederherstellung) und nach einer Erhöhung von
+``FILE_PREVIEW_VERSION`` alle Dateien. Läuft als periodischer Job (siehe
+app/tasks/job_handlers.py).
+"""
+
+import logging
+import time
+
+from sqlalchemy import or_
+
+from app import db
+from app.models.file import File, FilePreview
+from app.utils.file_previews import FILE_PREVIEW_VERSION, refresh_file_preview
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_BATCH_SIZE = 100
+# Laufzeit pro Job; danach wird ein Folgejob eingereiht, damit andere Jobs nicht warten
+PREVIEW_TIME_BUDGET_SECONDS = 120
+
+
+def generate_missing_previews(after_id=0):
+    """
+    Erzeugt fehlende oder veraltete Dateivorschauen in Stapeln (commit pro Stapel).
+
+    Ist das Zeitbudget erschöpft, wird ein Folgejob ab der zuletzt
+    bearbeiteten ID eingereiht.
+    """
+    from app.tasks.job_queue import PRIORITY_LOW, enqueue_job
+
+    started = time.monotonic()
+    generated = 0
+    last_id = int(after_id or 0)
+    while True:
+        files = File.query.outerjoin(FilePreview, FilePreview.file_id == File.id).filter(
+            File.id > last_id,
+            File.is_current.is_(True),
+            or_(
+                File.content_hash.is_(None),
+                FilePreview.file_id.is_(None),
+                FilePreview.content_hash != File.content_hash,
+                FilePreview.preview_version != FILE_PREVIEW_VERSION,
+            ),
+        ).order_by(File.id).limit(PREVIEW_BATCH_SIZE).all()
+        if not files:
+            break
+
+        for file in files:
+            try:
+                if refresh_file_preview(file):
+                    generated += 1
+            except Exception as exc:
+                logger.error(f"Vorschau für Datei {file.id} konnte nicht erzeugt werden: {exc}")
+        last_id = files[-1].id
+        db.session.commit()
+        db.session.expunge_all()
+
+        if time.monotonic() - started >= PREVIEW_TIME_BUDGET_SECONDS:
+            enqueue_job(
+                'file_preview_backfill',
+                payload={'after_id': last_id},
+                priority=PRIORITY_LOW,
+                dedup_key=f'file_preview_backfill:{last_id}',
+            )
+            break
+
+    if generated:
+        logger.info(f"Dateivorschauen: {generated} Dateien bearbeitet (bis ID {last_id})")
+    return generated
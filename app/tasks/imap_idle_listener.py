@@ -0,0 +1,338 @@
+"""
+IMAP-IDLE-Listener für den Posteingang.
+
+Statt nur im Intervall des E-Mail-Sync-Jobs (15–60 Minuten) neue Nachrichten
+zu sehen, hält der Scheduler-Leader eine eigene IMAP-Verbindung im IDLE-Modus
+(RFC 2177) auf der INBOX offen. Meldet der Server ``EXISTS``, ``EXPUNGE`` oder
+geänderte Flags, wird die INBOX inkrementell synchronisiert (nur neue UIDs,
+siehe ``sync_emails_from_folder``) und ein ``email_update`` an alle Benutzer
+mit Leserecht gesendet.
+
+- läuft nur im Prozess, der gerade Scheduler-Leader ist (einmal pro Cluster)
+- nutzt eine eigene Verbindung, nicht den Pool (IDLE blockiert die Verbindung)
+- IDLE wird spätestens nach ``IMAP_IDLE_TIMEOUT`` Sekunden erneuert
+- ohne IDLE-Unterstützung des Servers bleibt es beim periodischen Sync
+- solange IDLE aktiv ist, verlängert sich das Sync-Intervall auf
+  ``IMAP_IDLE_POLL_INTERVAL_MINUTES`` (die übrigen Ordner werden weiter gepollt)
+"""
+
+import imaplib
+import logging
+import re
+import select
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+IDLE_FOLDER = 'INBOX'
+DEFAULT_IDLE_TIMEOUT = 25 * 60
+DEFAULT_POLL_INTERVAL_MINUTES = 60
+NOT_LEADER_WAIT_SECONDS = 30
+RECONNECT_BASE_DELAY = 10
+RECONNECT_MAX_DELAY = 300
+# Wartezeit, um mehrere kurz aufeinanderfolgende Meldungen zu einem Sync zusammenzufassen
+CHANGE_SETTLE_SECONDS = 1.0
+# Maximale Wartezeit auf den Sync-Lock, bevor es später erneut versucht wird
+SYNC_LOCK_TIMEOUT = 60
+
+_CHANGE_RE = re.compile(rb'^\* \d+ (EXISTS|EXPUNGE|FETCH)\b', re.IGNORECASE)
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+class _LineReader:
+    """
+    Liest Zeilen direkt vom Socket, mit Zeitlimit pro Zeile.
+
+    ``imaplib`` liest über ein gepuffertes Dateiobjekt, das nach einem
+    Socket-Timeout nicht mehr verwendbar ist. Während IDLE wird deshalb
+    per ``select`` gewartet und selbst gepuffert.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = b''
+
+    def _pending(self):
+        pending = getattr(self.sock, 'pending', None)
+        return pending() if pending else 0
+
+    def readline(self, timeout):
+        deadline = time.monotonic() + max(0.0, timeout)
+        while b'\n' not in self.buffer:
+            remaining = deadline - time.monotonic()
+            if not self._pending():
+                if remaining <= 0:
+                    return None
+                readable, _, _ = select.select([self.sock], [], [], remaining)
+                if not readable:
+                    return None
+            chunk = self.sock.recv(8192)
+            if not chunk:
+                raise imaplib.IMAP4.abort('Verbindung vom Server geschlossen')
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        return line.rstrip(b'\r')
+
+
+class ImapIdleListener:
+    """Hintergrund-Thread, der die INBOX per IMAP IDLE beobachtet."""
+
+    def __init__(self, app, is_leader):
+        self.app = app
+        self.is_leader = is_leader
+        self.running = False
+        self.thread = None
+        self.idle_timeout = max(60, int(app.config.get('IMAP_IDLE_TIMEOUT', DEFAULT_IDLE_TIMEOUT)))
+        self.conn = None
+        self.active = False
+        self.last_event_at = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True, name='imap-idle')
+        self.thread.start()
+        logger.info("IMAP-IDLE-Listener gestartet")
+
+    def stop(self):
+        self.running = False
+        self._stop_event.set()
+        self._disconnect()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def _should_listen(self):
+        return self.running and self.is_leader()
+
+    def _run(self):
+        delay = RECONNECT_BASE_DELAY
+        while self.running:
+            if not self.is_leader():
+                self._disconnect()
+                self._stop_event.wait(NOT_LEADER_WAIT_SECONDS)
+                continue
+            try:
+                with self.app.app_context():
+                    supported = self._listen()
+                if supported is False:
+                    logger.info("IMAP-Server unterstützt kein IDLE - es bleibt beim periodischen Sync")
+                    self.running = False
+                    break
+                delay = RECONNECT_BASE_DELAY
+            except Exception as exc:
+                logger.warning(f"IMAP-IDLE unterbrochen: {exc} - neuer Versuch in {delay}s")
+                self._disconnect()
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        self._disconnect()
+
+    def _connect(self):
+        from flask import current_app
+        from app.blueprints.email import _is_placeholder_imap_config
+
+        config = current_app.config
+        server = config.get('IMAP_SERVER')
+        port = config.get('IMAP_PORT', 993)
+        username = config.get('MAIL_USERNAME')
+        password = config.get('MAIL_PASSWORD')
+        if not all([server, username, password]) or _is_placeholder_imap_config(server, username, password):
+            return None
+
+        if config.get('IMAP_USE_SSL', True):
+            conn = imaplib.IMAP4_SSL(server, port, timeout=30)
+        else:
+            conn = imaplib.IMAP4(server, port, timeout=30)
+        try:
+            conn.login(username, password)
+        except Exception:
+            try:
+                conn.shutdown()
+            except Exception:
+                pass
+            raise
+        return conn
+
+    def _disconnect(self):
+        conn, self.conn = self.conn, None
+        self.active = False
+        if conn is None:
+            return
+        try:
+            conn.logout()
+        except Exception:
+            try:
+                conn.shutdown()
+            except Exception:
+                pass
+
+    def _listen(self):
+        """
+        Baut die Verbindung auf und wartet per IDLE auf Änderungen, solange dieser Prozess Leader ist.
+
+        Returns:
+            False, wenn der Server kein IDLE kann; sonst None
+        """
+        from app.utils.imap_sync import get_capabilities, select_folder
+
+        self.conn = self._connect()
+        if self.conn is None:
+            # Keine (gültige) IMAP-Konfiguration: später erneut prüfen
+            self._stop_event.wait(NOT_LEADER_WAIT_SECONDS * 10)
+            return None
+        if 'IDLE' not in get_capabilities(self.conn):
+            self._disconnect()
+            return False
+        selected, status = select_folder(self.conn, IDLE_FOLDER, readonly=True)
+        if not selected:
+            raise imaplib.IMAP4.error(f"{IDLE_FOLDER} konnte nicht ausgewählt werden: {status}")
+
+        self.active = True
+        # Änderungen zwischen letztem Sync und Beginn von IDLE nicht verpassen
+        pending_sync, notify = True, False
+        while self._should_listen():
+            if pending_sync and self._sync_inbox(notify):
+                pending_sync, notify = False, False
+            changed = self._idle(timeout=5 if pending_sync else self.idle_timeout)
+            if changed:
+                pending_sync, notify = True, True
+        self._disconnect()
+        return None
+
+    def _idle(self, timeout):
+        """
+        Führt einen IDLE-Zyklus aus.
+
+        Endet bei einer Änderungsmeldung, nach ``timeout`` Sekunden oder wenn
+        dieser Prozess die Leitung verliert.
+
+        Returns:
+            True, wenn der Server Änderungen an der INBOX gemeldet hat
+        """
+        conn = self.conn
+        tag = conn._new_tag()
+        conn.send(tag + b' IDLE\r\n')
+        reader = _LineReader(conn.sock)
+        line = reader.readline(30)
+        if line is None or not line.startswith(b'+'):
+            raise imaplib.IMAP4.abort(f"IDLE abgelehnt: {line!r}")
+
+        changed = False
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._should_listen():
+                break
+            line = reader.readline(min(remaining, NOT_LEADER_WAIT_SECONDS))
+            if line is None:
+                continue
+            if line.upper().startswith(b'* BYE'):
+                raise imaplib.IMAP4.abort(line.decode('utf-8', errors='ignore'))
+            if _CHANGE_RE.match(line):
+                changed = True
+                # Weitere Meldungen kurz abwarten, damit mehrere Nachrichten gemeinsam geholt werden
+                deadline = min(deadline, time.monotonic() + CHANGE_SETTLE_SECONDS)
+
+        conn.send(b'DONE\r\n')
+        while True:
+            line = reader.readline(30)
+            if line is None:
+                raise imaplib.IMAP4.abort('Keine Antwort auf DONE')
+            if _CHANGE_RE.match(line):
+                changed = True
+            if line.startswith(tag + b' '):
+                conn.tagged_commands.pop(tag, None)
+                if not line[len(tag) + 1:].upper().startswith(b'OK'):
+                    raise imaplib.IMAP4.abort(line.decode('utf-8', errors='ignore'))
+                break
+        if changed:
+            self.last_event_at = time.time()
+        return changed
+
+    def _sync_inbox(self, notify=True):
+        """
+        Synchronisiert die INBOX inkrementell und benachrichtigt (nach IDLE-Meldungen) die Clients.
+
+        Returns:
+            False, wenn gerade eine andere Synchronisation läuft (später erneut versuchen)
+        """
+        from app.blueprints.email import sync_emails_from_folder
+        from app.utils.lock_manager import acquire_email_sync_lock
+
+        from app import db
+
+        try:
+            with acquire_email_sync_lock(timeout=SYNC_LOCK_TIMEOUT) as acquired:
+                if not acquired:
+                    logger.debug("IMAP-IDLE: Synchronisation läuft bereits, später erneut")
+                    return False
+                success, message = sync_emails_from_folder(IDLE_FOLDER)
+            if not success:
+                logger.warning(f"IMAP-IDLE: Synchronisation fehlgeschlagen: {message}")
+            else:
+                logger.debug(f"IMAP-IDLE: {message}")
+                if notify:
+                    notify_email_readers(IDLE_FOLDER, message)
+            return True
+        finally:
+            db.session.remove()
+
+
+def notify_email_readers(folder_name, message):
+    """Sendet ``email_update`` (Socket.IO-Dashboard und SSE) an alle Benutzer mit Leserecht."""
+    from app import db
+    from app.blueprints.sse import emit_email_sync_status
+    from app.models.email import EmailPermission
+    from app.utils.dashboard_events import emit_dashboard_update
+    from app.utils.email_folder_counts import get_unread_email_count
+
+    try:
+        user_ids = [
+            user_id for (user_id,) in db.session.query(EmailPermission.user_id).filter(
+                EmailPermission.can_read == True  # noqa: E712
+            ).all()
+        ]
+        if not user_ids:
+            return
+        unread_count = get_unread_email_count()
+        payload = {'count': unread_count, 'folder': folder_name, 'message': message}
+        for user_id in user_ids:
+            emit_dashboard_update(user_id, 'email_update', payload)
+            emit_email_sync_status(user_id, 'email_update', payload)
+    except Exception as exc:
+        logger.error(f"IMAP-IDLE: Fehler beim Senden der E-Mail-Updates: {exc}")
+
+
+def start_idle_listener(app, is_leader):
+    """Startet den IDLE-Listener dieses Prozesses (falls ``IMAP_IDLE_ENABLED``)."""
+    global _listener
+    if not app.config.get('IMAP_IDLE_ENABLED', True):
+        return None
+    with _listener_lock:
+        if _listener is None:
+            _listener = ImapIdleListener(app, is_leader)
+            _listener.start()
+    return _listener
+
+
+def stop_idle_listener():
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def is_idle_active():
+    """True, wenn dieser Prozess die INBOX gerade per IDLE beobachtet."""
+    return _listener is not None and _listener.running and _listener.active
+
+
+def get_poll_interval(app_config):
+    """Sync-Intervall in Sekunden, solange IDLE die INBOX abdeckt."""
+    minutes = app_config.get('IMAP_IDLE_POLL_INTERVAL_MINUTES', DEFAULT_POLL_INTERVAL_MINUTES)
+    return max(15, int(minutes)) * 60
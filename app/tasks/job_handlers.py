@@ -0,0 +1,76 @@
+"""
+Registrierung aller Job-Typen der Hintergrund-Queue.
+
+Wird von ``start_job_queue`` importiert. Die eigentliche Arbeit liegt in den
+jeweiligen Modulen; hier wird nur festgelegt, welcher Job-Typ welche Funktion
+ausführt und welche Aufgaben periodisch eingereiht werden.
+"""
+
+from app.tasks.job_queue import (
+    PRIORITY_LOW,
+    PRIORITY_NORMAL,
+    cleanup_finished_jobs,
+    register_job_handler,
+    register_periodic_job,
+)
+from app.utils.notifications import send_chat_notification, send_file_notification
+from app.blueprints.email import run_manual_email_sync
+from app.blueprints.media_downloader import process_download_job
+from app.tasks.email_sync_scheduler import get_sync_interval, run_email_cleanup, run_scheduled_email_sync
+from app.tasks.email_attachment_blobs import collect_attachment_blob_garbage, migrate_attachments_to_blob_store
+from app.tasks.email_search_index import index_pending_emails
+from app.utils.email_folder_counts import run_folder_count_reconciliation
+from app.tasks.outbound_mail import FLUSH_JOB_TYPE, flush_outbound_emails, run_outbound_maintenance
+from app.tasks.notification_scheduler import NOTIFICATION_TICK_SECONDS, run_notification_tick
+from app.tasks.media_downloader_cleanup import cleanup_expired_downloads
+from app.tasks.file_blobs import collect_file_blob_garbage, migrate_files_to_blob_store, reap_file_paths
+from app.tasks.file_preview_backfill import generate_missing_previews
+from app.utils.file_previews import PREVIEW_JOB_TYPE, generate_file_previews
+from app.utils.file_deletion import REAPER_JOB_TYPE
+from app.utils.chunked_upload import cleanup_stale_uploads
+
+# Benachrichtigungen
+register_job_handler('chat_notification', send_chat_notification)
+register_job_handler('file_notification', send_file_notification)
+register_job_handler('notification_tick', run_notification_tick)
+
+# Dateien
+register_job_handler(PREVIEW_JOB_TYPE, generate_file_previews)
+register_job_handler('file_preview_backfill', generate_missing_previews)
+register_job_handler('file_upload_cleanup', cleanup_stale_uploads)
+register_job_handler('file_blob_migration', migrate_files_to_blob_store)
+register_job_handler('file_blob_gc', collect_file_blob_garbage)
+register_job_handler(REAPER_JOB_TYPE, reap_file_paths)
+
+# E-Mail
+register_job_handler('email_manual_sync', run_manual_email_sync)
+register_job_handler('email_sync', run_scheduled_email_sync)
+register_job_handler('email_cleanup', run_email_cleanup)
+register_job_handler('email_attachment_blob_migration', migrate_attachments_to_blob_store)
+register_job_handler('email_attachment_blob_gc', collect_attachment_blob_garbage)
+register_job_handler('email_search_index', index_pending_emails)
+register_job_handler('email_folder_counts', run_folder_count_reconciliation)
+register_job_handler(FLUSH_JOB_TYPE, flush_outbound_emails)
+register_job_handler('outbound_email_maintenance', run_outbound_maintenance)
+
+# Media-Downloader
+register_job_handler('media_download', process_download_job)
+register_job_handler('media_downloader_cleanup', cleanup_expired_downloads)
+
+# Queue-Wartung
+register_job_handler('job_queue_cleanup', cleanup_finished_jobs)
+
+register_periodic_job('email_sync', get_sync_interval, priority=PRIORITY_NORMAL)
+register_periodic_job('email_cleanup', 60 * 60, priority=PRIORITY_LOW)
+register_periodic_job('outbound_email_maintenance', 60, priority=PRIORITY_NORMAL)
+register_periodic_job('notification_tick', NOTIFICATION_TICK_SECONDS, priority=PRIORITY_NORMAL)
+register_periodic_job('media_downloader_cleanup', 15 * 60, priority=PRIORITY_LOW)
+register_periodic_job('email_attachment_blob_migration', 6 * 60 * 60, priority=PRIORITY_LOW)
+register_periodic_job('email_attachment_blob_gc', 24 * 60 * 60, priority=PRIORITY_LOW)
+register_periodic_job('email_search_index', 60 * 60, priority=PRIORITY_LOW)
+register_periodic_job('email_folder_counts', 6 * 60 * 60, priority=PRIORITY_LOW)
+register_periodic_job('file_preview_backfill', 60 * 60, priority=PRIORITY_LOW)
+register_periodic_job('file_upload_cleanup', 60 * 60, priority=PRIORITY_LOW)
+register_periodic_job('file_blob_migration', 6 * 60 * 60, priority=PRIORITY_LOW)
+register_periodic_job('file_blob_gc', 24 * 60 * 60, priority=PRIORITY_LOW)
+register_periodic_job('job_queue_cleanup', 24 * 60 * 60, priority=PRIORITY_LOW)
@@ -0,0 +1,581 @@
+"""
+Persistente Hintergrund-Job-Queue.
+
+Jobs werden in der Tabelle ``background_jobs`` gespeichert und von einem
+Worker-Pool (``JOB_QUEUE_CONCURRENCY`` Threads pro Prozess) abgearbeitet.
+Mehrere Gunicorn-Worker können dieselbe Queue bedienen: ein Job wird per
+bedingtem UPDATE (``status='queued'`` -> ``'running'``) genau einem Worker
+zugeteilt. Nach einem Absturz werden hängende Jobs nach
+``JOB_QUEUE_STALE_AFTER`` Sekunden erneut eingeplant.
+
+Ist Redis aktiviert (``REDIS_ENABLED``), weckt ``enqueue_job`` wartende Worker
+aller Prozesse sofort über eine Redis-Liste auf; ohne Redis fragen Worker
+anderer Prozesse die Tabelle alle ``JOB_QUEUE_POLL_INTERVAL`` Sekunden ab.
+
+Fehlgeschlagene Jobs werden mit exponentiellem Backoff bis ``max_attempts``
+wiederholt. Wiederkehrende Aufgaben (E-Mail-Sync, Bereinigungen) werden über
+``register_periodic_job`` regelmäßig eingereiht. Das Einreihen und die
+Wiederherstellung hängender Jobs übernimmt nur der gewählte Scheduler-Leader
+(``LeaderLease``), damit diese Aufgaben einmal pro Cluster statt einmal pro
+Gunicorn-Worker laufen. Mit ``JOB_SCHEDULER_ENABLED=False`` starten die
+Web-Worker keinen Scheduler; dann übernimmt ``flask run-scheduler``.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import func, update
+
+from app import db
+from app.models.background_job import BackgroundJob
+from app.utils.lock_manager import LeaderLease
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_LOW = 10
+PRIORITY_NORMAL = 50
+PRIORITY_HIGH = 100
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_POLL_INTERVAL = 2
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_BASE_DELAY = 30
+DEFAULT_RETRY_MAX_DELAY = 3600
+DEFAULT_STALE_AFTER = 7200
+DEFAULT_RETENTION_DAYS = 7
+
+REDIS_WAKEUP_KEY = 'prismateams:jobs:wakeup'
+SCHEDULER_TICK_SECONDS = 30
+SCHEDULER_INITIAL_DELAY = 30
+SCHEDULER_RECOVERY_SECONDS = 60
+DEFAULT_LEADER_LEASE_SECONDS = 90
+
+ACTIVE_STATUSES = (BackgroundJob.STATUS_QUEUED, BackgroundJob.STATUS_RUNNING)
+
+_handlers = {}
+_periodic_jobs = {}
+_local_wakeup = threading.Event()
+
+_worker_pool = None
+_scheduler = None
+_start_lock = threading.Lock()
+
+
+class JobDeferred(Exception):
+    """Vom Handler auszulösen, wenn der Job später erneut laufen soll (zählt nicht als Fehlversuch)."""
+
+    def __init__(self, delay=5):
+        super().__init__(f"Job um {delay}s verschoben")
+        self.delay = delay
+
+
+def _config(key, default):
+    if has_app_context():
+        return current_app.config.get(key, default)
+    return default
+
+
+def job_handler(job_type):
+    """
+    Registriert eine Funktion als Handler für einen Job-Typ.
+
+    Der Handler wird mit dem Payload als Keyword-Argumenten innerhalb eines
+    Application Contexts aufgerufen.
+    """
+    def decorator(func):
+        register_job_handler(job_type, func)
+        return func
+    return decorator
+
+
+def register_job_handler(job_type, func):
+    _handlers[job_type] = func
+
+
+def register_periodic_job(job_type, interval, priority=PRIORITY_LOW, max_attempts=1):
+    """
+    Reiht ``job_type`` regelmäßig ein.
+
+    Args:
+        job_type: Registrierter Job-Typ
+        interval: Sekunden oder Callable, das die Sekunden liefert (im App-Context)
+        priority: Priorität der eingereihten Jobs
+        max_attempts: Versuche pro Ausführung (Standard 1, der nächste Lauf folgt ohnehin)
+    """
+    _periodic_jobs[job_type] = {
+        'interval': interval,
+        'priority': priority,
+        'max_attempts': max_attempts,
+    }
+
+
+def wake_job_workers():
+    """Weckt wartende Worker (z.B. nach ``enqueue_job(..., commit=False)`` und eigenem Commit)."""
+    _local_wakeup.set()
+    try:
+        from app.blueprints.sse import get_redis_client
+        client = get_redis_client()
+        if client:
+            client.lpush(REDIS_WAKEUP_KEY, '1')
+            client.ltrim(REDIS_WAKEUP_KEY, 0, 99)
+    except Exception as exc:
+        logger.debug(f"Job-Queue: Redis-Wakeup fehlgeschlagen: {exc}")
+
+
+def enqueue_job(job_type, payload=None, priority=PRIORITY_NORMAL, delay=0,
+                max_attempts=None, dedup_key=None, commit=True):
+    """
+    Reiht einen Job ein und liefert dessen ID.
+
+    Mit ``dedup_key`` wird kein neuer Job angelegt, solange ein Job mit
+    gleichem Schlüssel noch ansteht oder läuft; dann wird dessen ID geliefert.
+
+    ``commit=False`` legt den Job in der laufenden Transaktion an (z.B. atomar
+    mit den Daten, auf die er sich bezieht); der Aufrufer committet selbst.
+    """
+    if dedup_key:
+        existing_id = db.session.query(BackgroundJob.id).filter(
+            BackgroundJob.dedup_key == dedup_key,
+            BackgroundJob.status.in_(ACTIVE_STATUSES),
+        ).scalar()
+        if existing_id:
+            return existing_id
+
+    job = BackgroundJob(
+        job_type=job_type,
+        payload=json.dumps(payload or {}),
+        priority=priority,
+        max_attempts=max_attempts or _config('JOB_QUEUE_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS),
+        dedup_key=dedup_key,
+        status=BackgroundJob.STATUS_QUEUED,
+        run_at=datetime.utcnow() + timedelta(seconds=delay),
+    )
+    db.session.add(job)
+    if commit:
+        db.session.commit()
+        wake_job_workers()
+    else:
+        db.session.flush()
+    return job.id
+
+
+def _retry_delay(attempts):
+    base = _config('JOB_QUEUE_RETRY_BASE_DELAY', DEFAULT_RETRY_BASE_DELAY)
+    maximum = _config('JOB_QUEUE_RETRY_MAX_DELAY', DEFAULT_RETRY_MAX_DELAY)
+    return min(maximum, base * (2 ** max(0, attempts - 1)))
+
+
+def _claim_next_job(worker_id):
+    """Teilt diesem Worker den dringendsten fälligen Job zu (oder None)."""
+    now = datetime.utcnow()
+    candidate_ids = [
+        job_id
+        for (job_id,) in db.session.query(BackgroundJob.id).filter(
+            BackgroundJob.status == BackgroundJob.STATUS_QUEUED,
+            BackgroundJob.run_at <= now,
+        ).order_by(
+            BackgroundJob.priority.desc(),
+            BackgroundJob.run_at.asc(),
+            BackgroundJob.id.asc(),
+        ).limit(5).all()
+    ]
+    db.session.rollback()
+
+    for job_id in candidate_ids:
+        result = db.session.execute(
+            update(BackgroundJob)
+            .where(BackgroundJob.id == job_id, BackgroundJob.status == BackgroundJob.STATUS_QUEUED)
+            .values(
+                status=BackgroundJob.STATUS_RUNNING,
+                locked_by=worker_id,
+                started_at=now,
+                attempts=BackgroundJob.attempts + 1,
+            )
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            return db.session.get(BackgroundJob, job_id)
+    return None
+
+
+def _finish_job(job_id, **values):
+    db.session.execute(update(BackgroundJob).where(BackgroundJob.id == job_id).values(**values))
+    db.session.commit()
+
+
+def _execute_job(job):
+    job_id = job.id
+    job_type = job.job_type
+    attempts = job.attempts
+    max_attempts = job.max_attempts
+    payload = job.get_payload()
+    handler = _handlers.get(job_type)
+
+    try:
+        if handler is None:
+            raise LookupError(f"Kein Handler für Job-Typ '{job_type}' registriert")
+        handler(**payload)
+        db.session.commit()
+        _finish_job(
+            job_id,
+            status=BackgroundJob.STATUS_SUCCEEDED,
+            finished_at=datetime.utcnow(),
+            locked_by=None,
+            last_error=None,
+        )
+    except JobDeferred as deferred:
+        db.session.rollback()
+        _finish_job(
+            job_id,
+            status=BackgroundJob.STATUS_QUEUED,
+            attempts=max(0, attempts - 1),
+            run_at=datetime.utcnow() + timedelta(seconds=deferred.delay),
+            locked_by=None,
+        )
+    except Exception as exc:
+        db.session.rollback()
+        error = f"{type(exc).__name__}: {exc}"[:2000]
+        if handler is not None and attempts < max_attempts:
+            delay = _retry_delay(attempts)
+            logger.warning(f"Job {job_id} ({job_type}) fehlgeschlagen, neuer Versuch in {delay}s: {error}")
+            _finish_job(
+                job_id,
+                status=BackgroundJob.STATUS_QUEUED,
+                run_at=datetime.utcnow() + timedelta(seconds=delay),
+                locked_by=None,
+                last_error=error,
+            )
+        else:
+            logger.error(f"Job {job_id} ({job_type}) endgültig fehlgeschlagen: {error}", exc_info=True)
+            _finish_job(
+                job_id,
+                status=BackgroundJob.STATUS_FAILED,
+                finished_at=datetime.utcnow(),
+                locked_by=None,
+                last_error=error,
+            )
+
+
+def recover_stale_jobs():
+    """Plant Jobs neu ein, deren Worker (z.B. nach einem Absturz) nicht zurückgemeldet hat."""
+    stale_after = _config('JOB_QUEUE_STALE_AFTER', DEFAULT_STALE_AFTER)
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after)
+    stale_filter = (
+        BackgroundJob.status == BackgroundJob.STATUS_RUNNING,
+        BackgroundJob.started_at < cutoff,
+    )
+    failed = db.session.execute(
+        update(BackgroundJob)
+        .where(*stale_filter, BackgroundJob.attempts >= BackgroundJob.max_attempts)
+        .values(
+            status=BackgroundJob.STATUS_FAILED,
+            finished_at=datetime.utcnow(),
+            locked_by=None,
+            last_error='Zeitüberschreitung (Worker nicht zurückgemeldet)',
+        )
+    ).rowcount
+    requeued = db.session.execute(
+        update(BackgroundJob)
+        .where(*stale_filter)
+        .values(status=BackgroundJob.STATUS_QUEUED, run_at=datetime.utcnow(), locked_by=None)
+    ).rowcount
+    db.session.commit()
+    if failed or requeued:
+        logger.warning(f"Job-Queue: {requeued} hängende Job(s) neu eingeplant, {failed} als fehlgeschlagen markiert")
+    return requeued
+
+
+def cleanup_finished_jobs():
+    """Entfernt abgeschlossene Jobs nach ``JOB_QUEUE_RETENTION_DAYS`` (fehlgeschlagene nach der vierfachen Zeit)."""
+    retention_days = _config('JOB_QUEUE_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    now = datetime.utcnow()
+    deleted = BackgroundJob.query.filter(
+        BackgroundJob.status == BackgroundJob.STATUS_SUCCEEDED,
+        BackgroundJob.finished_at < now - timedelta(days=retention_days),
+    ).delete(synchronize_session=False)
+    deleted += BackgroundJob.query.filter(
+        BackgroundJob.status == BackgroundJob.STATUS_FAILED,
+        BackgroundJob.finished_at < now - timedelta(days=retention_days * 4),
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    if deleted:
+        logger.info(f"Job-Queue: {deleted} abgeschlossene Job(s) entfernt")
+    return deleted
+
+
+def enqueue_due_periodic_jobs():
+    """Reiht fällige periodische Jobs ein (höchstens einer pro Typ aktiv)."""
+    now = datetime.utcnow()
+    enqueued = []
+    for job_type, options in _periodic_jobs.items():
+        dedup_key = f"periodic:{job_type}"
+        try:
+            interval = options['interval']
+            if callable(interval):
+                interval = interval()
+            last_created = db.session.query(func.max(BackgroundJob.created_at)).filter(
+                BackgroundJob.dedup_key == dedup_key,
+            ).scalar()
+            if last_created and last_created > now - timedelta(seconds=interval):
+                continue
+            enqueue_job(
+                job_type,
+                priority=options['priority'],
+                max_attempts=options['max_attempts'],
+                dedup_key=dedup_key,
+            )
+            enqueued.append(job_type)
+        except Exception as exc:
+            db.session.rollback()
+            logger.error(f"Job-Queue: Periodischer Job '{job_type}' konnte nicht eingereiht werden: {exc}")
+    return enqueued
+
+
+def get_queue_stats(window_minutes=60):
+    """Kennzahlen für die Admin-Ansicht: Tiefe, Wartezeiten, Fehler."""
+    now = datetime.utcnow()
+
+    by_type = {}
+    for job_type, status, count in db.session.query(
+        BackgroundJob.job_type, BackgroundJob.status, func.count(BackgroundJob.id)
+    ).group_by(BackgroundJob.job_type, BackgroundJob.status).all():
+        by_type.setdefault(job_type, {status_name: 0 for status_name in (
+            BackgroundJob.STATUS_QUEUED, BackgroundJob.STATUS_RUNNING,
+            BackgroundJob.STATUS_SUCCEEDED, BackgroundJob.STATUS_FAILED,
+        )})[status] = count
+
+    oldest_due = db.session.query(func.min(BackgroundJob.run_at)).filter(
+        BackgroundJob.status == BackgroundJob.STATUS_QUEUED,
+        BackgroundJob.run_at <= now,
+    ).scalar()
+    due_count = BackgroundJob.query.filter(
+        BackgroundJob.status == BackgroundJob.STATUS_QUEUED,
+        BackgroundJob.run_at <= now,
+    ).count()
+
+    recent = db.session.query(
+        BackgroundJob.created_at, BackgroundJob.run_at, BackgroundJob.started_at, BackgroundJob.finished_at
+    ).filter(
+        BackgroundJob.status == BackgroundJob.STATUS_SUCCEEDED,
+        BackgroundJob.finished_at >= now - timedelta(minutes=window_minutes),
+    ).order_by(BackgroundJob.finished_at.desc()).limit(1000).all()
+    waits = [
+        max(0.0, (started - max(created, run_at)).total_seconds())
+        for created, run_at, started, _ in recent if started
+    ]
+    runtimes = [
+        (finished - started).total_seconds()
+        for _, _, started, finished in recent if started and finished
+    ]
+
+    recent_failures = BackgroundJob.query.filter(
+        BackgroundJob.status == BackgroundJob.STATUS_FAILED,
+    ).order_by(BackgroundJob.finished_at.desc()).limit(20).all()
+    running = BackgroundJob.query.filter(
+        BackgroundJob.status == BackgroundJob.STATUS_RUNNING,
+    ).order_by(BackgroundJob.started_at.asc()).limit(50).all()
+
+    return {
+        'by_type': dict(sorted(by_type.items())),
+        'due_count': due_count,
+        'oldest_due_seconds': (now - oldest_due).total_seconds() if oldest_due else 0,
+        'window_minutes': window_minutes,
+        'completed_in_window': len(recent),
+        'avg_wait_seconds': sum(waits) / len(waits) if waits else 0,
+        'max_wait_seconds': max(waits) if waits else 0,
+        'avg_runtime_seconds': sum(runtimes) / len(runtimes) if runtimes else 0,
+        'recent_failures': recent_failures,
+        'running': running,
+    }
+
+
+class JobWorkerPool:
+    """Worker-Threads, die Jobs aus der Queue abarbeiten."""
+
+    def __init__(self, app, concurrency=DEFAULT_CONCURRENCY):
+        self.app = app
+        self.concurrency = max(1, int(concurrency))
+        self.running = False
+        self.threads = []
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        for index in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._run,
+                args=(f"{self.worker_prefix}:{index}",),
+                daemon=True,
+                name=f'job-worker-{index}',
+            )
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"Job-Queue: {self.concurrency} Worker gestartet")
+
+    def stop(self):
+        self.running = False
+        _local_wakeup.set()
+        for thread in self.threads:
+            thread.join(timeout=5)
+        self.threads = []
+
+    def _wait_for_work(self, poll_interval):
+        try:
+            from app.blueprints.sse import get_redis_client
+            client = get_redis_client()
+            if client:
+                client.blpop(REDIS_WAKEUP_KEY, timeout=max(1, int(poll_interval)))
+                return
+        except Exception as exc:
+            logger.debug(f"Job-Queue: Redis-Wartevorgang fehlgeschlagen: {exc}")
+        _local_wakeup.wait(poll_interval)
+        _local_wakeup.clear()
+
+    def _run(self, worker_id):
+        while self.running:
+            poll_interval = DEFAULT_POLL_INTERVAL
+            try:
+                with self.app.app_context():
+                    poll_interval = self.app.config.get('JOB_QUEUE_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+                    # Jeder Job läuft in einem eigenen App-Context (und damit eigener Session)
+                    job = _claim_next_job(worker_id)
+                    if job is not None:
+                        _execute_job(job)
+                        continue
+                self._wait_for_work(poll_interval)
+            except Exception as exc:
+                logger.error(f"Job-Queue: Fehler im Worker {worker_id}: {exc}", exc_info=True)
+                time.sleep(poll_interval)
+
+
+class PeriodicJobScheduler:
+    """
+    Reiht registrierte periodische Jobs ein; die Ausführung übernimmt der Worker-Pool.
+
+    Jeder Prozess mit Scheduler bewirbt sich bei jedem Takt um die Leitung;
+    nur der Leader reiht Jobs ein und plant hängende Jobs neu ein. Fällt der
+    Leader aus, übernimmt ein anderer Prozess spätestens nach Ablauf des Leases.
+    """
+
+    def __init__(self, app, initial_delay=SCHEDULER_INITIAL_DELAY):
+        self.app = app
+        self.running = False
+        self.thread = None
+        self.initial_delay = initial_delay
+        self.lease = LeaderLease(
+            'job_scheduler',
+            lease_seconds=app.config.get('JOB_SCHEDULER_LEASE_SECONDS', DEFAULT_LEADER_LEASE_SECONDS),
+        )
+        self._last_recovery = 0.0
+        self._stop_event = threading.Event()
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True, name='job-scheduler')
+        self.thread.start()
+        logger.info("Job-Scheduler gestartet")
+
+    def stop(self):
+        self.running = False
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    @property
+    def is_leader(self):
+        return self.running and self.lease.is_leader
+
+    def _tick(self):
+        if not self.lease.acquire():
+            return
+        now = time.monotonic()
+        if now - self._last_recovery >= SCHEDULER_RECOVERY_SECONDS:
+            self._last_recovery = now
+            recover_stale_jobs()
+        enqueue_due_periodic_jobs()
+
+    def _run(self):
+        self._stop_event.wait(self.initial_delay)
+        while self.running:
+            try:
+                with self.app.app_context():
+                    self._tick()
+            except Exception as exc:
+                logger.error(f"Job-Scheduler Fehler: {exc}", exc_info=True)
+            self._stop_event.wait(SCHEDULER_TICK_SECONDS)
+        try:
+            with self.app.app_context():
+                self.lease.release()
+        except Exception as exc:
+            logger.debug(f"Job-Scheduler: Leitung konnte nicht abgegeben werden: {exc}")
+
+
+def start_job_queue(app, with_scheduler=None, with_workers=True, scheduler_delay=SCHEDULER_INITIAL_DELAY):
+    """
+    Registriert alle Handler und startet Worker-Pool und Scheduler dieses Prozesses.
+
+    Ohne Angabe von ``with_scheduler`` entscheidet ``JOB_SCHEDULER_ENABLED``.
+    """
+    global _worker_pool, _scheduler
+    from app.tasks import job_handlers  # noqa: F401  (registriert Handler und periodische Jobs)
+
+    if with_scheduler is None:
+        with_scheduler = app.config.get('JOB_SCHEDULER_ENABLED', True)
+
+    with _start_lock:
+        if with_workers and _worker_pool is None:
+            _worker_pool = JobWorkerPool(app, app.config.get('JOB_QUEUE_CONCURRENCY', DEFAULT_CONCURRENCY))
+            _worker_pool.start()
+        if with_scheduler and _scheduler is None:
+            _scheduler = PeriodicJobScheduler(app, initial_delay=scheduler_delay)
+            _scheduler.start()
+            # IMAP IDLE läuft wie die periodischen Jobs nur beim Scheduler-Leader
+            from app.tasks.imap_idle_listener import start_idle_listener
+            start_idle_listener(app, is_scheduler_leader)
+    return _worker_pool
+
+
+def is_scheduler_leader():
+    """True, wenn dieser Prozess aktuell der Scheduler-Leader ist."""
+    return _scheduler is not None and _scheduler.is_leader
+
+
+def run_scheduler(app, with_workers=False):
+    """
+    Betreibt den Scheduler im Vordergrund (``flask run-scheduler``), bis der Prozess beendet wird.
+
+    Auch hier gilt die Leader-Wahl: Mehrere gestartete Scheduler-Prozesse
+    (z.B. zur Ausfallsicherheit) reihen Jobs trotzdem nur einmal ein.
+    """
+    start_job_queue(app, with_scheduler=True, with_workers=with_workers, scheduler_delay=0)
+    logger.info("Job-Scheduler läuft im Vordergrund (Strg+C zum Beenden)")
+    try:
+        while _scheduler is not None and _scheduler.running:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_job_queue()
+
+
+def stop_job_queue():
+    global _worker_pool, _scheduler
+    with _start_lock:
+        if _scheduler is not None:
+            from app.tasks.imap_idle_listener import stop_idle_listener
+            stop_idle_listener()
+            _scheduler.stop()
+            _scheduler = None
+        if _worker_pool is not None:
+            _worker_pool.stop()
+            _worker_pool = None
@@ -1,8 +1,6 @@
-"""Background cleanup for expired media downloader files."""
+"""Background cleanup for expired media downloader files (periodic job, see job_handlers)."""
 
 import logging
-import threading
-import time
 
 from datetime import datetime
 
@@ -12,8 +10,6 @@ from app.utils.media_downloader import delete_job_file
 
 logger = logging.getLogger(__name__)
 
-_scheduler = None
-
 
 def cleanup_expired_downloads():
     """Delete expired download jobs and their files."""
@@ -43,37 +39,3 @@ def cleanup_expired_downloads():
         logger.error('Media downloader cleanup failed: %s', exc, exc_info=True)
         db.session.rollback()
         return 0
-
-
-class MediaDownloaderCleanupScheduler:
-    def __init__(self, app):
-        self.app = app
-        self.running = False
-        self.thread = None
-
-    def start(self):
-        if self.running:
-            return
-        self.running = True
-        self.thread = threading.Thread(
-            target=self._run,
-            daemon=True,
-            name='media-downloader-cleanup',
-        )
-        self.thread.start()
-
-    def _run(self):
-        while self.running:
-            try:
-                with self.app.app_context():
-                    cleanup_expired_downloads()
-            except Exception as exc:
-                logger.error('Media downloader cleanup scheduler error: %s', exc, exc_info=True)
-            time.sleep(900)
-
-
-def start_media_downloader_cleanup(app):
-    global _scheduler
-    if _scheduler is None:
-        _scheduler = MediaDownloaderCleanupScheduler(app)
-    _scheduler.start()
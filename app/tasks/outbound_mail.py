@@ -0,0 +1,259 @@
+"""
+Versand der ausgehenden E-Mails aus der Warteschlange ``outbound_emails``.
+
+``send_email_with_lock`` speichert die fertige Nachricht nur noch und reiht
+den Job ``outbound_email_flush`` ein; der Request wartet nicht mehr auf
+Verbindungsaufbau, STARTTLS und LOGIN. Der Job stellt die anstehenden
+Nachrichten stapelweise über die wiederverwendete SMTP-Verbindung des
+Prozesses zu (app/utils/smtp_pool.py):
+
+- Einträge werden per bedingtem UPDATE (``queued`` -> ``sending``) genau
+  einem Versandlauf zugeteilt
+- ``MAIL_RATE_LIMIT_PER_MINUTE`` / ``MAIL_RATE_LIMIT_PER_HOUR`` begrenzen die
+  Zustellungen; ist das Kontingent erschöpft, wird der Job verschoben
+- ist der Server nicht erreichbar (Verbindung, Anmeldung, 421), bleiben die
+  Nachrichten ohne Fehlversuch in der Warteschlange und der Job wird verschoben
+- vorübergehende Fehler einer Nachricht (4xx) führen zu einem neuen Versuch
+  mit exponentiellem Backoff, dauerhafte Fehler (5xx) oder zu viele Versuche
+  markieren den Eintrag als ``failed``
+- ein periodischer Lauf fängt liegengebliebene Einträge auf (z.B. nach einem
+  Absturz während des Versands) und räumt alte Einträge auf
+"""
+
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, update
+from sqlalchemy.orm import undefer
+
+from app import db
+from app.models.outbound_email import OutboundEmail
+from app.utils.smtp_pool import get_smtp_connection, is_server_error, is_temporary_smtp_error
+
+logger = logging.getLogger(__name__)
+
+FLUSH_JOB_TYPE = 'outbound_email_flush'
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_TIME_BUDGET = 120
+DEFAULT_RETRY_BASE_DELAY = 60
+DEFAULT_RETRY_MAX_DELAY = 3600
+DEFAULT_RETENTION_DAYS = 7
+# Einträge, die so lange in ``sending`` hängen, gelten als abgebrochen
+STALE_SENDING_SECONDS = 15 * 60
+# Wartezeit nach einem 421 bzw. Verbindungsfehler, bevor der Job weitermacht
+SERVER_BACKOFF_SECONDS = 60
+
+
+def schedule_outbound_flush(delay=0):
+    """Reiht den Versand-Job ein (höchstens ein anstehender Job gleichzeitig)."""
+    from app.tasks.job_queue import PRIORITY_HIGH, enqueue_job
+
+    return enqueue_job(
+        FLUSH_JOB_TYPE,
+        priority=PRIORITY_HIGH,
+        delay=delay,
+        max_attempts=3,
+        dedup_key=FLUSH_JOB_TYPE,
+    )
+
+
+def _retry_delay(attempts):
+    base = current_app.config.get('MAIL_QUEUE_RETRY_BASE_DELAY', DEFAULT_RETRY_BASE_DELAY)
+    return min(base * (2 ** max(0, attempts - 1)), DEFAULT_RETRY_MAX_DELAY)
+
+
+def _rate_limit_allowance(now):
+    """
+    Anzahl der Nachrichten, die jetzt noch gesendet werden dürfen (None = unbegrenzt),
+    und ggf. die Wartezeit in Sekunden, bis wieder gesendet werden darf.
+    """
+    allowance = None
+    wait = 0
+    for limit_key, window in (('MAIL_RATE_LIMIT_PER_MINUTE', 60), ('MAIL_RATE_LIMIT_PER_HOUR', 3600)):
+        limit = int(current_app.config.get(limit_key) or 0)
+        if limit <= 0:
+            continue
+        since = now - timedelta(seconds=window)
+        sent, oldest = db.session.query(func.count(OutboundEmail.id), func.min(OutboundEmail.sent_at)).filter(
+            OutboundEmail.sent_at >= since,
+        ).one()
+        remaining = max(0, limit - sent)
+        allowance = remaining if allowance is None else min(allowance, remaining)
+        if remaining == 0 and oldest is not None:
+            wait = max(wait, int((oldest - since).total_seconds()) + 1)
+    return allowance, wait
+
+
+def _claim_batch(run_id, limit, now):
+    """Teilt diesem Lauf bis zu ``limit`` fällige Einträge zu."""
+    candidate_ids = [
+        entry_id
+        for (entry_id,) in db.session.query(OutboundEmail.id).filter(
+            OutboundEmail.status == OutboundEmail.STATUS_QUEUED,
+            OutboundEmail.next_attempt_at <= now,
+        ).order_by(OutboundEmail.next_attempt_at.asc(), OutboundEmail.id.asc()).limit(limit).all()
+    ]
+    if not candidate_ids:
+        db.session.rollback()
+        return []
+    db.session.execute(
+        update(OutboundEmail)
+        .where(OutboundEmail.id.in_(candidate_ids), OutboundEmail.status == OutboundEmail.STATUS_QUEUED)
+        .values(status=OutboundEmail.STATUS_SENDING, locked_by=run_id, locked_at=now)
+    )
+    db.session.commit()
+    return OutboundEmail.query.options(undefer(OutboundEmail.message)).filter(
+        OutboundEmail.locked_by == run_id,
+        OutboundEmail.status == OutboundEmail.STATUS_SENDING,
+    ).order_by(OutboundEmail.id.asc()).all()
+
+
+def _release(entries, run_id):
+    """Gibt zugeteilte, aber nicht versuchte Einträge zurück an die Warteschlange."""
+    ids = [entry.id for entry in entries]
+    if not ids:
+        return
+    db.session.execute(
+        update(OutboundEmail)
+        .where(OutboundEmail.id.in_(ids), OutboundEmail.locked_by == run_id)
+        .values(status=OutboundEmail.STATUS_QUEUED, locked_by=None, locked_at=None)
+    )
+    db.session.commit()
+
+
+def _mark_failed_attempt(entry, exc, now):
+    error = f"{type(exc).__name__}: {exc}"[:2000]
+    entry.attempts += 1
+    entry.last_error = error
+    entry.locked_by = None
+    entry.locked_at = None
+    if is_temporary_smtp_error(exc) and entry.attempts < entry.max_attempts:
+        entry.status = OutboundEmail.STATUS_QUEUED
+        entry.next_attempt_at = now + timedelta(seconds=_retry_delay(entry.attempts))
+        logger.warning(f"E-Mail {entry.id}: Versand fehlgeschlagen, neuer Versuch um {entry.next_attempt_at}: {error}")
+    else:
+        entry.status = OutboundEmail.STATUS_FAILED
+        entry.message = None
+        logger.error(f"E-Mail {entry.id} ('{entry.subject}') endgültig nicht zustellbar: {error}")
+
+
+def flush_outbound_emails():
+    """
+    Stellt anstehende E-Mails zu, bis die Warteschlange leer oder das Zeitbudget erschöpft ist.
+
+    Returns:
+        Anzahl zugestellter Nachrichten
+    """
+    from app.tasks.job_queue import JobDeferred
+
+    config = current_app.config
+    batch_size = max(1, int(config.get('MAIL_QUEUE_BATCH_SIZE', DEFAULT_BATCH_SIZE)))
+    time_budget = int(config.get('MAIL_QUEUE_TIME_BUDGET', DEFAULT_TIME_BUDGET))
+    run_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    connection = get_smtp_connection(config)
+    started = time.monotonic()
+    delivered = 0
+
+    while True:
+        now = datetime.utcnow()
+        allowance, wait = _rate_limit_allowance(now)
+        if allowance == 0:
+            logger.info(f"E-Mail-Versand: Ratenbegrenzung erreicht, weiter in {wait}s")
+            raise JobDeferred(max(1, wait))
+        entries = _claim_batch(run_id, batch_size if allowance is None else min(batch_size, allowance), now)
+        if not entries:
+            break
+
+        for index, entry in enumerate(entries):
+            try:
+                refused = connection.send(entry.sender, entry.get_recipients(), entry.message, config)
+            except Exception as exc:
+                if is_server_error(exc):
+                    # Server nicht erreichbar, Anmeldung fehlgeschlagen oder überlastet: kein
+                    # Fehlversuch der Nachricht, der ganze Rest des Stapels folgt später
+                    entry.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+                    db.session.commit()
+                    _release(entries[index:], run_id)
+                    logger.warning(f"E-Mail-Versand: SMTP-Server nicht verfügbar ({exc}), weiter in {SERVER_BACKOFF_SECONDS}s")
+                    raise JobDeferred(SERVER_BACKOFF_SECONDS)
+                _mark_failed_attempt(entry, exc, datetime.utcnow())
+                db.session.commit()
+                continue
+            entry.status = OutboundEmail.STATUS_SENT
+            entry.sent_at = datetime.utcnow()
+            entry.attempts += 1
+            entry.message = None
+            entry.locked_by = None
+            entry.locked_at = None
+            entry.last_error = (
+                f"Empfänger abgelehnt: {', '.join(sorted(refused))}"[:2000] if refused else None
+            )
+            # Sofort festhalten, damit eine Unterbrechung nicht den ganzen Stapel erneut sendet
+            db.session.commit()
+            delivered += 1
+        db.session.expunge_all()
+
+        if time.monotonic() - started >= time_budget:
+            # Weitere Nachrichten im Folgelauf, damit andere Jobs nicht warten
+            raise JobDeferred(1)
+
+    if delivered:
+        logger.info(f"E-Mail-Versand: {delivered} Nachricht(en) zugestellt")
+    return delivered
+
+
+def run_outbound_maintenance():
+    """
+    Periodischer Sicherheitslauf: gibt hängende Einträge frei, entfernt alte
+    Einträge und stößt den Versand an, falls noch Nachrichten anstehen.
+    """
+    now = datetime.utcnow()
+    requeued = db.session.execute(
+        update(OutboundEmail)
+        .where(
+            OutboundEmail.status == OutboundEmail.STATUS_SENDING,
+            OutboundEmail.locked_at < now - timedelta(seconds=STALE_SENDING_SECONDS),
+        )
+        .values(status=OutboundEmail.STATUS_QUEUED, locked_by=None, locked_at=None)
+    ).rowcount
+    if requeued:
+        logger.warning(f"E-Mail-Versand: {requeued} hängende Nachricht(en) erneut eingeplant")
+
+    retention_days = current_app.config.get('MAIL_QUEUE_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    OutboundEmail.query.filter(
+        OutboundEmail.status == OutboundEmail.STATUS_SENT,
+        OutboundEmail.sent_at < now - timedelta(days=retention_days),
+    ).delete(synchronize_session=False)
+    OutboundEmail.query.filter(
+        OutboundEmail.status == OutboundEmail.STATUS_FAILED,
+        OutboundEmail.created_at < now - timedelta(days=retention_days * 4),
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+    pending = db.session.query(OutboundEmail.id).filter(
+        OutboundEmail.status == OutboundEmail.STATUS_QUEUED,
+        OutboundEmail.next_attempt_at <= now,
+    ).first()
+    if pending:
+        schedule_outbound_flush()
+
+
+def get_outbound_queue_stats():
+    """Kennzahlen der Versand-Warteschlange für die Admin-Ansicht."""
+    counts = dict(
+        db.session.query(OutboundEmail.status, func.count(OutboundEmail.id)).group_by(OutboundEmail.status).all()
+    )
+    sent_last_hour = db.session.query(func.count(OutboundEmail.id)).filter(
+        OutboundEmail.sent_at >= datetime.utcnow() - timedelta(hours=1),
+    ).scalar()
+    return {
+        'queued': counts.get(OutboundEmail.STATUS_QUEUED, 0),
+        'sending': counts.get(OutboundEmail.STATUS_SENDING, 0),
+        'failed': counts.get(OutboundEmail.STATUS_FAILED, 0),
+        'sent_last_hour': sent_last_hour or 0,
+    }
@@ -62,6 +62,55 @@ def has_module_access(user, module_key):
     return role.has_access if role else False
 
 
+
+def filter_users_with_module_access(users, module_key):
+    """
+    Batch-Variante von has_module_access für viele Benutzer.
+
+    Modulrollen werden mit einer einzigen Abfrage für alle Benutzer geladen,
+    die weder Admin noch Vollzugriff haben.
+
+    Args:
+        users: Liste von User-Objekten
+        module_key: Modul-Schlüssel (z.B. 'module_chat')
+
+    Returns:
+        Liste der Benutzer mit Zugriff (Reihenfolge bleibt erhalten)
+    """
+    users = list(users)
+    if not users:
+        return []
+
+    module_enabled = is_module_enabled(module_key)
+    allowed = {}
+    needs_role = []
+    for user in users:
+        is_guest = hasattr(user, 'is_guest') and user.is_guest
+        if is_guest and module_key in ['module_email', 'module_credentials']:
+            allowed[user.id] = False
+        elif user.__class__.__name__ == 'AssessmentUser':
+            allowed[user.id] = module_key == 'module_assessment'
+        elif getattr(user, 'is_super_admin', False) or getattr(user, 'is_admin', False):
+            allowed[user.id] = True
+        elif not module_enabled:
+            allowed[user.id] = False
+        elif getattr(user, 'has_full_access', False) and not is_guest:
+            allowed[user.id] = True
+        else:
+            needs_role.append(user.id)
+
+    if needs_role:
+        roles = dict(
+            UserModuleRole.query.with_entities(UserModuleRole.user_id, UserModuleRole.has_access)
+            .filter(UserModuleRole.user_id.in_(needs_role), UserModuleRole.module_key == module_key)
+            .all()
+        )
+        for user_id in needs_role:
+            allowed[user_id] = bool(roles.get(user_id, False))
+
+    return [user for user in users if allowed.get(user.id)]
+
+
 def check_module_access(module_key):
     """
     Decorator für Route-Zugriffskontrolle.
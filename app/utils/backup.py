@@ -141,7 +141,10 @@ def export_backup(categories: List[str], output_path: str) -> Dict:
 
 def export_settings() -> List[Dict]:
     """Exportiert System-Einstellungen."""
-    settings = SystemSettings.query.all()
+    from app.utils.settings_store import VERSION_KEY
+
+    # Die Cache-Versionsmarke ist instanzspezifisch und wird nicht exportiert
+    settings = SystemSettings.query.filter(SystemSettings.key != VERSION_KEY).all()
     result = []
     
     for s in settings:
@@ -295,17 +298,11 @@ def export_email_attachments() -> List[Dict]:
             'is_inline': att.is_inline,
             'created_at': att.created_at.isoformat() if att.created_at else None
         }
-        # Dateiinhalt nur wenn vorhanden
-        if att.file_path and os.path.exists(att.file_path):
-            try:
-                with open(att.file_path, 'rb') as f:
-                    import base64
-                    att_data['content_base64'] = base64.b64encode(f.read()).decode('utf-8')
-            except Exception:
-                pass
-        elif att.content:
+        # Dateiinhalt nur wenn vorhanden (Blob-Speicher, Datei oder Datenbank)
+        content = att.get_content()
+        if content:
             import base64
-            att_data['content_base64'] = base64.b64encode(att.content).decode('utf-8')
+            att_data['content_base64'] = base64.b64encode(content).decode('utf-8')
         result.append(att_data)
     return result
 
@@ -1502,6 +1499,7 @@ def import_emails(emails_data: List[Dict], user_map: Dict[str, int], current_use
             existing.bcc = e_data.get('bcc')
             existing.body_text = e_data.get('body_text')
             existing.body_html = e_data.get('body_html')
+            existing.preview_text = EmailMessage.build_preview(existing.body_text)
             existing.is_read = e_data.get('is_read', False)
             existing.is_sent = e_data.get('is_sent', False)
             existing.has_attachments = e_data.get('has_attachments', False)
@@ -1525,6 +1523,7 @@ def import_emails(emails_data: List[Dict], user_map: Dict[str, int], current_use
                 bcc=e_data.get('bcc'),
                 body_text=e_data.get('body_text'),
                 body_html=e_data.get('body_html'),
+                preview_text=EmailMessage.build_preview(e_data.get('body_text')),
                 is_read=e_data.get('is_read', False),
                 is_sent=e_data.get('is_sent', False),
                 has_attachments=e_data.get('has_attachments', False),
@@ -1535,6 +1534,8 @@ def import_emails(emails_data: List[Dict], user_map: Dict[str, int], current_use
                 email.received_at = datetime.fromisoformat(e_data['received_at'])
             if e_data.get('sent_at'):
                 email.sent_at = datetime.fromisoformat(e_data['sent_at'])
+            # Ordnerliste sortiert/paginiert über received_at
+            email.received_at = email.received_at or email.sent_at or datetime.utcnow()
             db.session.add(email)
             db.session.flush()
             if email.message_id:
@@ -1588,27 +1589,13 @@ def import_email_attachments(attachments_data: List[Dict], email_map: Dict[str,
             is_inline=att_data.get('is_inline', False)
         )
         
-        # Dateiinhalt speichern wenn vorhanden
+        # Dateiinhalt im Blob-Speicher ablegen wenn vorhanden
         if att_data.get('content_base64'):
+            content = None
             try:
                 import base64
                 content = base64.b64decode(att_data['content_base64'])
-                
-                # Speichere Datei im Upload-Verzeichnis
-                from werkzeug.utils import secure_filename
-                filename = secure_filename(att_data['filename'])
-                timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-                filename = f"{timestamp}_{filename}"
-                
-                upload_dir = os.path.join(current_app.root_path, '..', current_app.config.get('UPLOAD_FOLDER', 'uploads'), 'email_attachments')
-                os.makedirs(upload_dir, exist_ok=True)
-                file_path = os.path.join(upload_dir, filename)
-                
-                with open(file_path, 'wb') as f:
-                    f.write(content)
-                
-                attachment.file_path = file_path
-                attachment.is_large_file = True
+                attachment.set_content(content)
             except Exception as e:
                 current_app.logger.error(f"Fehler beim Speichern von E-Mail-Anhang {att_data['filename']}: {str(e)}")
                 # Fallback: In Datenbank speichern
@@ -2180,20 +2167,10 @@ def import_files(files_data: List[Dict], folder_map: Dict[str, int], user_map: D
                 try:
                     import base64
                     content = base64.b64decode(f_data['content_base64'])
-                    # Speichere Datei im Upload-Verzeichnis
-                    from werkzeug.utils import secure_filename
-                    filename = secure_filename(file.name)
-                    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-                    filename = f"{timestamp}_{filename}"
-                    
-                    upload_dir = os.path.join(current_app.root_path, '..', current_app.config.get('UPLOAD_FOLDER', 'uploads'), 'files')
-                    os.makedirs(upload_dir, exist_ok=True)
-                    file_path = os.path.join(upload_dir, filename)
-                    
-                    with open(file_path, 'wb') as f:
-                        f.write(content)
-                    
-                    file.file_path = file_path
+                    # Im Blob-Speicher ablegen (gleiche Inhalte nur einmal)
+                    from app.utils.file_storage import set_file_content, store_content
+                    content_hash, size = store_content(content)
+                    set_file_content(file, content_hash, size)
                 except Exception as e:
                     current_app.logger.error(f"Fehler beim Speichern von Datei {file.name}: {str(e)}")
             
@@ -2240,19 +2217,10 @@ def import_file_versions(versions_data: List[Dict], user_map: Dict[str, int], cu
             try:
                 import base64
                 content = base64.b64decode(v_data['content_base64'])
-                from werkzeug.utils import secure_filename
-                filename = secure_filename(f"{file.name}_v{v_data['version_number']}")
-                timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-                filename = f"{timestamp}_{filename}"
-                
-                upload_dir = os.path.join(current_app.root_path, '..', current_app.config.get('UPLOAD_FOLDER', 'uploads'), 'files')
-                os.makedirs(upload_dir, exist_ok=True)
-                file_path = os.path.join(upload_dir, filename)
-                
-                with open(file_path, 'wb') as f:
-                    f.write(content)
-                
-                version.file_path = file_path
+                # Im Blob-Speicher ablegen (gleiche Inhalte nur einmal)
+                from app.utils.file_storage import set_file_content, store_content
+                content_hash, size = store_content(content)
+                set_file_content(version, content_hash, size)
             except Exception as e:
                 current_app.logger.error(f"Fehler beim Speichern von Dateiversion: {str(e)}")
         
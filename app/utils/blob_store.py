@@ -0,0 +1,228 @@
+"""
+Inhaltsadressierter Dateispeicher unter ``UPLOAD_FOLDER``.
+
+Inhalte werden unter ihrem SHA-256-Hash abgelegt
+(``<UPLOAD_FOLDER>/blobs/<namespace>/ab/cd/<hash>``). Identische Inhalte,
+z.B. dasselbe Logo in tausenden E-Mails, liegen damit nur einmal auf der
+Festplatte; die Datenbank speichert nur noch den Hash.
+
+Blobs werden nie direkt beim Löschen eines Datensatzes entfernt, da andere
+Datensätze denselben Inhalt referenzieren können. Nicht mehr referenzierte
+Blobs räumt ``collect_garbage`` auf.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Frisch geschriebene Blobs werden nicht aufgeräumt, bis der zugehörige Datensatz sicher committet ist
+GC_MIN_AGE_SECONDS = 24 * 60 * 60
+
+
+def get_blob_root(namespace):
+    return os.path.join(os.path.abspath(current_app.config['UPLOAD_FOLDER']), 'blobs', namespace)
+
+
+def blob_path(content_hash, namespace):
+    """Absoluter Pfad eines Blobs (unabhängig davon, ob er existiert)."""
+    content_hash = (content_hash or '').lower()
+    if len(content_hash) != 64 or not all(c in '0123456789abcdef' for c in content_hash):
+        raise ValueError(f"Ungültiger Blob-Hash: {content_hash!r}")
+    return os.path.join(get_blob_root(namespace), content_hash[:2], content_hash[2:4], content_hash)
+
+
+def blob_exists(content_hash, namespace):
+    try:
+        return os.path.isfile(blob_path(content_hash, namespace))
+    except ValueError:
+        return False
+
+
+def _install(tmp_path, content_hash, namespace):
+    """Verschiebt eine temporäre Datei an ihren Blob-Pfad (oder verwirft sie, falls vorhanden)."""
+    target = blob_path(content_hash, namespace)
+    if os.path.isfile(target):
+        os.unlink(tmp_path)
+        # Zeitstempel erneuern, damit die Aufräumung den Blob nicht gerade jetzt entfernt
+        try:
+            os.utime(target, None)
+        except OSError:
+            pass
+        return target
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(tmp_path, target)
+    return target
+
+
+def _temp_file(namespace):
+    root = get_blob_root(namespace)
+    tmp_dir = os.path.join(root, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    return tempfile.mkstemp(dir=tmp_dir, prefix='blob-')
+
+
+def hash_file(path):
+    """SHA-256 einer Datei, blockweise gelesen."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_bytes(data, namespace):
+    """Legt ``data`` ab und liefert den SHA-256-Hash."""
+    content_hash = hashlib.sha256(data).hexdigest()
+    if blob_exists(content_hash, namespace):
+        try:
+            os.utime(blob_path(content_hash, namespace), None)
+        except OSError:
+            pass
+        return content_hash
+    fd, tmp_path = _temp_file(namespace)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        _install(tmp_path, content_hash, namespace)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return content_hash
+
+
+def store_chunks(chunks, namespace):
+    """
+    Legt einen Datenstrom (Iterable von Bytes-Blöcken) ab, ohne ihn im Speicher zu sammeln.
+
+    Returns:
+        (SHA-256-Hash, Größe in Bytes)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = _temp_file(namespace)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                tmp.write(chunk)
+        content_hash = digest.hexdigest()
+        _install(tmp_path, content_hash, namespace)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return content_hash, size
+
+
+def store_file(source_path, namespace, move=False):
+    """
+    Legt eine vorhandene Datei blockweise ab (ohne sie komplett in den Speicher zu laden).
+
+    Args:
+        move: Quelldatei danach entfernen
+
+    Returns:
+        (SHA-256-Hash, Größe in Bytes)
+    """
+    with open(source_path, 'rb') as source:
+        content_hash, size = store_chunks(iter(lambda: source.read(CHUNK_SIZE), b''), namespace)
+    if move:
+        try:
+            os.unlink(source_path)
+        except OSError as exc:
+            logger.debug(f"Quelldatei {source_path} konnte nicht entfernt werden: {exc}")
+    return content_hash, size
+
+
+def read_blob(content_hash, namespace):
+    with open(blob_path(content_hash, namespace), 'rb') as blob:
+        return blob.read()
+
+
+def delete_blob(content_hash, namespace):
+    try:
+        os.unlink(blob_path(content_hash, namespace))
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def iter_blob_hashes(namespace, min_age_seconds=0):
+    """Liefert die Hashes aller abgelegten Blobs, die älter als ``min_age_seconds`` sind."""
+    root = get_blob_root(namespace)
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - min_age_seconds
+    for dirpath, dirnames, filenames in os.walk(root):
+        if os.path.relpath(dirpath, root) == 'tmp':
+            dirnames[:] = []
+            continue
+        for filename in filenames:
+            if len(filename) != 64:
+                continue
+            try:
+                if os.path.getmtime(os.path.join(dirpath, filename)) > cutoff:
+                    continue
+            except OSError:
+                continue
+            yield filename
+
+
+def collect_garbage(namespace, referenced_hashes, batch_size=500, min_age_seconds=GC_MIN_AGE_SECONDS):
+    """
+    Entfernt Blobs, die von keinem Datensatz mehr referenziert werden.
+
+    Args:
+        referenced_hashes: Callable, das für eine Liste von Hashes die noch
+            referenzierten zurückgibt (z.B. eine ``IN (...)``-Abfrage)
+
+    Returns:
+        Anzahl entfernter Blobs
+    """
+    removed = 0
+    batch = []
+    cutoff = time.time() - min_age_seconds
+
+    def flush():
+        nonlocal removed
+        still_used = set(referenced_hashes(batch))
+        for content_hash in batch:
+            if content_hash in still_used:
+                continue
+            # Inzwischen erneut abgelegt (Zeitstempel erneuert)? Dann liegt gleich ein neuer Verweis vor.
+            try:
+                if os.path.getmtime(blob_path(content_hash, namespace)) > cutoff:
+                    continue
+            except OSError:
+                continue
+            if delete_blob(content_hash, namespace):
+                removed += 1
+        batch.clear()
+
+    for content_hash in iter_blob_hashes(namespace, min_age_seconds=min_age_seconds):
+        batch.append(content_hash)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    # Verwaiste temporäre Dateien abgebrochener Schreibvorgänge entfernen
+    tmp_dir = os.path.join(get_blob_root(namespace), 'tmp')
+    if os.path.isdir(tmp_dir):
+        for filename in os.listdir(tmp_dir):
+            path = os.path.join(tmp_dir, filename)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+            except OSError:
+                pass
+    return removed
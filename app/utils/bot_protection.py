@@ -10,6 +10,7 @@ import requests
 
 from app import db
 from app.models.settings import SystemSettings
+from app.utils.settings_store import get_setting
 
 BotContext = Literal['register', 'login', 'share_edit']
 VALID_PROVIDERS = frozenset({'none', 'honeypot', 'recaptcha', 'turnstile'})
@@ -43,9 +44,9 @@ DEFAULT_SETTINGS = {
 
 
 def _get_setting_value(key: str, default: str = '') -> str:
-    setting = SystemSettings.query.filter_by(key=key).first()
-    if setting and setting.value is not None:
-        return setting.value.strip()
+    value = get_setting(key)
+    if value is not None:
+        return value.strip()
     return default
 
 
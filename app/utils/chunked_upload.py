@@ -0,0 +1,347 @@
+"""
+Fortsetzbare Uploads in Teilstücken.
+
+Große Dateien werden nicht mehr in einem einzigen Multipart-Request
+hochgeladen, der einen Worker minutenlang belegt und nach einem Abbruch von
+vorne beginnt. Ablauf (Web-Oberfläche unter ``/files/uploads``, API unter
+``/api/files/uploads``):
+
+1. Anmelden: Dateiname, Zielordner, Größe und optional SHA-256 ->
+   Upload-ID und Teilstückgröße (``FILE_UPLOAD_CHUNK_SIZE``)
+2. Teilstücke nacheinander mit ``offset`` senden. Passt der Offset nicht
+   (z.B. nach einem Verbindungsabbruch), antwortet der Server mit 409 und dem
+   bereits empfangenen Stand; der Client setzt dort fort
+3. Abschließen: Größe und SHA-256 werden geprüft, danach wird die Datei wie
+   beim normalen Upload angelegt (inkl. Konfliktbehandlung ``version``/``separate``)
+
+Teilstücke liegen unter ``UPLOAD_FOLDER/chunked_uploads``. Nicht
+abgeschlossene Uploads entfernt der Job ``file_upload_cleanup`` nach
+``FILE_UPLOAD_SESSION_TTL_HOURS``.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import secrets
+import shutil
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+try:
+    import fcntl  # Unix/Linux
+except ImportError:  # Windows (Entwicklung): Teilstücke werden ohne Dateisperre geschrieben
+    fcntl = None
+
+from flask import current_app
+from sqlalchemy import update
+from werkzeug.utils import secure_filename
+
+from app import db
+from app.models.file import Folder, UploadSession
+from app.utils.blob_store import hash_file
+
+logger = logging.getLogger(__name__)
+
+CHUNK_DIR_NAME = 'chunked_uploads'
+DEFAULT_MAX_SIZE = 100 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_SESSION_TTL_HOURS = 24
+_COPY_BUFFER = 1024 * 1024
+# So lange wartet ein Teilstück auf einen anderen Request, der gerade in denselben Upload schreibt
+_WRITE_LOCK_WAIT_SECONDS = 5
+_SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ChunkedUploadError(Exception):
+    """Fehler im Upload-Protokoll; ``status_code`` und ``details`` gehen in die JSON-Antwort."""
+
+    def __init__(self, message, status_code=400, **details):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.details = details
+
+    def to_dict(self):
+        return {'success': False, 'error': self.message, **self.details}
+
+
+class AssembledUpload:
+    """Fertig zusammengesetzte Datei mit der Schnittstelle von ``FileStorage`` (``save``, ``content_type``)."""
+
+    def __init__(self, path, filename, content_type):
+        self.path = path
+        self.filename = filename
+        self.content_type = content_type
+
+    def save(self, dst):
+        # Verschieben statt Kopieren; über Dateisystemgrenzen kopiert shutil.move
+        shutil.move(self.path, dst)
+
+
+def get_max_upload_size():
+    return int(current_app.config.get('FILE_UPLOAD_MAX_SIZE') or DEFAULT_MAX_SIZE)
+
+
+def get_chunk_size():
+    return int(current_app.config.get('FILE_UPLOAD_CHUNK_SIZE') or DEFAULT_CHUNK_SIZE)
+
+
+def _chunk_dir():
+    path = os.path.join(os.path.abspath(current_app.config['UPLOAD_FOLDER']), CHUNK_DIR_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def part_path(upload):
+    return os.path.join(_chunk_dir(), f'{upload.id}.part')
+
+
+def _normalize_sha256(value):
+    if not value:
+        return None
+    value = str(value).strip().lower()
+    if not _SHA256_RE.match(value):
+        raise ChunkedUploadError('Ungültige SHA-256-Prüfsumme.')
+    return value
+
+
+def split_relative_path(relative_path):
+    """Zerlegt einen Unterordnerpfad (``a/b``) in bereinigte Ordnernamen."""
+    parts = [secure_filename(part) for part in str(relative_path or '').replace('\\', '/').split('/')]
+    return [part for part in parts if part]
+
+
+def create_upload(user_id, folder_id, filename, total_size, relative_path=None, sha256=None, mime_type=None):
+    """Meldet einen Upload an und legt die (leere) Teilstückdatei an (committet)."""
+    name = secure_filename(str(filename or ''))
+    if not name:
+        raise ChunkedUploadError('Ungültiger Dateiname.')
+    try:
+        total_size = int(total_size)
+    except (TypeError, ValueError):
+        raise ChunkedUploadError('Ungültige Dateigröße.')
+    if total_size < 0:
+        raise ChunkedUploadError('Ungültige Dateigröße.')
+    max_size = get_max_upload_size()
+    if total_size > max_size:
+        raise ChunkedUploadError(
+            f'Datei ist zu groß. Maximale Größe: {max_size / (1024 * 1024):.0f}MB.',
+            413,
+            max_size=max_size,
+        )
+    if folder_id is not None and db.session.get(Folder, folder_id) is None:
+        raise ChunkedUploadError('Ordner nicht gefunden.', 404)
+
+    upload = UploadSession(
+        id=secrets.token_hex(16),
+        user_id=user_id,
+        folder_id=folder_id,
+        relative_path='/'.join(split_relative_path(relative_path)) or None,
+        filename=name,
+        mime_type=(str(mime_type)[:100] if mime_type else None),
+        total_size=total_size,
+        received_size=0,
+        sha256=_normalize_sha256(sha256),
+    )
+    db.session.add(upload)
+    db.session.commit()
+    open(part_path(upload), 'wb').close()
+    return upload
+
+
+def get_upload(upload_id, user_id):
+    """Lädt einen Upload des Benutzers (404 für fremde oder unbekannte Uploads)."""
+    upload = db.session.get(UploadSession, str(upload_id or '')[:32])
+    if upload is None or upload.user_id != user_id:
+        raise ChunkedUploadError('Upload nicht gefunden.', 404)
+    return upload
+
+
+def upload_status(upload):
+    return {
+        'upload_id': upload.id,
+        'filename': upload.filename,
+        'total_size': upload.total_size,
+        'received_size': upload.received_size,
+        'chunk_size': get_chunk_size(),
+        'complete': upload.is_complete,
+    }
+
+
+@contextmanager
+def _locked_part_file(path):
+    """
+    Öffnet die Teilstückdatei (ohne sie zu kürzen) mit exklusiver Sperre.
+
+    Die Sperre gilt prozessübergreifend (``flock``), damit ein wiederholt
+    gesendetes Teilstück nicht gleichzeitig mit dem ursprünglichen Request
+    schreibt. Ist sie nach ``_WRITE_LOCK_WAIT_SECONDS`` nicht frei, folgt 409.
+    """
+    handle = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b')
+    try:
+        if fcntl is not None:
+            deadline = time.monotonic() + _WRITE_LOCK_WAIT_SECONDS
+            while True:
+                try:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise ChunkedUploadError('Teilstück wird bereits übertragen.', 409)
+                    time.sleep(0.1)
+        yield handle
+    finally:
+        handle.close()
+
+
+def append_chunk(upload, offset, stream, length, sha256=None):
+    """
+    Schreibt ein Teilstück ab ``offset`` aus ``stream`` (committet).
+
+    Schreiben und Fortschreiben von ``received_size`` laufen unter einer
+    Sperre je Upload. Innerhalb der Sperre werden der committete Stand und
+    die Dateigröße erneut geprüft; ein fehlgeschlagenes Teilstück kürzt die
+    Datei nie unter den committeten Stand.
+
+    Returns:
+        empfangene Bytes nach diesem Teilstück
+    """
+    try:
+        offset = int(offset)
+    except (TypeError, ValueError):
+        raise ChunkedUploadError('Ungültiger Offset.')
+    if offset != upload.received_size:
+        raise ChunkedUploadError(
+            'Offset passt nicht zum empfangenen Stand.', 409, received_size=upload.received_size
+        )
+    if length is None:
+        raise ChunkedUploadError('Content-Length fehlt.', 411)
+    if length > get_chunk_size():
+        raise ChunkedUploadError('Teilstück ist zu groß.', 413, chunk_size=get_chunk_size())
+    if offset + length > upload.total_size:
+        raise ChunkedUploadError('Teilstück überschreitet die angemeldete Dateigröße.')
+    expected_sha256 = _normalize_sha256(sha256)
+
+    path = part_path(upload)
+    with _locked_part_file(path) as handle:
+        # Stand eines parallelen Requests sehen (neue Transaktion statt Snapshot)
+        db.session.commit()
+        db.session.refresh(upload)
+        if offset != upload.received_size:
+            raise ChunkedUploadError(
+                'Offset passt nicht zum empfangenen Stand.', 409, received_size=upload.received_size
+            )
+        file_size = os.fstat(handle.fileno()).st_size
+        if file_size < offset:
+            discard_upload(upload)
+            raise ChunkedUploadError('Die Upload-Daten sind unvollständig. Bitte erneut hochladen.', 410)
+        # Reste eines abgebrochenen, nicht committeten Teilstücks verwerfen
+        handle.truncate(offset)
+        handle.seek(offset)
+
+        digest = hashlib.sha256()
+        remaining = length
+        try:
+            while remaining > 0:
+                block = stream.read(min(_COPY_BUFFER, remaining))
+                if not block:
+                    break
+                handle.write(block)
+                digest.update(block)
+                remaining -= len(block)
+        except Exception:
+            handle.truncate(offset)
+            raise
+        if remaining:
+            handle.truncate(offset)
+            raise ChunkedUploadError('Teilstück wurde nicht vollständig übertragen.', 400, received_size=offset)
+        if expected_sha256 and digest.hexdigest() != expected_sha256:
+            handle.truncate(offset)
+            raise ChunkedUploadError('Prüfsumme des Teilstücks stimmt nicht.', 422, received_size=offset)
+        handle.flush()
+
+        # Bedingtes UPDATE: ein doppelt gesendetes Teilstück schreibt den Stand nicht zweimal fort
+        table = UploadSession.__table__
+        result = db.session.execute(
+            update(table)
+            .where(table.c.id == upload.id, table.c.received_size == offset)
+            .values(received_size=offset + length, updated_at=datetime.utcnow())
+        )
+        if result.rowcount != 1:
+            # Stand wurde anderweitig fortgeschrieben: Datei nicht anfassen, sie gehört zum committeten Stand
+            db.session.rollback()
+            db.session.refresh(upload)
+            raise ChunkedUploadError(
+                'Offset passt nicht zum empfangenen Stand.', 409, received_size=upload.received_size
+            )
+        db.session.commit()
+    return offset + length
+
+
+def finish_upload(upload, sha256=None):
+    """
+    Prüft einen vollständig empfangenen Upload (Größe, SHA-256).
+
+    Bei falscher Prüfsumme wird der Upload verworfen.
+
+    Returns:
+        ``AssembledUpload`` zum Anlegen der Datei
+    """
+    if not upload.is_complete:
+        raise ChunkedUploadError('Upload ist noch nicht vollständig.', 409, received_size=upload.received_size)
+    path = part_path(upload)
+    if not os.path.isfile(path) or os.path.getsize(path) != upload.total_size:
+        discard_upload(upload)
+        raise ChunkedUploadError('Die Upload-Daten sind unvollständig. Bitte erneut hochladen.', 410)
+
+    expected_sha256 = _normalize_sha256(sha256) or upload.sha256
+    if expected_sha256 and hash_file(path) != expected_sha256:
+        discard_upload(upload)
+        raise ChunkedUploadError('Prüfsumme stimmt nicht; der Upload wurde verworfen.', 422)
+    return AssembledUpload(path, upload.filename, upload.mime_type)
+
+
+def discard_upload(upload, commit=True):
+    """Entfernt Upload-Eintrag und Teilstückdatei."""
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+    except OSError as exc:
+        logger.warning(f"Teilstückdatei von Upload {upload.id} konnte nicht entfernt werden: {exc}")
+    db.session.delete(upload)
+    if commit:
+        db.session.commit()
+
+
+def cleanup_stale_uploads():
+    """Job ``file_upload_cleanup``: entfernt abgebrochene Uploads und verwaiste Teilstückdateien."""
+    ttl_hours = int(current_app.config.get('FILE_UPLOAD_SESSION_TTL_HOURS') or DEFAULT_SESSION_TTL_HOURS)
+    cutoff = datetime.utcnow() - timedelta(hours=ttl_hours)
+
+    removed = 0
+    for upload in UploadSession.query.filter(UploadSession.updated_at < cutoff).all():
+        discard_upload(upload, commit=False)
+        removed += 1
+    db.session.commit()
+
+    chunk_dir = _chunk_dir()
+    known_ids = {upload_id for (upload_id,) in db.session.query(UploadSession.id).all()}
+    cutoff_ts = time.time() - ttl_hours * 3600
+    for name in os.listdir(chunk_dir):
+        upload_id, ext = os.path.splitext(name)
+        path = os.path.join(chunk_dir, name)
+        if ext != '.part' or upload_id in known_ids:
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff_ts:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+
+    if removed:
+        logger.info(f"Uploads: {removed} abgebrochene Uploads entfernt")
+    return removed
@@ -47,10 +47,10 @@ def get_system_timezone():
     """Liefert die im Portal konfigurierte Zeitzone (mit Fallback)."""
     timezone_name = current_app.config.get('PORTAL_TIMEZONE', DEFAULT_TIMEZONE)
     try:
-        from app.models.settings import SystemSettings
-        timezone_setting = SystemSettings.query.filter_by(key='portal_timezone').first()
-        if timezone_setting and timezone_setting.value:
-            timezone_name = timezone_setting.value.strip()
+        from app.utils.settings_store import get_setting
+        timezone_value = get_setting('portal_timezone')
+        if timezone_value:
+            timezone_name = timezone_value.strip()
     except Exception:
         # Während Setup/Migrationen ggf. keine Settings-Tabelle verfügbar
         pass
@@ -143,12 +143,12 @@ def is_module_enabled(module_key):
         True wenn das Modul aktiviert ist, False sonst. Standardmäßig True wenn nicht gesetzt.
     """
     try:
-        from app.models.settings import SystemSettings
-        setting = SystemSettings.query.filter_by(key=module_key).first()
+        from app.utils.settings_store import get_all_settings
+        settings_values = get_all_settings()
         enabled = False
-        if setting:
+        if module_key in settings_values:
             # Prüfe ob der Wert 'true' ist (case-insensitive)
-            enabled = str(setting.value).lower() == 'true'
+            enabled = str(settings_values[module_key]).lower() == 'true'
         else:
             # Standardmäßig aktiviert wenn nicht gesetzt (für Rückwärtskompatibilität)
             enabled = True
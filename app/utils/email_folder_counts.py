@@ -0,0 +1,178 @@
+"""
+Vorberechnete Zähler (gesamt / ungelesen) pro E-Mail-Ordner.
+
+Die Zähler liegen in ``email_folders.total_count`` und
+``email_folders.unread_count``. Ordnerbaum, Dashboard-Widget und die
+``email_update``-Benachrichtigungen nach einem Sync lesen nur diese Werte,
+statt die E-Mails zu zählen.
+
+Gepflegt werden sie über Session-Events: Vor jedem Flush werden neue,
+gelöschte und verschobene bzw. als (un)gelesen markierte ``EmailMessage``
+erfasst (Sync, Ansicht, Verschieben, Lesestatus); nach dem Flush werden die
+Differenzen in derselben Transaktion per ``UPDATE ... SET unread_count =
+unread_count + n`` übernommen. Ein Rollback verwirft sie damit automatisch.
+
+Massenänderungen an der ORM vorbei (``Query.delete``/``Query.update``,
+Sammel-INSERT) werden nicht erfasst: vor einem Massen-Löschen
+``discount_emails``, nach einem Sammel-INSERT ``count_inserted_emails``
+aufrufen, sonst danach ``recount_folder_counts``. Zusätzlich gleicht der periodische Job
+``email_folder_counts`` alle Zähler ab.
+"""
+
+from sqlalchemy import case, event, func, select, update
+
+from app import db
+from app.models.email import EmailFolder, EmailMessage
+
+_DELTAS_KEY = 'email_folder_count_deltas'
+# Maximale Anzahl IDs pro IN (...)-Abfrage
+_IN_CHUNK = 500
+
+
+def _is_unread(is_read):
+    # Neue E-Mails haben vor dem Flush noch keinen Default (False)
+    return not is_read
+
+
+def _add_delta(deltas, folder, total, unread):
+    if not folder:
+        return
+    entry = deltas.setdefault(folder, [0, 0])
+    entry[0] += total
+    entry[1] += unread
+
+
+def _stored_states(session, email_ids):
+    """(folder, is_read) der E-Mails, wie sie aktuell in der Datenbank stehen."""
+    states = {}
+    email_ids = list(email_ids)
+    for chunk_start in range(0, len(email_ids), _IN_CHUNK):
+        chunk = email_ids[chunk_start:chunk_start + _IN_CHUNK]
+        for email_id, folder, is_read in session.execute(
+            select(EmailMessage.id, EmailMessage.folder, EmailMessage.is_read).where(EmailMessage.id.in_(chunk))
+        ):
+            states[email_id] = (folder, is_read)
+    return states
+
+
+def _counter_changed(email_msg):
+    state = db.inspect(email_msg)
+    return any(state.attrs[key].history.has_changes() for key in ('folder', 'is_read'))
+
+
+@event.listens_for(db.session, 'before_flush')
+def _folder_counts_before_flush(session, flush_context, instances):
+    new = [obj for obj in session.new if isinstance(obj, EmailMessage)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, EmailMessage) and obj.id is not None]
+    changed = [
+        obj for obj in session.dirty
+        if isinstance(obj, EmailMessage) and obj.id is not None and obj not in session.deleted
+        and _counter_changed(obj)
+    ]
+    if not (new or deleted or changed):
+        return
+
+    deltas = session.info.setdefault(_DELTAS_KEY, {})
+    for email_msg in new:
+        _add_delta(deltas, email_msg.folder, 1, int(_is_unread(email_msg.is_read)))
+
+    stored = _stored_states(session, [obj.id for obj in deleted + changed]) if (deleted or changed) else {}
+    for email_msg in deleted:
+        if email_msg.id in stored:
+            folder, is_read = stored[email_msg.id]
+            _add_delta(deltas, folder, -1, -int(_is_unread(is_read)))
+    for email_msg in changed:
+        if email_msg.id not in stored:
+            continue
+        old_folder, old_is_read = stored[email_msg.id]
+        _add_delta(deltas, old_folder, -1, -int(_is_unread(old_is_read)))
+        _add_delta(deltas, email_msg.folder, 1, int(_is_unread(email_msg.is_read)))
+
+
+def _apply_deltas(connection, deltas):
+    table = EmailFolder.__table__
+    for folder, (total, unread) in deltas.items():
+        if not total and not unread:
+            continue
+        connection.execute(
+            update(table)
+            .where(table.c.name == folder)
+            .values(total_count=table.c.total_count + total, unread_count=table.c.unread_count + unread)
+        )
+
+
+@event.listens_for(db.session, 'after_flush')
+def _folder_counts_after_flush(session, flush_context):
+    deltas = session.info.pop(_DELTAS_KEY, None)
+    if deltas:
+        _apply_deltas(session.connection(), deltas)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _folder_counts_after_rollback(session):
+    session.info.pop(_DELTAS_KEY, None)
+
+
+def discount_emails(email_ids):
+    """
+    Zieht E-Mails von den Ordnerzählern ab, bevor sie per ``Query.delete`` entfernt werden.
+
+    Läuft in der Transaktion des Aufrufers (gemeinsam mit dem Löschen committen).
+    """
+    deltas = {}
+    for folder, total, unread in db.session.query(
+        EmailMessage.folder,
+        func.count(EmailMessage.id),
+        func.sum(case((EmailMessage.is_read.is_(True), 0), else_=1)),
+    ).filter(EmailMessage.id.in_(list(email_ids))).group_by(EmailMessage.folder).all():
+        _add_delta(deltas, folder, -total, -int(unread or 0))
+    if deltas:
+        _apply_deltas(db.session.connection(), deltas)
+
+
+def count_inserted_emails(folder, total, unread):
+    """
+    Rechnet per Sammel-INSERT (an der ORM vorbei) eingefügte E-Mails eines Ordners ein.
+
+    Läuft in der Transaktion des Aufrufers.
+    """
+    deltas = {}
+    _add_delta(deltas, folder, total, unread)
+    if deltas and (total or unread):
+        _apply_deltas(db.session.connection(), deltas)
+
+
+def recount_folder_counts(folder_names=None):
+    """
+    Zählt die E-Mails der angegebenen (bzw. aller) Ordner neu und speichert die Zähler.
+
+    Eine gruppierte Abfrage für alle Ordner; der Aufrufer committet.
+    """
+    query = db.session.query(
+        EmailMessage.folder,
+        func.count(EmailMessage.id),
+        func.sum(case((EmailMessage.is_read.is_(True), 0), else_=1)),
+    )
+    if folder_names is not None:
+        folder_names = list(folder_names)
+        if not folder_names:
+            return
+        query = query.filter(EmailMessage.folder.in_(folder_names))
+    counts = {folder: (total, int(unread or 0)) for folder, total, unread in query.group_by(EmailMessage.folder).all()}
+
+    folders = EmailFolder.query
+    if folder_names is not None:
+        folders = folders.filter(EmailFolder.name.in_(folder_names))
+    for folder in folders.all():
+        folder.total_count, folder.unread_count = counts.get(folder.name, (0, 0))
+
+
+def run_folder_count_reconciliation():
+    """Periodischer Abgleich aller Ordnerzähler (fängt Änderungen an der ORM vorbei auf)."""
+    recount_folder_counts()
+    db.session.commit()
+
+
+def get_unread_email_count():
+    """Ungelesene E-Mails über alle Ordner (aus den Ordnerzählern)."""
+    return int(db.session.query(func.coalesce(func.sum(EmailFolder.unread_count), 0)).scalar() or 0)
@@ -0,0 +1,74 @@
+"""
+Verzögertes Laden großer E-Mail-Anhänge.
+
+Nachrichten ab ``EMAIL_LAZY_FETCH_MIN_SIZE`` lädt der IMAP-Sync nicht mehr
+vollständig, sondern nur ``BODYSTRUCTURE``, Header, Texte und kleine Teile
+(siehe ``imap_sync.fetch_partial_message``). Große Anhänge werden nur mit
+ihrem IMAP-Abschnitt gespeichert (``EmailAttachment.imap_section``).
+
+Beim ersten Zugriff (Download, Inline-Bild, Weiterleiten) lädt
+``ensure_attachment_content`` den Abschnitt blockweise vom Server, dekodiert
+ihn dabei und schreibt ihn direkt in den Blob-Speicher. Danach verhält sich
+der Anhang wie jeder andere.
+"""
+
+import logging
+
+from app import db
+from app.models.email import EmailAttachment
+from app.utils import imap_sync
+from app.utils.blob_store import store_chunks
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_attachment_content(attachment):
+    """
+    Lädt einen noch nicht geladenen Anhang vom IMAP-Server (und committet).
+
+    Returns:
+        True, wenn der Inhalt danach lokal vorliegt
+    """
+    if not attachment.is_pending_download:
+        return True
+
+    email_msg = attachment.email
+    try:
+        uid = int(email_msg.imap_uid) if email_msg and email_msg.imap_uid else None
+    except (TypeError, ValueError):
+        uid = None
+    if not uid or not email_msg.folder:
+        logger.warning(f"Anhang {attachment.id} kann nicht nachgeladen werden: keine IMAP-UID")
+        return False
+
+    from app.blueprints.email import connect_imap
+
+    mail_conn = None
+    try:
+        mail_conn = connect_imap(folder=email_msg.folder)
+        if not mail_conn:
+            return False
+        chunks = imap_sync.iter_section_chunks(mail_conn, uid, attachment.imap_section)
+        content_hash, size = store_chunks(
+            imap_sync.decode_transfer_chunks(chunks, attachment.imap_encoding),
+            EmailAttachment.BLOB_NAMESPACE,
+        )
+    except Exception as exc:
+        logger.error(f"Anhang {attachment.id} ({attachment.filename}) konnte nicht vom IMAP-Server geladen werden: {exc}")
+        return False
+    finally:
+        try:
+            if mail_conn:
+                mail_conn.close()
+                mail_conn.logout()
+        except Exception:
+            pass
+
+    attachment.content_hash = content_hash
+    attachment.size = size
+    attachment.is_large_file = True
+    attachment.imap_section = None
+    attachment.imap_encoding = None
+    db.session.commit()
+    logger.info(f"Anhang {attachment.id} ({attachment.filename}, {size / (1024 * 1024):.2f} MB) vom IMAP-Server nachgeladen")
+    return True
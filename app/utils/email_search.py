@@ -0,0 +1,180 @@
+"""
+Volltextsuche für E-Mails über einen eigenen invertierten Index.
+
+Für jede E-Mail werden die Begriffe aus Betreff, Absender und Text in
+``email_search_terms`` abgelegt (Begriff, E-Mail-ID, Gewicht). Eine Suche
+liest nur diesen Index (Präfixsuche über den Primärschlüssel
+``(term, email_id)``) und lädt danach die Listenspalten der angezeigten
+Seite; ``body_text`` und ``body_html`` werden dabei nicht gelesen. Das
+funktioniert unter MySQL und SQLite gleich.
+
+- neue E-Mails werden beim IMAP-Sync, beim Senden und beim Speichern von
+  Entwürfen indexiert
+- den Bestand (und E-Mails aus anderen Quellen, z.B. Backup-Import)
+  indexiert der Hintergrund-Job ``email_search_index`` schrittweise nach
+  (app/tasks/email_search_index.py);
+  eine Erhöhung von ``SEARCH_INDEX_VERSION`` indexiert alles neu
+- Begriffe werden klein und ohne Akzente abgelegt ("muller" findet "Müller")
+- alle Suchbegriffe müssen vorkommen; ab drei Zeichen zählt auch ein
+  Wortanfang ("rechn" findet "Rechnung")
+- Rangfolge: Treffer im Betreff vor Treffern im Absender vor Treffern im Text
+"""
+
+import re
+import unicodedata
+from collections import Counter
+
+from sqlalchemy import delete, func, insert, select, union_all
+from sqlalchemy.orm import load_only
+
+from app import db
+from app.models.email import EmailMessage, EmailSearchTerm
+
+# Erhöhen, wenn sich Zerlegung oder Gewichtung ändern (der Bestand wird dann neu indexiert)
+SEARCH_INDEX_VERSION = 1
+
+SUBJECT_WEIGHT = 8
+SENDER_WEIGHT = 4
+# Text: Gewicht je Vorkommen, höchstens dieser Wert
+BODY_MAX_WEIGHT = 3
+
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 40
+# Kürzere Suchbegriffe werden nur exakt gesucht, längere auch als Wortanfang
+PREFIX_MIN_LENGTH = 3
+MAX_QUERY_TERMS = 8
+# Nur der Anfang langer Texte wird indexiert
+BODY_MAX_CHARS = 50000
+MAX_TERMS_PER_EMAIL = 2000
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_STYLE_SCRIPT_RE = re.compile(r'<(style|script)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+
+
+def normalize_term(word):
+    """Kleinschreibung und Akzente entfernen ("Müller" -> "muller")."""
+    decomposed = unicodedata.normalize('NFKD', word.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    """Liefert die normalisierten Begriffe eines Textes (mit Wiederholungen)."""
+    for match in _TOKEN_RE.finditer(text or ''):
+        term = normalize_term(match.group())
+        if MIN_TERM_LENGTH <= len(term) <= MAX_TERM_LENGTH:
+            yield term
+
+
+def build_term_weights(subject, sender, body_text):
+    """Begriff -> Gewicht für eine E-Mail."""
+    body_counts = Counter(tokenize((body_text or '')[:BODY_MAX_CHARS]))
+    weights = {
+        term: min(count, BODY_MAX_WEIGHT)
+        for term, count in body_counts.most_common(MAX_TERMS_PER_EMAIL)
+    }
+    for term in set(tokenize(sender)):
+        weights[term] = weights.get(term, 0) + SENDER_WEIGHT
+    for term in set(tokenize(subject)):
+        weights[term] = weights.get(term, 0) + SUBJECT_WEIGHT
+    return weights
+
+
+def _searchable_body(email_msg):
+    if email_msg.body_text:
+        return email_msg.body_text
+    if email_msg.body_html:
+        from app.blueprints.email import html_to_plain_text
+        html = _STYLE_SCRIPT_RE.sub(' ', email_msg.body_html[:BODY_MAX_CHARS * 4])
+        return html_to_plain_text(html)
+    return ''
+
+
+def index_email(email_msg):
+    """
+    Schreibt die Index-Einträge einer E-Mail neu (in der laufenden Transaktion).
+
+    Die E-Mail muss bereits eine ID haben (nach ``flush``); der Aufrufer committet.
+    """
+    index_emails([email_msg])
+
+
+def index_emails(email_msgs):
+    """Wie ``index_email`` für mehrere E-Mails (ein DELETE und ein Sammel-INSERT)."""
+    email_msgs = list(email_msgs)
+    if not email_msgs:
+        return
+    rows = []
+    for email_msg in email_msgs:
+        weights = build_term_weights(email_msg.subject, email_msg.sender, _searchable_body(email_msg))
+        rows.extend({'term': term, 'email_id': email_msg.id, 'weight': weight} for term, weight in weights.items())
+    db.session.execute(delete(EmailSearchTerm).where(
+        EmailSearchTerm.email_id.in_([email_msg.id for email_msg in email_msgs])
+    ))
+    if rows:
+        db.session.execute(insert(EmailSearchTerm), rows)
+    for email_msg in email_msgs:
+        email_msg.search_index_version = SEARCH_INDEX_VERSION
+
+
+def parse_query(query):
+    """Normalisierte, eindeutige Suchbegriffe (höchstens ``MAX_QUERY_TERMS``)."""
+    terms = []
+    for term in tokenize(query):
+        if term not in terms:
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _term_matches(term):
+    """Treffer eines Suchbegriffs: (email_id, score) je E-Mail."""
+    if len(term) >= PREFIX_MIN_LENGTH:
+        condition = EmailSearchTerm.term.like(f'{_escape_like(term)}%', escape='\\')
+    else:
+        condition = EmailSearchTerm.term == term
+    return select(
+        EmailSearchTerm.email_id.label('email_id'),
+        func.max(EmailSearchTerm.weight).label('score'),
+    ).where(condition).group_by(EmailSearchTerm.email_id)
+
+
+def search_emails(query, folder=None, page=1, per_page=25, columns=None):
+    """
+    Sucht E-Mails, die alle Begriffe aus ``query`` enthalten.
+
+    Args:
+        folder: nur in diesem Ordner suchen (None = alle Ordner)
+        columns: zu ladende Spalten von ``EmailMessage`` (Standard: nur ID)
+
+    Returns:
+        dict mit ``emails`` (Liste von (EmailMessage, Score)), ``total``,
+        ``page``, ``per_page``, ``terms``
+    """
+    terms = parse_query(query)
+    page = max(1, int(page or 1))
+    result = {'emails': [], 'total': 0, 'page': page, 'per_page': per_page, 'terms': terms}
+    if not terms:
+        return result
+
+    selects = [_term_matches(term) for term in terms]
+    matches = (selects[0] if len(selects) == 1 else union_all(*selects)).subquery()
+    ranked = select(
+        matches.c.email_id,
+        func.sum(matches.c.score).label('score'),
+    ).group_by(matches.c.email_id).having(func.count() == len(terms)).subquery()
+
+    base = db.session.query(EmailMessage, ranked.c.score).join(
+        ranked, ranked.c.email_id == EmailMessage.id
+    ).options(load_only(*(columns or (EmailMessage.id,))))
+    if folder:
+        base = base.filter(EmailMessage.folder == folder)
+
+    result['total'] = base.order_by(None).count()
+    if result['total']:
+        result['emails'] = base.order_by(
+            ranked.c.score.desc(), EmailMessage.received_at.desc(), EmailMessage.id.desc()
+        ).offset((page - 1) * per_page).limit(per_page).all()
+    return result
@@ -0,0 +1,154 @@
+"""
+Löschen von Dateien und Ordnerbäumen mit Mengen-Statements.
+
+Ordner, Dateien und Versionen werden nicht mehr Objekt für Objekt über die
+Beziehungen geladen und gelöscht:
+
+1. Die IDs eines Teilbaums liefert eine rekursive CTE in einer Abfrage
+2. Vorschauen, Versionen, Dateien und Ordner werden per ``DELETE ... IN``
+   in Stapeln gelöscht
+3. ``file_blobs.ref_count`` wird um die Anzahl der entfernten Verweise je
+   Hash verringert, da die Session-Events aus app/utils/file_storage.py
+   Mengen-Statements nicht sehen. Die Blobs selbst entfernt ``file_blob_gc``
+4. Altbestand-Dateien (``content_hash`` NULL) entfernt der Job
+   ``file_path_reaper`` (app/tasks/file_blobs.py). Er wird in derselben
+   Transaktion eingereiht, läuft also nur, wenn das Löschen committet wurde,
+   und wird bei Fehlern mit Backoff wiederholt
+
+Web-Oberfläche und API nutzen dieselben Funktionen; der Aufrufer committet.
+Bereits geladene ORM-Objekte der gelöschten Zeilen sind danach ungültig.
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, select, update
+
+from app import db
+from app.models.booking import BookingRequest
+from app.models.event import Event
+from app.models.file import File, FileBlob, FilePreview, FileVersion, Folder, UploadSession
+
+logger = logging.getLogger(__name__)
+
+REAPER_JOB_TYPE = 'file_path_reaper'
+REAPER_MAX_ATTEMPTS = 10
+# Pfade pro Reaper-Job (Payload bleibt unter der TEXT-Grenze von MySQL)
+REAPER_BATCH_SIZE = 100
+# IDs pro DELETE/SELECT ... IN (...)
+_ID_BATCH_SIZE = 500
+
+
+def _batches(ids, size=_ID_BATCH_SIZE):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def collect_folder_tree_ids(folder_id):
+    """Liefert die ID des Ordners und aller Unterordner (beliebige Tiefe) in einer Abfrage."""
+    tree = select(Folder.id).where(Folder.id == folder_id).cte('folder_tree', recursive=True)
+    # UNION statt UNION ALL: bricht auch bei fehlerhaften Zyklen in parent_id ab
+    tree = tree.union(select(Folder.id).where(Folder.parent_id == tree.c.id))
+    return [folder_id for (folder_id,) in db.session.execute(select(tree.c.id)).all()]
+
+
+def _release_blob_refs(counts):
+    if not counts:
+        return
+    table = FileBlob.__table__
+    now = datetime.utcnow()
+    db.session.connection().execute(
+        update(table)
+        .where(table.c.content_hash == bindparam('blob_hash'))
+        .values(ref_count=table.c.ref_count - bindparam('blob_refs'), updated_at=now),
+        [{'blob_hash': content_hash, 'blob_refs': refs} for content_hash, refs in sorted(counts.items())],
+    )
+
+
+def _enqueue_path_reaper(paths):
+    from app.tasks.job_queue import PRIORITY_LOW, enqueue_job
+
+    for batch in _batches(sorted(paths), REAPER_BATCH_SIZE):
+        enqueue_job(
+            REAPER_JOB_TYPE,
+            payload={'paths': batch},
+            priority=PRIORITY_LOW,
+            max_attempts=REAPER_MAX_ATTEMPTS,
+            commit=False,
+        )
+
+
+def delete_files(file_ids):
+    """
+    Löscht Dateien samt Versionen und Vorschauen.
+
+    Returns:
+        Anzahl gelöschter Dateien
+    """
+    file_ids = sorted(set(file_ids))
+    blob_refs = Counter()
+    legacy_paths = set()
+    deleted = 0
+
+    for batch in _batches(file_ids):
+        for model, id_column in ((File, File.id), (FileVersion, FileVersion.file_id)):
+            blob_refs.update(dict(
+                db.session.query(model.content_hash, func.count())
+                .filter(id_column.in_(batch), model.content_hash.isnot(None))
+                .group_by(model.content_hash)
+                .all()
+            ))
+            legacy_paths.update(
+                path for (path,) in db.session.query(model.file_path)
+                .filter(id_column.in_(batch), model.content_hash.is_(None))
+                .all()
+                if path
+            )
+
+        FilePreview.query.filter(FilePreview.file_id.in_(batch)).delete(synchronize_session=False)
+        FileVersion.query.filter(FileVersion.file_id.in_(batch)).delete(synchronize_session=False)
+        deleted += File.query.filter(File.id.in_(batch)).delete(synchronize_session=False)
+
+    _release_blob_refs(blob_refs)
+    if legacy_paths:
+        _enqueue_path_reaper(legacy_paths)
+    return deleted
+
+
+def delete_folder_tree(folder_id):
+    """
+    Löscht einen Ordner mit allen Unterordnern, Dateien und Versionen.
+
+    Verweise aus Buchungsanfragen und Veranstaltungen werden gelöst, laufende
+    Uploads in den Teilbaum verworfen (Teilstückdateien entfernt ``file_upload_cleanup``).
+
+    Returns:
+        (Anzahl gelöschter Ordner, Anzahl gelöschter Dateien)
+    """
+    folder_ids = collect_folder_tree_ids(folder_id)
+    if not folder_ids:
+        return 0, 0
+
+    file_ids = []
+    for batch in _batches(folder_ids):
+        file_ids.extend(file_id for (file_id,) in db.session.query(File.id).filter(File.folder_id.in_(batch)).all())
+    deleted_files = delete_files(file_ids)
+
+    for batch in _batches(folder_ids):
+        BookingRequest.query.filter(BookingRequest.folder_id.in_(batch)).update(
+            {BookingRequest.folder_id: None}, synchronize_session=False
+        )
+        Event.query.filter(Event.folder_id.in_(batch)).update({Event.folder_id: None}, synchronize_session=False)
+        UploadSession.query.filter(UploadSession.folder_id.in_(batch)).delete(synchronize_session=False)
+        # Verweise innerhalb des Teilbaums lösen, damit die Reihenfolge beim Löschen egal ist
+        Folder.query.filter(Folder.id.in_(batch), Folder.parent_id.isnot(None)).update(
+            {Folder.parent_id: None}, synchronize_session=False
+        )
+
+    deleted_folders = 0
+    for batch in _batches(folder_ids):
+        deleted_folders += Folder.query.filter(Folder.id.in_(batch)).delete(synchronize_session=False)
+
+    logger.info(f"Ordner {folder_id} gelöscht: {deleted_folders} Ordner, {deleted_files} Dateien")
+    return deleted_folders, deleted_files
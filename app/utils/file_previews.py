@@ -0,0 +1,197 @@
+"""
+Gespeicherte Vorschauen für die Ordneransicht der Dateien.
+
+Die Ordneransicht zeigt für Text-, Office- und Markdown-Dateien einen kurzen
+Ausschnitt. Er wird nicht mehr bei jedem Aufruf aus den Dateien gelesen,
+sondern einmal pro Inhalt erzeugt und in ``file_previews`` gespeichert
+(Schlüssel: Datei-ID + SHA-256 des Inhalts in ``File.content_hash``).
+
+- Neue Dateien und neue Inhalte (Upload, neue Version, Editor, OnlyOffice-Speichern,
+  Wiederherstellen) erkennt ein Session-Event an der Änderung von
+  ``File.content_hash`` und reiht in derselben Transaktion einen Job
+  ``file_previews`` ein
+- der Job erzeugt die Vorschau; Altbestand ohne Hash überträgt er dabei in den
+  Blob-Speicher (app/utils/file_storage.py)
+- Bestand und Änderungen an der ORM vorbei holt der periodische Job
+  ``file_preview_backfill`` nach (app/tasks/file_preview_backfill.py)
+- eine Erhöhung von ``FILE_PREVIEW_VERSION`` erzeugt alle Vorschauen neu
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+from sqlalchemy import event, insert
+
+from app import db
+from app.models.background_job import BackgroundJob
+from app.models.file import File, FilePreview
+from app.utils.file_storage import adopt_legacy_content
+
+logger = logging.getLogger(__name__)
+
+# Bei Änderungen an der Erzeugung erhöhen, damit der Bestand neu erzeugt wird
+FILE_PREVIEW_VERSION = 1
+PREVIEW_JOB_TYPE = 'file_previews'
+
+_PENDING_KEY = 'file_preview_pending'
+_WAKE_KEY = 'file_preview_wake'
+
+
+def _preview_job_key(file_ids):
+    ids_key = hashlib.sha1(','.join(str(file_id) for file_id in file_ids).encode()).hexdigest()
+    return f'{PREVIEW_JOB_TYPE}:{ids_key}'
+
+
+def _content_changed(file):
+    if not db.inspect(file).attrs.content_hash.history.has_changes():
+        return False
+    # Vorschau wurde zusammen mit dem Hash gesetzt (z.B. vom Vorschau-Job beim Übertragen von Altbestand)
+    return not is_preview_current(file, file.preview)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _file_previews_before_flush(session, flush_context, instances):
+    changed = [obj for obj in session.new if isinstance(obj, File)]
+    changed.extend(
+        obj for obj in session.dirty
+        if isinstance(obj, File) and obj.id is not None and obj not in session.deleted
+        and _content_changed(obj)
+    )
+    if not changed:
+        return
+    session.info.setdefault(_PENDING_KEY, []).extend(changed)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _file_previews_after_flush(session, flush_context):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    file_ids = sorted({file.id for file in pending if file.id is not None})
+    if not file_ids:
+        return
+    from app.tasks.job_queue import PRIORITY_NORMAL
+    # Core-INSERT: im after_flush dürfen keine ORM-Objekte hinzugefügt werden
+    session.connection().execute(insert(BackgroundJob.__table__).values(
+        job_type=PREVIEW_JOB_TYPE,
+        payload=json.dumps({'file_ids': file_ids}),
+        priority=PRIORITY_NORMAL,
+        dedup_key=_preview_job_key(file_ids),
+        status=BackgroundJob.STATUS_QUEUED,
+        run_at=datetime.utcnow(),
+    ))
+    session.info[_WAKE_KEY] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _file_previews_after_commit(session):
+    if session.info.pop(_WAKE_KEY, None):
+        from app.tasks.job_queue import wake_job_workers
+        wake_job_workers()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _file_previews_after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_WAKE_KEY, None)
+
+
+def is_preview_current(file, preview):
+    return bool(
+        preview is not None
+        and file.content_hash
+        and preview.content_hash == file.content_hash
+        and preview.preview_version == FILE_PREVIEW_VERSION
+    )
+
+
+def refresh_file_preview(file):
+    """
+    Erzeugt (falls nötig) die Vorschau einer Datei; der Aufrufer committet.
+
+    Altbestand ohne Inhalts-Hash wird dabei in den Blob-Speicher übertragen.
+
+    Returns:
+        False, wenn die Datei auf dem Datenträger fehlt
+    """
+    from app.blueprints.files import (
+        _resolve_absolute_file_path,
+        build_file_preview_text,
+        build_markdown_preview_html,
+    )
+
+    # Vorschau vor dem Übertragen laden: ein Autoflush mit neuem Hash, aber alter Vorschau reiht sonst einen Job ein
+    preview = file.preview
+    if not file.content_hash and not adopt_legacy_content(file):
+        return False
+    path = _resolve_absolute_file_path(file.file_path)
+    if not path or not os.path.isfile(path):
+        return False
+
+    if is_preview_current(file, preview):
+        return True
+
+    if preview is None:
+        preview = FilePreview(file_id=file.id)
+        file.preview = preview
+    preview.content_hash = file.content_hash
+    preview.preview_version = FILE_PREVIEW_VERSION
+    preview.preview_text = (build_file_preview_text(file) or '')[:255]
+    preview.preview_html = build_markdown_preview_html(file) or ''
+    return True
+
+
+def generate_file_previews(file_ids=None):
+    """Job ``file_previews``: erzeugt die Vorschauen der angegebenen Dateien (commit pro Datei)."""
+    generated = 0
+    for file_id in file_ids or []:
+        file = db.session.get(File, file_id)
+        if file is None:
+            continue
+        try:
+            if refresh_file_preview(file):
+                generated += 1
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            logger.error(f"Vorschau für Datei {file_id} konnte nicht erzeugt werden: {exc}")
+    return generated
+
+
+def get_file_preview_maps(files):
+    """
+    Liefert ``(text_map, html_map)`` der Dateien aus den gespeicherten Vorschauen.
+
+    Eine Abfrage für die ganze Liste. Fehlende oder veraltete Vorschauen
+    bleiben leer; für sie wird ein Job eingereiht.
+    """
+    files = list(files)
+    if not files:
+        return {}, {}
+    previews = {
+        preview.file_id: preview
+        for preview in FilePreview.query.filter(FilePreview.file_id.in_([file.id for file in files])).all()
+    }
+
+    text_map, html_map, stale_ids = {}, {}, []
+    for file in files:
+        preview = previews.get(file.id)
+        if is_preview_current(file, preview):
+            text_map[file.id] = preview.preview_text or ''
+            html_map[file.id] = preview.preview_html or ''
+        else:
+            text_map[file.id] = ''
+            html_map[file.id] = ''
+            stale_ids.append(file.id)
+
+    if stale_ids:
+        try:
+            from app.tasks.job_queue import enqueue_job
+            enqueue_job(PREVIEW_JOB_TYPE, payload={'file_ids': stale_ids}, dedup_key=_preview_job_key(stale_ids))
+        except Exception as exc:
+            db.session.rollback()
+            logger.warning(f"Vorschau-Job konnte nicht eingereiht werden: {exc}")
+    return text_map, html_map
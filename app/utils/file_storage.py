@@ -0,0 +1,301 @@
+"""
+Inhaltsadressierter Speicher für Dateien und Dateiversionen.
+
+Inhalte von ``File`` und ``FileVersion`` liegen im Blob-Speicher
+(``UPLOAD_FOLDER/blobs/files/ab/cd/<sha256>``, siehe app/utils/blob_store.py).
+``file_path`` zeigt auf den Blob, ``content_hash`` enthält dessen SHA-256.
+Damit gilt:
+
+- identische Inhalte liegen nur einmal auf der Festplatte, auch über Dateien hinweg
+- eine neue Version kopiert den bisherigen Inhalt nicht mehr, sondern verweist
+  auf denselben Blob; "Version wiederherstellen" ändert nur Metadaten
+- OnlyOffice-Zwischenspeicherungen mit unverändertem Inhalt schreiben nichts
+
+``file_blobs.ref_count`` zählt die Verweise je Blob. Ein Session-Event führt
+den Zähler bei jedem Anlegen, Ändern und Löschen mit; Blobs ohne Verweise
+entfernt der Job ``file_blob_gc``, der die Zähler zuvor neu abgleicht
+(app/tasks/file_blobs.py). ``content_hash`` NULL bedeutet Altbestand mit
+eigener Datei unter ``file_path``; ihn überträgt der Job ``file_blob_migration``.
+"""
+
+import io
+import logging
+import os
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import event, insert, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+from app.models.file import File, FileBlob, FileVersion
+from app.utils.chunked_upload import AssembledUpload
+from app.utils.blob_store import blob_path, get_blob_root, store_bytes, store_chunks, store_file
+
+logger = logging.getLogger(__name__)
+
+FILE_BLOB_NAMESPACE = 'files'
+DEFAULT_MAX_FILE_VERSIONS = 3
+_READ_CHUNK_SIZE = 1024 * 1024
+
+_DELTA_KEY = 'file_blob_ref_deltas'
+_UNLINK_KEY = 'file_blob_legacy_unlink'
+
+
+def get_max_file_versions():
+    return int(current_app.config.get('MAX_FILE_VERSIONS') or DEFAULT_MAX_FILE_VERSIONS)
+
+
+def is_blob_path(path):
+    if not path:
+        return False
+    root = get_blob_root(FILE_BLOB_NAMESPACE)
+    return os.path.abspath(path).startswith(root + os.sep)
+
+
+def store_content(source):
+    """
+    Legt einen Dateiinhalt im Blob-Speicher ab.
+
+    Args:
+        source: ``bytes``/``str``, ``FileStorage`` (wird blockweise gelesen)
+            oder ``AssembledUpload`` (Teilstückdatei wird verschoben)
+
+    Returns:
+        (SHA-256-Hash, Größe in Bytes)
+    """
+    if isinstance(source, str):
+        source = source.encode('utf-8')
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+        return store_bytes(data, FILE_BLOB_NAMESPACE), len(data)
+    if isinstance(source, AssembledUpload):
+        return store_file(source.path, FILE_BLOB_NAMESPACE, move=True)
+    stream = getattr(source, 'stream', source)
+    if hasattr(stream, 'seek'):
+        stream.seek(0)
+    return store_chunks(iter(lambda: stream.read(_READ_CHUNK_SIZE), b''), FILE_BLOB_NAMESPACE)
+
+
+def store_document(document):
+    """Speichert ein python-docx/openpyxl/python-pptx-Dokument direkt in den Blob-Speicher."""
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return store_content(buffer.getvalue())
+
+
+def set_file_content(obj, content_hash, size):
+    """Lässt ``File`` oder ``FileVersion`` auf einen abgelegten Blob verweisen."""
+    obj.content_hash = content_hash
+    obj.file_path = blob_path(content_hash, FILE_BLOB_NAMESPACE)
+    obj.file_size = size
+
+
+def add_file_version(file, content_hash, size, user_id):
+    """
+    Macht einen abgelegten Inhalt zum aktuellen Stand von ``file``.
+
+    Der bisherige Stand wird als ``FileVersion`` gesichert (gleicher Blob, keine
+    Kopie); ältere Versionen über ``MAX_FILE_VERSIONS`` werden entfernt. Der
+    Aufrufer committet.
+
+    Returns:
+        neue Versionsnummer
+    """
+    db.session.add(FileVersion(
+        file_id=file.id,
+        version_number=file.version_number,
+        file_path=file.file_path,
+        content_hash=file.content_hash,
+        file_size=file.file_size,
+        uploaded_by=file.uploaded_by,
+    ))
+
+    versions = FileVersion.query.filter_by(file_id=file.id).order_by(
+        FileVersion.version_number.desc()
+    ).all()
+    for oldest in versions[get_max_file_versions() - 1:]:
+        release_file_path(oldest.file_path)
+        db.session.delete(oldest)
+
+    set_file_content(file, content_hash, size)
+    file.version_number += 1
+    file.uploaded_by = user_id
+    file.updated_at = datetime.utcnow()
+    return file.version_number
+
+
+def replace_file_content(file, content_hash, size):
+    """
+    Ersetzt den aktuellen Inhalt ohne neue Version (z.B. OnlyOffice-Zwischenspeicherung).
+
+    Returns:
+        False, wenn sich der Inhalt nicht geändert hat
+    """
+    if file.content_hash == content_hash:
+        return False
+    old_path = file.file_path
+    set_file_content(file, content_hash, size)
+    file.updated_at = datetime.utcnow()
+    release_file_path(old_path)
+    return True
+
+
+def restore_file_version(file, version, user_id):
+    """
+    Stellt eine ältere Version als neuen aktuellen Stand her.
+
+    Der aktuelle Stand wird selbst zur Version; es werden keine Dateien kopiert.
+
+    Returns:
+        neue Versionsnummer oder None, wenn der Inhalt der Version fehlt
+    """
+    if not version.content_hash and not adopt_legacy_content(version):
+        return None
+    return add_file_version(file, version.content_hash, version.file_size, user_id)
+
+
+def release_file_path(path):
+    """
+    Gibt den Speicher eines entfernten Inhalts frei.
+
+    Blobs werden nur über ``file_blob_gc`` entfernt, da andere Dateien denselben
+    Inhalt referenzieren können; Altbestand-Dateien werden direkt gelöscht.
+    """
+    if not path or is_blob_path(path):
+        return
+    if not os.path.isabs(path):
+        path = os.path.join(os.getcwd(), path)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as exc:
+        logger.warning(f"Datei {path} konnte nicht entfernt werden: {exc}")
+
+
+def adopt_legacy_content(obj):
+    """
+    Überträgt den Inhalt eines Altbestand-Eintrags (``content_hash`` NULL) in den Blob-Speicher.
+
+    Die alte Datei wird nach dem Commit entfernt, sofern kein anderer Eintrag
+    mehr darauf verweist. Der Aufrufer committet.
+
+    Returns:
+        False, wenn die Datei fehlt
+    """
+    old_path = obj.file_path
+    source_path = old_path if os.path.isabs(old_path or '') else os.path.join(os.getcwd(), old_path or '')
+    if not old_path or not os.path.isfile(source_path):
+        return False
+    content_hash, size = store_file(source_path, FILE_BLOB_NAMESPACE)
+
+    with db.session.no_autoflush:
+        file_query = File.query.filter(File.file_path == old_path)
+        version_query = FileVersion.query.filter(FileVersion.file_path == old_path)
+        if obj.id is not None:
+            if isinstance(obj, File):
+                file_query = file_query.filter(File.id != obj.id)
+            else:
+                version_query = version_query.filter(FileVersion.id != obj.id)
+        shared = file_query.first() is not None or version_query.first() is not None
+
+    set_file_content(obj, content_hash, size)
+    if not shared and not is_blob_path(source_path):
+        db.session.info.setdefault(_UNLINK_KEY, set()).add(source_path)
+    return True
+
+
+def _stored_hash(obj):
+    """Hash, auf den der Eintrag vor diesem Flush verwiesen hat."""
+    history = db.inspect(obj).attrs.content_hash.history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None if history.added else obj.content_hash
+
+
+def _add_delta(deltas, content_hash, amount, size):
+    if not content_hash:
+        return
+    current, known_size = deltas.get(content_hash, (0, None))
+    deltas[content_hash] = (current + amount, known_size if known_size is not None else size)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _file_blobs_before_flush(session, flush_context, instances):
+    deltas = session.info.setdefault(_DELTA_KEY, {})
+    for obj in session.new:
+        if isinstance(obj, (File, FileVersion)):
+            _add_delta(deltas, obj.content_hash, 1, obj.file_size)
+    for obj in session.deleted:
+        if isinstance(obj, (File, FileVersion)):
+            _add_delta(deltas, _stored_hash(obj), -1, None)
+    for obj in session.dirty:
+        if not isinstance(obj, (File, FileVersion)) or obj in session.deleted:
+            continue
+        state = db.inspect(obj)
+        if not state.attrs.content_hash.history.has_changes():
+            if not state.attrs.file_path.history.has_changes() or obj.content_hash is None:
+                continue
+            # Pfad an der Blob-Ablage vorbei geändert: Inhalt gilt wieder als Altbestand
+            obj.content_hash = None
+        _add_delta(deltas, _stored_hash(obj), -1, None)
+        _add_delta(deltas, obj.content_hash, 1, obj.file_size)
+    if not deltas:
+        session.info.pop(_DELTA_KEY, None)
+
+
+def insert_ignoring_duplicates(connection, table):
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        return mysql_insert(table).on_duplicate_key_update(content_hash=table.c.content_hash)
+    if dialect == 'sqlite':
+        return sqlite_insert(table).on_conflict_do_nothing()
+    return insert(table)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _file_blobs_after_flush(session, flush_context):
+    deltas = session.info.pop(_DELTA_KEY, None)
+    if not deltas:
+        return
+    table = FileBlob.__table__
+    connection = session.connection()
+    now = datetime.utcnow()
+    # Core-Statements: im after_flush dürfen keine ORM-Objekte geändert werden
+    for content_hash, (amount, size) in sorted(deltas.items()):
+        if not amount:
+            continue
+        result = connection.execute(
+            update(table)
+            .where(table.c.content_hash == content_hash)
+            .values(ref_count=table.c.ref_count + amount, updated_at=now)
+        )
+        if result.rowcount or amount < 0:
+            continue
+        connection.execute(insert_ignoring_duplicates(connection, table).values(
+            content_hash=content_hash, size=size or 0, ref_count=0, created_at=now, updated_at=now,
+        ))
+        connection.execute(
+            update(table)
+            .where(table.c.content_hash == content_hash)
+            .values(ref_count=table.c.ref_count + amount, updated_at=now)
+        )
+
+
+@event.listens_for(db.session, 'after_commit')
+def _file_blobs_after_commit(session):
+    for path in session.info.pop(_UNLINK_KEY, None) or ():
+        try:
+            os.unlink(path)
+        except OSError as exc:
+            logger.debug(f"Alte Datei {path} konnte nicht entfernt werden: {exc}")
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _file_blobs_after_rollback(session):
+    session.info.pop(_DELTA_KEY, None)
+    session.info.pop(_UNLINK_KEY, None)
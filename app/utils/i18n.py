@@ -73,11 +73,11 @@ def _walk_translation(data: Dict[str, Any], parts: Iterable[str]) -> Optional[st
 def _get_system_setting(key: str, default: Optional[str] = None) -> Optional[str]:
     """Hilfsfunktion, um SystemSettings abzufragen."""
     try:
-        from app.models.settings import SystemSettings
+        from app.utils.settings_store import get_setting
 
-        setting = SystemSettings.query.filter_by(key=key).first()
-        if setting and setting.value:
-            return setting.value
+        value = get_setting(key)
+        if value:
+            return value
     except Exception as exc:  # pragma: no cover - nur Log
         if current_app:
             current_app.logger.debug("SystemSetting %s nicht verfügbar: %s", key, exc)
@@ -95,19 +95,13 @@ def _portal_display_name() -> str:
     portal_name = str(app_name or "Rpismateams").strip() or "Rpismateams"
 
     try:
-        from app.models.settings import SystemSettings
+        from app.utils.settings_store import get_setting_stripped
 
-        portal_name_setting = SystemSettings.query.filter_by(key="portal_name").first()
-        if portal_name_setting and portal_name_setting.value and portal_name_setting.value.strip():
-            portal_name = portal_name_setting.value.strip()
-        else:
-            organization_name_setting = SystemSettings.query.filter_by(key="organization_name").first()
-            if (
-                organization_name_setting
-                and organization_name_setting.value
-                and organization_name_setting.value.strip()
-            ):
-                portal_name = organization_name_setting.value.strip()
+        portal_name = (
+            get_setting_stripped("portal_name")
+            or get_setting_stripped("organization_name")
+            or portal_name
+        )
     except Exception:
         pass
 
@@ -296,12 +290,12 @@ def _resolve_key(translations: Dict[str, Any], key: str) -> Optional[Any]:
 def get_available_languages() -> Iterable[str]:
     """Gibt die verfügbaren Sprachen zurück (System-Setting oder Basisliste)."""
     try:
-        from app.models.settings import SystemSettings  # lokale Imports vermeiden Zirkularität
+        from app.utils.settings_store import get_setting  # lokale Imports vermeiden Zirkularität
 
-        setting = SystemSettings.query.filter_by(key="available_languages").first()
-        if setting and setting.value:
+        setting_value = get_setting("available_languages")
+        if setting_value:
             try:
-                parsed = json.loads(setting.value)
+                parsed = json.loads(setting_value)
                 if isinstance(parsed, list):
                     codes = [
                         code.strip()
@@ -311,7 +305,7 @@ def get_available_languages() -> Iterable[str]:
                 else:
                     codes = []
             except json.JSONDecodeError:
-                codes = [code.strip() for code in setting.value.split(",")]
+                codes = [code.strip() for code in setting_value.split(",")]
 
             filtered = [
                 code for code in codes if code in BASE_SUPPORTED_LANGUAGES
@@ -327,11 +321,11 @@ def get_available_languages() -> Iterable[str]:
 def _get_system_language(setting_key: str, default: str) -> str:
     """Liest eine Sprache aus den SystemSettings mit Fallback."""
     try:
-        from app.models.settings import SystemSettings
+        from app.utils.settings_store import get_setting
 
-        setting = SystemSettings.query.filter_by(key=setting_key).first()
-        if setting and setting.value:
-            value = setting.value.strip()
+        setting_value = get_setting(setting_key)
+        if setting_value:
+            value = setting_value.strip()
             if value in BASE_SUPPORTED_LANGUAGES:
                 return value
     except Exception:  # pylint: disable=broad-except
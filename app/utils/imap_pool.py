@@ -0,0 +1,383 @@
+"""
+IMAP-Verbindungspool pro Worker-Prozess.
+
+Bisher hat jede Aktion (Sync, Löschen, Verschieben, Flags, Gesendet-Ablage)
+eine eigene TLS-Verbindung aufgebaut und sich neu angemeldet. Der Pool hält
+angemeldete Verbindungen offen und gibt sie nacheinander an Sync-Job und
+Request-Handler aus:
+
+- ``connect_imap`` leiht eine Verbindung aus, ``logout()`` gibt sie zurück
+  (der bestehende Aufrufcode bleibt damit unverändert)
+- länger unbenutzte Verbindungen werden vor der Ausgabe per NOOP geprüft
+- Ordner werden erst ausgewählt, wenn ein Befehl es erfordert, und nur,
+  wenn nicht bereits derselbe Ordner (im passenden Modus) ausgewählt ist;
+  ein per EXAMINE geöffneter Ordner genügt für lesende Befehle, nur
+  STORE/COPY/MOVE/EXPUNGE wechseln auf SELECT
+- nach ``IMAP_POOL_IDLE_TIMEOUT`` Sekunden ohne Nutzung wird abgemeldet
+- pro Konto sind höchstens ``IMAP_POOL_SIZE`` Verbindungen offen (ausgeliehen
+  und frei zusammen); weitere Aufrufer warten bis zu ``IMAP_POOL_WAIT_TIMEOUT``
+  Sekunden auf eine zurückgegebene Verbindung
+- Verbindungen mit Netzwerk-/Protokollfehlern werden verworfen
+"""
+
+import imaplib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 4
+DEFAULT_IDLE_TIMEOUT = 300
+DEFAULT_NOOP_AFTER = 30
+DEFAULT_WAIT_TIMEOUT = 30
+
+# Befehle, die einen ausgewählten Ordner voraussetzen
+SELECTED_COMMANDS = frozenset({
+    'uid', 'fetch', 'search', 'store', 'copy', 'move', 'expunge', 'check', 'sort', 'thread',
+})
+# Davon Befehle, die den Ordner ändern und daher kein EXAMINE (nur lesend) erlauben
+WRITE_COMMANDS = frozenset({'store', 'copy', 'move', 'expunge'})
+
+# Fehler, nach denen die Verbindung nicht weiterverwendet werden darf
+CONNECTION_ERRORS = (imaplib.IMAP4.abort, OSError, EOFError)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _unquote(mailbox):
+    if len(mailbox) >= 2 and mailbox.startswith('"') and mailbox.endswith('"'):
+        return mailbox[1:-1]
+    return mailbox
+
+
+class PooledImapConnection:
+    """
+    Hülle um ``imaplib.IMAP4`` für den Pool.
+
+    Alle Attribute und Befehle werden an die Verbindung durchgereicht;
+    ``select``, ``close`` und ``logout`` berücksichtigen zusätzlich den Pool.
+    """
+
+    def __init__(self, pool, conn, key):
+        self._pool = pool
+        self._conn = conn
+        self._key = key
+        self.broken = False
+        self.checked_out = False
+        self.last_used = time.monotonic()
+        self.selected_folder = None
+        self.selected_readonly = False
+        self.selected_exists = None
+        self.desired_folder = None
+        self.desired_readonly = False
+        # Ordner wurde vom Aufrufer per select() gewählt (kein Ausweichen auf INBOX)
+        self.explicit_select = False
+
+    def __getattr__(self, name):
+        attr = getattr(self._conn, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            command = name.lower()
+            if command in SELECTED_COMMANDS:
+                if command == 'uid' and args:
+                    command = str(args[0]).lower()
+                self._ensure_selected(write=command in WRITE_COMMANDS)
+            return self._run(attr, *args, **kwargs)
+        return call
+
+    def _run(self, func, *args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except CONNECTION_ERRORS:
+            self.broken = True
+            raise
+
+    def _ensure_selected(self, write=False):
+        """
+        Wählt den gewünschten Ordner erst bei Bedarf aus.
+
+        Ein bereits per EXAMINE geöffneter Ordner genügt für lesende Befehle;
+        nur ändernde Befehle (``write``) erzwingen ein SELECT. Auf INBOX wird
+        nur ausgewichen, wenn der Ordner nicht per ``select()`` gewählt wurde.
+
+        Raises:
+            imaplib.IMAP4.error: wenn kein Kandidat ausgewählt werden kann
+        """
+        target = self.desired_folder or 'INBOX'
+        if (
+            self._conn.state == 'SELECTED'
+            and self.selected_folder == target
+            and not (write and self.selected_readonly)
+        ):
+            return
+        readonly = self.desired_readonly and not write
+        explicit = self.explicit_select
+        candidates = [target, f'"{target}"']
+        if not explicit and target != 'INBOX':
+            candidates.append('INBOX')
+        for candidate in candidates:
+            try:
+                status, _ = self.select(candidate, readonly=readonly)
+            except imaplib.IMAP4.abort:
+                raise
+            except imaplib.IMAP4.error:
+                continue
+            if status != 'OK':
+                continue
+            if candidate == 'INBOX' and target != 'INBOX':
+                logger.warning(f"Could not select folder '{target}', using '{candidate}'")
+            else:
+                # Ziel gilt als ausgewählt, auch wenn nur die gequotete Schreibweise akzeptiert wurde
+                self.selected_folder = target
+            self.desired_folder = target
+            self.explicit_select = explicit
+            return
+        raise imaplib.IMAP4.error(f"Ordner '{target}' konnte nicht ausgewählt werden")
+
+    def checkout(self, folder=None):
+        self.desired_folder = _unquote(folder) if folder else None
+        self.desired_readonly = False
+        self.explicit_select = False
+
+    def select(self, mailbox='INBOX', readonly=False):
+        """
+        Wählt einen Ordner aus und merkt ihn sich.
+
+        Ist derselbe Ordner bereits schreibbar ausgewählt, entfällt ein
+        erneutes SELECT. EXAMINE (``readonly=True``, z.B. beim Sync) wird
+        immer gesendet, damit UIDVALIDITY/UIDNEXT aktuell sind.
+        """
+        folder = _unquote(mailbox)
+        if (
+            not readonly
+            and self._conn.state == 'SELECTED'
+            and self.selected_folder == folder
+            and not self.selected_readonly
+        ):
+            self.desired_folder = folder
+            self.desired_readonly = False
+            self.explicit_select = True
+            return 'OK', [str(self.selected_exists or 0).encode()]
+        result = self._run(self._conn.select, mailbox, readonly)
+        if result[0] == 'OK':
+            self.selected_folder = folder
+            self.selected_readonly = bool(readonly)
+            self.desired_folder = folder
+            self.desired_readonly = bool(readonly)
+            self.explicit_select = True
+            exists = result[1][0] if result[1] else None
+            self.selected_exists = exists.decode('ascii', errors='ignore') if isinstance(exists, bytes) else None
+        else:
+            self.selected_folder = None
+        return result
+
+    def close(self):
+        """
+        Sendet kein CLOSE: der Ordner bleibt für die nächste Aktion ausgewählt.
+
+        Die Aufrufer entfernen gelöschte Nachrichten selbst per EXPUNGE; das
+        implizite Expunge von CLOSE würde sonst auch Löschmarkierungen anderer
+        Clients ausführen.
+        """
+        return 'OK', [b'']
+
+    def logout(self):
+        """Gibt die Verbindung an den Pool zurück (statt sich abzumelden)."""
+        self._pool.release(self)
+        return 'BYE', [b'']
+
+    def disconnect(self):
+        """Meldet die Verbindung tatsächlich ab."""
+        try:
+            self._conn.logout()
+        except Exception:
+            pass
+
+
+class ImapConnectionPool:
+    """Hält angemeldete IMAP-Verbindungen dieses Prozesses zur Wiederverwendung vor."""
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 noop_after=DEFAULT_NOOP_AFTER, wait_timeout=DEFAULT_WAIT_TIMEOUT):
+        self.max_size = max(1, int(max_size))
+        self.idle_timeout = max(1, int(idle_timeout))
+        self.noop_after = max(0, int(noop_after))
+        self.wait_timeout = max(0, int(wait_timeout))
+        self.pid = os.getpid()
+        self._idle = []
+        # Offene Verbindungen (ausgeliehen + frei) pro Konto
+        self._open = {}
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)
+        self._reaper = None
+
+    def acquire(self, server, port, use_ssl, username, password, folder=None):
+        """
+        Liefert eine angemeldete Verbindung (aus dem Pool oder neu aufgebaut).
+
+        Raises:
+            imaplib.IMAP4.error: wenn innerhalb von ``wait_timeout`` keine
+                Verbindung frei wird
+        """
+        key = (server, port, bool(use_ssl), username)
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            conn = self._take_idle(key)
+            if conn is not None:
+                if time.monotonic() - conn.last_used >= self.noop_after:
+                    try:
+                        status, _ = conn._run(conn._conn.noop)
+                        if status != 'OK':
+                            raise imaplib.IMAP4.abort(f"NOOP: {status}")
+                    except Exception as e:
+                        logger.debug(f"IMAP-Pool: Verbindung verworfen (NOOP fehlgeschlagen: {e})")
+                        self._discard(conn)
+                        continue
+                conn.checked_out = True
+                conn.checkout(folder)
+                return conn
+            if self._reserve(key, deadline):
+                break
+
+        try:
+            conn = self._connect(server, port, use_ssl, username, password, key)
+        except Exception:
+            self._forget(key)
+            raise
+        conn.checked_out = True
+        conn.checkout(folder)
+        return conn
+
+    def _reserve(self, key, deadline):
+        """
+        Reserviert einen Platz für eine neue Verbindung.
+
+        Returns:
+            False, wenn inzwischen eine Verbindung zurückgegeben wurde (erneut
+            im Pool nachsehen)
+        """
+        with self._lock:
+            while self._open.get(key, 0) >= self.max_size:
+                if any(conn._key == key for conn in self._idle):
+                    return False
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise imaplib.IMAP4.error(
+                        f"IMAP-Pool: keine Verbindung frei ({self.max_size} belegt, {self.wait_timeout}s gewartet)"
+                    )
+                self._released.wait(remaining)
+            self._open[key] = self._open.get(key, 0) + 1
+            return True
+
+    def _forget(self, key):
+        with self._lock:
+            self._open[key] = max(0, self._open.get(key, 0) - 1)
+            self._released.notify()
+
+    def _discard(self, conn):
+        conn.disconnect()
+        self._forget(conn._key)
+
+    def _connect(self, server, port, use_ssl, username, password, key):
+        logger.debug(f"Connecting to IMAP server: {server}:{port} (SSL: {use_ssl})")
+        if use_ssl:
+            raw = imaplib.IMAP4_SSL(server, port, timeout=30)
+        else:
+            raw = imaplib.IMAP4(server, port, timeout=30)
+        try:
+            raw.login(username, password)
+        except Exception:
+            try:
+                raw.shutdown()
+            except Exception:
+                pass
+            raise
+        conn = PooledImapConnection(self, raw, key)
+        # ENABLE ist nur vor dem ersten SELECT erlaubt
+        from app.utils.imap_sync import enable_condstore
+        enable_condstore(conn)
+        self._start_reaper()
+        return conn
+
+    def _take_idle(self, key):
+        expired = []
+        found = None
+        now = time.monotonic()
+        with self._lock:
+            for conn in list(self._idle):
+                if now - conn.last_used >= self.idle_timeout:
+                    self._idle.remove(conn)
+                    expired.append(conn)
+            for conn in reversed(self._idle):
+                if conn._key == key:
+                    self._idle.remove(conn)
+                    found = conn
+                    break
+        for conn in expired:
+            self._discard(conn)
+        return found
+
+    def release(self, conn):
+        # Doppeltes logout() darf die Verbindung nicht zweimal zurückgeben
+        if not conn.checked_out:
+            return
+        conn.checked_out = False
+        if conn.broken or conn._conn.state == 'LOGOUT':
+            self._discard(conn)
+            return
+        # Angesammelte unaufgeforderte Antworten nicht an den nächsten Nutzer weitergeben
+        try:
+            conn._conn.untagged_responses.clear()
+        except Exception:
+            pass
+        conn.checkout(None)
+        conn.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(conn)
+            self._released.notify()
+
+    def prune(self):
+        """Meldet Verbindungen ab, die länger als ``idle_timeout`` unbenutzt waren."""
+        self._take_idle(key=None)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+    def _start_reaper(self):
+        with self._lock:
+            if self._reaper is not None and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, daemon=True, name='imap-pool-reaper')
+            self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(5, min(60, self.idle_timeout // 2))
+        while True:
+            time.sleep(interval)
+            try:
+                self.prune()
+            except Exception as e:
+                logger.debug(f"IMAP-Pool: Bereinigung fehlgeschlagen: {e}")
+
+
+def get_imap_pool(config=None):
+    """Pool dieses Prozesses (nach einem Fork wird ein neuer angelegt)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            config = config or {}
+            _pool = ImapConnectionPool(
+                max_size=config.get('IMAP_POOL_SIZE', DEFAULT_MAX_SIZE),
+                idle_timeout=config.get('IMAP_POOL_IDLE_TIMEOUT', DEFAULT_IDLE_TIMEOUT),
+                noop_after=config.get('IMAP_POOL_NOOP_AFTER', DEFAULT_NOOP_AFTER),
+                wait_timeout=config.get('IMAP_POOL_WAIT_TIMEOUT', DEFAULT_WAIT_TIMEOUT),
+            )
+        return _pool
@@ -0,0 +1,523 @@
+"""
+IMAP-Hilfsfunktionen für die inkrementelle E-Mail-Synchronisation.
+
+Statt ``SEARCH ALL`` und einzelner ``FETCH``-Aufrufe pro Nachricht arbeitet
+die Synchronisation mit dem Ordnerzustand (UIDVALIDITY, UIDNEXT,
+HIGHESTMODSEQ) und UID-Bereichen:
+
+- neue Nachrichten: ``UID SEARCH UID n:*``
+- Flags und Größen: ein ``UID FETCH`` für alle neuen UIDs
+- Inhalte: ``UID FETCH`` mit ``BODY.PEEK[]`` in Stapeln (setzt kein ``\\Seen``)
+- große Nachrichten: nur ``BODYSTRUCTURE``, Header und kleine Teile; große
+  Anhänge werden später blockweise über ``BODY.PEEK[n]<offset.länge>`` geladen
+- Flag-Änderungen: ``UID FETCH ... (CHANGEDSINCE m)``, falls der Server CONDSTORE kann
+
+Die Funktionen greifen nicht auf die Datenbank zu.
+"""
+
+import binascii
+import email
+import logging
+import re
+from collections import namedtuple
+from email.message import Message
+
+logger = logging.getLogger(__name__)
+
+FolderStatus = namedtuple('FolderStatus', ['exists', 'uid_validity', 'uid_next', 'highest_modseq'])
+FetchedMessage = namedtuple('FetchedMessage', ['uid', 'flags', 'size', 'modseq', 'body'])
+# Teil einer Nachricht laut BODYSTRUCTURE; ``section`` ist der IMAP-Abschnitt (z.B. "2.1")
+BodyPart = namedtuple('BodyPart', ['section', 'content_type', 'encoding', 'size', 'children'])
+
+# Header, mit denen nicht geladene Teile in der zusammengesetzten Nachricht markiert werden
+LAZY_SECTION_HEADER = 'X-Prisma-Lazy-Section'
+LAZY_SIZE_HEADER = 'X-Prisma-Lazy-Size'
+LAZY_ENCODING_HEADER = 'X-Prisma-Lazy-Encoding'
+# Blockgröße beim Nachladen eines Abschnitts
+SECTION_CHUNK_SIZE = 4 * 1024 * 1024
+
+_FETCH_START = re.compile(rb'^\d+ \(')
+_UID_RE = re.compile(rb'\bUID (\d+)')
+_FLAGS_RE = re.compile(rb'\bFLAGS \(([^)]*)\)')
+_SIZE_RE = re.compile(rb'\bRFC822\.SIZE (\d+)')
+_MODSEQ_RE = re.compile(rb'\bMODSEQ \((\d+)\)')
+# Bestandteile einer FETCH-Antwort: Klammern, Strings, Literal-Ankündigung am Zeilenende, Atome
+_TOKEN_RE = re.compile(
+    rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|(\{\d+\})\s*$|([^\s()"\[]+(?:\[[^\]]*\](?:<\d+>)?)?))'
+)
+_ESCAPE_RE = re.compile(rb'\\(.)')
+_ORIGIN_RE = re.compile(rb'<\d+>$')
+
+
+def _to_int(value):
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode('ascii', errors='ignore')
+    try:
+        return int(str(value).strip().split()[0])
+    except (ValueError, IndexError):
+        return None
+
+
+def get_capabilities(mail_conn):
+    """Liefert die Capabilities nach dem Login (werden pro Verbindung zwischengespeichert)."""
+    cached = getattr(mail_conn, '_prisma_capabilities', None)
+    if cached is not None:
+        return cached
+    capabilities = set(getattr(mail_conn, 'capabilities', ()) or ())
+    try:
+        status, data = mail_conn.capability()
+        if status == 'OK' and data and data[0]:
+            raw = data[0].decode('ascii', errors='ignore') if isinstance(data[0], bytes) else str(data[0])
+            capabilities = {cap.upper() for cap in raw.split()}
+    except Exception as e:
+        logger.debug(f"IMAP CAPABILITY fehlgeschlagen: {e}")
+    mail_conn._prisma_capabilities = capabilities
+    return capabilities
+
+
+def enable_condstore(mail_conn):
+    """
+    Aktiviert CONDSTORE (RFC 7162), damit SELECT HIGHESTMODSEQ liefert.
+
+    Returns:
+        True, wenn der Server CONDSTORE unterstützt
+    """
+    if getattr(mail_conn, '_prisma_condstore', None) is not None:
+        return mail_conn._prisma_condstore
+    capabilities = get_capabilities(mail_conn)
+    supported = 'CONDSTORE' in capabilities or 'QRESYNC' in capabilities
+    if supported and 'ENABLE' in capabilities:
+        try:
+            mail_conn.xatom('ENABLE', 'CONDSTORE')
+        except Exception as e:
+            logger.debug(f"IMAP ENABLE CONDSTORE fehlgeschlagen: {e}")
+    mail_conn._prisma_condstore = supported
+    return supported
+
+
+def select_folder(mail_conn, folder_name, readonly=True):
+    """
+    Öffnet einen Ordner und liest dessen Zustand aus der SELECT-Antwort.
+
+    Returns:
+        (True, FolderStatus) oder (False, Fehlermeldung)
+    """
+    status, data = 'NO', None
+    for candidate in (folder_name, f'"{folder_name}"'):
+        try:
+            status, data = mail_conn.select(candidate, readonly=readonly)
+        except Exception as e:
+            status, data = 'NO', [str(e).encode('utf-8', errors='ignore')]
+        if status == 'OK':
+            break
+
+    if status != 'OK':
+        error_msg = 'Unbekannter Fehler'
+        if data and data[0]:
+            error_msg = data[0].decode('utf-8', errors='ignore') if isinstance(data[0], bytes) else str(data[0])
+        return False, error_msg
+
+    untagged = getattr(mail_conn, 'untagged_responses', {}) or {}
+
+    def last(key):
+        values = untagged.get(key)
+        return _to_int(values[-1]) if values else None
+
+    highest_modseq = None if 'NOMODSEQ' in untagged else last('HIGHESTMODSEQ')
+    return True, FolderStatus(
+        exists=_to_int(data[0]) if data else None,
+        uid_validity=last('UIDVALIDITY'),
+        uid_next=last('UIDNEXT'),
+        highest_modseq=highest_modseq,
+    )
+
+
+def uid_search(mail_conn, *criteria):
+    """``UID SEARCH`` mit aufsteigend sortierter Liste der UIDs als Ergebnis."""
+    status, data = mail_conn.uid('SEARCH', None, *criteria)
+    if status != 'OK':
+        raise RuntimeError(f"IMAP UID SEARCH fehlgeschlagen: {data}")
+    uids = []
+    for chunk in data or []:
+        if chunk:
+            uids.extend(int(uid) for uid in chunk.split() if uid.isdigit())
+    return sorted(set(uids))
+
+
+def compress_uid_set(uids):
+    """Fasst UIDs zu einer IMAP-Sequenzmenge zusammen, z.B. ``[1, 2, 3, 7]`` -> ``'1:3,7'``."""
+    ranges = []
+    start = previous = None
+    for uid in sorted(set(uids)):
+        if start is None:
+            start = previous = uid
+        elif uid == previous + 1:
+            previous = uid
+        else:
+            ranges.append(f"{start}:{previous}" if start != previous else str(start))
+            start = previous = uid
+    if start is not None:
+        ranges.append(f"{start}:{previous}" if start != previous else str(start))
+    return ','.join(ranges)
+
+
+def parse_fetch_response(data):
+    """
+    Zerlegt die Antwort eines ``UID FETCH`` in ``FetchedMessage``-Einträge.
+
+    imaplib liefert pro Nachricht ein Tupel (Metadaten, Literal) gefolgt von
+    den restlichen Metadaten als Bytes, bzw. nur Bytes ohne Literal.
+    Antworten ohne UID (unaufgeforderte FETCH-Meldungen) werden ignoriert.
+    """
+    entries = []
+    for item in data or []:
+        if isinstance(item, tuple):
+            meta = item[0] if isinstance(item[0], bytes) else str(item[0]).encode()
+            entries.append([meta, item[1] if len(item) > 1 else None])
+        elif isinstance(item, bytes):
+            if _FETCH_START.match(item) or not entries:
+                entries.append([item, None])
+            else:
+                entries[-1][0] += item
+
+    messages = []
+    for meta, body in entries:
+        uid_match = _UID_RE.search(meta)
+        if not uid_match:
+            continue
+        flags_match = _FLAGS_RE.search(meta)
+        size_match = _SIZE_RE.search(meta)
+        modseq_match = _MODSEQ_RE.search(meta)
+        flags = tuple(
+            flag.decode('utf-8', errors='ignore')
+            for flag in (flags_match.group(1).split() if flags_match else [])
+        )
+        messages.append(FetchedMessage(
+            uid=int(uid_match.group(1)),
+            flags=flags,
+            size=int(size_match.group(1)) if size_match else None,
+            modseq=int(modseq_match.group(1)) if modseq_match else None,
+            body=body,
+        ))
+    return messages
+
+
+def fetch_metadata(mail_conn, uids, changed_since=None):
+    """
+    Holt Flags und Größe für mehrere UIDs mit einem Befehl.
+
+    Args:
+        uids: Liste von UIDs oder fertige Sequenzmenge (z.B. ``'1:500'``)
+        changed_since: Nur Nachrichten mit MODSEQ > Wert (CONDSTORE)
+
+    Returns:
+        dict UID -> FetchedMessage
+    """
+    uid_set = uids if isinstance(uids, str) else compress_uid_set(uids)
+    if not uid_set:
+        return {}
+    items = '(UID FLAGS RFC822.SIZE)' if changed_since is None else '(UID FLAGS)'
+    if changed_since is not None:
+        status, data = mail_conn.uid('FETCH', uid_set, items, f'(CHANGEDSINCE {int(changed_since)})')
+    else:
+        status, data = mail_conn.uid('FETCH', uid_set, items)
+    if status != 'OK':
+        raise RuntimeError(f"IMAP UID FETCH fehlgeschlagen: {data}")
+    return {message.uid: message for message in parse_fetch_response(data)}
+
+
+def fetch_bodies(mail_conn, uids):
+    """Holt die vollständigen Nachrichten mehrerer UIDs in einem ``UID FETCH`` (ohne ``\\Seen`` zu setzen)."""
+    if not uids:
+        return {}
+    status, data = mail_conn.uid('FETCH', compress_uid_set(uids), '(UID BODY.PEEK[])')
+    if status != 'OK':
+        raise RuntimeError(f"IMAP UID FETCH fehlgeschlagen: {data}")
+    return {
+        message.uid: message.body
+        for message in parse_fetch_response(data)
+        if message.body is not None
+    }
+
+
+def batch_uids(uids, sizes, max_count=25, max_bytes=20 * 1024 * 1024):
+    """Teilt UIDs in Stapel mit höchstens ``max_count`` Nachrichten bzw. ``max_bytes`` Gesamtgröße."""
+    batch = []
+    batch_bytes = 0
+    for uid in uids:
+        size = sizes.get(uid) or 0
+        if batch and (len(batch) >= max_count or batch_bytes + size > max_bytes):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(uid)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def _text_tokens(text):
+    for match in _TOKEN_RE.finditer(text):
+        open_paren, close_paren, quoted, literal, atom = match.groups()
+        if open_paren:
+            yield '(', None
+        elif close_paren:
+            yield ')', None
+        elif quoted is not None:
+            yield 'value', _ESCAPE_RE.sub(rb'\1', quoted)
+        elif literal:
+            # Der Inhalt folgt als eigenes Element des imaplib-Tupels
+            continue
+        elif atom:
+            yield 'value', None if atom.upper() == b'NIL' else atom
+
+
+def parse_fetch_items(data):
+    """
+    Zerlegt eine FETCH-Antwort vollständig (Listen, Strings, Literale).
+
+    Returns:
+        Liste von dicts pro Nachricht, z.B. ``{'UID': b'7', 'BODY[1]': b'...'}``;
+        Schlüssel in Großbuchstaben, ohne ``<offset>`` bei Teilabrufen
+    """
+    stack = [[]]
+    for item in data or []:
+        if isinstance(item, tuple):
+            meta = item[0] if isinstance(item[0], bytes) else str(item[0]).encode()
+            tokens = list(_text_tokens(meta))
+            if len(item) > 1:
+                tokens.append(('value', item[1]))
+        elif isinstance(item, bytes):
+            tokens = _text_tokens(item)
+        else:
+            continue
+        for kind, value in tokens:
+            if kind == '(':
+                stack.append([])
+            elif kind == ')':
+                if len(stack) > 1:
+                    closed = stack.pop()
+                    stack[-1].append(closed)
+            else:
+                stack[-1].append(value)
+    while len(stack) > 1:
+        closed = stack.pop()
+        stack[-1].append(closed)
+
+    messages = []
+    for value in stack[0]:
+        if not isinstance(value, list):
+            continue
+        items = {}
+        for key, item in zip(value[0::2], value[1::2]):
+            if isinstance(key, bytes):
+                items[_ORIGIN_RE.sub(b'', key).decode('ascii', errors='ignore').upper()] = item
+        messages.append(items)
+    return messages
+
+
+def _text(value, default=''):
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='ignore')
+    return default if value is None else str(value)
+
+
+def parse_bodystructure(node, section=''):
+    """
+    Wandelt eine geparste BODYSTRUCTURE in einen Baum aus ``BodyPart`` um.
+
+    ``message/rfc822``-Teile werden nicht weiter zerlegt.
+    """
+    if not isinstance(node, list) or not node:
+        return None
+    if isinstance(node[0], list):
+        children = []
+        index = 0
+        for child in node:
+            if not isinstance(child, list):
+                break
+            index += 1
+            part = parse_bodystructure(child, f'{section}.{index}' if section else str(index))
+            if part:
+                children.append(part)
+        subtype = _text(node[index] if len(node) > index else None, 'mixed').lower()
+        return BodyPart(section, f'multipart/{subtype}', None, 0, tuple(children))
+
+    main_type = _text(node[0], 'application').lower()
+    subtype = _text(node[1] if len(node) > 1 else None, 'octet-stream').lower()
+    encoding = _text(node[5] if len(node) > 5 else None, '7bit').lower()
+    size = _to_int(node[6]) if len(node) > 6 and isinstance(node[6], bytes) else None
+    return BodyPart(section or '1', f'{main_type}/{subtype}', encoding, size or 0, ())
+
+
+def iter_leaf_parts(part):
+    """Alle Teile eines ``BodyPart``-Baums ohne Unterteile (in Abschnittsreihenfolge)."""
+    if not part.children:
+        yield part
+        return
+    for child in part.children:
+        yield from iter_leaf_parts(child)
+
+
+def is_lazy_part(part, min_size):
+    """Große Teile, die nicht für Text oder Vorschau gebraucht werden (Anhänge)."""
+    main_type = part.content_type.split('/', 1)[0]
+    return (
+        not part.children
+        and part.size >= min_size
+        and main_type not in ('text', 'multipart', 'message')
+    )
+
+
+def fetch_structures(mail_conn, uids):
+    """
+    Holt BODYSTRUCTURE und Header mehrerer UIDs in einem ``UID FETCH``.
+
+    Returns:
+        dict UID -> (Header-Bytes, BodyPart)
+    """
+    if not uids:
+        return {}
+    status, data = mail_conn.uid('FETCH', compress_uid_set(uids), '(UID BODYSTRUCTURE BODY.PEEK[HEADER])')
+    if status != 'OK':
+        raise RuntimeError(f"IMAP UID FETCH fehlgeschlagen: {data}")
+    structures = {}
+    for items in parse_fetch_items(data):
+        uid = _to_int(items.get('UID'))
+        header = items.get('BODY[HEADER]')
+        structure = parse_bodystructure(items.get('BODYSTRUCTURE'))
+        if uid and structure and isinstance(header, bytes):
+            structures[uid] = (header, structure)
+    return structures
+
+
+def _ensure_header_end(mime_header, part):
+    if not mime_header:
+        return (
+            f"Content-Type: {part.content_type}\r\n"
+            f"Content-Transfer-Encoding: {part.encoding or '7bit'}\r\n\r\n"
+        ).encode('ascii')
+    if not mime_header.endswith((b'\r\n\r\n', b'\n\n')):
+        mime_header += b'\r\n' if mime_header.endswith(b'\n') else b'\r\n\r\n'
+    return mime_header
+
+
+def _build_part(part, sections, lazy_sections):
+    if part.children:
+        node = Message()
+        node['Content-Type'] = part.content_type
+        node.set_payload([_build_part(child, sections, lazy_sections) for child in part.children])
+        return node
+    mime_header = _ensure_header_end(sections.get(f'{part.section}.MIME'), part)
+    if part.section in lazy_sections:
+        node = email.message_from_bytes(mime_header)
+        node[LAZY_SECTION_HEADER] = part.section
+        node[LAZY_SIZE_HEADER] = str(part.size)
+        node[LAZY_ENCODING_HEADER] = part.encoding or '7bit'
+        node.set_payload('')
+        return node
+    return email.message_from_bytes(mime_header + (sections.get(part.section) or b''))
+
+
+def fetch_partial_message(mail_conn, uid, header, structure, min_part_size):
+    """
+    Lädt eine Nachricht ohne ihre großen Anhänge.
+
+    Geholt werden die MIME-Header aller Teile und die Inhalte der kleinen
+    Teile; große Anhänge erscheinen in der zusammengesetzten Nachricht mit
+    leerem Inhalt und ``LAZY_*_HEADER``.
+
+    Returns:
+        (email.message.Message, geladene Bytes) oder None, falls sich das
+        verzögerte Laden nicht lohnt (kein großer Anhang, keine multipart-Nachricht)
+    """
+    if not structure.children:
+        return None
+    leaves = list(iter_leaf_parts(structure))
+    lazy_sections = {part.section for part in leaves if is_lazy_part(part, min_part_size)}
+    if not lazy_sections:
+        return None
+
+    fetch_items = []
+    for part in leaves:
+        fetch_items.append(f'BODY.PEEK[{part.section}.MIME]')
+        if part.section not in lazy_sections:
+            fetch_items.append(f'BODY.PEEK[{part.section}]')
+    status, data = mail_conn.uid('FETCH', str(uid), f"(UID {' '.join(fetch_items)})")
+    if status != 'OK':
+        raise RuntimeError(f"IMAP UID FETCH fehlgeschlagen: {data}")
+
+    sections = {}
+    fetched_bytes = len(header)
+    for items in parse_fetch_items(data):
+        if _to_int(items.get('UID')) != uid:
+            continue
+        for key, value in items.items():
+            if key.startswith('BODY[') and isinstance(value, bytes):
+                sections[key[5:-1]] = value
+                fetched_bytes += len(value)
+
+    message = email.message_from_bytes(header)
+    message.set_payload([_build_part(child, sections, lazy_sections) for child in structure.children])
+    return message, fetched_bytes
+
+
+def iter_section_chunks(mail_conn, uid, section, chunk_size=SECTION_CHUNK_SIZE):
+    """
+    Liefert einen Abschnitt einer Nachricht blockweise (``BODY.PEEK[n]<offset.länge>``).
+
+    Es liegt immer nur ein Block im Speicher.
+    """
+    offset = 0
+    key = f'BODY[{section}]'
+    while True:
+        status, data = mail_conn.uid('FETCH', str(uid), f'(UID BODY.PEEK[{section}]<{offset}.{chunk_size}>)')
+        if status != 'OK':
+            raise RuntimeError(f"IMAP UID FETCH fehlgeschlagen: {data}")
+        chunk = None
+        for items in parse_fetch_items(data):
+            if _to_int(items.get('UID')) == int(uid) and key in items:
+                chunk = items[key] or b''
+                break
+        if chunk is None:
+            if offset == 0:
+                raise LookupError(f"Abschnitt {section} von UID {uid} nicht auf dem Server gefunden")
+            return
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        offset += len(chunk)
+
+
+def decode_transfer_chunks(chunks, encoding):
+    """Dekodiert einen blockweise gelesenen Abschnitt (base64, quoted-printable, sonst unverändert)."""
+    encoding = (encoding or '').strip().lower()
+    if encoding == 'base64':
+        rest = b''
+        for chunk in chunks:
+            data = rest + re.sub(rb'[^A-Za-z0-9+/=]', b'', chunk)
+            usable = len(data) - len(data) % 4
+            rest = data[usable:]
+            if usable:
+                yield binascii.a2b_base64(data[:usable])
+        if rest:
+            try:
+                yield binascii.a2b_base64(rest + b'=' * (-len(rest) % 4))
+            except binascii.Error:
+                pass
+    elif encoding == 'quoted-printable':
+        rest = b''
+        for chunk in chunks:
+            data = rest + chunk
+            # Nur vollständige Zeilen dekodieren (Soft-Umbrüche und =XX nicht zerteilen)
+            cut = data.rfind(b'\n') + 1
+            rest = data[cut:]
+            if cut:
+                yield binascii.a2b_qp(data[:cut])
+        if rest:
+            yield binascii.a2b_qp(rest)
+    else:
+        yield from chunks
@@ -2,11 +2,14 @@
 Lock Manager für Single-Worker-Tasks
 Stellt sicher, dass bestimmte Aufgaben nur von einem Gunicorn-Worker gleichzeitig ausgeführt werden.
 Verwendet File-based Locking, das über Worker-Grenzen hinweg funktioniert.
+LeaderLease wählt einen einzelnen Prozess für dauerhafte Aufgaben (z.B. den Job-Scheduler).
 """
 
 import os
 import logging
+import socket
 import time
+import uuid
 from contextlib import contextmanager
 from pathlib import Path
 from flask import current_app
@@ -278,6 +281,143 @@ class LockManager:
             # Fehler beim Prüfen, annehmen dass Lock nicht aktiv ist
             return False
 
+    def try_acquire_held_lock(self, lock_name):
+        """
+        Versuche einen Lock ohne Warten zu erwerben, der bis zur Freigabe gehalten wird.
+
+        Anders als ``acquire_lock`` bleibt die Lock-Datei bestehen (ein Löschen
+        würde wartenden Prozessen eine neue, ungesperrte Datei unterschieben).
+        Der Kernel gibt den Lock frei, sobald der Prozess endet.
+
+        Args:
+            lock_name: Name des Locks
+
+        Returns:
+            Geöffnete Lock-Datei (für ``release_held_lock``) oder None
+        """
+        if not HAS_FCNTL:
+            return None
+
+        lock_file_path = self._get_lock_dir() / f"{lock_name}.lock"
+        lock_file = open(lock_file_path, 'a')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (IOError, OSError):
+            lock_file.close()
+            return None
+
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"PID: {os.getpid()}\n")
+        lock_file.write(f"Timestamp: {time.time()}\n")
+        lock_file.flush()
+        logger.info(f"Lock '{lock_name}' dauerhaft erworben (PID: {os.getpid()})")
+        return lock_file
+
+    def release_held_lock(self, lock_file):
+        """Gib einen mit ``try_acquire_held_lock`` erworbenen Lock frei."""
+        if not lock_file:
+            return
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        except (IOError, OSError):
+            pass
+        finally:
+            lock_file.close()
+
+
+class LeaderLease:
+    """
+    Wahl eines einzelnen Leader-Prozesses (z.B. für den Job-Scheduler).
+
+    Mit Redis (``REDIS_ENABLED``) ist die Leitung ein Lease-Schlüssel mit
+    Ablaufzeit, der vom Leader regelmäßig verlängert wird; das funktioniert
+    auch über mehrere Server hinweg. Ohne Redis wird ein dauerhaft gehaltener
+    fcntl-Lock im instance-Verzeichnis verwendet (ein Leader pro Server).
+
+    ``acquire()`` ist nicht blockierend und muss deutlich häufiger als
+    ``lease_seconds`` aufgerufen werden; es erwirbt oder verlängert die Leitung.
+    """
+
+    REDIS_KEY_PREFIX = 'prismateams:leader:'
+
+    _RENEW_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('expire', KEYS[1], ARGV[2]) else return 0 end"
+    )
+    _RELEASE_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+
+    def __init__(self, name, lease_seconds=90, lock_manager=None):
+        self.name = name
+        self.lease_seconds = max(10, int(lease_seconds))
+        self.lock_manager = lock_manager or get_lock_manager()
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._lock_file = None
+
+    def _redis_client(self):
+        try:
+            if not current_app.config.get('REDIS_ENABLED', False):
+                return None
+            from app.blueprints.sse import get_redis_client
+            return get_redis_client()
+        except Exception:
+            return None
+
+    def acquire(self):
+        """Erwirbt oder verlängert die Leitung. Liefert True, solange dieser Prozess Leader ist."""
+        was_leader = self.is_leader
+        if current_app.config.get('REDIS_ENABLED', False):
+            self.is_leader = self._acquire_redis()
+        elif HAS_FCNTL:
+            self.is_leader = self._acquire_file()
+        else:
+            # Windows-Entwicklung: nur ein Prozess, keine Wahl nötig
+            self.is_leader = True
+
+        if self.is_leader and not was_leader:
+            logger.info(f"Leader '{self.name}' übernommen ({self.token})")
+        elif was_leader and not self.is_leader:
+            logger.warning(f"Leader '{self.name}' verloren ({self.token})")
+        return self.is_leader
+
+    def _acquire_redis(self):
+        client = self._redis_client()
+        if client is None:
+            # Ohne erreichbares Redis lieber keinen Leader als zwei
+            return False
+        key = f"{self.REDIS_KEY_PREFIX}{self.name}"
+        try:
+            if self.is_leader and client.eval(self._RENEW_SCRIPT, 1, key, self.token, self.lease_seconds):
+                return True
+            return bool(client.set(key, self.token, nx=True, ex=self.lease_seconds))
+        except Exception as e:
+            logger.warning(f"Leader '{self.name}': Redis-Lease fehlgeschlagen: {e}")
+            return False
+
+    def _acquire_file(self):
+        if self._lock_file is not None:
+            return True
+        self._lock_file = self.lock_manager.try_acquire_held_lock(f"leader_{self.name}")
+        return self._lock_file is not None
+
+    def release(self):
+        """Gibt die Leitung ab (z.B. beim Beenden), damit ein anderer Prozess sofort übernehmen kann."""
+        if self._lock_file is not None:
+            self.lock_manager.release_held_lock(self._lock_file)
+            self._lock_file = None
+        elif self.is_leader:
+            client = self._redis_client()
+            if client is not None:
+                try:
+                    client.eval(self._RELEASE_SCRIPT, 1, f"{self.REDIS_KEY_PREFIX}{self.name}", self.token)
+                except Exception:
+                    pass
+        self.is_leader = False
+
 
 # Globale Instanz
 _lock_manager = None
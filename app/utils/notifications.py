@@ -3,13 +3,14 @@ import logging
 import re
 import base64
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import List, Dict, Optional
 
 from flask import current_app
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.primitives import serialization
 
-from app import db, socketio
+from app import db
 from app.models.user import User
 from app.models.notification import (
     PushSubscription,
@@ -18,16 +19,16 @@ from app.models.notification import (
     ChatNotificationSettings,
     PushDeliveryLog,
 )
-from app.models.chat import ChatMessage, ChatMember
+from app.models.chat import ChatMember
 from app.models.file import File
 from app.models.email import EmailMessage
 from app.models.calendar import CalendarEvent, EventParticipant
 
-try:
-    from pywebpush import webpush, WebPushException
-    WEBPUSH_AVAILABLE = True
-except ImportError:
-    WEBPUSH_AVAILABLE = False
+from app.utils import push_delivery
+from app.utils.push_delivery import GONE_STATUS_CODES, PushJob
+
+WEBPUSH_AVAILABLE = push_delivery.WEBPUSH_AVAILABLE
+if not WEBPUSH_AVAILABLE:
     logging.warning("pywebpush nicht verfügbar. Push-Benachrichtigungen deaktiviert.")
 
 
@@ -55,6 +56,13 @@ def get_vapid_keys():
         logging.warning("VAPID Keys nicht konfiguriert. Push-Benachrichtigungen deaktiviert.")
         return None, None, None
 
+    vapid_claims = {"sub": "mailto:admin@yourdomain.com"}
+    return _convert_vapid_private_key(private_key), public_key, vapid_claims
+
+
+@lru_cache(maxsize=4)
+def _convert_vapid_private_key(private_key: str) -> str:
+    """Wandelt einen rohen Base64url-Schlüssel in PEM um (einmal pro Schlüssel)."""
     converted_private_key = private_key
     try:
         if private_key and not private_key.startswith('-----BEGIN'):
@@ -71,19 +79,17 @@ def get_vapid_keys():
                 ).decode('ascii')
     except Exception as e:
         logging.error(f"VAPID Private Key Konvertierung fehlgeschlagen: {e}")
-
-    vapid_claims = {"sub": "mailto:admin@yourdomain.com"}
-    return converted_private_key, public_key, vapid_claims
+    return converted_private_key
 
 
 def _resolve_push_icon(icon: str) -> str:
     try:
-        from app.models.settings import SystemSettings
+        from app.utils.settings_store import get_setting
         from flask import url_for
 
-        portal_logo_setting = SystemSettings.query.filter_by(key='portal_logo').first()
-        if portal_logo_setting and portal_logo_setting.value:
-            portal_logo_url = url_for('settings.portal_logo', filename=portal_logo_setting.value, _external=True)
+        portal_logo = get_setting('portal_logo')
+        if portal_logo:
+            portal_logo_url = url_for('settings.portal_logo', filename=portal_logo, _external=True)
             if not icon or icon == "/static/img/logo.png":
                 return portal_logo_url
         if not icon or icon == "":
@@ -99,23 +105,6 @@ def _resolve_push_icon(icon: str) -> str:
     return icon
 
 
-def _push_already_delivered(subscription_id: int, dedup_key: str) -> bool:
-    return PushDeliveryLog.query.filter_by(
-        subscription_id=subscription_id,
-        dedup_key=dedup_key,
-    ).first() is not None
-
-
-def _record_push_delivery(user_id: int, subscription_id: int, dedup_key: str) -> None:
-    if _push_already_delivered(subscription_id, dedup_key):
-        return
-    db.session.add(PushDeliveryLog(
-        user_id=user_id,
-        subscription_id=subscription_id,
-        dedup_key=dedup_key,
-    ))
-
-
 def upsert_notification_log(
     user_id: int,
     title: str,
@@ -244,46 +233,87 @@ def send_push_notification(
         "data": data or {},
     }
     push_dedup = dedup_key or f"generic:{user_id}:{title}:{body}:{url or '/'}"
-    original_private_key = current_app.config.get('VAPID_PRIVATE_KEY')
-    success_count = 0
-
-    def ensure_padded_base64url(value: Optional[str]) -> Optional[str]:
-        if not isinstance(value, str):
-            return value
-        v = value.strip()
-        padding = (4 - (len(v) % 4)) % 4
-        if padding:
-            v += '=' * padding
-        return v
+    delivered = {
+        subscription_id
+        for (subscription_id,) in db.session.query(PushDeliveryLog.subscription_id).filter(
+            PushDeliveryLog.subscription_id.in_([subscription.id for subscription in subscriptions]),
+            PushDeliveryLog.dedup_key == push_dedup,
+        ).all()
+    }
+    jobs = [
+        _build_push_job(user_id, subscription, payload, push_dedup)
+        for subscription in subscriptions
+        if subscription.id not in delivered
+    ]
+    return _dispatch_push_jobs(jobs, vapid_claims) > 0
+
+
+def _ensure_padded_base64url(value: Optional[str]) -> Optional[str]:
+    if not isinstance(value, str):
+        return value
+    v = value.strip()
+    padding = (4 - (len(v) % 4)) % 4
+    if padding:
+        v += '=' * padding
+    return v
+
+
+def _build_push_job(user_id: int, subscription: PushSubscription, payload: Dict, push_dedup: str) -> PushJob:
+    sub_info = subscription.to_dict()
+    if 'keys' in sub_info:
+        sub_info['keys'] = dict(sub_info['keys'])
+        sub_info['keys']['p256dh'] = _ensure_padded_base64url(sub_info['keys'].get('p256dh'))
+        sub_info['keys']['auth'] = _ensure_padded_base64url(sub_info['keys'].get('auth'))
+    return PushJob(user_id, subscription.id, sub_info, json.dumps(payload), push_dedup)
+
+
+def _dispatch_push_jobs(jobs: List[PushJob], vapid_claims: Dict) -> int:
+    """
+    Stellt Push-Jobs parallel zu und schreibt die Ergebnisse gebündelt:
+    last_used und Zustell-Log für erfolgreiche, Deaktivierung (ein UPDATE)
+    für abgelaufene Subscriptions. Kein Commit.
+    """
+    if not jobs:
+        return 0
 
-    for subscription in subscriptions:
-        if _push_already_delivered(subscription.id, push_dedup):
+    results = push_delivery.dispatch(
+        jobs,
+        current_app.config.get('VAPID_PRIVATE_KEY'),
+        vapid_claims,
+    )
+
+    delivered_ids = []
+    gone_ids = []
+    for result in results:
+        job = result.job
+        if result.success:
+            delivered_ids.append(job.subscription_id)
+            db.session.add(PushDeliveryLog(
+                user_id=job.user_id,
+                subscription_id=job.subscription_id,
+                dedup_key=job.dedup_key,
+            ))
             continue
-        try:
-            sub_info = subscription.to_dict()
-            if 'keys' in sub_info:
-                sub_info['keys'] = dict(sub_info['keys'])
-                sub_info['keys']['p256dh'] = ensure_padded_base64url(sub_info['keys'].get('p256dh'))
-                sub_info['keys']['auth'] = ensure_padded_base64url(sub_info['keys'].get('auth'))
-
-            webpush(
-                subscription_info=sub_info,
-                data=json.dumps(payload),
-                vapid_private_key=original_private_key,
-                vapid_claims=vapid_claims,
-                ttl=86400,
-            )
-            subscription.last_used = datetime.utcnow()
-            _record_push_delivery(user_id, subscription.id, push_dedup)
-            success_count += 1
-        except WebPushException as e:
-            logging.error(f"WebPush Fehler für Benutzer {user_id}: {e}")
-            if e.response and e.response.status_code in [410, 404, 400]:
-                subscription.is_active = False
-        except Exception as e:
-            logging.error(f"Unerwarteter Fehler beim Senden der Push-Benachrichtigung: {e}")
+        logging.error(
+            f"WebPush Fehler für Benutzer {job.user_id} "
+            f"(Status {result.status_code}): {result.error}"
+        )
+        if result.status_code in GONE_STATUS_CODES:
+            gone_ids.append(job.subscription_id)
 
-    return success_count > 0
+    if delivered_ids:
+        PushSubscription.query.filter(PushSubscription.id.in_(delivered_ids)).update(
+            {PushSubscription.last_used: datetime.utcnow()},
+            synchronize_session='evaluate',
+        )
+    if gone_ids:
+        PushSubscription.query.filter(PushSubscription.id.in_(gone_ids)).update(
+            {PushSubscription.is_active: False},
+            synchronize_session='evaluate',
+        )
+        logging.info(f"{len(gone_ids)} abgelaufene Push-Subscriptions deaktiviert")
+
+    return len(delivered_ids)
 
 
 def get_or_create_notification_settings(user_id: int) -> NotificationSettings:
@@ -302,62 +332,172 @@ def send_chat_notification(
     chat_name: str = None,
     message_id: int = None,
 ) -> int:
-    members = ChatMember.query.filter_by(chat_id=chat_id).all()
-    recipients = [m for m in members if m.user_id != sender_id]
+    """
+    Benachrichtigt alle Chat-Mitglieder außer dem Absender.
+
+    Benutzer, Einstellungen, Stummschaltungen, Modulrollen, Ungelesen-Zähler,
+    bestehende Log-Einträge und Push-Subscriptions werden jeweils mit einer
+    Abfrage für alle Empfänger geladen; am Ende wird einmal committet.
+    """
+    from app.services.chat_unread_service import ChatUnreadService
+    from app.utils.access_control import filter_users_with_module_access
+
     sender = User.query.get(sender_id)
     if not sender:
         return 0
 
-    sent_count = 0
-    for member in recipients:
-        user = User.query.get(member.user_id)
-        if not user or not user.notifications_enabled or not user.chat_notifications:
-            continue
-
-        from app.utils.access_control import has_module_access
-        if not has_module_access(user, 'module_chat'):
-            continue
+    recipient_ids = [
+        user_id
+        for (user_id,) in db.session.query(ChatMember.user_id).filter(ChatMember.chat_id == chat_id).all()
+        if user_id != sender_id
+    ]
+    if not recipient_ids:
+        return 0
 
-        settings = get_or_create_notification_settings(user.id)
-        if not settings.chat_notifications_enabled:
-            continue
+    users = User.query.filter(
+        User.id.in_(recipient_ids),
+        User.notifications_enabled == True,
+        User.chat_notifications == True,
+    ).all()
+    users = filter_users_with_module_access(users, 'module_chat')
+    if not users:
+        return 0
+    user_ids = [user.id for user in users]
 
-        chat_settings = ChatNotificationSettings.query.filter_by(
-            user_id=user.id, chat_id=chat_id
-        ).first()
-        if chat_settings and not chat_settings.notifications_enabled:
-            continue
+    settings_by_user = {
+        settings.user_id: settings
+        for settings in NotificationSettings.query.filter(NotificationSettings.user_id.in_(user_ids)).all()
+    }
+    missing_settings = [user_id for user_id in user_ids if user_id not in settings_by_user]
+    if missing_settings:
+        for user_id in missing_settings:
+            settings_by_user[user_id] = NotificationSettings(user_id=user_id)
+            db.session.add(settings_by_user[user_id])
+        db.session.flush()
 
-        unread_count = ChatMessage.query.filter(
-            ChatMessage.chat_id == chat_id,
-            ChatMessage.sender_id != user.id,
-            ChatMessage.created_at > (member.last_read_at or member.joined_at or datetime.min),
-            ChatMessage.is_deleted == False,
-        ).count()
-        if unread_count == 0:
-            continue
+    muted_user_ids = {
+        user_id
+        for (user_id,) in db.session.query(ChatNotificationSettings.user_id).filter(
+            ChatNotificationSettings.chat_id == chat_id,
+            ChatNotificationSettings.user_id.in_(user_ids),
+            ChatNotificationSettings.notifications_enabled == False,
+        ).all()
+    }
+    unread_by_user = ChatUnreadService.counts_in_chat(chat_id, user_ids)
+
+    targets = [
+        user for user in users
+        if settings_by_user[user.id].chat_notifications_enabled
+        and user.id not in muted_user_ids
+        and unread_by_user.get(user.id, 0) > 0
+    ]
+    if not targets:
+        if missing_settings:
+            db.session.commit()
+        return 0
+    target_ids = [user.id for user in targets]
+
+    title = f'"{chat_name or "Team Chat"}"'
+    in_app_key = f"chat:{chat_id}"
+    push_key = f"chat:{chat_id}:msg:{message_id}" if message_id else in_app_key
+    url = f"/chat/{chat_id}"
+    icon = "/static/img/logo.png"
+    push_icon = icon
+
+    existing_logs = {
+        log.user_id: log
+        for log in NotificationLog.query.filter(
+            NotificationLog.user_id.in_(target_ids),
+            NotificationLog.dedup_key == in_app_key,
+            NotificationLog.is_read == False,
+        ).all()
+    }
 
+    subscriptions_by_user = {}
+    delivered_by_user = {}
+    vapid_claims = None
+    if WEBPUSH_AVAILABLE:
+        vapid_private_key, _, vapid_claims = get_vapid_keys()
+        if vapid_private_key:
+            subscriptions = PushSubscription.query.filter(
+                PushSubscription.user_id.in_(target_ids),
+                PushSubscription.is_active == True,
+            ).all()
+            for subscription in subscriptions:
+                subscriptions_by_user.setdefault(subscription.user_id, []).append(subscription)
+            subscription_ids = [subscription.id for subscription in subscriptions]
+            if subscription_ids:
+                for user_id, subscription_id in db.session.query(
+                    PushDeliveryLog.user_id, PushDeliveryLog.subscription_id
+                ).filter(
+                    PushDeliveryLog.subscription_id.in_(subscription_ids),
+                    PushDeliveryLog.dedup_key == push_key,
+                ).all():
+                    delivered_by_user.setdefault(user_id, set()).add(subscription_id)
+            push_icon = _resolve_push_icon(icon)
+
+    now = datetime.utcnow()
+    push_jobs = []
+    sent_count = 0
+    for user in targets:
+        unread_count = unread_by_user[user.id]
         if unread_count == 1:
             body = '1 neue Nachricht'
         else:
             body = f'{unread_count} neue Nachrichten'
-        title = f'"{chat_name or "Team Chat"}"'
-        in_app_key = f"chat:{chat_id}"
-        push_key = f"chat:{chat_id}:msg:{message_id}" if message_id else in_app_key
 
-        if notify_user(
-            user.id,
-            title=title,
-            body=body,
-            url=f"/chat/{chat_id}",
-            notification_type='chat',
-            dedup_key=in_app_key,
-            push_dedup_key=push_key,
-            source_id=chat_id,
-            data={'chat_id': chat_id, 'unread_count': unread_count, 'type': 'chat'},
-        ):
-            sent_count += 1
+        log_entry = existing_logs.get(user.id)
+        if log_entry:
+            log_entry.title = title
+            log_entry.body = body
+            log_entry.url = url
+            log_entry.notification_type = 'chat'
+            log_entry.source_id = chat_id
+            log_entry.icon = icon
+            log_entry.sent_at = now
+        else:
+            db.session.add(NotificationLog(
+                user_id=user.id,
+                title=title,
+                body=body,
+                url=url,
+                icon=icon,
+                notification_type='chat',
+                dedup_key=in_app_key,
+                source_id=chat_id,
+                success=True,
+                is_read=False,
+            ))
 
+        delivered = delivered_by_user.get(user.id, set())
+        subscriptions = [
+            subscription
+            for subscription in _deduplicate_subscriptions(subscriptions_by_user.get(user.id, []))
+            if subscription.id not in delivered
+        ]
+        if subscriptions:
+            payload = {
+                "title": title,
+                "body": body,
+                "icon": push_icon,
+                "url": url,
+                "data": {'chat_id': chat_id, 'unread_count': unread_count, 'type': 'chat'},
+            }
+            push_jobs.extend(
+                _build_push_job(user.id, subscription, payload, push_key)
+                for subscription in subscriptions
+            )
+        sent_count += 1
+
+    # Alle Geräte aller Empfänger in einem Durchlauf parallel beliefern
+    _dispatch_push_jobs(push_jobs, vapid_claims)
+
+    try:
+        db.session.commit()
+    except Exception as e:
+        logging.error(f"Fehler beim Speichern der Chat-Benachrichtigungen: {e}")
+        db.session.rollback()
+        return 0
     return sent_count
 
 
@@ -368,32 +508,36 @@ def enqueue_chat_notification(
     chat_name: str = None,
     message_id: int = None,
 ):
-    app = current_app._get_current_object()
+    """Reiht die Chat-Benachrichtigung in die Job-Queue ein (Fallback: synchron)."""
+    payload = {
+        'chat_id': chat_id,
+        'sender_id': sender_id,
+        'message_content': message_content,
+        'chat_name': chat_name,
+        'message_id': message_id,
+    }
+    try:
+        from app.tasks.job_queue import enqueue_job, PRIORITY_HIGH
+        enqueue_job('chat_notification', payload, priority=PRIORITY_HIGH)
+    except Exception as exc:
+        logging.warning(f"Chat-Benachrichtigung konnte nicht eingereiht werden, fallback synchron: {exc}")
+        db.session.rollback()
+        send_chat_notification(**payload)
 
-    def _run_in_background():
-        with app.app_context():
-            try:
-                send_chat_notification(
-                    chat_id=chat_id,
-                    sender_id=sender_id,
-                    message_content=message_content,
-                    chat_name=chat_name,
-                    message_id=message_id,
-                )
-            except Exception as exc:
-                logging.error(f"Asynchroner Chat-Push fehlgeschlagen: {exc}")
 
+def enqueue_file_notification(file_id: int, notification_type: str = 'new'):
+    """Reiht eine Datei-Benachrichtigung in die Job-Queue ein (Fallback: synchron)."""
     try:
-        socketio.start_background_task(_run_in_background)
-    except Exception as exc:
-        logging.warning(f"Background-Task konnte nicht gestartet werden, fallback synchron: {exc}")
-        send_chat_notification(
-            chat_id=chat_id,
-            sender_id=sender_id,
-            message_content=message_content,
-            chat_name=chat_name,
-            message_id=message_id,
+        from app.tasks.job_queue import enqueue_job
+        enqueue_job(
+            'file_notification',
+            {'file_id': file_id, 'notification_type': notification_type},
+            dedup_key=f"file_notification:{file_id}:{notification_type}",
         )
+    except Exception as exc:
+        logging.warning(f"Datei-Benachrichtigung konnte nicht eingereiht werden, fallback synchron: {exc}")
+        db.session.rollback()
+        send_file_notification(file_id, notification_type)
 
 
 def send_file_notification(file_id: int, notification_type: str = 'new') -> int:
@@ -458,6 +602,12 @@ def send_email_notification(email_id: int) -> int:
         logging.error(f"Fehler beim Laden der Benutzer: {e}")
         return 0
 
+    from app.utils.email_folder_counts import get_unread_email_count
+    # Ungelesene E-Mails aus den Ordnerzählern (für alle Benutzer gleich)
+    unread_count = get_unread_email_count()
+    if unread_count == 0:
+        return 0
+
     sent_count = 0
     for user in users:
         if not user.notifications_enabled or not user.email_notifications:
@@ -467,13 +617,6 @@ def send_email_notification(email_id: int) -> int:
         if not has_module_access(user, 'module_email'):
             continue
 
-        unread_count = EmailMessage.query.filter(
-            EmailMessage.is_read == False,
-            EmailMessage.is_sent == False,
-        ).count()
-        if unread_count == 0:
-            continue
-
         if unread_count == 1:
             body = "1 neue E-Mail"
         else:
@@ -131,12 +131,12 @@ def get_logo_path():
     """Holt den Pfad zum Portal-Logo aus SystemSettings oder Konfiguration."""
     # Try to get portal logo from SystemSettings first
     try:
-        from app.models.settings import SystemSettings
-        portal_logo_setting = SystemSettings.query.filter_by(key='portal_logo').first()
-        if portal_logo_setting and portal_logo_setting.value:
+        from app.utils.settings_store import get_setting
+        portal_logo = get_setting('portal_logo')
+        if portal_logo:
             # Portal logo is stored in uploads/system/
             project_root = os.path.dirname(current_app.root_path)
-            logo_path = os.path.join(project_root, current_app.config['UPLOAD_FOLDER'], 'system', portal_logo_setting.value)
+            logo_path = os.path.join(project_root, current_app.config['UPLOAD_FOLDER'], 'system', portal_logo)
             if os.path.exists(logo_path):
                 return logo_path
     except:
@@ -307,9 +307,8 @@ def generate_borrow_receipt_pdf(borrow_transactions, output=None):
     
     # Get portal name from SystemSettings
     try:
-        from app.models.settings import SystemSettings
-        portal_name_setting = SystemSettings.query.filter_by(key='portal_name').first()
-        app_name = portal_name_setting.value if portal_name_setting and portal_name_setting.value else current_app.config.get('APP_NAME', 'Prismateams')
+        from app.utils.settings_store import get_setting
+        app_name = get_setting('portal_name') or current_app.config.get('APP_NAME', 'Prismateams')
     except:
         app_name = current_app.config.get('APP_NAME', 'Prismateams')
     
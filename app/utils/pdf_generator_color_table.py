@@ -149,9 +149,8 @@ def generate_color_code_table_pdf(output=None):
     )
     # Get portal name from SystemSettings
     try:
-        from app.models.settings import SystemSettings
-        portal_name_setting = SystemSettings.query.filter_by(key='portal_name').first()
-        app_name = portal_name_setting.value if portal_name_setting and portal_name_setting.value else current_app.config.get('APP_NAME', 'Prismateams')
+        from app.utils.settings_store import get_setting
+        app_name = get_setting('portal_name') or current_app.config.get('APP_NAME', 'Prismateams')
     except:
         app_name = current_app.config.get('APP_NAME', 'Prismateams')
     footer_text = f"Erstellt am {datetime.now().strftime('%d.%m.%Y %H:%M')} - {app_name}"
@@ -0,0 +1,170 @@
+"""
+Parallele Web-Push-Zustellung.
+
+Statt jede Subscription nacheinander mit ``pywebpush.webpush`` zu beliefern
+(neue HTTPS-Verbindung und neu signiertes VAPID-JWT pro Aufruf), nutzt dieses
+Modul:
+
+- einen begrenzten Thread-Pool (``PUSH_DELIVERY_MAX_WORKERS``),
+- eine ``requests.Session`` pro Push-Dienst (Keep-Alive, Connection-Pool),
+- einen Cache der VAPID-Header pro Audience, bis das JWT kurz vor Ablauf steht.
+
+Die Worker-Threads greifen nicht auf die Datenbank zu; sie liefern nur
+Ergebnisse zurück. Das Schreiben (last_used, Zustell-Log, Deaktivierung
+abgelaufener Subscriptions) erledigt der Aufrufer gebündelt.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import urlparse
+
+import requests
+from flask import current_app, has_app_context
+from requests.adapters import HTTPAdapter
+
+try:
+    from pywebpush import WebPusher
+    from py_vapid import Vapid
+    WEBPUSH_AVAILABLE = True
+except ImportError:
+    WEBPUSH_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_TIMEOUT = 10
+DEFAULT_TTL = 86400
+
+# Gültigkeit eines VAPID-JWT (max. 24h laut RFC 8292) und Erneuerungspuffer
+VAPID_TOKEN_LIFETIME = 12 * 60 * 60
+VAPID_TOKEN_REFRESH_MARGIN = 15 * 60
+
+# Statuscodes, bei denen die Subscription als ungültig gilt
+GONE_STATUS_CODES = (400, 404, 410)
+
+PushJob = namedtuple('PushJob', ['user_id', 'subscription_id', 'subscription_info', 'data', 'dedup_key'])
+PushResult = namedtuple('PushResult', ['job', 'success', 'status_code', 'error'])
+
+_executor = None
+_executor_lock = threading.Lock()
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+_vapid_headers = {}
+_vapid_lock = threading.Lock()
+
+
+def _config(key, default):
+    if has_app_context():
+        return current_app.config.get(key, default)
+    return default
+
+
+def _get_executor(max_workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='webpush')
+        return _executor
+
+
+def _get_session(origin, pool_size):
+    """Eine wiederverwendete Session pro Push-Dienst (z.B. fcm.googleapis.com)."""
+    with _sessions_lock:
+        session = _sessions.get(origin)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[origin] = session
+        return session
+
+
+@lru_cache(maxsize=4)
+def _load_vapid(private_key):
+    if os.path.isfile(private_key):
+        return Vapid.from_file(private_key_file=private_key)
+    return Vapid.from_string(private_key=private_key)
+
+
+def _get_vapid_headers(origin, private_key, claims):
+    """Liefert (gecachte) VAPID-Header für eine Audience."""
+    cache_key = (origin, private_key, claims.get('sub'))
+    now = int(time.time())
+    with _vapid_lock:
+        cached = _vapid_headers.get(cache_key)
+        if cached and cached[1] - now > VAPID_TOKEN_REFRESH_MARGIN:
+            return cached[0]
+
+    token_claims = dict(claims)
+    token_claims['aud'] = origin
+    token_claims['exp'] = now + VAPID_TOKEN_LIFETIME
+    headers = _load_vapid(private_key).sign(token_claims)
+
+    with _vapid_lock:
+        _vapid_headers[cache_key] = (headers, token_claims['exp'])
+    return headers
+
+
+def _origin(endpoint):
+    parsed = urlparse(endpoint or '')
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def _send_one(job, private_key, claims, ttl, timeout, pool_size):
+    try:
+        origin = _origin(job.subscription_info.get('endpoint'))
+        headers = dict(_get_vapid_headers(origin, private_key, claims))
+        response = WebPusher(
+            job.subscription_info,
+            requests_session=_get_session(origin, pool_size),
+        ).send(job.data, headers, ttl=ttl, timeout=timeout)
+        if response.status_code > 202:
+            return PushResult(job, False, response.status_code, (response.text or '')[:200])
+        return PushResult(job, True, response.status_code, None)
+    except Exception as exc:
+        status_code = getattr(getattr(exc, 'response', None), 'status_code', None)
+        return PushResult(job, False, status_code, str(exc))
+
+
+def dispatch(jobs, vapid_private_key, vapid_claims, ttl=DEFAULT_TTL):
+    """
+    Stellt alle Jobs parallel zu und liefert eine Liste von ``PushResult``.
+
+    Args:
+        jobs: Liste von ``PushJob``
+        vapid_private_key: VAPID Private Key (String oder Pfad zur PEM-Datei)
+        vapid_claims: Claims mit mindestens ``sub``
+        ttl: Time-To-Live der Push-Nachricht in Sekunden
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return []
+    if not WEBPUSH_AVAILABLE:
+        return [PushResult(job, False, None, 'pywebpush nicht verfügbar') for job in jobs]
+
+    max_workers = max(1, int(_config('PUSH_DELIVERY_MAX_WORKERS', DEFAULT_MAX_WORKERS)))
+    timeout = _config('PUSH_DELIVERY_TIMEOUT', DEFAULT_TIMEOUT)
+    claims = {key: value for key, value in (vapid_claims or {}).items() if key not in ('aud', 'exp')}
+
+    if len(jobs) == 1:
+        return [_send_one(jobs[0], vapid_private_key, claims, ttl, timeout, max_workers)]
+
+    executor = _get_executor(max_workers)
+    futures = [
+        executor.submit(_send_one, job, vapid_private_key, claims, ttl, timeout, max_workers)
+        for job in jobs
+    ]
+    results = [future.result() for future in futures]
+
+    failed = sum(1 for result in results if not result.success)
+    if failed:
+        logger.info(f"Web-Push: {len(results) - failed}/{len(results)} zugestellt")
+    return results
@@ -0,0 +1,215 @@
+"""
+Zentraler Prozess-Cache für SystemSettings.
+
+Alle Einstellungen werden mit einer einzigen Abfrage geladen und pro Worker im
+Speicher gehalten. Schreibzugriffe auf SystemSettings setzen (in derselben
+Transaktion) eine neue Versionsmarke in der Zeile ``settings_cache_version``.
+Jeder Worker vergleicht diese Marke höchstens einmal pro Request (bzw. alle
+``SETTINGS_CACHE_CHECK_INTERVAL`` Sekunden außerhalb von Requests) und lädt
+bei Abweichung neu. Dadurch sehen alle Gunicorn-Worker Änderungen sofort.
+
+Zusätzlich läuft jeder Eintrag nach ``SETTINGS_CACHE_MAX_AGE`` Sekunden ab, damit
+auch Änderungen, die an der ORM vorbei geschrieben wurden (manuelle SQL-Updates),
+spätestens dann sichtbar werden. Für solche Fälle gibt es außerdem
+``bump_settings_version()``, das die Invalidierung explizit an alle Worker verteilt.
+"""
+
+import logging
+import threading
+import time
+import uuid
+
+from flask import current_app, g, has_app_context, has_request_context
+from sqlalchemy import event
+
+from app import db
+from app.models.settings import SystemSettings
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'settings_cache_version'
+DEFAULT_CHECK_INTERVAL = 5
+DEFAULT_MAX_AGE = 300
+
+_MISSING = object()
+
+_lock = threading.Lock()
+_cache = {
+    'values': None,
+    'version': None,
+    'loaded_at': 0.0,
+    'checked_at': 0.0,
+}
+
+
+def _check_interval():
+    if has_app_context():
+        return current_app.config.get('SETTINGS_CACHE_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL)
+    return DEFAULT_CHECK_INTERVAL
+
+
+def _max_age():
+    if has_app_context():
+        return current_app.config.get('SETTINGS_CACHE_MAX_AGE', DEFAULT_MAX_AGE)
+    return DEFAULT_MAX_AGE
+
+
+def _load_all():
+    """Lädt alle Einstellungen (inkl. Versionsmarke) mit einer Abfrage."""
+    rows = db.session.query(SystemSettings.key, SystemSettings.value).all()
+    values = {key: value for key, value in rows}
+    version = values.pop(VERSION_KEY, None)
+    now = time.monotonic()
+    with _lock:
+        _cache['values'] = values
+        _cache['version'] = version
+        _cache['loaded_at'] = now
+        _cache['checked_at'] = now
+    return values
+
+
+def _read_version():
+    return db.session.query(SystemSettings.value).filter(
+        SystemSettings.key == VERSION_KEY
+    ).scalar()
+
+
+def _needs_version_check():
+    if has_request_context():
+        return not getattr(g, '_settings_version_checked', False)
+    return (time.monotonic() - _cache['checked_at']) >= _check_interval()
+
+
+def _mark_checked():
+    if has_request_context():
+        g._settings_version_checked = True
+    _cache['checked_at'] = time.monotonic()
+
+
+def get_all_settings():
+    """
+    Liefert alle Einstellungen als Dict ``{key: value}``.
+
+    Der Cache wird pro Request höchstens einmal gegen die Versionsmarke geprüft.
+    Bei Fehlern (z.B. während Setup ohne Tabelle) wird ein leeres Dict geliefert.
+    """
+    try:
+        values = _cache['values']
+        if values is None or (time.monotonic() - _cache['loaded_at']) >= _max_age():
+            values = _load_all()
+            _mark_checked()
+            return values
+
+        if _needs_version_check():
+            if _read_version() != _cache['version']:
+                values = _load_all()
+            _mark_checked()
+        return values
+    except Exception as exc:
+        logger.debug("SystemSettings-Cache nicht verfügbar: %s", exc)
+        return {}
+
+
+def get_setting(key, default=None):
+    """
+    Liefert den Wert einer Einstellung aus dem Cache.
+
+    ``default`` wird nur zurückgegeben, wenn der Schlüssel nicht existiert;
+    eine vorhandene Einstellung mit ``NULL``-Wert liefert ``None``.
+    """
+    return get_all_settings().get(key, default)
+
+
+def has_setting(key):
+    """Prüft, ob eine Einstellung in der Datenbank existiert."""
+    return get_all_settings().get(key, _MISSING) is not _MISSING
+
+
+def get_setting_stripped(key, default=None):
+    """Liefert einen getrimmten, nicht-leeren Wert oder ``default``."""
+    value = get_setting(key)
+    if value is None:
+        return default
+    value = str(value).strip()
+    return value or default
+
+
+def invalidate_settings_cache():
+    """Verwirft den lokalen Cache dieses Workers."""
+    with _lock:
+        _cache['values'] = None
+        _cache['version'] = None
+        _cache['loaded_at'] = 0.0
+        _cache['checked_at'] = 0.0
+    if has_request_context():
+        g._settings_version_checked = False
+
+
+def bump_settings_version():
+    """
+    Invalidiert den Cache in allen Workern.
+
+    Nur nötig, wenn Einstellungen an der ORM vorbei geändert wurden; normale
+    Schreibzugriffe über ``SystemSettings`` erhöhen die Version automatisch.
+    """
+    try:
+        _bump_version(db.session)
+        db.session.commit()
+    except Exception as exc:
+        db.session.rollback()
+        logger.warning("Konnte SystemSettings-Version nicht erhöhen: %s", exc)
+    invalidate_settings_cache()
+
+
+def _bump_version(session):
+    """Setzt eine neue Versionsmarke innerhalb der laufenden Transaktion."""
+    token = uuid.uuid4().hex
+    connection = session.connection()
+    table = SystemSettings.__table__
+    result = connection.execute(
+        table.update().where(table.c.key == VERSION_KEY).values(value=token)
+    )
+    if not result.rowcount:
+        connection.execute(
+            table.insert().values(
+                key=VERSION_KEY,
+                value=token,
+                description='Versionsmarke für den SystemSettings-Cache',
+            )
+        )
+
+
+def _touches_settings(session):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, SystemSettings) and obj.key != VERSION_KEY:
+            return True
+    return False
+
+
+@event.listens_for(db.session, 'before_flush')
+def _settings_before_flush(session, flush_context, instances):
+    if _touches_settings(session):
+        session.info['settings_changed'] = True
+
+
+@event.listens_for(db.session, 'after_flush')
+def _settings_after_flush(session, flush_context):
+    if session.info.get('settings_changed') and not session.info.get('settings_version_bumped'):
+        try:
+            _bump_version(session)
+            session.info['settings_version_bumped'] = True
+        except Exception as exc:
+            logger.warning("Konnte SystemSettings-Version nicht erhöhen: %s", exc)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _settings_after_commit(session):
+    if session.info.pop('settings_changed', False):
+        session.info.pop('settings_version_bumped', None)
+        invalidate_settings_cache()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _settings_after_rollback(session):
+    session.info.pop('settings_changed', None)
+    session.info.pop('settings_version_bumped', None)
@@ -0,0 +1,189 @@
+"""
+Wiederverwendete SMTP-Verbindung pro Worker-Prozess.
+
+Bisher hat jede E-Mail eine eigene Verbindung aufgebaut (TCP, STARTTLS,
+LOGIN) und danach wieder abgemeldet. ``SmtpConnection`` hält die angemeldete
+Verbindung offen und stellt nacheinander über sie zu:
+
+- länger unbenutzte Verbindungen werden vor dem Versand per NOOP geprüft
+- nach ``SMTP_IDLE_TIMEOUT`` Sekunden ohne Nutzung wird vor dem nächsten
+  Versand neu verbunden (die meisten Server trennen untätige Sitzungen)
+- nach ``MAIL_MAX_MESSAGES_PER_CONNECTION`` Nachrichten wird neu verbunden
+  (viele Server begrenzen die Nachrichten pro Sitzung)
+- bricht die Verbindung ab, wird einmal neu verbunden und erneut gesendet
+- ein 421 des Servers (Dienst nicht verfügbar, oft Ratenbegrenzung) schließt
+  die Verbindung; der Aufrufer entscheidet über den neuen Versuch
+"""
+
+import logging
+import os
+import smtplib
+import ssl
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IDLE_TIMEOUT = 120
+DEFAULT_NOOP_AFTER = 30
+DEFAULT_MAX_MESSAGES = 100
+DEFAULT_TIMEOUT = 30
+
+# Fehler, nach denen die Verbindung nicht weiterverwendet werden darf
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError, ssl.SSLError)
+
+_connection = None
+_connection_lock = threading.Lock()
+
+
+def is_server_error(exc):
+    """
+    True für Fehler, die nicht an der einzelnen Nachricht liegen: Server nicht
+    erreichbar, Anmeldung/STARTTLS fehlgeschlagen oder 421 (Dienst nicht verfügbar).
+    """
+    if isinstance(exc, (smtplib.SMTPAuthenticationError, smtplib.SMTPConnectError,
+                        smtplib.SMTPHeloError, smtplib.SMTPNotSupportedError)):
+        return True
+    if isinstance(exc, CONNECTION_ERRORS):
+        return True
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code == 421
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+def is_temporary_smtp_error(exc):
+    """True für SMTP-Antworten der Klasse 4xx bzw. abgebrochene Verbindungen (später erneut versuchen)."""
+    if isinstance(exc, CONNECTION_ERRORS):
+        return True
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in exc.recipients.values()]
+        return bool(codes) and all(400 <= code < 500 for code in codes)
+    code = getattr(exc, 'smtp_code', None)
+    return code is not None and 400 <= code < 500
+
+
+class SmtpConnection:
+    """Angemeldete SMTP-Verbindung dieses Prozesses (threadsicher, ein Versand zur Zeit)."""
+
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT, noop_after=DEFAULT_NOOP_AFTER,
+                 max_messages=DEFAULT_MAX_MESSAGES):
+        self.idle_timeout = max(1, int(idle_timeout))
+        self.noop_after = max(0, int(noop_after))
+        self.max_messages = max(0, int(max_messages))
+        self.pid = os.getpid()
+        self._smtp = None
+        self._key = None
+        self._lock = threading.RLock()
+        self.last_used = 0.0
+        self.sent_on_connection = 0
+
+    def _connect(self, config):
+        server = config.get('MAIL_SERVER')
+        port = config.get('MAIL_PORT', 587)
+        use_ssl = config.get('MAIL_USE_SSL', False)
+        username = config.get('MAIL_USERNAME')
+        password = config.get('MAIL_PASSWORD')
+        logger.debug(f"Connecting to SMTP server: {server}:{port} (SSL: {use_ssl})")
+        if use_ssl:
+            smtp = smtplib.SMTP_SSL(server, port, timeout=DEFAULT_TIMEOUT)
+        else:
+            smtp = smtplib.SMTP(server, port, timeout=DEFAULT_TIMEOUT)
+        try:
+            if not use_ssl and config.get('MAIL_USE_TLS', True):
+                smtp.starttls()
+            if username and password:
+                smtp.login(username, password)
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+            raise
+        self._smtp = smtp
+        self._key = (server, port, bool(use_ssl), username)
+        self.sent_on_connection = 0
+        self.last_used = time.monotonic()
+
+    def _ensure_connected(self, config):
+        key = (config.get('MAIL_SERVER'), config.get('MAIL_PORT', 587),
+               bool(config.get('MAIL_USE_SSL', False)), config.get('MAIL_USERNAME'))
+        if self._smtp is not None:
+            idle = time.monotonic() - self.last_used
+            if (
+                key != self._key
+                or idle >= self.idle_timeout
+                or (self.max_messages and self.sent_on_connection >= self.max_messages)
+            ):
+                self.close()
+            elif idle >= self.noop_after:
+                try:
+                    code, _ = self._smtp.noop()
+                    if code != 250:
+                        raise smtplib.SMTPServerDisconnected(f"NOOP: {code}")
+                except Exception as e:
+                    logger.debug(f"SMTP: Verbindung verworfen (NOOP fehlgeschlagen: {e})")
+                    self.close()
+        if self._smtp is None:
+            self._connect(config)
+
+    def send(self, sender, recipients, message, config):
+        """
+        Stellt eine fertige Nachricht zu.
+
+        Returns:
+            Dict der abgelehnten Empfänger (leer, wenn alle angenommen wurden)
+
+        Raises:
+            smtplib.SMTPException / OSError: wenn der Versand fehlschlägt
+        """
+        with self._lock:
+            for attempt in (1, 2):
+                self._ensure_connected(config)
+                try:
+                    refused = self._smtp.sendmail(sender, recipients, message)
+                except CONNECTION_ERRORS:
+                    self.close()
+                    if attempt == 2:
+                        raise
+                    logger.debug("SMTP: Verbindung abgebrochen, verbinde neu")
+                    continue
+                except smtplib.SMTPResponseException as e:
+                    if e.smtp_code == 421:
+                        self.close()
+                    else:
+                        self.last_used = time.monotonic()
+                    raise
+                except smtplib.SMTPRecipientsRefused:
+                    self.last_used = time.monotonic()
+                    raise
+                self.last_used = time.monotonic()
+                self.sent_on_connection += 1
+                return refused
+
+    def close(self):
+        with self._lock:
+            smtp, self._smtp = self._smtp, None
+            self._key = None
+            if smtp is None:
+                return
+            try:
+                smtp.quit()
+            except Exception:
+                try:
+                    smtp.close()
+                except Exception:
+                    pass
+
+
+def get_smtp_connection(config=None):
+    """SMTP-Verbindung dieses Prozesses (nach einem Fork wird eine neue angelegt)."""
+    global _connection
+    with _connection_lock:
+        if _connection is None or _connection.pid != os.getpid():
+            config = config or {}
+            _connection = SmtpConnection(
+                idle_timeout=config.get('SMTP_IDLE_TIMEOUT', DEFAULT_IDLE_TIMEOUT),
+                noop_after=config.get('SMTP_NOOP_AFTER', DEFAULT_NOOP_AFTER),
+                max_messages=config.get('MAIL_MAX_MESSAGES_PER_CONNECTION', DEFAULT_MAX_MESSAGES),
+            )
+        return _connection
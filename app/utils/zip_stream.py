@@ -0,0 +1,222 @@
+"""
+ZIP-Archive für Ordner- und Mehrfach-Downloads, die beim Senden entstehen.
+
+Das Archiv wird weder im Speicher noch als Temp-Datei aufgebaut:
+``zipfile`` schreibt in einen nicht-seekbaren Puffer, der nach jedem Block an
+den Client geht (Einträge mit Data Descriptor). Der Speicherbedarf bleibt so
+unabhängig von der Archivgröße bei etwa einem Leseblock.
+
+Bereits komprimierte Formate (Bilder, Videos, Office-Dokumente, Archive, ...)
+werden ohne erneute Kompression abgelegt (``ZIP_STORED``); das spart CPU und
+wäre ohnehin kaum kleiner. Alles andere wird mit ``ZIP_DEFLATED`` gepackt.
+
+Einträge werden vor dem Senden aus der Datenbank aufgelöst
+(``build_folder_entries``/``build_file_entries``), der Generator selbst liest
+nur noch Dateien.
+"""
+
+import logging
+import os
+import posixpath
+import unicodedata
+import zipfile
+from collections import namedtuple
+from datetime import datetime
+from urllib.parse import quote
+
+from app.models.file import File, Folder
+
+logger = logging.getLogger(__name__)
+
+_READ_CHUNK_SIZE = 256 * 1024
+# Ab dieser Größe wird der Eintrag vorab als ZIP64 angelegt (Größe steht erst danach fest)
+_ZIP64_THRESHOLD = zipfile.ZIP64_LIMIT - 64 * 1024 * 1024
+
+STORED_EXTENSIONS = frozenset({
+    # Bilder
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.heif', '.avif',
+    # Audio/Video
+    '.mp3', '.m4a', '.aac', '.ogg', '.opus', '.flac', '.mp4', '.m4v', '.mov', '.mkv', '.webm', '.avi',
+    # Archive
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.zst',
+    # Office/ZIP-Container
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.epub', '.jar', '.apk',
+    # Sonstige komprimierte Formate
+    '.pdf', '.woff', '.woff2',
+})
+
+ZipEntry = namedtuple('ZipEntry', ['arcname', 'path', 'modified'])
+
+
+class _StreamBuffer:
+    """Nicht-seekbares Ziel für ``zipfile``; gesammelte Bytes holt ``drain`` ab."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        if data:
+            self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _clean_name(name):
+    """Macht einen Datei-/Ordnernamen als einzelnen Pfadbestandteil im Archiv sicher."""
+    cleaned = (name or '').replace('/', '_').replace('\\', '_').strip()
+    if cleaned in ('', '.', '..'):
+        cleaned = '_'
+    return cleaned
+
+
+def _unique_name(name, used):
+    """Hängt bei gleichen Namen im selben Ordner " (2)", " (3)", ... an."""
+    candidate = name
+    counter = 2
+    stem, ext = os.path.splitext(name)
+    while candidate.lower() in used:
+        candidate = f"{stem} ({counter}){ext}"
+        counter += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def _absolute_path(file_path):
+    return file_path if os.path.isabs(file_path) else os.path.join(os.getcwd(), file_path)
+
+
+def _file_entry(file, directory, used):
+    arcname = posixpath.join(directory, _unique_name(_clean_name(file.original_name or file.name), used))
+    return ZipEntry(arcname, _absolute_path(file.file_path), file.updated_at or file.created_at)
+
+
+def build_folder_entries(root_folder, name=None):
+    """
+    Sammelt alle aktuellen Dateien eines Ordners inklusive Unterordnern.
+
+    Ordner werden ebenenweise geladen (eine Abfrage je Ebene), Dateien je
+    Ebene gesammelt. Leere Ordner erscheinen als eigener Eintrag.
+
+    Args:
+        root_folder: Folder, dessen Inhalt unter ``<name>/`` im Archiv landet
+        name: Ordnername im Archiv (Standard: Name des Ordners)
+
+    Returns:
+        Liste von ``ZipEntry``
+    """
+    entries = []
+    root_dir = name or _clean_name(root_folder.name)
+    directories = {root_folder.id: root_dir}
+    used_names = {root_folder.id: set()}
+    level = [root_folder.id]
+
+    while level:
+        files = File.query.filter(
+            File.folder_id.in_(level),
+            File.is_current == True,
+        ).order_by(File.folder_id, File.name, File.id).all()
+        subfolders = Folder.query.filter(Folder.parent_id.in_(level)).order_by(Folder.name, Folder.id).all()
+
+        non_empty = set()
+        for file in files:
+            entries.append(_file_entry(file, directories[file.folder_id], used_names[file.folder_id]))
+            non_empty.add(file.folder_id)
+
+        next_level = []
+        for subfolder in subfolders:
+            if subfolder.id in directories:
+                continue
+            dir_name = _unique_name(_clean_name(subfolder.name), used_names[subfolder.parent_id])
+            directories[subfolder.id] = posixpath.join(directories[subfolder.parent_id], dir_name)
+            used_names[subfolder.id] = set()
+            non_empty.add(subfolder.parent_id)
+            next_level.append(subfolder.id)
+
+        for folder_id in level:
+            if folder_id not in non_empty:
+                entries.append(ZipEntry(directories[folder_id] + '/', None, None))
+        level = next_level
+
+    return entries
+
+
+def build_file_entries(files, folders=()):
+    """
+    Sammelt eine Auswahl aus Dateien und Ordnern für ein gemeinsames Archiv.
+
+    Dateien liegen auf oberster Ebene, Ordner jeweils mit ihrem gesamten Inhalt.
+    """
+    entries = []
+    used = set()
+    for folder in folders:
+        entries.extend(build_folder_entries(folder, _unique_name(_clean_name(folder.name), used)))
+    for file in files:
+        entries.append(_file_entry(file, '', used))
+    return entries
+
+
+def _zip_info(entry):
+    modified = entry.modified or datetime.utcnow()
+    date_time = (max(modified.year, 1980),) + modified.timetuple()[1:6]
+    info = zipfile.ZipInfo(entry.arcname, date_time=date_time)
+    if entry.path is None:
+        info.external_attr = (0o40755 << 16) | 0x10
+        return info
+    info.external_attr = 0o644 << 16
+    if os.path.splitext(entry.arcname)[1].lower() in STORED_EXTENSIONS:
+        info.compress_type = zipfile.ZIP_STORED
+    else:
+        info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def stream_zip(entries):
+    """
+    Generator, der das Archiv blockweise liefert.
+
+    Fehlende oder nicht lesbare Dateien werden übersprungen und protokolliert,
+    da die Antwort zu diesem Zeitpunkt bereits begonnen hat.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, mode='w', allowZip64=True) as archive:
+        for entry in entries:
+            info = _zip_info(entry)
+            if entry.path is None:
+                archive.writestr(info, b'')
+                continue
+
+            try:
+                size = os.path.getsize(entry.path)
+                source = open(entry.path, 'rb')
+            except OSError as exc:
+                logger.warning(f"ZIP-Download: {entry.path} übersprungen: {exc}")
+                continue
+
+            with source, archive.open(info, mode='w', force_zip64=size >= _ZIP64_THRESHOLD) as target:
+                for chunk in iter(lambda: source.read(_READ_CHUNK_SIZE), b''):
+                    target.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+    # Rest des letzten Eintrags und Zentralverzeichnis
+    yield buffer.drain()
+
+
+def zip_download_headers(filename):
+    """Header für den Download; Umlaute im Namen über ``filename*`` (RFC 5987)."""
+    if not filename.lower().endswith('.zip'):
+        filename += '.zip'
+    ascii_name = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii').replace('"', '').strip() or 'download.zip'
+    return {
+        'Content-Disposition': f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}",
+        'Cache-Control': 'no-store',
+        # Kein Puffern durch nginx, damit der Download sofort beginnt
+        'X-Accel-Buffering': 'no',
+    }
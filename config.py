@@ -37,13 +37,43 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or os.environ.get('MAIL_USERNAME')
     MAIL_SENDER_NAME = os.environ.get('MAIL_SENDER_NAME', '')
+    # Versand-Warteschlange (False = sofort im Request senden), Nachrichten pro Versandlauf-Stapel,
+    # Laufzeit am Stück (s), Versuche pro Nachricht, Wartezeit vor dem 2. Versuch (s), Aufbewahrung (Tage)
+    MAIL_QUEUE_ENABLED = os.environ.get('MAIL_QUEUE_ENABLED', 'True').lower() == 'true'
+    MAIL_QUEUE_BATCH_SIZE = int(os.environ.get('MAIL_QUEUE_BATCH_SIZE', '20'))
+    MAIL_QUEUE_TIME_BUDGET = int(os.environ.get('MAIL_QUEUE_TIME_BUDGET', '120'))
+    MAIL_QUEUE_MAX_ATTEMPTS = int(os.environ.get('MAIL_QUEUE_MAX_ATTEMPTS', '5'))
+    MAIL_QUEUE_RETRY_BASE_DELAY = int(os.environ.get('MAIL_QUEUE_RETRY_BASE_DELAY', '60'))
+    MAIL_QUEUE_RETENTION_DAYS = int(os.environ.get('MAIL_QUEUE_RETENTION_DAYS', '7'))
+    # Ratenbegrenzung des SMTP-Anbieters (Nachrichten pro Minute/Stunde, 0 = keine)
+    MAIL_RATE_LIMIT_PER_MINUTE = int(os.environ.get('MAIL_RATE_LIMIT_PER_MINUTE', '0'))
+    MAIL_RATE_LIMIT_PER_HOUR = int(os.environ.get('MAIL_RATE_LIMIT_PER_HOUR', '0'))
+    # Wiederverwendete SMTP-Verbindung: Neuaufbau nach Leerlauf (s), NOOP-Prüfung ab (s), Nachrichten pro Verbindung
+    SMTP_IDLE_TIMEOUT = int(os.environ.get('SMTP_IDLE_TIMEOUT', '120'))
+    SMTP_NOOP_AFTER = int(os.environ.get('SMTP_NOOP_AFTER', '30'))
+    MAIL_MAX_MESSAGES_PER_CONNECTION = int(os.environ.get('MAIL_MAX_MESSAGES_PER_CONNECTION', '100'))
     
     IMAP_SERVER = os.environ.get('IMAP_SERVER')
     IMAP_PORT = int(os.environ.get('IMAP_PORT', 993))
     IMAP_USE_SSL = os.environ.get('IMAP_USE_SSL', 'True').lower() == 'true'
+    # IMAP-Verbindungspool pro Worker: höchstens offene Verbindungen (ausgeliehen + frei), Abmeldung nach
+    # Leerlauf (s), NOOP-Prüfung ab (s), Wartezeit auf eine freie Verbindung (s)
+    IMAP_POOL_SIZE = int(os.environ.get('IMAP_POOL_SIZE', '4'))
+    IMAP_POOL_IDLE_TIMEOUT = int(os.environ.get('IMAP_POOL_IDLE_TIMEOUT', '300'))
+    IMAP_POOL_NOOP_AFTER = int(os.environ.get('IMAP_POOL_NOOP_AFTER', '30'))
+    IMAP_POOL_WAIT_TIMEOUT = int(os.environ.get('IMAP_POOL_WAIT_TIMEOUT', '30'))
+    # IMAP IDLE auf der INBOX (Scheduler-Leader): Erneuerung nach (s), Sync-Intervall der übrigen Ordner (min)
+    IMAP_IDLE_ENABLED = os.environ.get('IMAP_IDLE_ENABLED', 'True').lower() == 'true'
+    IMAP_IDLE_TIMEOUT = int(os.environ.get('IMAP_IDLE_TIMEOUT', '1500'))
+    IMAP_IDLE_POLL_INTERVAL_MINUTES = int(os.environ.get('IMAP_IDLE_POLL_INTERVAL_MINUTES', '60'))
     
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', 'uploads')
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 524288000))
+    # Uploads in Teilstücken: maximale Dateigröße, Größe je Teilstück (Bytes),
+    # Aufbewahrung unvollständiger Uploads (Stunden)
+    FILE_UPLOAD_MAX_SIZE = int(os.environ.get('FILE_UPLOAD_MAX_SIZE', str(100 * 1024 * 1024)))
+    FILE_UPLOAD_CHUNK_SIZE = int(os.environ.get('FILE_UPLOAD_CHUNK_SIZE', str(8 * 1024 * 1024)))
+    FILE_UPLOAD_SESSION_TTL_HOURS = int(os.environ.get('FILE_UPLOAD_SESSION_TTL_HOURS', '24'))
     ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'mp4', 'webm', 'ogg', 'mp3', 'wav', 'md', 'doc', 'docx', 'xls', 'xlsx', 'zip', 'rar'}
     
     APP_NAME = os.environ.get('APP_NAME', 'Prismateams')
@@ -55,10 +85,27 @@ class Config:
     
     VAPID_PRIVATE_KEY = os.environ.get('VAPID_PRIVATE_KEY')
     VAPID_PUBLIC_KEY = os.environ.get('VAPID_PUBLIC_KEY')
+    # Web-Push: parallele Zustellungen pro Worker und HTTP-Timeout (Sekunden)
+    PUSH_DELIVERY_MAX_WORKERS = int(os.environ.get('PUSH_DELIVERY_MAX_WORKERS', '16'))
+    PUSH_DELIVERY_TIMEOUT = int(os.environ.get('PUSH_DELIVERY_TIMEOUT', '10'))
     
     EMAIL_HTML_MAX_LENGTH = int(os.environ.get('EMAIL_HTML_MAX_LENGTH', 0))
     EMAIL_TEXT_MAX_LENGTH = int(os.environ.get('EMAIL_TEXT_MAX_LENGTH', 10000))
     EMAIL_HTML_STORAGE_TYPE = os.environ.get('EMAIL_HTML_STORAGE_TYPE', 'TEXT')
+    # Inkrementeller IMAP-Sync: Nachrichten pro UID FETCH bzw. maximale Größe eines Stapels (Bytes)
+    EMAIL_SYNC_FETCH_BATCH_SIZE = int(os.environ.get('EMAIL_SYNC_FETCH_BATCH_SIZE', '25'))
+    EMAIL_SYNC_FETCH_BATCH_BYTES = int(os.environ.get('EMAIL_SYNC_FETCH_BATCH_BYTES', str(20 * 1024 * 1024)))
+    # Anhänge ab dieser Größe (Bytes) erst beim ersten Zugriff vom IMAP-Server laden (0 = aus)
+    EMAIL_LAZY_FETCH_MIN_SIZE = int(os.environ.get('EMAIL_LAZY_FETCH_MIN_SIZE', str(1024 * 1024)))
+    # Gleichzeitig abgeglichene Ordner (je eine IMAP-Verbindung) und aufbewahrte Sync-Kennzahlen
+    EMAIL_SYNC_PARALLEL_FOLDERS = int(os.environ.get('EMAIL_SYNC_PARALLEL_FOLDERS', '4'))
+    EMAIL_SYNC_RUN_HISTORY = int(os.environ.get('EMAIL_SYNC_RUN_HISTORY', '500'))
+    # Bereinigung nach Speicherdauer: E-Mails pro Stapel, Laufzeit am Stück (s), Pause danach (s),
+    # Zeitfenster in Stunden der Portal-Zeitzone (z.B. "1-5", leer = jederzeit)
+    EMAIL_CLEANUP_BATCH_SIZE = int(os.environ.get('EMAIL_CLEANUP_BATCH_SIZE', '500'))
+    EMAIL_CLEANUP_TIME_BUDGET = int(os.environ.get('EMAIL_CLEANUP_TIME_BUDGET', '300'))
+    EMAIL_CLEANUP_PAUSE = int(os.environ.get('EMAIL_CLEANUP_PAUSE', '30'))
+    EMAIL_CLEANUP_HOURS = os.environ.get('EMAIL_CLEANUP_HOURS', '')
     
     ONLYOFFICE_ENABLED = os.environ.get('ONLYOFFICE_ENABLED', 'False').lower() == 'true'
     ONLYOFFICE_DOCUMENT_SERVER_URL = os.environ.get('ONLYOFFICE_DOCUMENT_SERVER_URL', '/onlyoffice')
@@ -74,6 +121,25 @@ class Config:
     MEDIA_DOWNLOADER_MAX_CONCURRENT = int(os.environ.get('MEDIA_DOWNLOADER_MAX_CONCURRENT', '2'))
     FFMPEG_PATH = os.environ.get('FFMPEG_PATH', '')
 
+    # SystemSettings-Cache: Versionsprüfung außerhalb von Requests (Sekunden)
+    SETTINGS_CACHE_CHECK_INTERVAL = int(os.environ.get('SETTINGS_CACHE_CHECK_INTERVAL', '5'))
+    # Maximale Lebensdauer des SystemSettings-Caches pro Worker (Sekunden)
+    SETTINGS_CACHE_MAX_AGE = int(os.environ.get('SETTINGS_CACHE_MAX_AGE', '300'))
+
+    # Hintergrund-Job-Queue (app/tasks/job_queue.py)
+    JOB_QUEUE_CONCURRENCY = int(os.environ.get('JOB_QUEUE_CONCURRENCY', '4'))
+    JOB_QUEUE_POLL_INTERVAL = int(os.environ.get('JOB_QUEUE_POLL_INTERVAL', '2'))
+    JOB_QUEUE_MAX_ATTEMPTS = int(os.environ.get('JOB_QUEUE_MAX_ATTEMPTS', '3'))
+    JOB_QUEUE_RETRY_BASE_DELAY = int(os.environ.get('JOB_QUEUE_RETRY_BASE_DELAY', '30'))
+    JOB_QUEUE_RETRY_MAX_DELAY = int(os.environ.get('JOB_QUEUE_RETRY_MAX_DELAY', '3600'))
+    # Laufende Jobs ohne Rückmeldung gelten danach als abgestürzt (Sekunden)
+    JOB_QUEUE_STALE_AFTER = int(os.environ.get('JOB_QUEUE_STALE_AFTER', '7200'))
+    JOB_QUEUE_RETENTION_DAYS = int(os.environ.get('JOB_QUEUE_RETENTION_DAYS', '7'))
+    # Scheduler in den Web-Workern starten (False, wenn `flask run-scheduler` separat läuft)
+    JOB_SCHEDULER_ENABLED = os.environ.get('JOB_SCHEDULER_ENABLED', 'True').lower() == 'true'
+    # Gültigkeit der Scheduler-Leitung; danach übernimmt ein anderer Prozess (Sekunden)
+    JOB_SCHEDULER_LEASE_SECONDS = int(os.environ.get('JOB_SCHEDULER_LEASE_SECONDS', '90'))
+
     # Redis für SocketIO Message Queue (optional, für Multi-Worker-Setups)
     REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
     REDIS_ENABLED = os.environ.get('REDIS_ENABLED', 'False').lower() == 'true'